@@ -0,0 +1,96 @@
+"""
+ロール履歴のメモリ使用量ベンチマーク
+
+10,000ユーザー × 10回分のロール結果を履歴キャッシュと同じ形（ユーザーごとのdeque）で保持し、
+従来の辞書形式・RollResult・RollRecord（出目を持たずシードだけを保存）の
+1ロールあたりのバイト数を tracemalloc で比較する。
+
+実行方法:
+    python benchmarks/bench_history_memory.py
+"""
+import gc
+import sys
+import os
+import tracemalloc
+from collections import deque
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.roller import roll_complex_dice
+from src.dice.result import RollRecord
+from src.dice.rng import new_seed
+
+USERS = 10000
+ROLLS_PER_USER = 10
+# 実際の卓でよく使われる表記
+EXPRESSIONS = ["1d20+5", "2d6", "1d100", "4d6", "1d20+1d4+2", "3d8-1"]
+
+def to_legacy_dict(result) -> dict:
+    """RollResultを従来の辞書形式（出目はリスト、表記は文字列）に変換する"""
+    details = []
+    for term in result.terms:
+        if term.type == "dice":
+            details.append({
+                "type": "dice",
+                "notation": f"{'-' if term.negative else ''}{abs(term.count)}d{term.sides}",
+                "rolls": list(term.rolls),
+                "sum": term.total,
+                "negative": term.negative,
+                "is_critical": term.is_critical,
+                "is_fumble": term.is_fumble,
+                "sides": term.sides
+            })
+        else:
+            details.append({"type": "modifier", "value": term.value})
+    return {"input": result.input, "details": details, "result": result.total}
+
+def identity(result):
+    """RollResultをそのまま保存する"""
+    return result
+
+def measure(convert) -> int:
+    """
+    全ユーザー分のロールを行って履歴に保存し、保持されたバイト数を返す
+
+    引数:
+        convert: ロール結果を保存形式に変換する関数
+
+    戻り値:
+        履歴の保持に使われたバイト数
+    """
+    # パースキャッシュを温めておき、計測対象から除く
+    for expression in EXPRESSIONS:
+        roll_complex_dice(expression)
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = {}
+    for user_id in range(USERS):
+        user_history = deque(maxlen=ROLLS_PER_USER)
+        for i in range(ROLLS_PER_USER):
+            expression = EXPRESSIONS[(user_id + i) % len(EXPRESSIONS)]
+            user_history.append(convert(roll_complex_dice(expression, seed=new_seed())))
+        history[user_id] = user_history
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+def main():
+    total_rolls = USERS * ROLLS_PER_USER
+    legacy = measure(to_legacy_dict)
+    slotted = measure(identity)
+    record = measure(RollRecord.from_result)
+
+    print(f"{USERS:,}ユーザー × {ROLLS_PER_USER}回 = {total_rolls:,}ロール")
+    print(f"{'辞書形式':<12} {legacy:>14,} bytes  ({legacy / total_rolls:,.0f} bytes/roll)")
+    print(f"{'RollResult':<12} {slotted:>14,} bytes  ({slotted / total_rolls:,.0f} bytes/roll)")
+    print(f"{'RollRecord':<12} {record:>14,} bytes  ({record / total_rolls:,.0f} bytes/roll)")
+    print(f"削減率: RollResult {1 - slotted / legacy:.1%} / RollRecord {1 - record / legacy:.1%}")
+
+if __name__ == "__main__":
+    main()
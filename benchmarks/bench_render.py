@@ -0,0 +1,94 @@
+"""
+ダイス結果のEmbed作成のベンチマーク
+
+全ての出目を連結していた従来の create_dice_embed と、文字数を割り当てて大きなダイスプールを
+まとめる現在の実装について、設定上の最大（100個・1000面）付近のロールで
+1回あたりの作成時間とペイロード（embedのJSON）のバイト数を比較する。
+Discordの上限（フィールド1024文字、全体6000文字）を超えるEmbedには「超過」と表示する。
+
+実行方法:
+    python benchmarks/bench_render.py
+"""
+import dataclasses
+import datetime
+import json
+import logging
+import sys
+import os
+import timeit
+from types import SimpleNamespace
+
+import discord
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from config.settings import get_settings
+from src.dice.roller import roll_complex_dice
+from src.dice.renderer import create_dice_embed, EMBED_TOTAL_LIMIT, FIELD_VALUE_LIMIT
+
+# 最後の2つはギルド別の設定でダイス数の上限を上げた場合
+NOTATIONS = ["1d20+5", "100d6", "100d1000", "100d1000+100d1000+100d1000", "1000d6", "1000d1000"]
+
+def create_dice_embed_legacy(interaction, result) -> discord.Embed:
+    """従来の実装（Embedを毎回組み立て、全ての出目を連結する）"""
+    if result.is_critical:
+        color = discord.Color.gold()
+    elif result.is_fumble:
+        color = discord.Color.dark_red()
+    else:
+        color = discord.Color.blue()
+    embed = discord.Embed(
+        title=f"🎲 ダイスロール: {result.input}",
+        description=f"{interaction.user.display_name}さんのロール結果",
+        color=color,
+        timestamp=datetime.datetime.now()
+    )
+    embed.set_thumbnail(url=interaction.user.display_avatar.url)
+    for term in result.terms:
+        if term.type == "dice":
+            rolls_str = ", ".join(map(str, term.rolls))
+            embed.add_field(name=term.notation, value=f"[{rolls_str}] = **{term.total}**", inline=False)
+        else:
+            embed.add_field(name="修正値", value=f"{term.value:+}", inline=False)
+    embed.add_field(name="最終結果", value=f"**{result.total}**", inline=False)
+    if result.is_critical:
+        embed.set_footer(text="🎉 クリティカル！ 大成功です！")
+    elif result.is_fumble:
+        embed.set_footer(text="💥 ファンブル！ 大失敗です！")
+    return embed
+
+def measure(func, *args) -> float:
+    """1回あたりの最短の実行時間（秒）"""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+def payload_bytes(embed: discord.Embed) -> int:
+    """送信されるembedのJSONのバイト数"""
+    return len(json.dumps(embed.to_dict(), ensure_ascii=False).encode('utf-8'))
+
+def within_limits(embed: discord.Embed) -> bool:
+    """Discordのembedの上限に収まっているかどうか"""
+    return len(embed) <= EMBED_TOTAL_LIMIT and all(len(field.value) <= FIELD_VALUE_LIMIT for field in embed.fields)
+
+def main():
+    logging.getLogger('dice_bot').setLevel(logging.WARNING + 1)
+    settings = dataclasses.replace(get_settings(), max_dice_count=1000)
+    avatar = SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+    interaction = SimpleNamespace(user=SimpleNamespace(display_name="ベンチマーク", display_avatar=avatar))
+
+    print(f"{'ダイス':<28} {'従来 (µs)':>10} {'バイト':>8} {'現在 (µs)':>10} {'バイト':>8}")
+    for notation in NOTATIONS:
+        result = roll_complex_dice(notation, settings)
+        row = []
+        for render in (create_dice_embed_legacy, create_dice_embed):
+            embed = render(interaction, result)
+            status = "" if within_limits(embed) else " 超過"
+            row.append(f"{measure(render, interaction, result) * 1e6:>10,.1f} {payload_bytes(embed):>8,}{status:<3}")
+        print(f"{notation:<28} {' '.join(row)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+ダイスロールのマイクロベンチマーク
+
+1ダイスごとに random.randint を呼ぶ従来の実装と、
+ブロック単位で乱数を生成する roll_dice の速度（ダイス/秒）を比較する。
+
+実行方法:
+    python benchmarks/bench_roll_dice.py
+"""
+import random
+import sys
+import os
+import timeit
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.roller import roll_dice
+
+# (ダイス数, 面数) の組み合わせ
+CASES = [(1, 20), (3, 6), (10, 10), (100, 6), (100, 1000)]
+
+def roll_dice_randint(num_dice: int, num_sides: int):
+    """従来の実装（1ダイスごとに random.randint を呼ぶ）"""
+    return [random.randint(1, num_sides) for _ in range(abs(num_dice))]
+
+def dice_per_second(func, num_dice: int, num_sides: int, duration: float = 0.2) -> float:
+    """
+    指定した関数のスループットを計測する
+
+    引数:
+        func: 計測するロール関数
+        num_dice: ダイスの数
+        num_sides: ダイスの面数
+        duration: 計測時間の目安（秒）
+
+    戻り値:
+        1秒あたりに振れるダイス数
+    """
+    timer = timeit.Timer(lambda: func(num_dice, num_sides))
+    number, elapsed = timer.autorange()
+    # autorangeの結果から計測時間に見合う回数を決めて再計測する
+    number = max(number, int(number * duration / max(elapsed, 1e-9)))
+    elapsed = min(timer.repeat(repeat=3, number=number))
+    return num_dice * number / elapsed
+
+def main():
+    print(f"{'ダイス':>10} {'randint (dice/s)':>18} {'roll_dice (dice/s)':>20} {'倍率':>8}")
+    for num_dice, num_sides in CASES:
+        before = dice_per_second(roll_dice_randint, num_dice, num_sides)
+        after = dice_per_second(roll_dice, num_dice, num_sides)
+        print(f"{num_dice:>5}d{num_sides:<4} {before:>18,.0f} {after:>20,.0f} {after / before:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
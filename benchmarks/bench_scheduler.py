@@ -0,0 +1,115 @@
+"""
+スケジューラーのベンチマーク
+
+待機中の予定を大量に抱えた状態で、従来の方法（予定ごとに asyncio.sleep で待つコルーチン）と
+スケジューラー（1つのタスクと最小ヒープ）のメモリ使用量と実行の遅れを比較する。
+予定の保存先はメモリ上のバックエンドを使い、ディスクへの書き込みは計測に含めない。
+
+実行方法:
+    python benchmarks/bench_scheduler.py
+"""
+import asyncio
+import gc
+import statistics
+import sys
+import os
+import time
+import tracemalloc
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.timers.scheduler import Scheduler, MemorySchedulerBackend
+
+# 待機中の予定の数
+PENDING = 50000
+# 計測中に実行する予定の数と、実行までの時間（秒）
+DUE = 2000
+DUE_WITHIN = 1.0
+
+def _delays():
+    """実行する予定は DUE_WITHIN 秒以内に均等に散らし、残りは1時間後にする"""
+    return [DUE_WITHIN * i / DUE if i < DUE else 3600.0 for i in range(PENDING)]
+
+async def run_sleep_tasks(trace: bool):
+    """
+    予定ごとに asyncio.sleep で待つコルーチンを起動する
+
+    引数:
+        trace: Trueの場合はメモリ使用量を計測する（計測中は遅くなるため、遅れは別に計測する）
+    """
+    lateness = []
+
+    async def wait(delay: float):
+        due_at = time.time() + delay
+        await asyncio.sleep(delay)
+        lateness.append(time.time() - due_at)
+
+    if trace:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.ensure_future(wait(delay)) for delay in _delays()]
+    await asyncio.sleep(0)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    if trace:
+        return used, None
+
+    await asyncio.sleep(DUE_WITHIN + 0.5)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return used, lateness
+
+async def run_scheduler(trace: bool):
+    """
+    スケジューラーに予定を追加する
+
+    引数:
+        trace: Trueの場合はメモリ使用量を計測する
+    """
+    lateness = []
+
+    async def handler(event):
+        lateness.append(time.time() - event.due_at)
+
+    scheduler = Scheduler(MemorySchedulerBackend())
+    scheduler.register("bench", handler)
+    await scheduler.start()
+
+    if trace:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for delay in _delays():
+        await scheduler.schedule("bench", delay, {})
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    if trace:
+        return used, None
+
+    await asyncio.sleep(DUE_WITHIN + 0.2)
+    await scheduler.close()
+    return used, lateness
+
+def report(name: str, run):
+    gc.collect()
+    used, _ = asyncio.run(run(True))
+    gc.collect()
+    _, lateness = asyncio.run(run(False))
+    lateness_ms = sorted(value * 1000 for value in lateness)
+    p99 = lateness_ms[int(len(lateness_ms) * 0.99) - 1] if lateness_ms else float('nan')
+    print(
+        f"{name:<10} {used / PENDING:>8,.0f} bytes/予定  実行 {len(lateness):>5,}件  "
+        f"遅れ 中央値 {statistics.median(lateness_ms):6.2f}ms / p99 {p99:6.2f}ms"
+    )
+
+def main():
+    print(f"待機中の予定 {PENDING:,}件のうち {DUE:,}件を{DUE_WITHIN:.0f}秒以内に実行")
+    report("sleep", run_sleep_tasks)
+    # スケジューラーはメモリ上の予定に加え、保存先（メモリ上のバックエンド）の分も含む
+    report("scheduler", run_scheduler)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+モンテカルロシミュレーションのベンチマーク
+
+/simulate と同じ処理（プロセスプールでのチャンクの並列実行）のスループット（試行/秒）を、
+roll_complex_dice を1回ずつ呼んで合計を数える方法と比較する。
+
+実行方法:
+    python benchmarks/bench_simulation.py [試行数]
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.parser import compile_dice_expression
+from src.dice.roller import roll_complex_dice
+from src.dice.simulation import run_simulation
+
+# ダイス式
+CASES = ["3d6", "1d20+2d4-1", "100d6", "100d1000"]
+
+# 1回ずつ振る方法で計測する試行の数（遅いため少なくする）
+BASELINE_TRIALS = 20000
+
+def baseline_throughput(expression) -> float:
+    """roll_complex_dice を1回ずつ呼ぶ方法のスループット"""
+    start = time.perf_counter()
+    Counter(roll_complex_dice(expression).total for _ in range(BASELINE_TRIALS))
+    return BASELINE_TRIALS / (time.perf_counter() - start)
+
+async def simulation_throughput(expression, trials: int, workers: int) -> float:
+    """プロセスプールでのシミュレーションのスループット（プールの起動時間は含めない）"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # ワーカーを起動し、累積分布の表を作らせておく
+        await run_simulation(expression, workers * 100000, 0, executor, workers)
+        result = await run_simulation(expression, trials, 1, executor, workers)
+    return result.throughput
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    workers = os.cpu_count() or 1
+    print(f"試行数 {trials:,}、プロセス数 {workers}")
+    print(f"{'式':>12} {'1回ずつ (回/s)':>16} {'1プロセス (回/s)':>18} {f'{workers}プロセス (回/s)':>18}")
+    for dice_str in CASES:
+        expression = compile_dice_expression(dice_str)
+        before = baseline_throughput(expression)
+        single = asyncio.run(simulation_throughput(expression, trials, 1))
+        parallel = asyncio.run(simulation_throughput(expression, trials, workers))
+        print(f"{dice_str:>12} {before:>16,.0f} {single:>18,.0f} {parallel:>18,.0f}")
+
+if __name__ == "__main__":
+    main()
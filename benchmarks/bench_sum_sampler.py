@@ -0,0 +1,50 @@
+"""
+合計だけのロールのマイクロベンチマーク
+
+出目を振って合計する従来の方法と、累積分布の表から合計を直接引く方法の
+1回あたりの時間を比較する。表の作成にかかる時間と、作成のコストを回収できる回数も表示する。
+
+実行方法:
+    python benchmarks/bench_sum_sampler.py
+"""
+import random
+import sys
+import os
+import time
+import timeit
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.roller import roll_dice
+from src.dice.sampler import get_sum_table
+
+# (ダイス数, 面数) の組み合わせ
+CASES = [(3, 6), (10, 10), (100, 6), (100, 100), (100, 1000)]
+
+def seconds_per_call(func) -> float:
+    """関数1回あたりの実行時間（秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+def main():
+    rng = random.Random(1)
+    print(f"{'ダイス':>10} {'出目 (µs)':>10} {'表 (µs)':>9} {'倍率':>8} {'表の作成 (ms)':>14} {'回収 (回)':>10}")
+    for num_dice, num_sides in CASES:
+        start = time.perf_counter()
+        table = get_sum_table(num_dice, num_sides)
+        build = time.perf_counter() - start
+
+        faces = seconds_per_call(lambda: sum(roll_dice(num_dice, num_sides, rng)))
+        sampled = seconds_per_call(lambda: table.sample(rng))
+        payback = build / max(faces - sampled, 1e-12)
+        print(
+            f"{num_dice:>5}d{num_sides:<4} {faces * 1e6:>10.2f} {sampled * 1e6:>9.2f} "
+            f"{faces / sampled:>7.1f}x {build * 1000:>14.1f} {payback:>10,.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
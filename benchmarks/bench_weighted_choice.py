@@ -0,0 +1,67 @@
+"""
+重み付き選択のマイクロベンチマーク
+
+同じ重み付きリストから繰り返し1つずつ選ぶ場合について、呼び出しごとに重みを検証して
+random.choices を呼ぶ従来の weighted_select と、作成済みのエイリアス表から選ぶ場合の
+1回あたりの時間を比較する。リストを渡してキャッシュから表を探す weighted_select は
+項目と重みのハッシュにO(n)かかるため、表を保持して選ぶ場合とは別に表示する。
+
+実行方法:
+    python benchmarks/bench_weighted_choice.py
+"""
+import logging
+import random
+import sys
+import os
+import time
+import timeit
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.randomizers.selector import WeightedSampler, weighted_select
+
+# 項目数
+CASES = [10, 100, 1000, 10000]
+
+def weighted_select_legacy(items, weights):
+    """従来の実装（呼び出しごとに重みを0以上に補正して合計し、random.choices で選ぶ）"""
+    weights = [max(0, w) for w in weights]
+    if sum(weights) == 0:
+        return random.choice(items)
+    return random.choices(items, weights=weights, k=1)[0]
+
+def seconds_per_call(func) -> float:
+    """関数1回あたりの実行時間（秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+def main():
+    logging.getLogger('dice_bot').setLevel(logging.WARNING + 1)
+    rng = random.Random(0)
+
+    print(
+        f"{'項目数':>8} {'従来 (µs)':>12} {'表を保持 (µs)':>14} {'倍率':>8} "
+        f"{'キャッシュ参照 (µs)':>18} {'表の作成 (ms)':>14}"
+    )
+    for size in CASES:
+        items = [f"項目{i}" for i in range(size)]
+        weights = [rng.randint(1, 100) for _ in range(size)]
+
+        start = time.perf_counter()
+        sampler = WeightedSampler(items, weights)
+        build = time.perf_counter() - start
+
+        before = seconds_per_call(lambda: weighted_select_legacy(items, weights))
+        held = seconds_per_call(sampler.sample)
+        cached = seconds_per_call(lambda: weighted_select(items, weights))
+        print(
+            f"{size:>8,} {before * 1e6:>12.2f} {held * 1e6:>14.2f} {before / held:>7.1f}x "
+            f"{cached * 1e6:>18.2f} {build * 1000:>14.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
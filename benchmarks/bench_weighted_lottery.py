@@ -0,0 +1,74 @@
+"""
+重み付き抽選のベンチマーク
+
+当選者を1人選ぶごとに random.choices で重みを合計し直す従来の実装（O(n·k)）と、
+Efraimidis–Spirakis法の draw_weighted_lottery（O(n log k)）の実行時間を比較する。
+
+実行方法:
+    python benchmarks/bench_weighted_lottery.py
+"""
+import logging
+import random
+import sys
+import os
+import time
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.randomizers.lottery import draw_weighted_lottery
+
+# (参加者数, 当選者数) の組み合わせ
+CASES = [(1000, 10), (10000, 100), (100000, 1000)]
+
+def draw_weighted_lottery_legacy(participants, weights, winners_count):
+    """従来の実装（1人選ぶごとに重みを合計し直し、リストから削除する）"""
+    remaining_participants = participants.copy()
+    remaining_weights = [max(0, w) for w in weights]
+    winners = []
+    for _ in range(min(winners_count, len(participants))):
+        if sum(remaining_weights) == 0:
+            idx = random.randrange(len(remaining_participants))
+        else:
+            idx = random.choices(range(len(remaining_participants)), weights=remaining_weights, k=1)[0]
+        winners.append(remaining_participants.pop(idx))
+        remaining_weights.pop(idx)
+    return winners
+
+def best_time(func, *args, repeat: int = 3) -> float:
+    """
+    関数を数回実行して最短の実行時間を返す
+
+    引数:
+        func: 計測する関数
+        *args: 関数に渡す引数
+        repeat: 実行回数
+
+    戻り値:
+        最短の実行時間（秒）
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    logging.getLogger('dice_bot').setLevel(logging.WARNING + 1)
+    rng = random.Random(0)
+
+    print(f"{'参加者/当選者':>16} {'従来 (ms)':>12} {'新実装 (ms)':>12} {'倍率':>8}")
+    for participants, winners in CASES:
+        names = [f"参加者{i}" for i in range(participants)]
+        # 口数（整数）で重みを指定する
+        tickets = [rng.randint(1, 10) for _ in range(participants)]
+        repeat = 1 if participants >= 100000 else 3
+        before = best_time(draw_weighted_lottery_legacy, names, tickets, winners, repeat=repeat)
+        after = best_time(draw_weighted_lottery, names, tickets, winners)
+        print(f"{participants:>9,}/{winners:<6,} {before * 1000:>12,.1f} {after * 1000:>12,.1f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+ダイスエンジンとランダム選択のベンチマークスイート
+
+ホットパスの関数を小さな入力から設定上の最大サイズまで計測し、結果をJSONで出力する。
+基準となる結果を指定すると、許容範囲を超えて遅くなったケースを報告して終了コード1で終わる。
+
+実行方法:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --tolerance 0.2
+    python benchmarks/run_benchmarks.py --filter roll_complex_dice
+"""
+import argparse
+import datetime
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import os
+import timeit
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.parser import parse_complex_dice_notation, clear_parse_cache
+from src.dice.roller import roll_complex_dice
+from src.dice.renderer import create_dice_embed
+from src.randomizers.selector import create_teams
+from src.randomizers.lottery import draw_weighted_lottery, tournament_draw
+
+class Benchmark(NamedTuple):
+    """ベンチマークのケース"""
+    name: str
+    params: Dict[str, Any]
+    func: Callable[[], Any]
+
+def _participants(count: int) -> List[str]:
+    return [f"参加者{i}" for i in range(count)]
+
+def _interaction() -> Any:
+    """create_dice_embed が参照する属性だけを持つインタラクション"""
+    avatar = SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+    return SimpleNamespace(user=SimpleNamespace(display_name="ベンチマーク", display_avatar=avatar))
+
+def build_benchmarks() -> List[Benchmark]:
+    """
+    計測するケースを作成する
+
+    戻り値:
+        ベンチマークのリスト
+    """
+    benchmarks = []
+
+    # ダイス表記の解析（キャッシュ済みの場合と、毎回解析する場合）
+    for notation in ("1d20", "2d6+1d4+3", "100d1000+100d1000-50d20+1000"):
+        benchmarks.append(Benchmark(
+            "parse_complex_dice_notation", {"notation": notation, "cached": True},
+            lambda notation=notation: parse_complex_dice_notation(notation)
+        ))
+
+        def parse_uncached(notation=notation):
+            clear_parse_cache()
+            return parse_complex_dice_notation(notation)
+        benchmarks.append(Benchmark(
+            "parse_complex_dice_notation", {"notation": notation, "cached": False}, parse_uncached
+        ))
+
+    # ダイスロール（設定上の最大は100個・1000面）
+    for notation in ("1d20", "4d6+2", "10d10+1d4", "100d1000"):
+        benchmarks.append(Benchmark(
+            "roll_complex_dice", {"notation": notation},
+            lambda notation=notation: roll_complex_dice(notation)
+        ))
+
+    # Embedの作成（100d6 は出目ごとの個数にまとめる場合）
+    interaction = _interaction()
+    for notation in ("1d20+5", "10d10+1d4", "100d6", "100d1000", "100d1000+100d1000+100d1000"):
+        result = roll_complex_dice(notation)
+        benchmarks.append(Benchmark(
+            "create_dice_embed", {"notation": notation},
+            lambda result=result: create_dice_embed(interaction, result)
+        ))
+
+    # チーム分け
+    for members, teams in ((10, 2), (1000, 10), (100000, 100)):
+        member_list = _participants(members)
+        benchmarks.append(Benchmark(
+            "create_teams", {"members": members, "teams": teams},
+            lambda member_list=member_list, teams=teams: create_teams(member_list, teams)
+        ))
+
+    # 重み付き抽選
+    rng = random.Random(0)
+    for participants, winners in ((10, 1), (1000, 10), (10000, 100), (100000, 1000)):
+        participant_list = _participants(participants)
+        weights = [rng.uniform(0.5, 5.0) for _ in range(participants)]
+        benchmarks.append(Benchmark(
+            "draw_weighted_lottery", {"participants": participants, "winners": winners},
+            lambda participant_list=participant_list, weights=weights, winners=winners:
+                draw_weighted_lottery(participant_list, weights, winners)
+        ))
+
+    # トーナメント表（コマンドの上限は6ラウンド）
+    for participants, rounds in ((8, 3), (64, 6), (10000, 6)):
+        participant_list = _participants(participants)
+        benchmarks.append(Benchmark(
+            "tournament_draw", {"participants": participants, "rounds": rounds},
+            lambda participant_list=participant_list, rounds=rounds: tournament_draw(participant_list, rounds)
+        ))
+
+    return benchmarks
+
+def case_id(name: str, params: Dict[str, Any]) -> str:
+    """ケースを一意に表す文字列（例: "roll_complex_dice[notation=1d20]"）"""
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+def measure(func: Callable[[], Any], duration: float, repeat: int = 5) -> Dict[str, Any]:
+    """
+    関数の1回あたりの実行時間を計測する
+
+    引数:
+        func: 計測する関数
+        duration: 1回の計測にかける時間の目安（秒）
+        repeat: 計測の繰り返し回数
+
+    戻り値:
+        繰り返し回数と、1回あたりの最短・中央値・平均時間（秒）の辞書
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorangeの結果から計測時間に見合う回数を決めて再計測する
+    number = max(1, int(number * duration / max(elapsed, 1e-9)))
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    best = min(timings)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "best_s": best,
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.mean(timings),
+        "ops_per_s": 1 / best if best > 0 else None
+    }
+
+def run(benchmarks: List[Benchmark], duration: float, name_filter: Optional[str] = None) -> Dict[str, Any]:
+    """
+    ベンチマークを実行する
+
+    引数:
+        benchmarks: 実行するベンチマーク
+        duration: 1回の計測にかける時間の目安（秒）
+        name_filter: 指定した場合、ケース名にこの文字列を含むものだけを実行する
+
+    戻り値:
+        実行環境と各ケースの結果を含む辞書
+    """
+    results = []
+    for benchmark in benchmarks:
+        identifier = case_id(benchmark.name, benchmark.params)
+        if name_filter and name_filter not in identifier:
+            continue
+        timing = measure(benchmark.func, duration)
+        results.append({"id": identifier, "name": benchmark.name, "params": benchmark.params, **timing})
+        print(f"{identifier:<80} {timing['best_s'] * 1e6:>14,.2f} µs", file=sys.stderr)
+
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "duration": duration,
+        "results": results
+    }
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    基準の結果より遅くなったケースを探す
+
+    引数:
+        current: 今回の結果
+        baseline: 基準の結果
+        tolerance: 許容する遅くなる割合（0.2なら20%まで）
+
+    戻り値:
+        許容範囲を超えて遅くなったケースのリスト
+    """
+    baseline_times = {result["id"]: result["best_s"] for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_times.get(result["id"])
+        if before is None or before <= 0:
+            continue
+        ratio = result["best_s"] / before
+        if ratio > 1 + tolerance:
+            regressions.append({"id": result["id"], "baseline_s": before, "current_s": result["best_s"], "ratio": ratio})
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ダイスエンジンとランダム選択のベンチマーク")
+    parser.add_argument('--output', help="結果を書き出すJSONファイル（省略時は標準出力）")
+    parser.add_argument('--filter', dest='name_filter', help="ケース名にこの文字列を含むものだけを実行")
+    parser.add_argument('--duration', type=float, default=0.2, help="1回の計測にかける時間の目安（秒）")
+    parser.add_argument('--baseline', help="比較する基準の結果（JSONファイル）")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="許容する遅くなる割合（デフォルト: 0.2）")
+    args = parser.parse_args(argv)
+
+    # 計測中のログ出力を抑える
+    logging.getLogger('dice_bot').setLevel(logging.WARNING + 1)
+
+    results = run(build_benchmarks(), args.duration, args.name_filter)
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"遅くなりました: {regression['id']} "
+                f"{regression['baseline_s'] * 1e6:,.2f} µs -> {regression['current_s'] * 1e6:,.2f} µs "
+                f"({regression['ratio']:.2f}x)",
+                file=sys.stderr
+            )
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,376 @@
 """
 設定管理モジュール
+
+設定は起動時に一度だけ読み込んで検証し、不変のスナップショット（Settings）として保持する。
+ホットパスはスナップショットを一度取得して属性を参照する。
+.envやギルド別設定ファイルが変更された場合は reload_settings でスナップショットを丸ごと差し替える。
 """
 import os
+import json
 import logging
-from typing import Dict, Any
-from dotenv import load_dotenv
+import threading
+from dataclasses import dataclass, fields, replace, asdict
+from typing import Dict, Any, Optional
+from dotenv import dotenv_values
+
+# プロジェクトのルートディレクトリ
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# データ保存先
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 
-# 環境変数のロード
-load_dotenv()
+# 環境変数ファイル
+ENV_PATH = os.path.join(PROJECT_ROOT, '.env')
 
-# ボット設定
-BOT_CONFIG: Dict[str, Any] = {
+@dataclass(frozen=True)
+class Settings:
+    """ボット設定のスナップショット（不変）"""
     # Discord API関連
-    'BOT_TOKEN': os.getenv('DISCORD_BOT_TOKEN', ''),
-    
+    bot_token: str = ''
+
     # ロギング設定
-    'LOG_LEVEL': getattr(logging, os.getenv('LOG_LEVEL', 'INFO'), logging.INFO),
-    
+    log_level: int = logging.INFO
+    log_format: str = 'text'  # text / json
+    log_max_bytes: int = 10 * 1024 * 1024  # このサイズを超えたらログファイルをローテートする
+    log_backup_count: int = 5
+
     # ダイス設定
-    'MAX_DICE_COUNT': 100,
-    'MIN_DICE_COUNT': 1,
-    'MAX_DICE_SIDES': 1000,
-    'MIN_DICE_SIDES': 2,
-    'MAX_MODIFIER': 1000,
-    'MIN_MODIFIER': -1000,
-    
+    max_dice_count: int = 100
+    min_dice_count: int = 1
+    max_dice_sides: int = 1000
+    min_dice_sides: int = 2
+    max_modifier: int = 1000
+    min_modifier: int = -1000
+
     # ロール履歴
-    'MAX_HISTORY_SIZE': 10,
-    
+    max_history_size: int = 10
+    history_backend: str = 'sqlite'  # sqlite / memory
+    history_db_path: str = os.path.join(DATA_DIR, 'history.db')
+    history_idle_seconds: float = 600.0  # この秒数アクセスのないユーザーはキャッシュから外す
+    history_cache_max_users: int = 10000
+    history_flush_interval: float = 1.0  # 秒
+    history_batch_size: int = 200
+
+    # 運の統計（/stats・/leaderboard）。集計値はロールのたびにメモリ上で更新し、一定間隔で保存する
+    stats_flush_interval: float = 30.0  # 秒
+    stats_idle_seconds: float = 600.0  # この秒数アクセスのないギルドの集計値は保存後にメモリから外す
+    stats_leaderboard_min_rolls: int = 20  # 割合の指標で順位に含めるのに必要なロールの回数
+
+    # ロールのシード（マスターキーとインタラクションIDから導出し、履歴の出目の再生成に使う）
+    roll_seed_key: str = ''  # 空の場合はキーファイルを使う
+    roll_seed_key_path: str = os.path.join(DATA_DIR, 'roll_seed.key')
+
     # ボタン設定
-    'BUTTON_TIMEOUT': 60,  # 秒
-}
+    button_timeout: float = 0.0  # 最後のロールからこの秒数を過ぎた再ロールボタンは使えない。0以下で期限なし
+
+    # 再ロールボタンの連打によるメッセージの編集の制限（ユーザーとメッセージの組ごと）
+    reroll_edit_rate: float = 1.0  # 1秒あたりの編集の回数
+    reroll_edit_burst: int = 3  # 連続して編集できる回数
+
+    # 添付ファイルから読み込む参加者リスト
+    attachment_max_bytes: int = 25 * 1024 * 1024
+    attachment_max_entries: int = 100000  # 全員をメモリに保持するコマンド（シャッフル・チーム分けなど）の上限
+
+    # 計算のオフロード設定
+    executor_kind: str = 'thread'  # thread / process
+    executor_max_workers: Optional[int] = None  # Noneの場合はCPU数から自動決定
+    offload_cost_threshold: int = 50000  # これ以上のコストの計算はエグゼキューターで実行
+    stats_max_cost: int = 16_000_000  # /roll stats で計算する分布の最大コスト（超える式は計算しない）
+
+    # 計測値のエンドポイント（Prometheusのテキスト形式）。0で無効
+    metrics_host: str = '127.0.0.1'
+    metrics_port: int = 0
+
+    # スラッシュコマンドの同期
+    command_sync_state_path: str = os.path.join(DATA_DIR, 'command_sync.json')  # 前回同期したコマンドのハッシュ
+    dev_guild_id: Optional[int] = None  # 指定した場合はグローバルではなくこのギルドに同期する（開発用）
+
+    # タイマー（予定したイベントはスケジューラーが保存し、再起動後も実行する）
+    scheduler_db_path: str = os.path.join(DATA_DIR, 'scheduler.db')
+    timer_max_seconds: int = 7 * 24 * 60 * 60  # 1つのタイマーの最大の長さ（秒）
+    timer_max_per_user: int = 10  # 1人が同時に動かせるタイマーの数
+
+    # モンテカルロシミュレーション（/simulate）。試行は専用のプロセスプールで並列に実行する
+    simulate_max_trials: int = 10_000_000  # 1回のシミュレーションの最大試行数
+    simulate_workers: Optional[int] = None  # プロセス数。Noneの場合はCPU数
+    simulate_update_interval: float = 3.0  # 途中経過でメッセージを編集する間隔（秒）
+
+    # クラスター（複数プロセスでのシャーディング）
+    cluster_stats_interval: float = 10.0  # 各クラスターがランチャーに統計を送る間隔（秒）
+
+    # 設定の再読み込み
+    guild_settings_path: str = os.path.join(DATA_DIR, 'guild_settings.json')
+    config_watch_interval: float = 5.0  # 秒。0以下で監視しない
+
+    def __post_init__(self):
+        self.validate()
+
+    def validate(self):
+        """
+        設定値の整合性を検証する
+
+        例外:
+            ValueError: 設定値が不正な場合
+        """
+        if self.log_format not in ('text', 'json'):
+            raise ValueError(f"不明なログ形式です: {self.log_format}")
+        if not (1 <= self.min_dice_count <= self.max_dice_count):
+            raise ValueError("ダイス数の範囲が不正です")
+        if not (2 <= self.min_dice_sides <= self.max_dice_sides <= 65535):
+            raise ValueError("ダイスの面数の範囲が不正です（2～65535）")
+        if self.min_modifier > self.max_modifier:
+            raise ValueError("修正値の範囲が不正です")
+        if self.max_history_size < 1:
+            raise ValueError("MAX_HISTORY_SIZEは1以上を指定してください")
+        if self.history_backend not in ('sqlite', 'memory'):
+            raise ValueError(f"不明な履歴バックエンドです: {self.history_backend}")
+        if self.stats_flush_interval <= 0:
+            raise ValueError("STATS_FLUSH_INTERVALは0より大きい値を指定してください")
+        if self.stats_idle_seconds <= 0:
+            raise ValueError("STATS_IDLE_SECONDSは0より大きい値を指定してください")
+        if self.stats_leaderboard_min_rolls < 1:
+            raise ValueError("STATS_LEADERBOARD_MIN_ROLLSは1以上を指定してください")
+        if self.attachment_max_bytes < 1 or self.attachment_max_entries < 1:
+            raise ValueError("添付ファイルの上限は1以上を指定してください")
+        if self.reroll_edit_rate <= 0 or self.reroll_edit_burst < 1:
+            raise ValueError("再ロールの編集の制限は、回数が0より大きく連続回数が1以上を指定してください")
+        if self.timer_max_seconds < 1 or self.timer_max_per_user < 1:
+            raise ValueError("タイマーの上限は1以上を指定してください")
+        if self.simulate_max_trials < 1 or (self.simulate_workers is not None and self.simulate_workers < 1):
+            raise ValueError("シミュレーションの試行数とプロセス数は1以上を指定してください")
+        if self.simulate_update_interval <= 0:
+            raise ValueError("SIMULATE_UPDATE_INTERVALは0より大きい値を指定してください")
+        if self.stats_max_cost < 1:
+            raise ValueError("STATS_MAX_COSTは1以上を指定してください")
+        if self.executor_kind not in ('thread', 'process'):
+            raise ValueError(f"不明なエグゼキューターです: {self.executor_kind}")
+
+# ギルドごとに上書きできる設定
+GUILD_OVERRIDABLE = frozenset({
+    'max_dice_count', 'min_dice_count',
+    'max_dice_sides', 'min_dice_sides',
+    'max_modifier', 'min_modifier',
+    'button_timeout'
+})
+
+# 設定名と異なる名前の環境変数
+_ENV_NAMES = {'bot_token': 'DISCORD_BOT_TOKEN'}
+
+_settings: Optional[Settings] = None
+_guild_overrides: Dict[int, Dict[str, Any]] = {}
+# set_guild_overrides で上書きした設定（再読み込みの後も設定ファイルの値より優先する）
+_runtime_overrides: Dict[int, Dict[str, Any]] = {}
+_guild_settings: Dict[int, Settings] = {}
+# .envで設定した環境変数 -> .envで上書きする前の値（なかった場合はNone）
+_dotenv_originals: Dict[str, Optional[str]] = {}
+_watched_mtimes: Dict[str, Optional[float]] = {}
+_reload_lock = threading.Lock()
+
+def _parse_value(field_name: str, field_type: Any, raw: str) -> Any:
+    """環境変数の文字列を設定の型に変換する"""
+    if field_name == 'log_level':
+        return getattr(logging, raw.upper(), logging.INFO)
+    if field_type is bool:
+        return raw.lower() in ('1', 'true', 'yes', 'on')
+    if field_type is int:
+        return int(raw)
+    if field_type is float:
+        return float(raw)
+    if field_type == Optional[int]:
+        return int(raw) if raw else None
+    return raw
+
+def _mtime(path: str) -> Optional[float]:
+    """ファイルの更新時刻（存在しない場合はNone）"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _load_guild_overrides(path: str) -> Dict[int, Dict[str, Any]]:
+    """
+    ギルド別設定ファイルを読み込む
+
+    形式: {"ギルドID": {"max_dice_count": 200, ...}, ...}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    overrides = {}
+    for guild_id, values in data.items():
+        unknown = set(values) - GUILD_OVERRIDABLE
+        if unknown:
+            raise ValueError(f"ギルド {guild_id} の設定に上書きできない項目があります: {', '.join(sorted(unknown))}")
+        overrides[int(guild_id)] = dict(values)
+    return overrides
+
+def _apply_dotenv():
+    """
+    .envの値を環境変数に設定する（.envの値を優先する）
+
+    前回の読み込みから.envで消えたキーは、.envで上書きする前の環境変数に戻す（なければ削除する）
+    """
+    values = {key: value for key, value in dotenv_values(ENV_PATH).items() if value is not None}
+    for key in set(_dotenv_originals) - set(values):
+        original = _dotenv_originals.pop(key)
+        if original is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = original
+    for key, value in values.items():
+        if key not in _dotenv_originals:
+            _dotenv_originals[key] = os.environ.get(key)
+        os.environ[key] = value
+
+def load_settings() -> Settings:
+    """
+    環境変数から設定を読み込んで検証する
+
+    戻り値:
+        新しい設定のスナップショット
+
+    例外:
+        ValueError: 設定値が不正な場合
+    """
+    _apply_dotenv()
+
+    values = {}
+    for field in fields(Settings):
+        raw = os.getenv(_ENV_NAMES.get(field.name, field.name.upper()))
+        if raw is not None:
+            values[field.name] = _parse_value(field.name, field.type, raw)
+    return Settings(**values)
+
+def reload_settings() -> bool:
+    """
+    設定を再読み込みし、スナップショットを差し替える
+
+    検証に失敗した場合は現在の設定を維持する。set_guild_overrides で上書きした設定は
+    新しい設定にも適用する（新しい設定では不正になる上書きは破棄する）
+
+    戻り値:
+        差し替えた場合はTrue
+    """
+    global _settings, _guild_overrides, _guild_settings
+    with _reload_lock:
+        try:
+            settings = load_settings()
+            overrides = _load_guild_overrides(settings.guild_settings_path)
+            # ギルド別の設定も差し替え前に検証しておく
+            guild_settings = {guild_id: replace(settings, **values) for guild_id, values in overrides.items()}
+        except (ValueError, OSError) as e:
+            logging.getLogger('dice_bot').error("設定の読み込みに失敗しました（現在の設定を維持します）: %s", e)
+            return False
+
+        for guild_id, runtime in list(_runtime_overrides.items()):
+            values = {**overrides.get(guild_id, {}), **runtime}
+            try:
+                guild_settings[guild_id] = replace(settings, **values)
+            except ValueError as e:
+                logging.getLogger('dice_bot').error(
+                    "ギルド %d の上書きした設定が新しい設定では不正なため破棄します: %s", guild_id, e
+                )
+                del _runtime_overrides[guild_id]
+                continue
+            overrides[guild_id] = values
+
+        _watched_mtimes[ENV_PATH] = _mtime(ENV_PATH)
+        _watched_mtimes[settings.guild_settings_path] = _mtime(settings.guild_settings_path)
+
+        # 参照の代入は原子的なため、読み込み側はロックなしで古いか新しいスナップショットのどちらかを見る
+        _guild_overrides = overrides
+        _guild_settings = guild_settings
+        _settings = settings
+        return True
+
+def reload_if_changed() -> bool:
+    """
+    .envまたはギルド別設定ファイルが変更されていれば再読み込みする
+
+    戻り値:
+        再読み込みした場合はTrue
+    """
+    if _settings is None:
+        return reload_settings()
+    for path, mtime in list(_watched_mtimes.items()):
+        if _mtime(path) != mtime:
+            logging.getLogger('dice_bot').info("設定ファイルの変更を検出しました: %s", path)
+            return reload_settings()
+    return False
+
+def get_settings(guild_id: Optional[int] = None) -> Settings:
+    """
+    設定のスナップショットを取得する
+
+    引数:
+        guild_id: ギルドID（指定した場合はギルド別設定を上書きした設定を返す）
+
+    戻り値:
+        設定のスナップショット
+    """
+    if _settings is None:
+        if not reload_settings():
+            raise RuntimeError("設定を読み込めませんでした")
+    if guild_id is not None:
+        guild_settings = _guild_settings.get(guild_id)
+        if guild_settings is not None:
+            return guild_settings
+    return _settings
+
+def set_guild_overrides(guild_id: int, **overrides: Any) -> Settings:
+    """
+    ギルド別の設定を上書きする（実行中のみ有効。設定を再読み込みしても維持する）
+
+    引数:
+        guild_id: ギルドID
+        **overrides: 上書きする設定
+
+    戻り値:
+        上書き後のギルドの設定
+
+    例外:
+        ValueError: 上書きできない項目、または不正な値の場合
+    """
+    global _guild_settings
+    unknown = set(overrides) - GUILD_OVERRIDABLE
+    if unknown:
+        raise ValueError(f"上書きできない設定です: {', '.join(sorted(unknown))}")
+
+    get_settings()
+    with _reload_lock:
+        values = {**_guild_overrides.get(guild_id, {}), **overrides}
+        guild_settings = replace(_settings, **values)
+        _guild_overrides[guild_id] = values
+        _runtime_overrides[guild_id] = {**_runtime_overrides.get(guild_id, {}), **overrides}
+        _guild_settings = {**_guild_settings, guild_id: guild_settings}
+    return guild_settings
 
 def get_config(key: str, default: Any = None) -> Any:
     """
     設定値を取得する
-    
+
     引数:
-        key: 取得する設定キー
+        key: 取得する設定キー（例: 'MAX_DICE_COUNT'）
         default: キーが存在しない場合のデフォルト値
-        
+
     戻り値:
         設定値
     """
-    return BOT_CONFIG.get(key, default) 
\ No newline at end of file
+    return getattr(get_settings(), key.lower(), default)
+
+def settings_as_dict(settings: Optional[Settings] = None) -> Dict[str, Any]:
+    """
+    設定を辞書に変換する（トークンは伏せる）
+
+    引数:
+        settings: 変換する設定（省略時は現在の設定）
+
+    戻り値:
+        設定名と値の辞書
+    """
+    values = asdict(settings or get_settings())
+    if values.get('bot_token'):
+        values['bot_token'] = '***'
+    return values
@@ -39,15 +39,55 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Discord ダイスボット")
     parser.add_argument('--debug', action='store_true', 
                         help="デバッグモードで実行")
+    parser.add_argument('--sync', action='store_true',
+                        help="コマンドに変更がなくてもスラッシュコマンドを同期")
+    parser.add_argument('--guild', type=int, metavar='GUILD_ID',
+                        help="グローバルではなく指定したギルドにコマンドを同期（開発用）")
+    parser.add_argument('--sharded', action='store_true',
+                        help="1つのプロセスで全シャードを動かすAutoShardedBotで起動")
+    parser.add_argument('--clusters', type=int, default=1, metavar='N',
+                        help="シャードをN個のプロセスに分けて起動（デフォルト: 1）")
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help="全シャード数（省略時はDiscordの推奨値）")
+    parser.add_argument('--measure-startup', action='store_true',
+                        help="ボットを起動せず、モジュールごとの読み込み時間を計測して表示")
+    parser.add_argument('--startup-budget', type=float, metavar='MS',
+                        help="--measure-startupで読み込み時間の合計がMSミリ秒を超えた場合に終了コード1で終了")
     
     args = parser.parse_args()
     
+    if args.measure_startup:
+        from src.utils.startup import measure_startup, format_startup_report
+        try:
+            report = measure_startup()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print(format_startup_report(report))
+        if args.startup_budget is not None and report.total_us / 1000 > args.startup_budget:
+            print(f"読み込み時間が目標（{args.startup_budget:.0f}ms）を超えています")
+            sys.exit(1)
+        sys.exit(0)
+    
     # ログレベルの設定
     log_level = logging.DEBUG if args.debug else logging.INFO
     
+    if args.clusters < 1 or (args.shards is not None and args.shards < args.clusters):
+        print("--clustersは1以上、--shardsは--clusters以上を指定してください")
+        sys.exit(1)
+    
     try:
-        from src.bot import start_bot
-        start_bot(log_level)
+        if args.clusters > 1:
+            from src.cluster.launcher import launch_clusters
+            launch_clusters(
+                args.clusters, args.shards, log_level, force_sync=args.sync, dev_guild_id=args.guild
+            )
+        else:
+            from src.bot import start_bot
+            start_bot(
+                log_level, force_sync=args.sync, dev_guild_id=args.guild,
+                sharded=args.sharded or args.shards is not None, shard_count=args.shards
+            )
     except ImportError:
         print("srcディレクトリが見つかりません。正しいディレクトリで実行してください。")
         sys.exit(1)
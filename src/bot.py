@@ -2,33 +2,71 @@
 Discord ダイスボット メインアプリケーション
 """
 import discord
-from discord import app_commands
 from discord.ext import commands
+import asyncio
+import importlib
 import logging
-import os
-import sys
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
-sys.path.append(project_root)
+from src.utils.logger import setup_logger, LOG_FILE_NAME
+from config.settings import get_settings, reload_if_changed
+from src.utils.executor import loop_lag_monitor, get_execution_stats
+from src.utils.metrics import start_metrics_server
+from src.utils.command_sync import CommandSyncManager
+from src.timers.scheduler import get_scheduler
 
-from dice.src.utils.logger import get_logger, setup_logger
-from dice.config.settings import get_config
-from dice.src.commands.roll import setup_roll_command
-from dice.src.commands.history import setup_history_command
-from dice.src.commands.choose import setup_choose_command
-from dice.src.commands.lottery import setup_lottery_command
+if TYPE_CHECKING:
+    from src.cluster.launcher import ClusterInfo
 
-def start_bot(log_level: int = logging.INFO):
+# 登録するコマンドの (モジュール, 登録関数) の組。モジュールは start_bot で初めて読み込む
+COMMAND_MODULES = (
+    ('src.commands.roll', 'setup_roll_command'),
+    ('src.commands.history', 'setup_history_command'),
+    ('src.commands.choose', 'setup_choose_command'),  # ランダム選択コマンド
+    ('src.commands.lottery', 'setup_lottery_command'),  # 抽選コマンド
+    ('src.commands.botstats', 'setup_botstats_command'),  # 計測値表示コマンド
+    ('src.commands.timer', 'setup_timer_command'),  # タイマーコマンド
+    ('src.commands.simulate', 'setup_simulate_command'),  # シミュレーションコマンド
+    ('src.commands.stats', 'setup_stats_command')  # 運の統計コマンド
+)
+
+def load_command_setups() -> List[Callable[[commands.Bot], None]]:
+    """
+    コマンドのモジュールを読み込み、登録関数を返す
+    
+    戻り値:
+        ボットを引数に取る登録関数のリスト
+    """
+    return [getattr(importlib.import_module(module), name) for module, name in COMMAND_MODULES]
+
+def start_bot(
+    log_level: int = logging.INFO,
+    force_sync: bool = False,
+    dev_guild_id: Optional[int] = None,
+    sharded: bool = False,
+    shard_count: Optional[int] = None,
+    cluster: Optional['ClusterInfo'] = None
+):
     """
     ボットを起動する
     
     引数:
         log_level: ログレベル
+        force_sync: Trueの場合はコマンドに変更がなくても同期する
+        dev_guild_id: 指定した場合はグローバルではなくこのギルドに同期する（省略時は設定のDEV_GUILD_ID）
+        sharded: Trueの場合は1つのプロセスで全シャードを動かす AutoShardedBot で起動する
+        shard_count: 全シャード数（省略時はDiscordの推奨値）
+        cluster: クラスターランチャーから起動された場合のクラスターの情報
     """
-    # ロガーの設定
-    logger = setup_logger(log_level)
+    # ロガーの設定（形式とローテーションは設定に従う）
+    settings = get_settings()
+    logger = setup_logger(
+        log_level,
+        log_format=settings.log_format,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        file_name=LOG_FILE_NAME if cluster is None else f"dice_bot.cluster{cluster.cluster_id}.log"
+    )
     logger.info("ダイスボットを起動しています...")
     
     # ボットの設定
@@ -36,42 +74,97 @@ def start_bot(log_level: int = logging.INFO):
     intents.message_content = True
     
     # スラッシュコマンド対応のため、command_prefixは不要に
-    bot = commands.Bot(command_prefix='/', intents=intents)
+    if cluster is not None:
+        # このクラスターが担当するシャードだけに接続する
+        bot = commands.AutoShardedBot(
+            command_prefix='/', intents=intents, shard_ids=cluster.shard_ids, shard_count=cluster.shard_count
+        )
+    elif sharded:
+        bot = commands.AutoShardedBot(command_prefix='/', intents=intents, shard_count=shard_count)
+    else:
+        bot = commands.Bot(command_prefix='/', intents=intents)
+    
+    cluster_worker = None
+    if cluster is not None:
+        from src.cluster.worker import ClusterWorker
+        cluster_worker = ClusterWorker(bot, cluster)
+    
+    config_watcher = None
+    metrics_server = None
+    
+    async def watch_config():
+        """.envとギルド別設定ファイルの変更を監視し、変更があれば設定を差し替える"""
+        while True:
+            await asyncio.sleep(get_settings().config_watch_interval)
+            try:
+                if reload_if_changed():
+                    logger.info("設定を再読み込みしました")
+            except Exception as e:
+                logger.error("設定の再読み込み中にエラーが発生しました: %s", e)
+    
+    sync_manager = CommandSyncManager(bot.tree, settings.command_sync_state_path)
+    if dev_guild_id is None:
+        dev_guild_id = settings.dev_guild_id
     
-    # コマンドの設定
     @bot.event
-    async def on_ready():
-        """ボット起動完了時のイベントハンドラ"""
-        logger.info(f"{bot.user} としてログインしました")
-        logger.info("スラッシュコマンドを準備しています...")
+    async def setup_hook():
+        """ログイン後、ゲートウェイに接続する前に一度だけ呼ばれる（再接続時は呼ばれない）"""
+        # 保存されているタイマーと遅延表示の予定を読み込み、実行を開始する
+        await get_scheduler().start(owner=cluster.cluster_id if cluster is not None else 0)
         
-        # 全てのコマンドを表示（デバッグ用）
-        all_commands = []
-        for cmd in bot.tree.get_commands():
-            all_commands.append(f"{cmd.name} ({type(cmd).__name__})")
+        if cluster_worker is not None:
+            await cluster_worker.start()
+            # コマンドの同期はクラスター0だけが行う
+            if cluster.cluster_id != 0:
+                return
         
-        logger.info(f"登録されているコマンド: {', '.join(all_commands)}")
+        all_commands = [f"{cmd.name} ({type(cmd).__name__})" for cmd in bot.tree.get_commands()]
+        logger.info("登録されているコマンド: %s", ', '.join(all_commands))
         
-        # スラッシュコマンドをサーバーに同期
+        # スラッシュコマンドを同期（前回の同期から変わっていなければ省略）
         try:
-            # グローバルコマンドを同期
-            synced = await bot.tree.sync()
-            logger.info(f"{len(synced)}個のグローバルスラッシュコマンドを同期しました")
-            
-            # 念のため特定のギルドにも同期（必要に応じてIDを変更）
-            # guild = discord.Object(id=123456789012345678)  # 実際のギルドIDを指定
-            # guild_synced = await bot.tree.sync(guild=guild)
-            # logger.info(f"{len(guild_synced)}個のギルドスラッシュコマンドを同期しました")
+            if dev_guild_id is not None:
+                synced = await sync_manager.sync_guild(dev_guild_id, force=force_sync)
+                target = f"ギルド {dev_guild_id} "
+            else:
+                synced = await sync_manager.sync(force=force_sync)
+                target = "グローバル"
+            if synced is not None:
+                logger.info("%d個の%sスラッシュコマンドを同期しました", synced, target)
         except Exception as e:
-            logger.error(f"スラッシュコマンドの同期中にエラーが発生しました: {e}")
+            logger.error("スラッシュコマンドの同期中にエラーが発生しました: %s", e)
+    
+    # コマンドの設定
+    @bot.event
+    async def on_ready():
+        """ボット起動完了時のイベントハンドラ"""
+        logger.info("%s としてログインしました", bot.user)
+        
+        # イベントループの停止時間の計測を開始
+        loop_lag_monitor.start()
+        
+        # 設定ファイルの変更監視を開始（再接続時に重複して起動しないようにする）
+        nonlocal config_watcher
+        if get_settings().config_watch_interval > 0 and (config_watcher is None or config_watcher.done()):
+            config_watcher = bot.loop.create_task(watch_config())
         
+        # 計測値のエンドポイントを起動（ポートが設定されている場合のみ。クラスターごとにポートをずらす）
+        nonlocal metrics_server
+        settings = get_settings()
+        if settings.metrics_port and metrics_server is None:
+            port = settings.metrics_port + (cluster.cluster_id if cluster is not None else 0)
+            try:
+                metrics_server = await start_metrics_server(settings.metrics_host, port)
+                logger.info("計測値のエンドポイントを起動しました: http://%s:%d/metrics", settings.metrics_host, port)
+            except OSError as e:
+                logger.error("計測値のエンドポイントを起動できませんでした: %s", e)
+        if cluster_worker is not None:
+            cluster_worker.notify_ready()
         logger.info("ダイスボットの準備が完了しました")
     
     # コマンドのセットアップ
-    setup_roll_command(bot)
-    setup_history_command(bot)
-    setup_choose_command(bot)  # ランダム選択コマンドを追加
-    setup_lottery_command(bot)  # 抽選コマンドを追加
+    for setup_command in load_command_setups():
+        setup_command(bot)
     
     # エラーハンドリング（スラッシュコマンドのエラーは各コマンドで捕捉）
     @bot.event
@@ -85,11 +178,11 @@ def start_bot(log_level: int = logging.INFO):
         elif isinstance(error, commands.BadArgument):
             await ctx.send(f"無効な引数です: {error}")
         else:
-            logger.error(f"コマンド実行中のエラー: {error}")
+            logger.error("コマンド実行中のエラー: %s", error)
             await ctx.send(f"エラーが発生しました: {error}")
     
     # ボットの起動
-    token = get_config('BOT_TOKEN', '')
+    token = get_settings().bot_token
     if not token:
         logger.error("BOT_TOKENが設定されていません。.envファイルを確認してください。")
         return
@@ -100,7 +193,16 @@ def start_bot(log_level: int = logging.INFO):
     except discord.errors.LoginFailure:
         logger.error("BOT_TOKENが無効です。正しいトークンを設定してください。")
     except Exception as e:
-        logger.error(f"ボット起動中にエラーが発生しました: {e}")
+        logger.error("ボット起動中にエラーが発生しました: %s", e)
+    finally:
+        # コマンドごとの計算時間とイベントループの最大停止時間を記録
+        for command, stats in get_execution_stats().items():
+            logger.info(
+                "%s: ループ上 %d回 (最大 %.1fms), オフロード %d回 (最大 %.1fms)",
+                command, stats['inline_count'], stats['max_blocking_ms'],
+                stats['offloaded_count'], stats['max_offloaded_ms']
+            )
+        logger.info("イベントループの最大停止時間: %.1fms", loop_lag_monitor.max_lag * 1000)
 
 if __name__ == "__main__":
     # 直接実行された場合は起動
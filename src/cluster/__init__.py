@@ -0,0 +1,3 @@
+"""
+シャードを複数のプロセスで動かすクラスターパッケージ
+"""
@@ -0,0 +1,315 @@
+"""
+クラスターのプロセス間通信モジュール
+
+ランチャー（親プロセス）が127.0.0.1で待ち受け、各クラスター（子プロセス）が接続する。
+メッセージは1行に1つのJSONで、次の操作を扱う:
+
+    hello      クラスター -> ランチャー  接続時の認証（クラスターIDと共有の秘密）
+    ready      クラスター -> ランチャー  最初の on_ready（次のクラスターを起動してよい合図）
+    stats      クラスター -> ランチャー  定期的に送るクラスターの統計
+    get_stats  クラスター -> ランチャー  全クラスターの統計を要求（reply で応答）
+    publish    クラスター -> ランチャー  他の全クラスターへのイベントの送信（event として中継）
+    event      ランチャー -> クラスター  中継されたイベント、またはランチャーからの指示（shutdown）
+"""
+import asyncio
+import hmac
+import itertools
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+IPC_HOST = '127.0.0.1'
+
+# 1メッセージの最大バイト数
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+class IPCError(Exception):
+    """プロセス間通信に失敗した場合の例外"""
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+async def _read(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """メッセージを1つ読む（接続が閉じられた場合はNone）"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+class ClusterIPCServer:
+    """ランチャー側の待ち受け（クラスターの統計の集計とイベントの中継）"""
+
+    def __init__(self, secret: str):
+        """
+        引数:
+            secret: クラスターの認証に使う共有の秘密
+        """
+        self.secret = secret
+        self.port: Optional[int] = None
+        self.stats: Dict[int, Dict[str, Any]] = {}
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._ready: Dict[int, asyncio.Event] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """
+        待ち受けを開始する
+
+        戻り値:
+            待ち受けているポート
+        """
+        self._server = await asyncio.start_server(self._handle, IPC_HOST, 0, limit=MAX_MESSAGE_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """待ち受けを終了し、全ての接続を閉じる"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._writers.values()):
+            writer.close()
+        self._writers.clear()
+
+    def _ready_event(self, cluster_id: int) -> asyncio.Event:
+        event = self._ready.get(cluster_id)
+        if event is None:
+            event = self._ready[cluster_id] = asyncio.Event()
+        return event
+
+    async def wait_ready(self, cluster_id: int, timeout: float) -> bool:
+        """
+        クラスターの準備完了を待つ
+
+        引数:
+            cluster_id: クラスターID
+            timeout: 最大の待ち時間（秒）
+
+        戻り値:
+            準備が完了した場合はTrue
+        """
+        try:
+            await asyncio.wait_for(self._ready_event(cluster_id).wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def forget(self, cluster_id: int):
+        """終了したクラスターの状態を消去する（再起動時に呼ぶ）"""
+        self.stats.pop(cluster_id, None)
+        self._ready.pop(cluster_id, None)
+
+    def send_event(self, event: str, data: Optional[Dict[str, Any]] = None, exclude: Optional[int] = None):
+        """
+        接続中のクラスターにイベントを送る
+
+        引数:
+            event: イベント名
+            data: イベントのデータ
+            exclude: 送らないクラスター（イベントの送信元）
+        """
+        payload = _encode({"op": "event", "event": event, "data": data or {}})
+        for cluster_id, writer in list(self._writers.items()):
+            if cluster_id != exclude and not writer.is_closing():
+                writer.write(payload)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """クラスターからの接続を処理する"""
+        cluster_id = None
+        try:
+            hello = await _read(reader)
+            if (
+                not hello or hello.get("op") != "hello"
+                or not hmac.compare_digest(str(hello.get("secret", "")), self.secret)
+            ):
+                logger.warning("認証できないIPC接続を切断しました")
+                return
+            cluster_id = int(hello["cluster_id"])
+            self._writers[cluster_id] = writer
+            logger.debug("クラスター %d が接続しました", cluster_id)
+
+            while True:
+                message = await _read(reader)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "stats":
+                    self.stats[cluster_id] = message["data"]
+                elif op == "ready":
+                    self._ready_event(cluster_id).set()
+                elif op == "publish":
+                    self.send_event(message["event"], message.get("data"), exclude=cluster_id)
+                elif op == "get_stats":
+                    writer.write(_encode({
+                        "op": "reply",
+                        "id": message["id"],
+                        "data": {str(key): value for key, value in sorted(self.stats.items())}
+                    }))
+                else:
+                    logger.warning("不明なIPCメッセージです: %s", op)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("クラスター %s とのIPC接続でエラーが発生しました: %s", cluster_id, e)
+        finally:
+            if cluster_id is not None and self._writers.get(cluster_id) is writer:
+                del self._writers[cluster_id]
+            writer.close()
+
+EventHandler = Callable[[Dict[str, Any]], Any]
+
+class ClusterIPCClient:
+    """クラスター側の接続"""
+
+    def __init__(self, cluster_id: int, port: int, secret: str):
+        """
+        引数:
+            cluster_id: このクラスターのID
+            port: ランチャーが待ち受けているポート
+            secret: 共有の秘密
+        """
+        self.cluster_id = cluster_id
+        self.port = port
+        self.secret = secret
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._handlers: Dict[str, EventHandler] = {}
+        self._requests: Dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count(1)
+        self._disconnect_callbacks: Set[Callable[[], Awaitable[None]]] = set()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def on(self, event: str, handler: EventHandler):
+        """
+        イベントの処理を登録する
+
+        引数:
+            event: イベント名
+            handler: イベントのデータを受け取る関数
+        """
+        self._handlers[event] = handler
+
+    def on_disconnect(self, callback: Callable[[], Awaitable[None]]):
+        """ランチャーとの接続が切れた時に呼ぶコルーチン関数を登録する"""
+        self._disconnect_callbacks.add(callback)
+
+    async def connect(self):
+        """
+        ランチャーに接続して認証する
+
+        例外:
+            IPCError: 接続できない場合
+        """
+        try:
+            self._reader, self._writer = await asyncio.open_connection(IPC_HOST, self.port, limit=MAX_MESSAGE_BYTES)
+        except OSError as e:
+            raise IPCError(f"ランチャーに接続できませんでした: {e}") from e
+        self._send({"op": "hello", "cluster_id": self.cluster_id, "secret": self.secret})
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def close(self):
+        """接続を閉じる"""
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+    def _send(self, message: Dict[str, Any]):
+        if not self.connected:
+            raise IPCError("ランチャーに接続されていません")
+        self._writer.write(_encode(message))
+
+    def send_stats(self, stats: Dict[str, Any]):
+        """このクラスターの統計を送る"""
+        self._send({"op": "stats", "data": stats})
+
+    def send_ready(self):
+        """準備完了を知らせる"""
+        self._send({"op": "ready"})
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """
+        他の全クラスターにイベントを送る
+
+        引数:
+            event: イベント名
+            data: イベントのデータ（JSONに変換可能な辞書）
+        """
+        self._send({"op": "publish", "event": event, "data": data})
+
+    async def get_stats(self, timeout: float = 5.0) -> Dict[int, Dict[str, Any]]:
+        """
+        全クラスターの統計を取得する
+
+        引数:
+            timeout: 応答の最大の待ち時間（秒）
+
+        戻り値:
+            クラスターIDと、各クラスターが最後に送った統計の辞書
+
+        例外:
+            IPCError: 接続されていない場合、または応答がない場合
+        """
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        try:
+            self._send({"op": "get_stats", "id": request_id})
+            data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError as e:
+            raise IPCError("ランチャーから応答がありません") from e
+        finally:
+            self._requests.pop(request_id, None)
+        return {int(key): value for key, value in data.items()}
+
+    async def _read_loop(self):
+        """ランチャーからのメッセージを処理する"""
+        try:
+            while True:
+                message = await _read(self._reader)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "reply":
+                    future = self._requests.get(message.get("id"))
+                    if future is not None and not future.done():
+                        future.set_result(message["data"])
+                elif op == "event":
+                    handler = self._handlers.get(message["event"])
+                    if handler is None:
+                        continue
+                    try:
+                        result = handler(message.get("data") or {})
+                        if asyncio.iscoroutine(result):
+                            await result
+                    except Exception as e:
+                        logger.error("IPCイベント %s の処理中にエラーが発生しました: %s", message["event"], e)
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, ValueError) as e:
+            logger.error("ランチャーとのIPC接続でエラーが発生しました: %s", e)
+
+        logger.warning("ランチャーとの接続が切れました")
+        if self._writer is not None:
+            self._writer.close()
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(IPCError("ランチャーとの接続が切れました"))
+        for callback in list(self._disconnect_callbacks):
+            await callback()
+
+_client: Optional[ClusterIPCClient] = None
+
+def set_cluster_client(client: Optional[ClusterIPCClient]):
+    """このプロセスのクラスター接続を設定する"""
+    global _client
+    _client = client
+
+def get_cluster_client() -> Optional[ClusterIPCClient]:
+    """このプロセスのクラスター接続（クラスターとして起動していない場合はNone）"""
+    return _client
@@ -0,0 +1,263 @@
+"""
+シャードを複数のプロセスに分けて起動するクラスターランチャー
+
+全シャードを連続した範囲に分け、クラスターごとに1つのワーカープロセスで AutoShardedBot を起動する。
+Discordへの接続（IDENTIFY）が同時に集中しないよう、前のクラスターの準備が完了してから次を起動する。
+異常終了したクラスターは待ち時間を置いて再起動する。
+"""
+import asyncio
+import logging
+import multiprocessing
+import secrets
+import signal
+from typing import Dict, List, NamedTuple, Optional
+
+import aiohttp
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.cluster.ipc import ClusterIPCServer
+
+logger = get_logger()
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+# 1シャードあたりの準備完了の待ち時間の目安（秒）
+READY_TIMEOUT_PER_SHARD = 15.0
+
+# 異常終了したクラスターを再起動するまでの待ち時間（秒）
+RESTART_DELAY = 5.0
+
+# 終了を指示してから強制終了するまでの待ち時間（秒）
+SHUTDOWN_TIMEOUT = 30.0
+
+class ClusterInfo(NamedTuple):
+    """ワーカープロセスに渡すクラスターの情報"""
+    cluster_id: int
+    cluster_count: int
+    shard_ids: List[int]
+    shard_count: int
+    ipc_port: int
+    ipc_secret: str
+
+def shard_ranges(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """
+    シャードをクラスターごとの連続した範囲に分ける
+
+    引数:
+        shard_count: 全シャード数
+        cluster_count: クラスター数
+
+    戻り値:
+        クラスターごとのシャードIDのリスト（シャード数の差は最大1）
+
+    例外:
+        ValueError: クラスター数がシャード数より多い場合
+    """
+    if not 1 <= cluster_count <= shard_count:
+        raise ValueError("クラスター数は1以上、シャード数以下を指定してください")
+    base, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = base + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+async def fetch_recommended_shard_count(token: str) -> int:
+    """
+    Discordが推奨するシャード数を取得する
+
+    引数:
+        token: ボットのトークン
+
+    戻り値:
+        推奨シャード数
+
+    例外:
+        RuntimeError: 取得できない場合
+    """
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_BOT_URL, headers=headers) as response:
+            if response.status != 200:
+                raise RuntimeError(f"推奨シャード数を取得できませんでした（HTTP {response.status}）")
+            data = await response.json()
+    return int(data["shards"])
+
+def run_cluster(info: ClusterInfo, log_level: int, force_sync: bool, dev_guild_id: Optional[int]):
+    """
+    ワーカープロセスでクラスターのボットを起動する
+
+    引数:
+        info: クラスターの情報
+        log_level: ログレベル
+        force_sync: Trueの場合はコマンドに変更がなくても同期する（クラスター0のみ）
+        dev_guild_id: 開発用のギルドID
+    """
+    # 終了はランチャーからIPCで指示する（端末のCtrl+Cはランチャーだけが受け取る）
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from src.bot import start_bot
+    start_bot(log_level, force_sync=force_sync, dev_guild_id=dev_guild_id, cluster=info)
+
+class ClusterLauncher:
+    """ワーカープロセスの起動と監視"""
+
+    def __init__(
+        self,
+        cluster_count: int,
+        shard_count: Optional[int] = None,
+        log_level: int = logging.INFO,
+        force_sync: bool = False,
+        dev_guild_id: Optional[int] = None
+    ):
+        """
+        引数:
+            cluster_count: クラスター（ワーカープロセス）数
+            shard_count: 全シャード数（省略時はDiscordの推奨値）
+            log_level: ログレベル
+            force_sync: Trueの場合はコマンドに変更がなくても同期する
+            dev_guild_id: 開発用のギルドID
+        """
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+        self.log_level = log_level
+        self.force_sync = force_sync
+        self.dev_guild_id = dev_guild_id
+        self.server = ClusterIPCServer(secrets.token_hex(32))
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._infos: Dict[int, ClusterInfo] = {}
+        # 子プロセスは親の状態を引き継がないよう spawn で起動する
+        self._context = multiprocessing.get_context('spawn')
+        self._stopping = False
+
+    def _spawn(self, cluster_id: int):
+        info = self._infos[cluster_id]
+        self.server.forget(cluster_id)
+        process = self._context.Process(
+            target=run_cluster,
+            args=(info, self.log_level, self.force_sync, self.dev_guild_id),
+            name=f"dice-cluster-{cluster_id}"
+        )
+        process.start()
+        self._processes[cluster_id] = process
+        logger.info(
+            "クラスター %d を起動しました（PID %d, シャード %d-%d / %d）",
+            cluster_id, process.pid, info.shard_ids[0], info.shard_ids[-1], info.shard_count
+        )
+
+    async def _start_cluster(self, cluster_id: int):
+        """クラスターを起動し、準備が完了するまで待つ"""
+        self._spawn(cluster_id)
+        timeout = READY_TIMEOUT_PER_SHARD * len(self._infos[cluster_id].shard_ids) + 60
+        if not await self.server.wait_ready(cluster_id, timeout):
+            logger.warning("クラスター %d の準備が %.0f秒以内に完了しませんでした", cluster_id, timeout)
+
+    async def run(self):
+        """全クラスターを起動し、終了するまで監視する"""
+        settings = get_settings()
+        shard_count = self.shard_count
+        if shard_count is None:
+            shard_count = max(await fetch_recommended_shard_count(settings.bot_token), self.cluster_count)
+            logger.info("推奨シャード数: %d", shard_count)
+
+        port = await self.server.start()
+        for cluster_id, shard_ids in enumerate(shard_ranges(shard_count, self.cluster_count)):
+            self._infos[cluster_id] = ClusterInfo(
+                cluster_id, self.cluster_count, shard_ids, shard_count, port, self.server.secret
+            )
+
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                # Windowsではシグナルハンドラを登録できない（KeyboardInterruptで終了する）
+                pass
+
+        try:
+            for cluster_id in self._infos:
+                if stop.is_set():
+                    break
+                await self._start_cluster(cluster_id)
+
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                for cluster_id, process in list(self._processes.items()):
+                    if process.is_alive() or stop.is_set():
+                        continue
+                    logger.error(
+                        "クラスター %d が終了しました（終了コード %s）。%.0f秒後に再起動します",
+                        cluster_id, process.exitcode, RESTART_DELAY
+                    )
+                    await asyncio.sleep(RESTART_DELAY)
+                    await self._start_cluster(cluster_id)
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """全クラスターに終了を指示し、終了するまで待つ"""
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info("全クラスターを終了しています...")
+        self.server.send_event("shutdown")
+
+        deadline = asyncio.get_running_loop().time() + SHUTDOWN_TIMEOUT
+        for cluster_id, process in self._processes.items():
+            remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+            await asyncio.get_running_loop().run_in_executor(None, process.join, remaining)
+            if process.is_alive():
+                logger.warning("クラスター %d が終了しないため強制終了します", cluster_id)
+                process.terminate()
+                process.join()
+        await self.server.close()
+
+def launch_clusters(
+    cluster_count: int,
+    shard_count: Optional[int] = None,
+    log_level: int = logging.INFO,
+    force_sync: bool = False,
+    dev_guild_id: Optional[int] = None
+):
+    """
+    クラスターランチャーを起動する（全クラスターが終了するまで戻らない）
+
+    引数:
+        cluster_count: クラスター（ワーカープロセス）数
+        shard_count: 全シャード数（省略時はDiscordの推奨値）
+        log_level: ログレベル
+        force_sync: Trueの場合はコマンドに変更がなくても同期する
+        dev_guild_id: 開発用のギルドID
+    """
+    from src.utils.logger import setup_logger
+    from src.dice.rng import get_master_key
+
+    settings = get_settings()
+    setup_logger(
+        log_level,
+        log_format=settings.log_format,
+        max_bytes=settings.log_max_bytes,
+        backup_count=settings.log_backup_count,
+        file_name='dice_bot.launcher.log'
+    )
+    if not settings.bot_token:
+        logger.error("BOT_TOKENが設定されていません。.envファイルを確認してください。")
+        return
+
+    # 全クラスターが同じキーでシードを導出するよう、起動前にキーファイルを作成しておく
+    get_master_key()
+
+    launcher = ClusterLauncher(cluster_count, shard_count, log_level, force_sync, dev_guild_id)
+    try:
+        asyncio.run(launcher.run())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error("クラスターの起動中にエラーが発生しました: %s", e)
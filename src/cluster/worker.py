@@ -0,0 +1,116 @@
+"""
+クラスターのワーカープロセス側の処理
+
+ランチャーに接続し、統計を定期的に送る。ロール履歴の追加を他のクラスターに通知し、
+他のクラスターで追加された履歴を自分のキャッシュに反映する（保存先のSQLiteは全クラスターで共有）。
+"""
+import asyncio
+import math
+import os
+from typing import Any, Dict, Optional
+
+from discord.ext import commands
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.utils.metrics import get_metrics_summary
+from src.utils.executor import loop_lag_monitor
+from src.dice.result import RollRecord
+from src.storage.history import get_history_store
+from src.cluster.ipc import ClusterIPCClient, set_cluster_client
+from src.cluster.launcher import ClusterInfo
+
+logger = get_logger()
+
+# 履歴の追加を知らせるイベント
+HISTORY_EVENT = "history_append"
+
+class ClusterWorker:
+    """ワーカープロセスとランチャーの連携"""
+
+    def __init__(self, bot: commands.AutoShardedBot, info: ClusterInfo):
+        """
+        引数:
+            bot: このクラスターのボット
+            info: クラスターの情報
+        """
+        self.bot = bot
+        self.info = info
+        self.client = ClusterIPCClient(info.cluster_id, info.ipc_port, info.ipc_secret)
+        self._stats_task: Optional[asyncio.Task] = None
+        self._ready_sent = False
+
+    async def start(self):
+        """ランチャーに接続し、イベントの処理と統計の送信を開始する"""
+        self.client.on("shutdown", self._on_shutdown)
+        self.client.on(HISTORY_EVENT, self._on_history_append)
+        self.client.on_disconnect(self._on_disconnect)
+        await self.client.connect()
+        set_cluster_client(self.client)
+
+        get_history_store().add_listener(self._publish_history)
+        self._stats_task = asyncio.ensure_future(self._stats_loop())
+        logger.info(
+            "クラスター %d としてランチャーに接続しました（シャード %s）",
+            self.info.cluster_id, ", ".join(map(str, self.info.shard_ids))
+        )
+
+    def notify_ready(self):
+        """最初の on_ready でランチャーに準備完了を知らせる（次のクラスターが起動を始める）"""
+        if self._ready_sent or not self.client.connected:
+            return
+        self._ready_sent = True
+        self.client.send_ready()
+        self.client.send_stats(self.collect_stats())
+
+    def collect_stats(self) -> Dict[str, Any]:
+        """
+        このクラスターの統計を集める
+
+        戻り値:
+            JSONに変換可能な統計の辞書
+        """
+        latencies = {
+            str(shard_id): (latency * 1000 if math.isfinite(latency) else None)
+            for shard_id, latency in self.bot.latencies
+        }
+        return {
+            "pid": os.getpid(),
+            "shard_ids": self.info.shard_ids,
+            "guilds": len(self.bot.guilds),
+            "latency_ms": latencies,
+            "loop_lag_ms": loop_lag_monitor.max_lag * 1000,
+            "commands": {
+                name: {"calls": metrics["calls"], "errors": metrics["errors"]}
+                for name, metrics in get_metrics_summary().items()
+            }
+        }
+
+    async def _stats_loop(self):
+        """統計を定期的にランチャーに送る"""
+        while self.client.connected:
+            await asyncio.sleep(get_settings().cluster_stats_interval)
+            try:
+                self.client.send_stats(self.collect_stats())
+            except Exception as e:
+                logger.error("クラスターの統計の送信中にエラーが発生しました: %s", e)
+
+    def _publish_history(self, user_id: int, record: RollRecord):
+        """このクラスターで追加された履歴を他のクラスターに知らせる"""
+        if self.client.connected:
+            self.client.publish(HISTORY_EVENT, {"user_id": user_id, "record": record.to_dict()})
+
+    def _on_history_append(self, data: Dict[str, Any]):
+        get_history_store().merge_remote(int(data["user_id"]), RollRecord.from_dict(data["record"]))
+
+    async def _on_shutdown(self, data: Dict[str, Any]):
+        logger.info("ランチャーから終了の指示を受けました")
+        await self.bot.close()
+
+    async def _on_disconnect(self):
+        # ランチャーが終了した場合は、このクラスターも終了する
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+        set_cluster_client(None)
+        if not self.bot.is_closed():
+            await self.bot.close()
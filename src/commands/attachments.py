@@ -0,0 +1,114 @@
+"""
+コマンドの添付ファイル（参加者リスト）を読み込む処理と、参加者リストの表示
+
+添付ファイルの参加者は数万人になり得るため、結果の表示はDiscordのembedの上限
+（フィールド1024文字、全体6000文字、25フィールド）に収まる分だけを並べ、残りは人数だけを示す。
+"""
+import discord
+from typing import Callable, Iterable, List, Optional
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.utils.metrics import measure_phase
+from src.randomizers.ingest import IngestError, IngestResult, ingest_attachment
+from src.dice.renderer import FIELD_VALUE_LIMIT, EMBED_TOTAL_LIMIT
+
+logger = get_logger()
+
+def split_items(text: Optional[str]) -> List[str]:
+    """
+    カンマ区切りの文字列を項目のリストに分割する
+
+    引数:
+        text: カンマ区切りの文字列
+
+    戻り値:
+        空白を除いた項目のリスト
+    """
+    if not text:
+        return []
+    return [item for item in map(str.strip, text.split(',')) if item]
+
+def format_lines(lines: Iterable[str], total: int, limit: int = FIELD_VALUE_LIMIT, unit: str = "件") -> str:
+    """
+    行を改行で連結してEmbedのフィールドの値を作る
+
+    上限に収まらない行は「…他N件」にまとめる。行は必要な分だけ取り出すため、
+    ジェネレーターを渡せば表示しない行は作られない
+
+    引数:
+        lines: 表示する行
+        total: 行の総数
+        limit: 値の最大文字数
+        unit: 省略した行の数の単位
+
+    戻り値:
+        フィールドの値
+    """
+    parts = []
+    # 省略した行の数の表示に使う分を残しておく
+    remaining = limit - len(f"\n…他{total:,}{unit}")
+    for line in lines:
+        if len(line) + 1 > remaining:
+            if not parts:
+                # 1行目だけで上限を超える場合は末尾を省略して表示する
+                parts.append(line[:max(remaining - 2, 0)] + "…")
+            break
+        parts.append(line)
+        remaining -= len(line) + 1
+    omitted = total - len(parts)
+    if omitted > 0:
+        parts.append(f"…他{omitted:,}{unit}")
+    return "\n".join(parts)
+
+def field_budget(embed: discord.Embed, num_fields: int) -> int:
+    """
+    これから追加するフィールドの値に使える1つあたりの文字数
+
+    Embed全体の上限からタイトル・説明・フッターなど作成済みの分を除き、
+    各フィールドの名前に64文字ずつ残して分け合う
+
+    引数:
+        embed: 追加先のEmbed（フッターは先に設定しておく）
+        num_fields: 追加するフィールドの数（MAX_FIELDS以下）
+
+    戻り値:
+        1つのフィールドの値の最大文字数
+    """
+    return max(0, min(FIELD_VALUE_LIMIT, (EMBED_TOTAL_LIMIT - len(embed)) // max(num_fields, 1) - 64))
+
+async def read_attachment(
+    interaction: discord.Interaction,
+    attachment: discord.Attachment,
+    consume: Callable[[str, float], None],
+    keep_all: bool = False
+) -> Optional[IngestResult]:
+    """
+    応答を保留してから添付ファイルをストリーミングで読み込む
+
+    読み込みに失敗した場合はエラーメッセージを送信する
+
+    引数:
+        interaction: インタラクション
+        attachment: 添付ファイル
+        consume: 参加者ごとに (名前, 重み) で呼び出す関数
+        keep_all: 全員をメモリに保持するコマンドの場合はTrue（参加者数の上限を適用する）
+
+    戻り値:
+        読み込み結果の集計（失敗した場合はNone）
+    """
+    settings = get_settings(interaction.guild_id)
+    if not interaction.response.is_done():
+        await interaction.response.defer(thinking=True)
+    try:
+        with measure_phase('parse'):
+            return await ingest_attachment(
+                attachment,
+                consume,
+                settings.attachment_max_bytes,
+                settings.attachment_max_entries if keep_all else None
+            )
+    except IngestError as e:
+        logger.info("添付ファイルを読み込めませんでした: %s", e)
+        await interaction.followup.send(f"エラー: {e}")
+        return None
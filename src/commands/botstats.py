@@ -0,0 +1,117 @@
+"""
+ボットの計測値を表示する管理者向けコマンド
+"""
+from typing import Any, Dict, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from src.utils.logger import get_logger
+from src.utils.metrics import get_metrics_summary, get_counters
+from src.utils.executor import get_execution_stats, loop_lag_monitor
+from src.cluster.ipc import IPCError, get_cluster_client
+from src.commands.attachments import field_budget, format_lines
+
+logger = get_logger()
+
+# Embedのフィールド数の上限
+MAX_FIELDS = 25
+
+def _format_cluster(cluster_id: int, stats: Dict[str, Any]) -> str:
+    """クラスター1つ分の統計を1行にする"""
+    shard_ids = stats["shard_ids"]
+    latencies = [latency for latency in stats["latency_ms"].values() if latency is not None]
+    latency = f"{max(latencies):.0f}ms" if latencies else "-"
+    calls = sum(command["calls"] for command in stats["commands"].values())
+    errors = sum(command["errors"] for command in stats["commands"].values())
+    return (
+        f"#{cluster_id} シャード {shard_ids[0]}-{shard_ids[-1]} / ギルド {stats['guilds']:,} / "
+        f"遅延 最大{latency} / 実行 {calls:,}回 / エラー {errors:,}回"
+    )
+
+def create_botstats_embed(cluster_stats: Optional[Dict[int, Dict[str, Any]]] = None) -> discord.Embed:
+    """
+    コマンドごとの計測値のEmbedを作成する
+
+    コマンドやフェーズが多い場合は、Embed全体の上限に収まるよう各コマンドの行を省略する
+
+    引数:
+        cluster_stats: クラスターとして起動している場合の全クラスターの統計
+
+    戻り値:
+        計測値のEmbed
+    """
+    summary = get_metrics_summary()
+    execution_stats = get_execution_stats()
+
+    embed = discord.Embed(
+        title="📊 ボットの計測値",
+        description=(
+            f"イベントループの遅延: 直近 {loop_lag_monitor.last_lag * 1000:.1f}ms / "
+            f"最大 {loop_lag_monitor.max_lag * 1000:.1f}ms"
+        ),
+        color=discord.Color.dark_grey()
+    )
+
+    fields = MAX_FIELDS
+    if cluster_stats:
+        guilds = sum(stats["guilds"] for stats in cluster_stats.values())
+        lines = [_format_cluster(cluster_id, stats) for cluster_id, stats in sorted(cluster_stats.items())]
+        embed.add_field(
+            name=f"クラスター（{len(cluster_stats)}プロセス / ギルド {guilds:,}）",
+            value=format_lines(lines, len(lines), unit="プロセス"),
+            inline=False
+        )
+        fields -= 1
+
+    counters = get_counters()
+    if counters:
+        embed.add_field(
+            name="イベント",
+            value=format_lines((f"{name}: {count:,}回" for name, count in counters.items()), len(counters)),
+            inline=False
+        )
+        fields -= 1
+
+    if not summary:
+        embed.add_field(name="コマンド", value="まだ実行されたコマンドはありません", inline=False)
+        return embed
+
+    commands_shown = list(summary.items())[:fields]
+    budget = field_budget(embed, len(commands_shown))
+    for name, metrics in commands_shown:
+        lines = [f"実行 {metrics['calls']}回 / エラー {metrics['errors']}回 ({metrics['error_rate']:.1%})"]
+        for phase, values in metrics["phases"].items():
+            lines.append(
+                f"{phase}: p50 {values['p50_ms']:.1f}ms / p95 {values['p95_ms']:.1f}ms / 最大 {values['max_ms']:.1f}ms"
+            )
+        stats = execution_stats.get(name)
+        if stats is not None and stats["offloaded_count"]:
+            lines.append(f"オフロード {stats['offloaded_count']}回")
+        embed.add_field(name=f"/{name}", value=format_lines(lines, len(lines), budget), inline=False)
+
+    return embed
+
+def setup_botstats_command(bot: commands.Bot):
+    """
+    計測値表示コマンドをボットに登録する
+
+    引数:
+        bot: コマンドを登録するBot
+    """
+    @bot.tree.command(name="botstats", description="コマンドのレイテンシとエラー率を表示します（管理者向け）")
+    @app_commands.default_permissions(administrator=True)
+    async def botstats(interaction: discord.Interaction):
+        """計測値を表示するコマンド"""
+        # クラスターとして起動している場合は全クラスターの統計も表示する（コマンドの計測値はこのクラスターの分）
+        cluster_stats = None
+        client = get_cluster_client()
+        if client is not None:
+            try:
+                cluster_stats = await client.get_stats()
+            except IPCError as e:
+                logger.warning("クラスターの統計を取得できませんでした: %s", e)
+        await interaction.response.send_message(embed=create_botstats_embed(cluster_stats), ephemeral=True)
+
+    logger.info("計測値表示コマンドを設定しました")
@@ -2,27 +2,85 @@
 ランダム選択コマンドを提供するモジュール
 """
 import discord
+from collections import Counter
 from discord import app_commands
 from discord.ext import commands
-import os
-import sys
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
-from dice.src.randomizers.selector import (
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.utils.executor import run_computation, run_interaction_computation, estimate_selection_cost
+from src.utils.metrics import track_command, measure_phase, record_error
+from src.randomizers.selector import (
     select_random_item,
     select_random_multiple,
     shuffle_list,
-    create_teams
+    create_teams,
+    get_weighted_sampler,
+    parse_weighted_items,
+    Reservoir
 )
+from src.commands.attachments import read_attachment, split_items, format_lines, field_budget
+from src.dice.renderer import FIELD_VALUE_LIMIT, MAX_FIELDS
 
 logger = get_logger()
 
+# /choose weighted で一度に選べる最大数
+WEIGHTED_MAX_COUNT = 1000
+
+def draw_weighted(items: List[str], weights: List[float], count: int) -> List[Tuple[str, int, float]]:
+    """
+    キャッシュしたエイリアス表から重複ありで選ぶ
+
+    引数:
+        items: 選択対象の項目
+        weights: 各項目の重み
+        count: 選ぶ個数
+
+    戻り値:
+        選ばれた項目ごとの (項目, 回数, 確率) のリスト（回数の多い順）
+
+    例外:
+        ValueError: 重みが不正な場合
+    """
+    sampler = get_weighted_sampler(items, weights)
+    counts = Counter(sampler.sample_index() for _ in range(count))
+    return [(sampler.items[index], times, sampler.probability(index)) for index, times in counts.most_common()]
+
+def _format_weighted_result(selected: List[Tuple[str, int, float]], count: int) -> str:
+    """選ばれた項目を回数と確率を添えて列挙する（フィールドに収まらない分は省略する）"""
+    lines = []
+    # 省略した種類数の表示に使う分を残しておく
+    remaining = FIELD_VALUE_LIMIT - 16
+    for shown, (item, times, probability) in enumerate(selected):
+        line = f"• **{item}**{f' ×{times}' if count > 1 else ''}（{probability:.1%}）"
+        if len(line) + 1 > remaining:
+            lines.append(f"…他{len(selected) - shown}種類")
+            break
+        lines.append(line)
+        remaining -= len(line) + 1
+    return "\n".join(lines)
+
+async def _send_result(interaction: discord.Interaction, embed: discord.Embed):
+    """
+    選択結果を送信する（応答を保留している場合はフォローアップで送る）
+
+    送信に失敗した場合はエラーメッセージを送る
+
+    引数:
+        interaction: インタラクション
+        embed: 結果のEmbed
+    """
+    send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+    try:
+        with measure_phase('respond'):
+            await send(embed=embed)
+    except discord.HTTPException as e:
+        logger.error("選択結果を送信できませんでした: %s", e)
+        record_error()
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+        await send("結果を表示できませんでした。項目を減らしてもう一度お試しください。", ephemeral=True)
+
 def setup_choose_command(bot: commands.Bot):
     """
     ランダム選択コマンドをボットに登録する
@@ -40,11 +98,13 @@ def setup_choose_command(bot: commands.Bot):
     
     # シンプルなテストコマンドの追加（グループ外）
     @bot.tree.command(name="test", description="テストコマンド")
+    @track_command('test')
     async def test_command(interaction: discord.Interaction):
         await interaction.response.send_message("テストコマンドが実行されました！", ephemeral=True)
     
     # ランダム選択コマンド（シンプルなバージョン - グループ外）
     @bot.tree.command(name="random_pick", description="リストからランダムに選択します")
+    @track_command('random_pick')
     async def random_pick(
         interaction: discord.Interaction, 
         items: str
@@ -58,130 +118,292 @@ def setup_choose_command(bot: commands.Bot):
         await interaction.response.send_message(f"選ばれたのは: **{selected}**")
     
     @choose_group.command(name="one", description="リストからランダムに1つの項目を選択します")
+    @app_commands.describe(
+        items="カンマ区切りの選択肢",
+        items_file="選択肢を1行に1つずつ書いたテキスト/CSVファイル"
+    )
+    @track_command('choose one')
     async def choose_one(
         interaction: discord.Interaction, 
-        items: str
+        items: Optional[str] = None,
+        items_file: Optional[discord.Attachment] = None
     ):
         """リストからランダムに1つの項目を選択するコマンド"""
-        # 項目を分割
-        item_list = [item.strip() for item in items.split(',') if item.strip()]
+        if items_file is not None:
+            # 添付ファイルは1件分のリザーバーで読みながら選ぶ
+            reservoir = Reservoir(1)
+            ingest = await read_attachment(interaction, items_file, lambda name, _: reservoir.add(name))
+            if ingest is None:
+                return
+            selected_items = reservoir.sample()
+            total = ingest.entries
+            selected = selected_items[0] if selected_items else None
+        else:
+            # 項目を分割
+            item_list = split_items(items)
+            total = len(item_list)
+            selected = None
+            if item_list:
+                # ランダム選択
+                selected, index = await run_interaction_computation(
+                    interaction, 'choose one', len(item_list), select_random_item, item_list
+                )
         
-        if not item_list:
-            await interaction.response.send_message("選択肢を入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+        if selected is None:
+            await send("選択肢を入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。", ephemeral=True)
             return
-            
-        # ランダム選択
-        selected, index = select_random_item(item_list)
         
         # 結果の表示
         embed = discord.Embed(
             title="🎲 ランダム選択",
-            description=f"**{len(item_list)}個**の選択肢から選びました",
+            description=f"**{total:,}個**の選択肢から選びました",
             color=0x3498db
         )
         embed.add_field(name="選ばれたのは...", value=f"**{selected}**", inline=False)
+        if items_file is not None:
+            embed.set_footer(text=ingest.summary())
         
-        await interaction.response.send_message(embed=embed)
+        await _send_result(interaction, embed)
         
     @choose_group.command(name="multiple", description="リストからランダムに複数の項目を選択します")
+    @app_commands.describe(
+        items="カンマ区切りの選択肢",
+        count="選択する数",
+        unique="重複なしで選択するかどうか",
+        items_file="選択肢を1行に1つずつ書いたテキスト/CSVファイル"
+    )
+    @track_command('choose multiple')
     async def choose_multiple(
         interaction: discord.Interaction, 
-        items: str,
+        items: Optional[str] = None,
         count: int = 1,
-        unique: bool = True
+        unique: bool = True,
+        items_file: Optional[discord.Attachment] = None
     ):
         """リストからランダムに複数の項目を選択するコマンド"""
-        # 項目を分割
-        item_list = [item.strip() for item in items.split(',') if item.strip()]
-        
-        if not item_list:
-            await interaction.response.send_message("選択肢を入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
-            return
-            
         if count < 1:
             await interaction.response.send_message("選択数は1以上を指定してください。", ephemeral=True)
             return
-            
-        # 重複なしの場合、選択数が項目数を超えないようにする
-        if unique and count > len(item_list):
-            count = len(item_list)
-            
-        # ランダム選択
-        selected = select_random_multiple(item_list, count, unique)
+        # 重複ありの場合は選ぶ数だけ結果をメモリに持つため、添付ファイルの件数と同じ上限にする
+        max_count = get_settings(interaction.guild_id).attachment_max_entries
+        if not unique and count > max_count:
+            await interaction.response.send_message(
+                f"重複ありの選択数は{max_count:,}以下を指定してください。", ephemeral=True
+            )
+            return
+        
+        if items_file is not None:
+            if unique:
+                # 重複なしの場合はリザーバーサンプリングで、選択数分のメモリだけで選ぶ
+                reservoir = Reservoir(count)
+                ingest = await read_attachment(interaction, items_file, lambda name, _: reservoir.add(name))
+                selected = reservoir.sample() if ingest is not None else None
+            else:
+                item_list = []
+                ingest = await read_attachment(interaction, items_file, lambda name, _: item_list.append(name), keep_all=True)
+                selected = []
+                if ingest is not None and item_list:
+                    # 添付ファイルの読み込みで応答は保留済み
+                    selected = await run_computation(
+                        'choose multiple', estimate_selection_cost(len(item_list), count, unique),
+                        select_random_multiple, item_list, count, unique
+                    )
+            if ingest is None:
+                return
+            total = ingest.entries
+        else:
+            # 項目を分割
+            item_list = split_items(items)
+            total = len(item_list)
+            selected = []
+            if item_list:
+                # ランダム選択（選ぶ数が多い場合は応答を保留し、イベントループの外で実行）
+                selected = await run_interaction_computation(
+                    interaction, 'choose multiple', estimate_selection_cost(len(item_list), count, unique),
+                    select_random_multiple, item_list, count, unique
+                )
+        
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+        if total == 0:
+            await send("選択肢を入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。", ephemeral=True)
+            return
         
         # 結果の表示
         embed = discord.Embed(
             title="🎲 複数ランダム選択",
-            description=f"**{len(item_list)}個**の選択肢から**{count}個**選びました",
+            description=f"**{total:,}個**の選択肢から**{len(selected)}個**選びました",
             color=0x3498db
         )
         
-        result_text = "\n".join([f"• {item}" for item in selected])
+        result_text = format_lines((f"• {item}" for item in selected), len(selected), unit="個")
         embed.add_field(name="選ばれたのは...", value=result_text if result_text else "なし", inline=False)
+        if items_file is not None:
+            embed.set_footer(text=ingest.summary())
+        
+        await _send_result(interaction, embed)
+        
+    @choose_group.command(name="weighted", description="重み付きのリストからランダムに選択します")
+    @app_commands.describe(
+        items="「項目:重み」のカンマ区切り（例: 剣:5, 盾:3, 薬:1。重みを省略すると1）",
+        count="選択する数（重複あり）",
+        items_file="「項目,重み」を1行に1つずつ書いたテキスト/CSVファイル"
+    )
+    @track_command('choose weighted')
+    async def choose_weighted(
+        interaction: discord.Interaction,
+        items: Optional[str] = None,
+        count: int = 1,
+        items_file: Optional[discord.Attachment] = None
+    ):
+        """重み付きのリストからランダムに選択するコマンド"""
+        if not 1 <= count <= WEIGHTED_MAX_COUNT:
+            await interaction.response.send_message(
+                f"選択数は1から{WEIGHTED_MAX_COUNT}の間で指定してください。", ephemeral=True
+            )
+            return
+        
+        ingest = None
+        if items_file is not None:
+            item_list, weights = [], []
+            
+            def consume(name: str, weight: float):
+                item_list.append(name)
+                weights.append(weight)
+            
+            ingest = await read_attachment(interaction, items_file, consume, keep_all=True)
+            if ingest is None:
+                return
+        else:
+            with measure_phase('parse'):
+                item_list, weights = parse_weighted_items(items)
+        
+        if not item_list:
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send("選択肢を入力してください。「項目:重み」をカンマ区切りで指定するか、ファイルを添付できます。", ephemeral=True)
+            return
+        
+        # 同じ項目と重みのエイリアス表は前回の呼び出しで作成したものを使う
+        # （選ぶ回数が多い場合は応答を保留し、イベントループの外で実行）
+        try:
+            selected = await run_interaction_computation(
+                interaction, 'choose weighted', len(item_list) + count, draw_weighted, item_list, weights, count
+            )
+        except ValueError as e:
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send(f"エラー: {e}", ephemeral=True)
+            return
         
-        await interaction.response.send_message(embed=embed)
+        embed = discord.Embed(
+            title="⚖️ 重み付きランダム選択",
+            description=f"**{len(item_list):,}個**の選択肢から**{count}回**選びました",
+            color=0x3498db
+        )
+        embed.add_field(name="選ばれたのは...", value=_format_weighted_result(selected, count), inline=False)
+        if ingest is not None:
+            embed.set_footer(text=ingest.summary())
+        
+        await _send_result(interaction, embed)
         
     @choose_group.command(name="shuffle", description="リストの項目をランダムに並べ替えます")
+    @app_commands.describe(
+        items="カンマ区切りの項目",
+        items_file="項目を1行に1つずつ書いたテキスト/CSVファイル"
+    )
+    @track_command('choose shuffle')
     async def shuffle(
         interaction: discord.Interaction, 
-        items: str
+        items: Optional[str] = None,
+        items_file: Optional[discord.Attachment] = None
     ):
         """リストの項目をランダムに並べ替えるコマンド"""
-        # 項目を分割
-        item_list = [item.strip() for item in items.split(',') if item.strip()]
+        if items_file is not None:
+            # 全項目を並べ替えるため、添付ファイルの項目数には上限がある
+            item_list = []
+            ingest = await read_attachment(interaction, items_file, lambda name, _: item_list.append(name), keep_all=True)
+            if ingest is None:
+                return
+        else:
+            # 項目を分割
+            item_list = split_items(items)
         
         if not item_list:
-            await interaction.response.send_message("シャッフルする項目を入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send("シャッフルする項目を入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。", ephemeral=True)
             return
             
-        # シャッフル
-        shuffled = shuffle_list(item_list)
+        # シャッフル（項目数が多い場合は応答を保留し、イベントループの外で実行）
+        shuffled = await run_interaction_computation(interaction, 'choose shuffle', len(item_list), shuffle_list, item_list)
         
         # 結果の表示
         embed = discord.Embed(
             title="🔀 シャッフル結果",
-            description=f"**{len(item_list)}個**の項目をシャッフルしました",
+            description=f"**{len(item_list):,}個**の項目をシャッフルしました",
             color=0x3498db
         )
         
-        result_text = "\n".join([f"{i+1}. {item}" for i, item in enumerate(shuffled)])
+        result_text = format_lines((f"{i+1}. {item}" for i, item in enumerate(shuffled)), len(shuffled), unit="個")
         embed.add_field(name="シャッフル後の順序", value=result_text, inline=False)
         
-        await interaction.response.send_message(embed=embed)
+        await _send_result(interaction, embed)
         
     @choose_group.command(name="teams", description="メンバーをランダムにチームに分けます")
+    @app_commands.describe(
+        members="カンマ区切りのメンバー",
+        num_teams="チーム数",
+        members_file="メンバーを1行に1人ずつ書いたテキスト/CSVファイル"
+    )
+    @track_command('choose teams')
     async def teams(
         interaction: discord.Interaction, 
-        members: str,
-        num_teams: int = 2
+        members: Optional[str] = None,
+        num_teams: int = 2,
+        members_file: Optional[discord.Attachment] = None
     ):
         """メンバーをランダムにチームに分けるコマンド"""
-        # メンバーを分割
-        member_list = [member.strip() for member in members.split(',') if member.strip()]
-        
-        if not member_list:
-            await interaction.response.send_message("メンバーを入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
-            return
-            
         if num_teams < 1:
             await interaction.response.send_message("チーム数は1以上を指定してください。", ephemeral=True)
             return
+        
+        if members_file is not None:
+            member_list = []
+            ingest = await read_attachment(interaction, members_file, lambda name, _: member_list.append(name), keep_all=True)
+            if ingest is None:
+                return
+        else:
+            # メンバーを分割
+            member_list = split_items(members)
+        
+        if not member_list:
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send("メンバーを入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。", ephemeral=True)
+            return
             
-        # チーム分け
-        teams = create_teams(member_list, num_teams)
+        # チーム分け（人数が多い場合は応答を保留し、イベントループの外で実行）
+        teams = await run_interaction_computation(interaction, 'choose teams', len(member_list), create_teams, member_list, num_teams)
         
         # 結果の表示
         embed = discord.Embed(
             title="👥 チーム分け結果",
-            description=f"**{len(member_list)}人**を**{num_teams}チーム**に分けました",
+            description=f"**{len(member_list):,}人**を**{num_teams}チーム**に分けました",
             color=0x3498db
         )
         
-        for i, team in enumerate(teams):
-            team_members = "\n".join([f"• {member}" for member in team]) if team else "なし"
+        # フィールドの数の上限を超えるチームは人数だけをまとめて表示する
+        shown = teams if len(teams) <= MAX_FIELDS else teams[:MAX_FIELDS - 1]
+        budget = field_budget(embed, MAX_FIELDS if len(teams) > MAX_FIELDS else len(shown))
+        for i, team in enumerate(shown):
+            team_members = format_lines((f"• {member}" for member in team), len(team), budget, "人") if team else "なし"
             embed.add_field(name=f"チーム {i+1}", value=team_members, inline=True)
+        if len(shown) < len(teams):
+            omitted = teams[len(shown):]
+            embed.add_field(
+                name="その他のチーム",
+                value=f"チーム {len(shown) + 1}～{len(teams)}（{sum(map(len, omitted)):,}人）",
+                inline=False
+            )
         
-        await interaction.response.send_message(embed=embed)
+        await _send_result(interaction, embed)
     
     # コマンドグループをボットツリーに追加
     bot.tree.add_command(choose_group)
@@ -1,23 +1,156 @@
 """
 ダイスロール履歴に関するコマンド処理
+
+/history は履歴ストアのバックエンドを条件で検索し、ページ送りのボタンで古い履歴までたどれる。
+/audit は直近の履歴（メモリ上のキャッシュ）のロールをシードから再生成する。
 """
+import asyncio
+import datetime
 import discord
 from discord import app_commands
 from discord.ext import commands
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+from src.commands.roll import get_roll_history
+from src.dice.parser import normalize_dice_notation
+from src.storage.history import HistoryCursor, HistoryFilter, HistoryRow, get_history_store
+from src.views.history_view import HistoryView
+from src.dice.roller import replay_roll
+from src.dice.renderer import FIELD_NAME_LIMIT, _truncate, create_audit_embed
+from src.utils.metrics import track_command, measure_phase, record_error
 
-import sys
-import os
+logger = get_logger()
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
+# 1ページに表示する履歴の件数
+HISTORY_PAGE_SIZE = 10
 
-from dice.src.utils.logger import get_logger
-from dice.src.commands.roll import get_roll_history
+# 絞り込みに使う結果の種類
+_FLAG_LABELS = {'critical': "🎉 クリティカル", 'fumble': "💥 ファンブル"}
 
-logger = get_logger()
+def parse_date(text: str) -> float:
+    """
+    「YYYY-MM-DD」の日付をその日の0時（ボットのタイムゾーン）のUNIX時刻に変換する
+
+    引数:
+        text: 日付
+
+    戻り値:
+        UNIX時刻
+
+    例外:
+        ValueError: 日付の形式が不正な場合
+    """
+    return datetime.datetime.strptime(text.strip(), "%Y-%m-%d").timestamp()
+
+def build_history_filter(
+    expression: Optional[str] = None,
+    flag: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    channel_id: Optional[int] = None
+) -> HistoryFilter:
+    """
+    コマンドの引数から履歴の検索条件を作成する
+
+    引数:
+        expression: ダイス式
+        flag: 'critical' / 'fumble'
+        since: この日以降（YYYY-MM-DD）
+        until: この日まで（YYYY-MM-DD、その日を含む）
+        channel_id: チャンネルID
+
+    戻り値:
+        検索条件
+
+    例外:
+        ValueError: 日付の形式が不正な場合
+    """
+    return HistoryFilter(
+        expression=normalize_dice_notation(expression) if expression else None,
+        flag=flag,
+        since=parse_date(since) if since else None,
+        # 終了日はその日の終わりまでを含める
+        until=parse_date(until) + 86400 if until else None,
+        channel_id=channel_id
+    )
+
+def fetch_history_page(
+    user_id: int,
+    history_filter: HistoryFilter,
+    page_size: int = HISTORY_PAGE_SIZE,
+    before: Optional[HistoryCursor] = None,
+    after: Optional[HistoryCursor] = None
+) -> Tuple[List[HistoryRow], bool, bool]:
+    """
+    履歴の1ページを取得する（ストアの保存を待つことがあるため、イベントループの外で呼ぶ）
+
+    次のページがあるかを調べるため1件多く取得する
+
+    引数:
+        user_id: ユーザーID
+        history_filter: 検索条件
+        page_size: 1ページの件数
+        before: 指定した場合はこれより古いページを取得する
+        after: 指定した場合はこれより新しいページを取得する
+
+    戻り値:
+        (新しい順の履歴, 新しい方のページがあるか, 古い方のページがあるか) のタプル
+    """
+    rows = get_history_store().query(user_id, history_filter, page_size + 1, before, after)
+    if after is not None:
+        has_newer = len(rows) > page_size
+        return rows[-page_size:], has_newer, True
+    has_older = len(rows) > page_size
+    return rows[:page_size], before is not None, has_older
+
+def _describe_filter(history_filter: HistoryFilter, since: Optional[str], until: Optional[str]) -> str:
+    """検索条件の説明"""
+    parts = []
+    if history_filter.expression:
+        parts.append(f"ダイス: `{history_filter.expression}`")
+    if history_filter.flag:
+        parts.append(_FLAG_LABELS[history_filter.flag])
+    if since or until:
+        parts.append(f"期間: {since or ''}～{until or ''}")
+    if history_filter.channel_id:
+        parts.append(f"チャンネル: <#{history_filter.channel_id}>")
+    return "・".join(parts)
+
+def create_history_embed(display_name: str, rows: List[HistoryRow], page: int, description: str) -> discord.Embed:
+    """
+    履歴の1ページ分のEmbedを作成する
+
+    引数:
+        display_name: 表示名
+        rows: 新しい順の履歴
+        page: ページ番号（1始まり）
+        description: 検索条件の説明
+
+    戻り値:
+        Embedオブジェクト
+    """
+    embed = discord.Embed(
+        title=f"🎲 {display_name}さんのロール履歴",
+        description=description or None,
+        color=discord.Color.blue()
+    )
+    for row in rows:
+        record = row.record
+        status = ""
+        if record.is_critical:
+            status = " 🎉 クリティカル!"
+        elif record.is_fumble:
+            status = " 💥 ファンブル!"
+        where = f"・<#{row.channel_id}>" if row.channel_id else ""
+        embed.add_field(
+            # 長いダイス式はフィールド名の上限で切り詰める
+            name=_truncate(record.input, FIELD_NAME_LIMIT),
+            value=f"結果: **{record.total}**{status}\n<t:{int(row.created_at)}:f>{where}",
+            inline=False
+        )
+    embed.set_footer(text=f"ページ {page}")
+    return embed
 
 def setup_history_command(bot: commands.Bot):
     """
@@ -26,52 +159,127 @@ def setup_history_command(bot: commands.Bot):
     引数:
         bot: コマンドを追加するBotインスタンス
     """
-    @bot.tree.command(name='history', description='あなたの過去10回分のロール履歴を表示します。')
-    async def show_history(interaction: discord.Interaction):
+    @bot.tree.command(name='history', description='あなたのロール履歴を表示します。条件で絞り込めます。')
+    @app_commands.describe(
+        expression='このダイス式のロールだけを表示（例: 1d20+5）',
+        result='クリティカルまたはファンブルのロールだけを表示',
+        since='この日以降のロール（YYYY-MM-DD）',
+        until='この日までのロール（YYYY-MM-DD）',
+        channel='このチャンネルのロールだけを表示'
+    )
+    @app_commands.choices(result=[
+        app_commands.Choice(name="クリティカル", value="critical"),
+        app_commands.Choice(name="ファンブル", value="fumble")
+    ])
+    @track_command('history')
+    async def show_history(
+        interaction: discord.Interaction,
+        expression: Optional[str] = None,
+        result: Optional[app_commands.Choice[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        channel: Optional[discord.TextChannel] = None
+    ):
         """ロール履歴表示コマンド"""
         try:
+            try:
+                with measure_phase('parse'):
+                    history_filter = build_history_filter(
+                        expression, result.value if result else None, since, until, channel.id if channel else None
+                    )
+            except ValueError:
+                await interaction.response.send_message("日付は「YYYY-MM-DD」の形式で指定してください。", ephemeral=True)
+                return
+            
             user_id = interaction.user.id
-            history = get_roll_history(user_id)
+            display_name = interaction.user.display_name
+            description = _describe_filter(history_filter, since, until)
+            loop = asyncio.get_running_loop()
+            with measure_phase('compute'):
+                rows, has_newer, has_older = await loop.run_in_executor(
+                    None, fetch_history_page, user_id, history_filter
+                )
             
-            if not history:
-                await interaction.response.send_message("ロール履歴がありません。`/roll`コマンドでダイスを振ってみましょう！", ephemeral=True)
+            if not rows:
+                message = "条件に合うロール履歴がありません。" if description else \
+                    "ロール履歴がありません。`/roll`コマンドでダイスを振ってみましょう！"
+                await interaction.response.send_message(message, ephemeral=True)
                 return
-                
-            # 履歴の概要Embedを作成
-            embed = discord.Embed(
-                title=f"🎲 {interaction.user.display_name}さんのロール履歴",
-                description=f"最近の{len(history)}回分のロール履歴です",
-                color=discord.Color.blue()
-            )
             
-            # 各ロールの詳細を追加
-            for i, roll in enumerate(reversed(history), 1):
-                # 各ロールの概要を表示
-                notation = roll['input']
-                result = roll['result']
-                
-                # クリティカル/ファンブルの判定
-                is_critical = any(detail.get("is_critical", False) for detail in roll["details"] if detail["type"] == "dice")
-                is_fumble = any(detail.get("is_fumble", False) for detail in roll["details"] if detail["type"] == "dice")
-                
-                # 特殊結果の表示
-                status = ""
-                if is_critical:
-                    status = " 🎉 クリティカル!"
-                elif is_fumble:
-                    status = " 💥 ファンブル!"
+            # 表示中のページ（端の記録がページ送りの基準になる）
+            state = {"rows": rows, "page": 1}
+            
+            async def turn_page(button_interaction: discord.Interaction, direction: int):
+                current = state["rows"]
+                if direction > 0:
+                    page = await loop.run_in_executor(
+                        None, fetch_history_page, user_id, history_filter, HISTORY_PAGE_SIZE, current[-1].cursor, None
+                    )
+                else:
+                    page = await loop.run_in_executor(
+                        None, fetch_history_page, user_id, history_filter, HISTORY_PAGE_SIZE, None, current[0].cursor
+                    )
+                page_rows, newer, older = page
+                if page_rows:
+                    state["rows"] = page_rows
+                    # 表示中に新しいロールが増えた場合でも1ページ目より前には数えない
+                    state["page"] = max(1, state["page"] + direction)
+                view.update_buttons(newer, older)
+                await button_interaction.response.edit_message(
+                    embed=create_history_embed(display_name, state["rows"], state["page"], description), view=view
+                )
+            
+            view = HistoryView(user_id, turn_page, has_newer, has_older)
+            with measure_phase('render'):
+                embed = create_history_embed(display_name, rows, 1, description)
+            with measure_phase('respond'):
+                await interaction.response.send_message(embed=embed, view=view)
+            view.message = await interaction.original_response()
                 
-                embed.add_field(
-                    name=f"{i}. {notation}",
-                    value=f"結果: **{result}**{status}",
-                    inline=False
+        except Exception as e:
+            logger.error("履歴コマンド処理中にエラー: %s", e)
+            record_error()
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True)
+            else:
+                await interaction.followup.send(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True) 
+    
+    @bot.tree.command(name='audit', description='履歴のロールの出目をシードから再生成して検証します。')
+    @app_commands.describe(
+        number='検証するロール（1が最新、2がその1つ前）',
+        user='検証するユーザー（省略時は自分）'
+    )
+    @track_command('audit')
+    async def audit_roll(interaction: discord.Interaction, number: int = 1, user: Optional[discord.User] = None):
+        """履歴のロール検証コマンド"""
+        try:
+            target = user or interaction.user
+            with measure_phase('compute'):
+                await get_history_store().preload(target.id)
+                history = get_roll_history(target.id)
+            
+            if not 1 <= number <= len(history):
+                await interaction.response.send_message(
+                    f"{target.display_name}さんの{number}番目のロール履歴はありません。", ephemeral=True
                 )
+                return
+            
+            record = history[-number]
+            with measure_phase('compute'):
+                result = replay_roll(record)
+            if result.error:
+                await interaction.response.send_message(f"エラー: {result.error}", ephemeral=True)
+                return
             
-            await interaction.response.send_message(embed=embed)
+            with measure_phase('render'):
+                embed = create_audit_embed(target.display_name, record, result)
+            with measure_phase('respond'):
+                await interaction.response.send_message(embed=embed)
                 
         except Exception as e:
-            logger.error(f"履歴コマンド処理中にエラー: {e}")
+            logger.error("検証コマンド処理中にエラー: %s", e)
+            record_error()
             if not interaction.response.is_done():
                 await interaction.response.send_message(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True)
             else:
-                await interaction.followup.send(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True) 
\ No newline at end of file
+                await interaction.followup.send(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True)
@@ -4,25 +4,111 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import os
-import sys
-from typing import List, Optional
-import asyncio
+from typing import Dict, List, Optional
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
-from dice.src.randomizers.lottery import (
+from src.utils.logger import get_logger
+from src.utils.executor import run_interaction_computation
+from src.utils.metrics import track_command, measure_phase
+from src.randomizers.lottery import (
     draw_lottery,
     draw_tiered_lottery,
-    tournament_draw
+    tournament_draw,
+    assign_prize_tiers,
+    WeightedReservoir
 )
+from src.commands.attachments import read_attachment, split_items, format_lines, field_budget
+from src.timers.scheduler import ScheduledEvent, get_scheduler, register_event_handler
 
 logger = get_logger()
 
+# 抽選結果の遅延表示のイベント
+LOTTERY_REVEAL_EVENT = "lottery_reveal"
+
+# 「抽選中...」のメッセージID -> インタラクションのトークン
+# トークンは15分間応答を編集できる資格情報のため、予定（scheduler.db）には保存せず、
+# 結果を表示するまで（最長10秒）メモリ上にだけ持つ
+_reveal_tokens: Dict[int, str] = {}
+
+async def _send_error(interaction: discord.Interaction, message: str):
+    """
+    エラーメッセージを送信する（応答を保留している場合はフォローアップで送る）
+    
+    引数:
+        interaction: インタラクション
+        message: エラーメッセージ
+    """
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
+
+async def _announce_result(interaction: discord.Interaction, embed: discord.Embed, announce_delay: int):
+    """
+    抽選演出（遅延表示）の後に結果を表示する
+    
+    演出中は待機せず、結果の表示をスケジューラーに予定する（再起動しても結果を表示する）。
+    インタラクションのトークンは予定に保存しない
+    
+    引数:
+        interaction: インタラクション
+        embed: 結果のEmbed
+        announce_delay: 結果を表示するまでの秒数（1～10秒の場合のみ演出する）
+    """
+    # 添付ファイルを読み込んだ場合は応答を保留しているため、保留中のメッセージを書き換える
+    deferred = interaction.response.is_done()
+    if announce_delay > 0 and announce_delay <= 10:
+        with measure_phase('respond'):
+            if deferred:
+                message = await interaction.edit_original_response(content="🥁 抽選中...")
+            else:
+                await interaction.response.send_message("🥁 抽選中...", ephemeral=False)
+                message = await interaction.original_response()
+        
+        _reveal_tokens[message.id] = interaction.token
+        try:
+            await get_scheduler().schedule(LOTTERY_REVEAL_EVENT, announce_delay, {
+                "application_id": interaction.application_id,
+                "message_id": message.id,
+                "channel_id": interaction.channel_id,
+                "embed": embed.to_dict()
+            })
+        except Exception:
+            _reveal_tokens.pop(message.id, None)
+            raise
+    else:
+        # 演出なしですぐに結果表示
+        with measure_phase('respond'):
+            if deferred:
+                await interaction.edit_original_response(embed=embed)
+            else:
+                await interaction.response.send_message(embed=embed)
+
+async def _reveal_result(bot: commands.Bot, event: ScheduledEvent):
+    """
+    予定した抽選結果を表示する（「抽選中...」のメッセージを結果に書き換える）
+    
+    再起動してトークンがない場合は、ボットのメッセージとして書き換える
+    
+    引数:
+        bot: ボット
+        event: _announce_result で予定した結果の表示
+    """
+    data = event.payload
+    embed = discord.Embed.from_dict(data["embed"])
+    # 以前のバージョンで予定した結果はトークンを保存している
+    token = _reveal_tokens.pop(data["message_id"], None) or data.get("token")
+    try:
+        if token is not None:
+            webhook = discord.Webhook.partial(data["application_id"], token, client=bot)
+            await webhook.edit_message(data["message_id"], content="", embed=embed)
+        else:
+            channel = bot.get_partial_messageable(data["channel_id"])
+            await channel.get_partial_message(data["message_id"]).edit(content="", embed=embed)
+    except discord.HTTPException as e:
+        # トークンの期限（15分）が切れた場合や、ボットがメッセージを編集できない場合は、チャンネルに結果を送る
+        logger.warning("抽選中のメッセージを書き換えられませんでした（結果を新しく送ります）: %s", e)
+        await bot.get_partial_messageable(data["channel_id"]).send(embed=embed)
+
 def setup_lottery_command(bot: commands.Bot):
     """
     抽選コマンドをボットに登録する
@@ -32,6 +118,12 @@ def setup_lottery_command(bot: commands.Bot):
     """
     logger.info("抽選コマンドを設定中...")
     
+    async def reveal_result(event: ScheduledEvent):
+        await _reveal_result(bot, event)
+    
+    # スケジューラーは最初に使う時に作成する
+    register_event_handler(LOTTERY_REVEAL_EVENT, reveal_result)
+    
     # グループコマンドの作成
     lottery_group = app_commands.Group(
         name="lottery", 
@@ -39,68 +131,80 @@ def setup_lottery_command(bot: commands.Bot):
     )
     
     @lottery_group.command(name="draw", description="参加者から当選者を抽選します")
+    @app_commands.describe(
+        participants="カンマ区切りの参加者",
+        winners_count="当選者数",
+        announce_delay="結果を表示するまでの秒数（0で演出なし）",
+        participants_file="参加者を1行に1人ずつ書いたテキスト/CSVファイル（2列目に口数を指定すると重み付き抽選）"
+    )
+    @track_command('lottery draw')
     async def lottery_draw(
         interaction: discord.Interaction, 
-        participants: str,
+        participants: Optional[str] = None,
         winners_count: int = 1,
-        announce_delay: int = 3
+        announce_delay: int = 3,
+        participants_file: Optional[discord.Attachment] = None
     ):
         """参加者リストから当選者を抽選するコマンド"""
-        # 参加者を分割
-        participant_list = [p.strip() for p in participants.split(',') if p.strip()]
-        
-        if not participant_list:
-            await interaction.response.send_message("参加者リストを入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
-            return
-            
         if winners_count < 1:
             await interaction.response.send_message("当選者数は1以上を指定してください。", ephemeral=True)
             return
-            
-        # 抽選を実行
-        winners = draw_lottery(participant_list, winners_count)
+        
+        footer = None
+        if participants_file is not None:
+            # 当選者数分のリザーバーで読みながら抽選する（口数の指定がなければ等確率）
+            reservoir = WeightedReservoir(winners_count)
+            ingest = await read_attachment(interaction, participants_file, reservoir.add)
+            if ingest is None:
+                return
+            total = ingest.entries
+            winners = reservoir.sample()
+            footer = ingest.summary()
+        else:
+            # 参加者を分割
+            participant_list = split_items(participants)
+            total = len(participant_list)
+            winners = []
+            if participant_list:
+                # 抽選を実行（参加者が多い場合は応答を保留し、イベントループの外で実行）
+                winners = await run_interaction_computation(
+                    interaction, 'lottery draw', len(participant_list), draw_lottery, participant_list, winners_count
+                )
+        
+        if total == 0:
+            await _send_error(interaction, "参加者リストを入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。")
+            return
         
         # 結果表示の準備
         embed = discord.Embed(
             title="🎉 抽選結果",
-            description=f"**{len(participant_list)}人**の参加者から**{len(winners)}人**を抽選しました",
+            description=f"**{total:,}人**の参加者から**{len(winners)}人**を抽選しました",
             color=0xf1c40f
         )
+        if footer:
+            embed.set_footer(text=footer)
+        result_text = format_lines((f"🏆 **{winner}**" for winner in winners), len(winners), unit="人")
+        embed.add_field(name="当選者", value=result_text if result_text else "該当者なし", inline=False)
         
-        # 抽選演出（遅延表示）
-        if announce_delay > 0 and announce_delay <= 10:
-            await interaction.response.send_message("🥁 抽選中...", ephemeral=False)
-            await asyncio.sleep(announce_delay)
-            
-            # 結果の表示
-            result_text = "\n".join([f"🏆 **{winner}**" for winner in winners])
-            embed.add_field(name="当選者", value=result_text if result_text else "該当者なし", inline=False)
-            
-            await interaction.edit_original_response(content="", embed=embed)
-        else:
-            # 演出なしですぐに結果表示
-            result_text = "\n".join([f"🏆 **{winner}**" for winner in winners])
-            embed.add_field(name="当選者", value=result_text if result_text else "該当者なし", inline=False)
-            
-            await interaction.response.send_message(embed=embed)
+        await _announce_result(interaction, embed, announce_delay)
         
     @lottery_group.command(name="tiered", description="複数の賞品に対して当選者を抽選します")
+    @app_commands.describe(
+        participants="カンマ区切りの参加者",
+        announce_delay="結果を表示するまでの秒数（0で演出なし）",
+        participants_file="参加者を1行に1人ずつ書いたテキスト/CSVファイル（2列目に口数を指定すると重み付き抽選）"
+    )
+    @track_command('lottery tiered')
     async def tiered_lottery(
         interaction: discord.Interaction, 
-        participants: str,
+        participants: Optional[str] = None,
         first_prize_count: int = 1,
         second_prize_count: int = 2,
         third_prize_count: int = 3,
-        announce_delay: int = 3
+        announce_delay: int = 3,
+        participants_file: Optional[discord.Attachment] = None
     ):
         """複数賞品の当選者を抽選するコマンド"""
-        # 参加者を分割
-        participant_list = [p.strip() for p in participants.split(',') if p.strip()]
-        
-        if not participant_list:
-            await interaction.response.send_message("参加者リストを入力してください。カンマ区切りで複数指定できます。", ephemeral=True)
-            return
-            
         # 賞品と当選者数の設定
         prize_tiers = {
             "一等賞": max(0, first_prize_count),
@@ -112,43 +216,55 @@ def setup_lottery_command(bot: commands.Bot):
         if all(count == 0 for count in prize_tiers.values()):
             await interaction.response.send_message("少なくとも1つの賞品に1人以上の当選者数を設定してください。", ephemeral=True)
             return
-            
-        # 抽選を実行
-        results = draw_tiered_lottery(participant_list, prize_tiers)
+        
+        footer = None
+        if participants_file is not None:
+            # 全賞品の当選者数分のリザーバーで読みながら抽選する
+            reservoir = WeightedReservoir(sum(prize_tiers.values()))
+            ingest = await read_attachment(interaction, participants_file, reservoir.add)
+            if ingest is None:
+                return
+            total = ingest.entries
+            results = assign_prize_tiers(reservoir.sample(), prize_tiers)
+            footer = ingest.summary()
+        else:
+            # 参加者を分割
+            participant_list = split_items(participants)
+            total = len(participant_list)
+            results = {}
+            if participant_list:
+                # 抽選を実行（参加者が多い場合は応答を保留し、イベントループの外で実行）
+                results = await run_interaction_computation(
+                    interaction, 'lottery tiered', len(participant_list), draw_tiered_lottery, participant_list, prize_tiers
+                )
+        
+        if total == 0:
+            await _send_error(interaction, "参加者リストを入力してください。カンマ区切りで複数指定するか、ファイルを添付できます。")
+            return
         
         # 結果表示の準備
         embed = discord.Embed(
             title="🎊 階層的抽選結果",
-            description=f"**{len(participant_list)}人**の参加者から抽選しました",
+            description=f"**{total:,}人**の参加者から抽選しました",
             color=0xf1c40f
         )
         
-        # 抽選演出（遅延表示）
-        if announce_delay > 0 and announce_delay <= 10:
-            await interaction.response.send_message("🥁 抽選中...", ephemeral=False)
-            await asyncio.sleep(announce_delay)
-            
-            # 結果の表示（逆順で表示 - 三等賞→一等賞）
-            for prize in reversed(list(results.keys())):
-                winners = results[prize]
-                result_text = "\n".join([f"• **{winner}**" for winner in winners])
-                embed.add_field(name=f"🏆 {prize} ({len(winners)}名)", 
-                               value=result_text if result_text else "該当者なし", 
-                               inline=False)
-            
-            await interaction.edit_original_response(content="", embed=embed)
-        else:
-            # 演出なしですぐに結果表示
-            for prize in reversed(list(results.keys())):
-                winners = results[prize]
-                result_text = "\n".join([f"• **{winner}**" for winner in winners])
-                embed.add_field(name=f"🏆 {prize} ({len(winners)}名)", 
-                               value=result_text if result_text else "該当者なし", 
-                               inline=False)
-            
-            await interaction.response.send_message(embed=embed)
+        if footer:
+            embed.set_footer(text=footer)
+        
+        # 結果の表示（逆順で表示 - 三等賞→一等賞）
+        budget = field_budget(embed, len(results))
+        for prize in reversed(list(results.keys())):
+            winners = results[prize]
+            result_text = format_lines((f"• **{winner}**" for winner in winners), len(winners), budget, "人")
+            embed.add_field(name=f"🏆 {prize} ({len(winners)}名)", 
+                           value=result_text if result_text else "該当者なし", 
+                           inline=False)
+        
+        await _announce_result(interaction, embed, announce_delay)
         
     @lottery_group.command(name="tournament", description="トーナメント表を生成します")
+    @track_command('lottery tournament')
     async def tournament(
         interaction: discord.Interaction, 
         participants: str,
@@ -166,8 +282,10 @@ def setup_lottery_command(bot: commands.Bot):
             await interaction.response.send_message("ラウンド数は1〜6の範囲で指定してください。", ephemeral=True)
             return
             
-        # トーナメント表を生成
-        tournament = tournament_draw(participant_list, rounds)
+        # トーナメント表を生成（参加者が多い場合は応答を保留し、イベントループの外で実行）
+        tournament = await run_interaction_computation(
+            interaction, 'lottery tournament', len(participant_list), tournament_draw, participant_list, rounds
+        )
         
         # 結果表示の準備
         embed = discord.Embed(
@@ -177,18 +295,22 @@ def setup_lottery_command(bot: commands.Bot):
         )
         
         # トーナメント表の表示
+        budget = field_budget(embed, len(tournament))
         for round_num, matches in tournament.items():
-            round_text = []
-            for i, (player1, player2) in enumerate(matches):
-                round_text.append(f"試合{i+1}: **{player1}** vs **{player2}**")
-            
+            round_text = (
+                f"試合{i+1}: **{player1}** vs **{player2}**" for i, (player1, player2) in enumerate(matches)
+            )
             embed.add_field(
                 name=f"ラウンド {round_num} ({len(matches)}試合)",
-                value="\n".join(round_text),
+                value=format_lines(round_text, len(matches), budget, "試合"),
                 inline=False
             )
         
-        await interaction.response.send_message(embed=embed)
+        with measure_phase('respond'):
+            if interaction.response.is_done():
+                await interaction.followup.send(embed=embed)
+            else:
+                await interaction.response.send_message(embed=embed)
     
     # コマンドグループをボットツリーに追加
     bot.tree.add_command(lottery_group)
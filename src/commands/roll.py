@@ -5,25 +5,30 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from typing import Dict, Any, List, Optional
+import re
 
-import sys
-import os
-
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
-from dice.config.settings import get_config
-from dice.src.dice.roller import roll_complex_dice
-from dice.src.dice.renderer import create_dice_embed
-from dice.src.views.dice_view import DiceRollView
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.dice.parser import compile_dice_expression
+from src.dice.roller import roll_complex_dice
+from src.dice.result import RollResult, RollRecord
+from src.dice.rng import derive_seed
+from src.dice.probability import calculate_dice_stats
+from src.dice.renderer import create_dice_embed, create_stats_embed
+from src.views.dice_view import create_reroll_view, setup_reroll_handler
+from src.storage.history import get_history_store
+from src.storage.stats import get_luck_stats_store
+from src.utils.executor import (
+    run_interaction_computation,
+    estimate_roll_cost,
+    estimate_distribution_cost
+)
+from src.utils.metrics import track_command, measure_phase, record_error
 
 logger = get_logger()
 
-# ユーザーごとのロール履歴
-roll_history: Dict[int, List[Dict[str, Any]]] = {}
+# 確率分布の表示: "stats 3d6+2d8+4" または "stats 3d6+4 >=15"
+stats_pattern = re.compile(r"^stats\s+(.+?)(?:\s*>=\s*(-?\d+))?\s*$", re.IGNORECASE)
 
 def setup_roll_command(bot: commands.Bot):
     """
@@ -32,10 +37,17 @@ def setup_roll_command(bot: commands.Bot):
     引数:
         bot: コマンドを追加するBotインスタンス
     """
+    # 再ロールボタンは custom_id から1つのハンドラーで処理する（再起動前のボタンも使える）
+    setup_reroll_handler(bot)
+    
     # スラッシュコマンドとして定義
     @bot.tree.command(name='roll', description='ダイスを振ります。例: 1d6, 2d10+3, d20-1')
-    @app_commands.describe(dice_str='振りたいダイス (例: 1d6, 2d10+3, d20-1)')
-    async def roll_dice_command(interaction: discord.Interaction, dice_str: str = None):
+    @app_commands.describe(
+        dice_str='振りたいダイス (例: 1d6, 2d10+3, d20-1)',
+        sum_only='出目を表示せず合計だけを表示する（大量のダイスを速く振れますが、出目は履歴から再生成できません）'
+    )
+    @track_command('roll')
+    async def roll_dice_command(interaction: discord.Interaction, dice_str: str = None, sum_only: bool = False):
         """ダイスロールコマンド"""
         try:
             if not dice_str:
@@ -46,28 +58,49 @@ def setup_roll_command(bot: commands.Bot):
                 await send_help_message(interaction)
                 return
             
-            # ダイスロール実行
-            result = roll_complex_dice(dice_str)
+            stats_match = stats_pattern.match(dice_str.strip())
+            if stats_match:
+                await send_stats_message(interaction, stats_match.group(1), stats_match.group(2))
+                return
+            
+            # ダイスロール実行（大きなロールはイベントループの外で実行）
+            with measure_phase('parse'):
+                expression = compile_dice_expression(dice_str)
+            cost = estimate_roll_cost(expression) if expression else 0
+            settings = get_settings(interaction.guild_id)
+            # インタラクションごとのシードで振り、履歴から出目を再生成できるようにする
+            # （合計だけの場合は出目を振らないため再生成できない。
+            # 時間のかかる計算は応答を保留してからエグゼキューターで実行する）
+            seed = derive_seed(interaction.id)
+            result = await run_interaction_computation(
+                interaction, 'roll', cost, roll_complex_dice, expression or dice_str, settings, seed, sum_only
+            )
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
             
-            if "error" in result:
-                await interaction.response.send_message(f"エラー: {result['error']}", ephemeral=True)
+            if result.error:
+                await send(f"エラー: {result.error}", ephemeral=True)
                 return
                 
-            # Embedの作成
-            embed = create_dice_embed(interaction, result)
-            
-            # ビューの作成と設定
-            view = DiceRollView(dice_str, interaction)
-            view.set_history_callback(update_roll_history)
+            with measure_phase('render'):
+                # Embedの作成
+                embed = create_dice_embed(interaction, result)
+                
+                # 再ロールボタン（ロールした人とダイス式を custom_id に埋め込む）
+                view = create_reroll_view(interaction.user.id, expression, sum_only)
             
             # 結果を送信
-            await interaction.response.send_message(embed=embed, view=view)
+            with measure_phase('respond'):
+                if view is not None:
+                    await send(embed=embed, view=view)
+                else:
+                    await send(embed=embed)
             
             # ロール履歴に追加
-            update_roll_history(interaction.user.id, result)
+            update_roll_history(interaction.user.id, result, interaction.guild_id, interaction.channel_id)
                 
         except Exception as e:
-            logger.error(f"ロールコマンド処理中にエラー: {e}")
+            logger.error("ロールコマンド処理中にエラー: %s", e)
+            record_error()
             if not interaction.response.is_done():
                 await interaction.response.send_message(f"コマンド処理中にエラーが発生しました: {str(e)}", ephemeral=True)
             else:
@@ -75,16 +108,47 @@ def setup_roll_command(bot: commands.Bot):
     
     # ヘルプコマンド
     @bot.tree.command(name='dice_help', description='ダイスボットの使い方を表示します')
+    @track_command('dice_help')
     async def roll_help_command(interaction: discord.Interaction):
         """ダイスボットのヘルプを表示"""
         await send_help_message(interaction)
         
     # 追加のヘルプコマンド（シンプルな名前）
     @bot.tree.command(name='help', description='ダイスボットの使い方を表示します')
+    @track_command('help')
     async def help_command(interaction: discord.Interaction):
         """ダイスボットのヘルプを表示（シンプルなコマンド名）"""
         await send_help_message(interaction)
 
+async def send_stats_message(interaction: discord.Interaction, dice_str: str, target: Optional[str] = None):
+    """
+    ダイス式の確率分布を送信する
+    
+    引数:
+        interaction: インタラクション
+        dice_str: ダイス表記文字列
+        target: 確率を求めたい結果（省略可能）
+    """
+    with measure_phase('parse'):
+        expression = compile_dice_expression(dice_str)
+    cost = estimate_distribution_cost(expression) if expression else 0
+    
+    # 時間のかかる計算は応答を保留してからエグゼキューターで実行する
+    stats = await run_interaction_computation(
+        interaction, 'roll stats', cost, calculate_dice_stats,
+        dice_str, int(target) if target is not None else None, get_settings(interaction.guild_id)
+    )
+    send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+    
+    if "error" in stats:
+        await send(f"エラー: {stats['error']}", ephemeral=True)
+        return
+    
+    with measure_phase('render'):
+        embed = create_stats_embed(stats)
+    with measure_phase('respond'):
+        await send(embed=embed)
+
 async def send_help_message(interaction: discord.Interaction):
     """
     ヘルプメッセージを送信する
@@ -107,14 +171,23 @@ async def send_help_message(interaction: discord.Interaction):
             "`/roll 2d6` - 6面ダイスを2個振る\n"
             "`/roll 1d20+5` - 20面ダイスを振り、結果に5を加える\n"
             "`/roll 2d6-1` - 6面ダイスを2個振り、結果から1を引く\n"
-            "`/roll 1d20+2d4` - 複数種類のダイスを振る"
+            "`/roll 1d20+2d4` - 複数種類のダイスを振る\n"
+            "`/roll 100d1000 sum_only:True` - 出目を表示せず合計だけを表示する\n"
+            "`/roll stats 3d6+4` - 結果の確率分布を表示する\n"
+            "`/roll stats 3d6+4 >=15` - 15以上が出る確率を表示する\n"
+            "`/simulate 3d6+4 [trials]` - 何度も振って結果の分布を調べる"
         ),
         inline=False
     )
     
     help_embed.add_field(
         name="📜 履歴",
-        value="`/history` - あなたの過去10回分のダイスロール履歴を表示",
+        value=(
+            "`/history` - あなたのダイスロール履歴を表示（ダイス式・結果・期間・チャンネルで絞り込み可）\n"
+            "`/audit [number]` - 履歴のロールの出目をシードから再生成して検証（合計だけのロールは検証できません）\n"
+            "`/stats [user]` - このサーバーでのクリティカル率・出目の平均などの運の統計\n"
+            "`/leaderboard [metric]` - このサーバーの運のリーダーボード"
+        ),
         inline=False
     )
     
@@ -124,6 +197,7 @@ async def send_help_message(interaction: discord.Interaction):
         value=(
             "`/choose one [items]` - リストから1つをランダムに選択\n"
             "`/choose multiple [items] [count] [unique]` - 複数のアイテムを選択\n"
+            "`/choose weighted [剣:5,盾:3,薬:1] [count]` - 重み付きで選択\n"
             "`/choose shuffle [items]` - リストをランダムに並べ替え\n"
             "`/choose teams [members] [num_teams]` - メンバーをチームに分ける"
         ),
@@ -151,40 +225,41 @@ async def send_help_message(interaction: discord.Interaction):
         inline=False
     )
     
+    settings = get_settings(interaction.guild_id)
     help_embed.add_field(
         name="⚙️ 制限事項",
         value=(
-            f"ダイスの数: {get_config('MIN_DICE_COUNT', 1)}～{get_config('MAX_DICE_COUNT', 100)}個\n"
-            f"ダイスの面数: {get_config('MIN_DICE_SIDES', 2)}～{get_config('MAX_DICE_SIDES', 1000)}面\n"
-            f"修正値: {get_config('MIN_MODIFIER', -1000)}～{get_config('MAX_MODIFIER', 1000)}"
+            f"ダイスの数: {settings.min_dice_count}～{settings.max_dice_count}個\n"
+            f"ダイスの面数: {settings.min_dice_sides}～{settings.max_dice_sides}面\n"
+            f"修正値: {settings.min_modifier}～{settings.max_modifier}"
         ),
         inline=False
     )
     
     await interaction.response.send_message(embed=help_embed, ephemeral=True)
 
-def update_roll_history(user_id: int, result: Dict[str, Any]):
+def update_roll_history(
+    user_id: int,
+    result: RollResult,
+    guild_id: Optional[int] = None,
+    channel_id: Optional[int] = None
+):
     """
-    ユーザーのロール履歴を更新する
+    ユーザーのロール履歴と、ギルドの運の統計を更新する
     
     引数:
         user_id: ユーザーID
-        result: ロール結果
+        result: ロール結果（出目は保存せず、ダイス式とシードだけを記録する）
+        guild_id: ロールしたギルドのID
+        channel_id: ロールしたチャンネルのID
     """
-    global roll_history
-    
-    if user_id not in roll_history:
-        roll_history[user_id] = []
-        
-    # 最大履歴数に制限
-    max_history = get_config('MAX_HISTORY_SIZE', 10)
-    roll_history[user_id].append(result)
-    if len(roll_history[user_id]) > max_history:
-        roll_history[user_id].pop(0)
-        
-    logger.debug(f"ユーザー {user_id} の履歴を更新: {len(roll_history[user_id])}件")
+    # 最大履歴数はストア側のdequeで制限され、保存は書き込みスレッドで行われる
+    get_history_store().append(user_id, result, guild_id, channel_id)
+    # 集計値は出目から更新するため、出目を保存しない履歴からは作り直せない
+    get_luck_stats_store().record(guild_id, user_id, result)
+    logger.debug("ユーザー %s の履歴を更新しました", user_id)
 
-def get_roll_history(user_id: int) -> List[Dict[str, Any]]:
+def get_roll_history(user_id: int) -> List[RollRecord]:
     """
     ユーザーのロール履歴を取得する
     
@@ -192,7 +267,6 @@ def get_roll_history(user_id: int) -> List[Dict[str, Any]]:
         user_id: ユーザーID
         
     戻り値:
-        ロール履歴のリスト
+        ロールの記録のリスト（古い順）
     """
-    global roll_history
-    return roll_history.get(user_id, []) 
\ No newline at end of file
+    return get_history_store().get(user_id)
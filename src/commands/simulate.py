@@ -0,0 +1,106 @@
+"""
+モンテカルロシミュレーションのコマンドを提供するモジュール
+
+ダイス式を指定した回数だけ振り、結果の頻度をヒストグラムで表示する。試行はプロセスプールで
+並列に実行し、実行中は一定間隔でメッセージを編集して途中経過を表示する。
+"""
+import asyncio
+import discord
+from discord import app_commands
+from discord.ext import commands
+from typing import Dict
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.dice.parser import compile_dice_expression
+from src.dice.roller import check_expression_limits
+from src.dice.renderer import create_simulation_embed
+from src.dice.rng import derive_seed
+from src.dice.simulation import SimulationResult, run_simulation
+from src.utils.executor import get_simulation_executor
+from src.utils.metrics import track_command, measure_phase, record_error
+from src.views.simulation_view import SimulationView
+
+logger = get_logger()
+
+# 実行中のシミュレーション（ユーザーID -> 中止のイベント）。1人1つまで
+_running: Dict[int, asyncio.Event] = {}
+
+def setup_simulate_command(bot: commands.Bot):
+    """
+    シミュレーションコマンドをボットに登録する
+
+    引数:
+        bot: コマンドを登録するBot
+    """
+    logger.info("シミュレーションコマンドを設定中...")
+
+    @bot.tree.command(name="simulate", description="ダイス式を何度も振り、結果の分布を調べます")
+    @app_commands.describe(
+        expression="振るダイス式（例: 3d6+2, 100d1000）",
+        trials="試行の回数"
+    )
+    @track_command('simulate')
+    async def simulate(interaction: discord.Interaction, expression: str, trials: int = 100000):
+        """モンテカルロシミュレーションのコマンド"""
+        settings = get_settings(interaction.guild_id)
+        if not 1 <= trials <= settings.simulate_max_trials:
+            await interaction.response.send_message(
+                f"試行の回数は1から{settings.simulate_max_trials:,}の間で指定してください。", ephemeral=True
+            )
+            return
+
+        with measure_phase('parse'):
+            compiled = compile_dice_expression(expression)
+        error = "無効なダイス表記です" if compiled is None else check_expression_limits(compiled, settings)
+        if error:
+            await interaction.response.send_message(f"エラー: {error}", ephemeral=True)
+            return
+
+        user_id = interaction.user.id
+        if user_id in _running:
+            await interaction.response.send_message(
+                "実行中のシミュレーションがあります。終わるか中止してから実行してください。", ephemeral=True
+            )
+            return
+
+        stop = asyncio.Event()
+        _running[user_id] = stop
+        view = SimulationView(user_id, stop)
+        try:
+            with measure_phase('respond'):
+                await interaction.response.send_message(
+                    embed=create_simulation_embed(compiled.normalized, SimulationResult(trials)), view=view
+                )
+
+            async def show_progress(result: SimulationResult):
+                try:
+                    await interaction.edit_original_response(embed=create_simulation_embed(compiled.normalized, result))
+                except discord.HTTPException as e:
+                    # 途中経過の表示に失敗してもシミュレーションは続ける
+                    logger.warning("シミュレーションの途中経過を表示できませんでした: %s", e)
+
+            executor, workers = get_simulation_executor()
+            result = await run_simulation(
+                compiled, trials, derive_seed(interaction.id), executor, workers,
+                on_progress=show_progress, interval=settings.simulate_update_interval, stop=stop
+            )
+            logger.info(
+                "シミュレーション %s: %d回（%.0f回/秒）%s",
+                compiled.normalized, result.trials, result.throughput, "中止" if result.cancelled else "完了"
+            )
+
+            with measure_phase('respond'):
+                await interaction.edit_original_response(
+                    embed=create_simulation_embed(compiled.normalized, result), view=None
+                )
+        except Exception as e:
+            logger.error("シミュレーション中にエラーが発生: %s", e)
+            record_error()
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send("シミュレーション中にエラーが発生しました。", ephemeral=True)
+        finally:
+            view.stop()
+            _running.pop(user_id, None)
+
+    logger.info("シミュレーションコマンドを設定しました")
@@ -0,0 +1,200 @@
+"""
+運の統計のコマンドを提供するモジュール
+
+/stats と /leaderboard はロールのたびに更新している集計値（src.storage.stats）だけを使い、
+ロール履歴は読まない。
+"""
+import discord
+from discord import app_commands
+from discord.ext import commands
+from typing import List, Optional, Tuple
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.storage.stats import LuckStats, get_luck_stats_store
+from src.utils.metrics import track_command, measure_phase, record_error
+
+logger = get_logger()
+
+# 出目の平均を表示するダイスの種類の数
+STATS_FACE_ROWS = 6
+
+# リーダーボードに表示する人数
+LEADERBOARD_SIZE = 10
+
+# リーダーボードの指標の表示名
+_METRIC_LABELS = {
+    'luck': "運の良さ",
+    'critical': "クリティカル率",
+    'fumble': "ファンブル率",
+    'rolls': "ロール回数"
+}
+
+def format_metric(metric: str, value: float) -> str:
+    """
+    リーダーボードの指標の値を表示用の文字列にする
+
+    引数:
+        metric: 指標
+        value: 値
+
+    戻り値:
+        表示用の文字列
+    """
+    if metric == 'luck':
+        return f"{value:+.2f}σ"
+    if metric == 'rolls':
+        return f"{int(value):,}回"
+    return f"{value:.1%}"
+
+def _face_lines(stats: LuckStats) -> List[str]:
+    """よく振ったダイスの種類から順に、出目の平均を1行ずつにする"""
+    counts: List[Tuple[int, int]] = sorted(
+        ((sum(histogram), sides) for sides, histogram in stats.faces.items()), reverse=True
+    )
+    lines = []
+    for dice, sides in counts[:STATS_FACE_ROWS]:
+        if not dice:
+            continue
+        histogram = stats.faces[sides]
+        line = f"d{sides}: {dice:,}個 平均 {stats.face_mean(sides):.2f}（期待値 {(sides + 1) / 2:.1f}）"
+        if sides >= 4:
+            line += f" / 最大の目 {histogram[-1]:,}回・1の目 {histogram[0]:,}回"
+        lines.append(line)
+    return lines
+
+def create_luck_embed(display_name: str, stats: LuckStats, guild_stats: Optional[LuckStats]) -> discord.Embed:
+    """
+    運の統計のEmbedを作成する
+
+    引数:
+        display_name: 表示名
+        stats: ユーザーの集計値
+        guild_stats: 比較用のギルド全体の集計値
+
+    戻り値:
+        Embedオブジェクト
+    """
+    embed = discord.Embed(title=f"🍀 {display_name}さんの運の統計", color=discord.Color.green())
+    embed.add_field(name="ロール", value=f"{stats.count:,}回", inline=True)
+    embed.add_field(name="合計の平均", value=f"{stats.mean:.1f}（標準偏差 {stats.stddev:.1f}）", inline=True)
+    embed.add_field(name="運の良さ", value=f"{stats.luck:+.2f}σ", inline=True)
+    embed.add_field(name="🎉 クリティカル", value=f"{stats.critical:,}回（{stats.critical_rate:.1%}）", inline=True)
+    embed.add_field(name="💥 ファンブル", value=f"{stats.fumble:,}回（{stats.fumble_rate:.1%}）", inline=True)
+
+    lines = _face_lines(stats)
+    if lines:
+        embed.add_field(name="出目の平均", value="\n".join(lines)[:1024], inline=False)
+
+    footer = "運の良さ: 合計が期待値から標準偏差いくつ分ずれたかの平均（0が期待値どおり）"
+    if guild_stats is not None:
+        footer += f"\nサーバー全体: {guild_stats.count:,}回 / 運の良さ {guild_stats.luck:+.2f}σ"
+    embed.set_footer(text=footer)
+    return embed
+
+def create_leaderboard_embed(
+    metric: str,
+    ranking: List[Tuple[int, float, LuckStats]],
+    min_rolls: int
+) -> discord.Embed:
+    """
+    リーダーボードのEmbedを作成する
+
+    引数:
+        metric: 指標
+        ranking: (ユーザーID, 指標の値, 集計値) のリスト（順位順）
+        min_rolls: 割合の指標で順位に含めるのに必要なロールの回数
+
+    戻り値:
+        Embedオブジェクト
+    """
+    medals = ["🥇", "🥈", "🥉"]
+    lines = []
+    for rank, (user_id, value, stats) in enumerate(ranking, 1):
+        mark = medals[rank - 1] if rank <= len(medals) else f"{rank}."
+        lines.append(f"{mark} <@{user_id}> {format_metric(metric, value)}（{stats.count:,}回）")
+
+    embed = discord.Embed(
+        title=f"🏆 リーダーボード: {_METRIC_LABELS[metric]}",
+        description="\n".join(lines) if lines else "まだ順位に入る人がいません。",
+        color=discord.Color.gold()
+    )
+    if metric != 'rolls':
+        embed.set_footer(text=f"{min_rolls}回以上ロールした人が対象です")
+    return embed
+
+def setup_stats_command(bot: commands.Bot):
+    """
+    運の統計のコマンドをボットに登録する
+
+    引数:
+        bot: コマンドを登録するBot
+    """
+    logger.info("運の統計のコマンドを設定中...")
+
+    @bot.tree.command(name="stats", description="このサーバーでのロールの運の統計を表示します")
+    @app_commands.describe(user="統計を表示するユーザー（省略時は自分）")
+    @track_command('stats')
+    async def show_stats(interaction: discord.Interaction, user: Optional[discord.User] = None):
+        """運の統計のコマンド"""
+        try:
+            target = user or interaction.user
+            store = get_luck_stats_store()
+            # 初めて参照するギルドの集計値はイベントループの外で読み込む
+            await store.preload(interaction.guild_id)
+            with measure_phase('compute'):
+                stats = store.get(interaction.guild_id, target.id)
+                guild_stats = store.get(interaction.guild_id) if interaction.guild_id else None
+
+            if stats is None:
+                await interaction.response.send_message(
+                    f"{target.display_name}さんのロールはまだ集計されていません。", ephemeral=True
+                )
+                return
+
+            with measure_phase('render'):
+                embed = create_luck_embed(target.display_name, stats, guild_stats)
+            with measure_phase('respond'):
+                await interaction.response.send_message(embed=embed)
+
+        except Exception as e:
+            logger.error("運の統計の表示中にエラー: %s", e)
+            record_error()
+            if not interaction.response.is_done():
+                await interaction.response.send_message("統計の表示中にエラーが発生しました。", ephemeral=True)
+
+    @bot.tree.command(name="leaderboard", description="このサーバーの運のリーダーボードを表示します")
+    @app_commands.describe(metric="順位を付ける指標")
+    @app_commands.choices(metric=[
+        app_commands.Choice(name=label, value=metric) for metric, label in _METRIC_LABELS.items()
+    ])
+    @track_command('leaderboard')
+    async def show_leaderboard(
+        interaction: discord.Interaction,
+        metric: Optional[app_commands.Choice[str]] = None
+    ):
+        """リーダーボードのコマンド"""
+        try:
+            key = metric.value if metric else 'luck'
+            min_rolls = get_settings(interaction.guild_id).stats_leaderboard_min_rolls
+            store = get_luck_stats_store()
+            await store.preload(interaction.guild_id)
+            with measure_phase('compute'):
+                ranking = store.leaderboard(
+                    interaction.guild_id, key, min_rolls, LEADERBOARD_SIZE
+                )
+            with measure_phase('render'):
+                embed = create_leaderboard_embed(key, ranking, min_rolls)
+            with measure_phase('respond'):
+                # 順位の表示でメンションの通知は送らない
+                await interaction.response.send_message(
+                    embed=embed, allowed_mentions=discord.AllowedMentions.none()
+                )
+
+        except Exception as e:
+            logger.error("リーダーボードの表示中にエラー: %s", e)
+            record_error()
+            if not interaction.response.is_done():
+                await interaction.response.send_message("リーダーボードの表示中にエラーが発生しました。", ephemeral=True)
+
+    logger.info("運の統計のコマンドを設定しました")
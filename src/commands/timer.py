@@ -0,0 +1,224 @@
+"""
+タイマーコマンドを提供するモジュール
+
+タイマーはスケジューラーの予定として保存するため、ボットを再起動しても終了時刻に通知する。
+残り時間はDiscordの相対タイムスタンプ（<t:...:R>）で表示し、メッセージを編集し続けることはしない。
+"""
+import discord
+from discord import app_commands
+from discord.ext import commands
+from typing import Optional
+import re
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.utils.metrics import track_command, measure_phase
+from src.timers.scheduler import ScheduledEvent, get_scheduler, register_event_handler
+
+logger = get_logger()
+
+# タイマーの終了と、終了前の残り時間通知のイベント
+TIMER_EVENT = "timer"
+TIMER_REMIND_EVENT = "timer_remind"
+
+# 時間の単位と秒数
+_UNITS = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+_UNIT_PATTERN = re.compile(r'(\d+)\s*([dhms])')
+_CLOCK_PATTERN = re.compile(r'^(?:(\d+):)?(\d+):(\d{1,2})$')
+
+def parse_duration(text: str) -> int:
+    """
+    時間の表記を秒数に変換する
+
+    「90」（秒）、「5m」「1h30m」「2d」のような単位付きの表記と、「1:30」「1:00:00」の形式を受け付ける
+
+    引数:
+        text: 時間の表記
+
+    戻り値:
+        秒数
+
+    例外:
+        ValueError: 表記が不正な場合
+    """
+    text = text.strip().lower()
+    if text.isdigit():
+        return int(text)
+
+    match = _CLOCK_PATTERN.match(text)
+    if match:
+        hours, minutes, seconds = match.groups()
+        if int(seconds) >= 60:
+            raise ValueError(f"時間の表記が不正です: {text}")
+        return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+
+    if not text or _UNIT_PATTERN.sub('', text).strip():
+        raise ValueError(f"時間の表記が不正です: {text}")
+    return sum(int(value) * _UNITS[unit] for value, unit in _UNIT_PATTERN.findall(text))
+
+def format_duration(seconds: int) -> str:
+    """
+    秒数を「1時間30分」のような表記にする
+
+    引数:
+        seconds: 秒数
+
+    戻り値:
+        時間の表記
+    """
+    parts = []
+    for unit, size in (('日', 86400), ('時間', 3600), ('分', 60), ('秒', 1)):
+        value, seconds = divmod(seconds, size)
+        if value:
+            parts.append(f"{value}{unit}")
+    return "".join(parts) or "0秒"
+
+def _timer_label(payload: dict) -> str:
+    return f"「{payload['label']}」" if payload.get('label') else ""
+
+def _owner_mentions(payload: dict) -> discord.AllowedMentions:
+    """タイマーを開始したユーザーだけに通知する（ラベルに書かれたメンションでは通知しない）"""
+    return discord.AllowedMentions(everyone=False, roles=False, users=[discord.Object(payload["user_id"])])
+
+def setup_timer_command(bot: commands.Bot):
+    """
+    タイマーコマンドをボットに登録する
+
+    引数:
+        bot: コマンドを登録するBot
+    """
+    logger.info("タイマーコマンドを設定中...")
+
+    async def notify_timer(event: ScheduledEvent):
+        """タイマーの終了をチャンネルに通知する"""
+        data = event.payload
+        channel = bot.get_partial_messageable(data["channel_id"], guild_id=data.get("guild_id"))
+        await channel.send(
+            f"⏰ <@{data['user_id']}> タイマー{_timer_label(data)}（{format_duration(data['duration'])}）が終了しました",
+            allowed_mentions=_owner_mentions(data)
+        )
+
+    async def notify_remaining(event: ScheduledEvent):
+        """タイマーの終了前に残り時間を通知する"""
+        data = event.payload
+        channel = bot.get_partial_messageable(data["channel_id"], guild_id=data.get("guild_id"))
+        await channel.send(
+            f"⏳ <@{data['user_id']}> タイマー{_timer_label(data)}の残り時間は{format_duration(data['remaining'])}です",
+            allowed_mentions=_owner_mentions(data)
+        )
+
+    # スケジューラーは最初に使う時（起動時の読み込みかコマンドの実行時）に作成する
+    register_event_handler(TIMER_EVENT, notify_timer)
+    register_event_handler(TIMER_REMIND_EVENT, notify_remaining)
+
+    timer_group = app_commands.Group(
+        name="timer",
+        description="タイマーコマンド",
+    )
+
+    @timer_group.command(name="start", description="タイマーを開始します")
+    @app_commands.describe(
+        duration="時間（例: 90, 5m, 1h30m, 1:30）",
+        label="タイマーの名前",
+        remind="終了のこの時間前にも通知する（例: 1m）"
+    )
+    @track_command('timer start')
+    async def timer_start(
+        interaction: discord.Interaction,
+        duration: str,
+        label: Optional[str] = None,
+        remind: Optional[str] = None
+    ):
+        """タイマーを開始するコマンド"""
+        settings = get_settings()
+        try:
+            seconds = parse_duration(duration)
+            remind_seconds = parse_duration(remind) if remind else None
+        except ValueError:
+            await interaction.response.send_message(
+                "時間は「90」（秒）、「5m」「1h30m」のような単位付き、または「1:30」の形式で指定してください。",
+                ephemeral=True
+            )
+            return
+
+        if not 1 <= seconds <= settings.timer_max_seconds:
+            await interaction.response.send_message(
+                f"時間は1秒以上、{format_duration(settings.timer_max_seconds)}以下で指定してください。", ephemeral=True
+            )
+            return
+        if remind_seconds is not None and not 1 <= remind_seconds < seconds:
+            await interaction.response.send_message("残り時間の通知はタイマーより短い時間を指定してください。", ephemeral=True)
+            return
+
+        scheduler = get_scheduler()
+        user_id = interaction.user.id
+        running = [event for event in scheduler.pending(TIMER_EVENT) if event.payload["user_id"] == user_id]
+        if len(running) >= settings.timer_max_per_user:
+            await interaction.response.send_message(
+                f"同時に動かせるタイマーは{settings.timer_max_per_user}個までです。`/timer cancel`で止めてください。",
+                ephemeral=True
+            )
+            return
+
+        payload = {
+            "channel_id": interaction.channel_id,
+            "guild_id": interaction.guild_id,
+            "user_id": user_id,
+            "label": label,
+            "duration": seconds
+        }
+        with measure_phase('compute'):
+            timer = await scheduler.schedule(TIMER_EVENT, seconds, payload)
+            if remind_seconds is not None:
+                await scheduler.schedule(
+                    TIMER_REMIND_EVENT, seconds - remind_seconds,
+                    dict(payload, timer_id=timer.id, remaining=remind_seconds)
+                )
+
+        embed = discord.Embed(
+            title=f"⏱️ タイマー{_timer_label(payload)}を開始しました",
+            description=f"{format_duration(seconds)}後（<t:{int(timer.due_at)}:R>）に通知します",
+            color=0x3498db
+        )
+        if remind_seconds is not None:
+            embed.add_field(name="残り時間の通知", value=f"終了の{format_duration(remind_seconds)}前", inline=False)
+        embed.set_footer(text=f"タイマーID: {timer.id}")
+        with measure_phase('respond'):
+            await interaction.response.send_message(embed=embed)
+
+    @timer_group.command(name="list", description="動いているタイマーを表示します")
+    @track_command('timer list')
+    async def timer_list(interaction: discord.Interaction):
+        """自分のタイマーを表示するコマンド"""
+        user_id = interaction.user.id
+        timers = [event for event in get_scheduler().pending(TIMER_EVENT) if event.payload["user_id"] == user_id]
+        if not timers:
+            await interaction.response.send_message("動いているタイマーはありません。", ephemeral=True)
+            return
+
+        lines = [
+            f"`{event.id}` {_timer_label(event.payload) or 'タイマー'} - <t:{int(event.due_at)}:R>"
+            for event in timers
+        ]
+        embed = discord.Embed(title="⏱️ 動いているタイマー", description="\n".join(lines), color=0x3498db)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @timer_group.command(name="cancel", description="タイマーを止めます")
+    @app_commands.describe(timer_id="止めるタイマーのID（/timer list で確認できます）")
+    @track_command('timer cancel')
+    async def timer_cancel(interaction: discord.Interaction, timer_id: int):
+        """タイマーを止めるコマンド"""
+        scheduler = get_scheduler()
+        timer = scheduler.get(timer_id)
+        if timer is None or timer.kind != TIMER_EVENT or timer.payload["user_id"] != interaction.user.id:
+            await interaction.response.send_message("そのIDのタイマーは見つかりませんでした。", ephemeral=True)
+            return
+
+        await scheduler.cancel(timer_id)
+        for event in scheduler.pending(TIMER_REMIND_EVENT):
+            if event.payload.get("timer_id") == timer_id:
+                await scheduler.cancel(event.id)
+        await interaction.response.send_message(f"タイマー{_timer_label(timer.payload)}を止めました。", ephemeral=True)
+
+    bot.tree.add_command(timer_group)
+    logger.info("タイマーコマンドを設定しました")
@@ -2,38 +2,68 @@
 ダイス表記のパース機能を提供するモジュール
 """
 import re
-from typing import List, Tuple, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Tuple, Dict, Optional, NamedTuple
 
 # 複雑なダイス表記をパースするための正規表現
 complex_dice_pattern = re.compile(r'([+-]?\d*d\d+|[+-]?\d+)', re.IGNORECASE)
 # 基本的なダイス表記をパースするための正規表現
 basic_dice_pattern = re.compile(r"^(?:(\d+)d)?(\d+)(?:([+-])(\d+))?$", re.IGNORECASE)
 
-def parse_complex_dice_notation(dice_str: str) -> List[Tuple[int, int, int]]:
+# パース結果キャッシュの最大エントリ数
+PARSE_CACHE_SIZE = 512
+
+class DiceComponent(NamedTuple):
+    """ダイス式の1項（ダイス数, 面数, 修正値）"""
+    num_dice: int
+    num_sides: int
+    modifier: int
+
+class CompiledDiceExpression(NamedTuple):
     """
-    複雑なダイス表記をパースする
-    
-    例:
-        "1d20+2d6+3" -> [(1, 20, 0), (2, 6, 0), (0, 0, 3)]
-        
+    コンパイル済みのダイス式（不変）
+
+    パース結果と、ロール時に毎回計算していた値を事前に保持する
+    """
+    normalized: str
+    components: Tuple[DiceComponent, ...]
+    min_total: int
+    max_total: int
+    min_dice_count: int
+    max_dice_count: int
+    min_sides: int
+    max_sides: int
+    min_modifier: int
+    max_modifier: int
+
+    @property
+    def has_dice(self) -> bool:
+        """ダイス項を含むかどうか"""
+        return self.max_sides > 0
+
+def normalize_dice_notation(dice_str: str) -> str:
+    """
+    ダイス表記をキャッシュキー用に正規化する
+
     引数:
         dice_str: ダイス表記文字列
-        
+
     戻り値:
-        (ダイス数, 面数, 修正値) のタプルのリスト
+        空白を除去し小文字化した文字列
     """
-    # 文字列から空白を削除
-    dice_str = dice_str.replace(" ", "")
-    
+    return dice_str.replace(" ", "").lower()
+
+def _parse_components(dice_str: str) -> List[DiceComponent]:
+    """正規化済みのダイス表記を項のリストに分解する"""
     # 加算と減算で分割
     components = complex_dice_pattern.findall(dice_str)
     if not components:
         return []
-    
+
     # 最初の要素が+で始まっていない場合、+を追加
     if not components[0].startswith('+') and not components[0].startswith('-'):
         components[0] = '+' + components[0]
-    
+
     result = []
     for comp in components:
         sign = 1
@@ -42,26 +72,119 @@ def parse_complex_dice_notation(dice_str: str) -> List[Tuple[int, int, int]]:
             comp = comp[1:]
         elif comp.startswith('+'):
             comp = comp[1:]
-        
-        if 'd' in comp.lower():
+
+        if 'd' in comp:
             # ダイス表記の処理
-            parts = comp.lower().split('d')
+            parts = comp.split('d')
             num_dice = int(parts[0]) if parts[0] else 1
             num_sides = int(parts[1])
-            result.append((sign * num_dice, num_sides, 0))
+            result.append(DiceComponent(sign * num_dice, num_sides, 0))
         else:
             # 単純な数値の処理
-            result.append((0, 0, sign * int(comp)))
-    
+            result.append(DiceComponent(0, 0, sign * int(comp)))
+
     return result
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _compile_normalized(normalized: str) -> Optional[CompiledDiceExpression]:
+    """正規化済みのダイス表記をコンパイルする（LRUキャッシュ付き）"""
+    components = _parse_components(normalized)
+    if not components:
+        return None
+
+    min_total = max_total = 0
+    dice_counts = []
+    sides = []
+    modifiers = []
+    for num_dice, num_sides, modifier in components:
+        if num_sides > 0:
+            count = abs(num_dice)
+            dice_counts.append(count)
+            sides.append(num_sides)
+            # 負のダイスは最小値と最大値が入れ替わる
+            if num_dice < 0:
+                min_total -= count * num_sides
+                max_total -= count
+            else:
+                min_total += count
+                max_total += count * num_sides
+        else:
+            modifiers.append(modifier)
+            min_total += modifier
+            max_total += modifier
+
+    return CompiledDiceExpression(
+        normalized=normalized,
+        components=tuple(components),
+        min_total=min_total,
+        max_total=max_total,
+        min_dice_count=min(dice_counts, default=0),
+        max_dice_count=max(dice_counts, default=0),
+        min_sides=min(sides, default=0),
+        max_sides=max(sides, default=0),
+        min_modifier=min(modifiers, default=0),
+        max_modifier=max(modifiers, default=0)
+    )
+
+def compile_dice_expression(dice_str: str) -> Optional[CompiledDiceExpression]:
+    """
+    ダイス表記をコンパイル済みの式に変換する
+
+    同じ表記（空白・大文字小文字の違いを含む）は一度だけパースされ、
+    以降はキャッシュから返される。
+
+    引数:
+        dice_str: ダイス表記文字列
+
+    戻り値:
+        コンパイル済みの式。無効な表記の場合はNone
+    """
+    return _compile_normalized(normalize_dice_notation(dice_str))
+
+def get_parse_cache_info() -> Dict[str, int]:
+    """
+    パースキャッシュの統計情報を取得する
+
+    戻り値:
+        ヒット数、ミス数、現在のサイズ、最大サイズの辞書
+    """
+    info = _compile_normalized.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize
+    }
+
+def clear_parse_cache():
+    """パースキャッシュと統計情報をクリアする"""
+    _compile_normalized.cache_clear()
+
+def parse_complex_dice_notation(dice_str: str) -> List[Tuple[int, int, int]]:
+    """
+    複雑なダイス表記をパースする
+
+    例:
+        "1d20+2d6+3" -> [(1, 20, 0), (2, 6, 0), (0, 0, 3)]
+
+    引数:
+        dice_str: ダイス表記文字列
+
+    戻り値:
+        (ダイス数, 面数, 修正値) のタプルのリスト
+    """
+    expression = compile_dice_expression(dice_str)
+    if expression is None:
+        return []
+    return list(expression.components)
+
 def validate_dice_notation(dice_str: str) -> Tuple[bool, Optional[str]]:
     """
     ダイス表記が有効かどうかを検証する
-    
+
     引数:
         dice_str: ダイス表記文字列
-        
+
     戻り値:
         (有効かどうか, エラーメッセージ)
     """
@@ -69,18 +192,18 @@ def validate_dice_notation(dice_str: str) -> Tuple[bool, Optional[str]]:
         dice_str = dice_str.strip()
         if not dice_str:
             return False, "ダイス表記が空です"
-            
+
         components = parse_complex_dice_notation(dice_str)
         if not components:
             return False, "無効なダイス表記です"
-            
+
         from ..utils.logger import get_logger
         logger = get_logger()
-        logger.debug(f"ダイス表記パース結果: {components}")
-        
+        logger.debug("ダイス表記パース結果: %s", components)
+
         return True, None
     except Exception as e:
         from ..utils.logger import get_logger
         logger = get_logger()
-        logger.error(f"ダイス表記の検証中にエラー: {e}")
-        return False, f"ダイス表記のパース中にエラーが発生しました: {str(e)}" 
\ No newline at end of file
+        logger.error("ダイス表記の検証中にエラー: %s", e)
+        return False, f"ダイス表記のパース中にエラーが発生しました: {str(e)}"
@@ -0,0 +1,449 @@
+"""
+ダイス式の確率分布を計算するモジュール
+
+分布はモンテカルロ法ではなく、母関数から厳密に計算する。
+ダイスの組の母関数 Π((1 - x^s) / (1 - x))^c は有理関数なので、その係数は項の少ない線形の漸化式を満たし、
+分布全体をO(分布の長さ × 項の数)で計算できる（ダイス1個ずつの畳み込みではダイス数倍かかる）。
+分布の形は面数ごとのダイスの個数だけで決まるため、それをキーにメモ化し、
+負のダイスや修正値は最小値をずらすだけで同じ形を使う。
+"""
+import math
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate, chain, islice, repeat
+from operator import add, sub
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .parser import compile_dice_expression, CompiledDiceExpression, DiceComponent
+from .roller import check_expression_limits
+from config.settings import Settings, get_settings
+
+# キャッシュの最大エントリ数（ギルドをまたいで共有される）
+DICE_DISTRIBUTION_CACHE_SIZE = 64
+EXPRESSION_DISTRIBUTION_CACHE_SIZE = 128
+
+# 未正規化の度数がfloatの範囲を超えないよう、この桁数ごとに正規化する
+_RESCALE_DIGITS = 250
+_RESCALE_LIMIT = 1e250
+
+# 漸化式で一度に扱う面数の種類の上限（漸化式の項の数は 2^(種類+1) 程度まで増える）
+RECURRENCE_MAX_SIDES = 4
+
+# 漸化式でこの間隔未満の項は1つずつ、それ以上の項はブロック単位でまとめて計算する
+_NEAR_SHIFT = 16
+
+class DiceDistribution:
+    """
+    整数値をとる確率分布（不変）
+
+    probabilities[i] は値 offset + i が出る確率
+    """
+    __slots__ = ('offset', 'probabilities', 'mean', 'variance', '_cumulative')
+
+    def __init__(self, offset: int, probabilities: array, mean: float, variance: float):
+        self.offset = offset
+        self.probabilities = probabilities
+        self.mean = mean
+        self.variance = variance
+        self._cumulative = None
+
+    @property
+    def min_value(self) -> int:
+        """取りうる最小値"""
+        return self.offset
+
+    @property
+    def max_value(self) -> int:
+        """取りうる最大値"""
+        return self.offset + len(self.probabilities) - 1
+
+    @property
+    def std_dev(self) -> float:
+        """標準偏差"""
+        return math.sqrt(self.variance)
+
+    @property
+    def mode(self) -> int:
+        """最も出やすい値（複数ある場合は最小のもの）"""
+        probabilities = self.probabilities
+        return self.offset + probabilities.index(max(probabilities))
+
+    @property
+    def cumulative(self) -> array:
+        """累積分布（必要になった時点で一度だけ計算する）"""
+        if self._cumulative is None:
+            self._cumulative = array('d', accumulate(self.probabilities))
+        return self._cumulative
+
+    def probability(self, value: int) -> float:
+        """
+        指定した値が出る確率
+
+        引数:
+            value: 値
+
+        戻り値:
+            P(X = value)
+        """
+        index = value - self.offset
+        if 0 <= index < len(self.probabilities):
+            return self.probabilities[index]
+        return 0.0
+
+    def cdf(self, value: int) -> float:
+        """
+        指定した値以下が出る確率
+
+        引数:
+            value: 値
+
+        戻り値:
+            P(X <= value)
+        """
+        index = value - self.offset
+        if index < 0:
+            return 0.0
+        if index >= len(self.probabilities):
+            return 1.0
+        return min(1.0, self.cumulative[index])
+
+    def at_least(self, value: int) -> float:
+        """
+        指定した値以上が出る確率
+
+        引数:
+            value: 値
+
+        戻り値:
+            P(X >= value)
+        """
+        return max(0.0, 1.0 - self.cdf(value - 1))
+
+    def percentile(self, value: int) -> float:
+        """
+        結果が分布の何パーセンタイルに位置するか
+
+        引数:
+            value: ロール結果
+
+        戻り値:
+            P(X <= value) を百分率で表した値
+        """
+        return self.cdf(value) * 100
+
+    def value_at_percentile(self, percent: float) -> int:
+        """
+        指定したパーセンタイルに対応する値
+
+        引数:
+            percent: パーセンタイル（0～100）
+
+        戻り値:
+            P(X <= 値) が percent% 以上となる最小の値
+        """
+        target = percent / 100
+        index = bisect_left(self.cumulative, target - 1e-12)
+        return self.offset + min(index, len(self.probabilities) - 1)
+
+def _add_die(frequencies: list, num_sides: int) -> list:
+    """
+    度数分布に1～num_sidesの一様なダイスを1個畳み込む
+
+    新しい度数は幅num_sidesの移動和なので、累積和の差分で求める
+    （スケーリングは呼び出し側でまとめて行う）
+    """
+    length = len(frequencies)
+    prefix = list(accumulate(frequencies, initial=0.0))
+    prefix.extend(repeat(prefix[-1], num_sides - 1))
+    lower = chain(repeat(0.0, num_sides - 1), islice(prefix, 0, length))
+    return list(map(sub, islice(prefix, 1, None), lower))
+
+def _add_dice(frequencies: list, num_dice: int, num_sides: int) -> list:
+    """度数分布にnum_dice個のダイスを畳み込み、確率として正規化する"""
+    # floatのオーバーフローを避けるため、一定個数ごとに面数の累乗で割る
+    batch = max(1, int(_RESCALE_DIGITS / math.log10(num_sides)))
+    for i in range(num_dice):
+        frequencies = _add_die(frequencies, num_sides)
+        pending = (i + 1) % batch
+        if pending == 0 or i + 1 == num_dice:
+            scale = float(num_sides) ** -(pending or batch)
+            frequencies = [value * scale for value in frequencies]
+    return frequencies
+
+def _poly_mul(left: Dict[int, int], right: Dict[int, int]) -> Dict[int, int]:
+    """疎な多項式（次数 -> 係数）の積"""
+    product: Dict[int, int] = {}
+    for i, a in left.items():
+        for j, b in right.items():
+            product[i + j] = product.get(i + j, 0) + a * b
+    return {degree: value for degree, value in product.items() if value}
+
+def _shape_recurrence(groups: Tuple[Tuple[int, int], ...]) -> List[Tuple[int, int, int]]:
+    """
+    ダイスの組の度数 g_k が満たす漸化式の係数を求める
+
+    0～s-1の一様なダイスc個の母関数は ((1 - x^s) / (1 - x))^c なので、積 G の対数微分に
+    Q(x) = (1 - x) Π(1 - x^s) を掛けると Q(x)·x·G'(x) = R(x)·G(x) となる多項式 R が得られる。
+    x^k の係数を比べると k·g_k = Σ_i (a_i - b_i·k)·g_{k-i} になる。
+
+    戻り値:
+        (i, a_i, b_i) のリスト（iの昇順）
+    """
+    box = {0: 1}
+    for sides, _ in groups:
+        box = _poly_mul(box, {0: 1, sides: -1})
+    q = _poly_mul(box, {0: 1, 1: -1})
+    r: Dict[int, int] = {}
+    for sides, count in groups:
+        rest = {0: 1}
+        for other, _ in groups:
+            if other != sides:
+                rest = _poly_mul(rest, {0: 1, other: -1})
+        # c·(-s·x^s·(1 - x)·Π_{他}(1 - x^s') + x·Π(1 - x^s))
+        for degree, value in _poly_mul(rest, {sides: -sides * count, sides + 1: sides * count}).items():
+            r[degree] = r.get(degree, 0) + value
+        for degree, value in box.items():
+            r[degree + 1] = r.get(degree + 1, 0) + count * value
+
+    terms = []
+    for i in sorted(set(q) | set(r)):
+        a = r.get(i, 0) + i * q.get(i, 0)
+        b = q.get(i, 0)
+        if i and (a or b):
+            terms.append((i, a, b))
+    return terms
+
+def _recurrence_shape(groups: Tuple[Tuple[int, int], ...]) -> list:
+    """
+    ダイスの組（面数, 個数）の出目-1の合計の分布を漸化式で求める
+
+    分布は中央に対して対称なので、前半だけを計算して折り返す。
+    漸化式の間隔が_NEAR_SHIFT以上の項は、ブロック内の値がすべて計算済みの値だけで決まるため
+    ブロック単位でまとめて足し、間隔の短い項だけを1つずつ計算する。
+    """
+    length = sum(count * (sides - 1) for sides, count in groups) + 1
+    half = (length + 1) // 2
+    terms = _shape_recurrence(groups)
+    # 間隔1の項は (1 - x) の因子から必ず現れる
+    _, a1, b1 = terms[0]
+    near = [term for term in terms[1:] if term[0] < _NEAR_SHIFT]
+    far = [term for term in terms if term[0] >= _NEAR_SHIFT]
+    block = far[0][0] if far else half
+
+    g = [1.0]
+    start = 1
+    while start < half:
+        stop = min(start + block, half)
+        extra = [0.0] * (stop - start)
+        for i, a, b in far:
+            first = max(start, i)
+            if first >= stop:
+                break
+            contributions = [(a - b * k) * value for k, value in zip(range(first, stop), g[first - i:stop - i])]
+            offset = first - start
+            extra[offset:] = map(add, islice(extra, offset, None), contributions)
+        value = g[-1]
+        for k, total in zip(range(start, stop), extra):
+            # 間隔1の項は直前の値だけを使う
+            total += (a1 - b1 * k) * value
+            for i, a, b in near:
+                if i > k:
+                    break
+                total += (a - b * k) * g[k - i]
+            value = total / k
+            g.append(value)
+            if value > _RESCALE_LIMIT:
+                # 線形の漸化式なので全体を同じ倍率で縮めてよい
+                g = [x / _RESCALE_LIMIT for x in g]
+                extra[k - start + 1:] = [x / _RESCALE_LIMIT for x in islice(extra, k - start + 1, None)]
+                value = g[-1]
+        start = stop
+
+    g.extend(reversed(g[:length - half]))
+    # 値はすべて正なので、桁の離れた値が多くても単純な和で十分な精度になる（math.fsumより桁違いに速い）
+    scale = 1.0 / sum(g)
+    return [value * scale for value in g]
+
+@lru_cache(maxsize=DICE_DISTRIBUTION_CACHE_SIZE)
+def _dice_shape(groups: Tuple[Tuple[int, int], ...]) -> array:
+    """
+    ダイスの組の出目-1の合計の分布（ダイスの組ごとにメモ化される）
+
+    引数:
+        groups: (面数, 個数) のタプル（面数の昇順、面数は2以上）
+
+    戻り値:
+        値 0, 1, 2, ... の確率
+    """
+    # 幅の大きい組から漸化式で求め、残りの組はダイス1個ずつ畳み込む
+    ordered = sorted(groups, key=lambda group: group[1] * (group[0] - 1), reverse=True)
+    probabilities = _recurrence_shape(tuple(ordered[:RECURRENCE_MAX_SIDES]))
+    for sides, count in ordered[RECURRENCE_MAX_SIDES:]:
+        probabilities = _add_dice(probabilities, count, sides)
+    return array('d', probabilities)
+
+def _dice_groups(components: Tuple[DiceComponent, ...]) -> Tuple[Tuple[int, int], ...]:
+    """式の項を面数ごとのダイスの個数にまとめる（1面のダイスと修正値は分布の形に影響しない）"""
+    counts: Dict[int, int] = {}
+    for num_dice, num_sides, _ in components:
+        if num_sides > 1:
+            counts[num_sides] = counts.get(num_sides, 0) + abs(num_dice)
+    return tuple(sorted(counts.items()))
+
+def distribution_cost(components: Tuple[DiceComponent, ...]) -> int:
+    """
+    ダイス式の分布の計算コストを見積もる
+
+    漸化式は分布の長さ × 項の数に比例し、漸化式に含めない組はダイス1個ごとに分布の長さに比例する
+
+    引数:
+        components: ダイス式の項
+
+    戻り値:
+        計算する要素数の見積もり
+    """
+    groups = sorted(_dice_groups(components), key=lambda group: group[1] * (group[0] - 1), reverse=True)
+    length = sum(count * (sides - 1) for sides, count in groups) + 1
+    terms = 2 ** (min(len(groups), RECURRENCE_MAX_SIDES) + 1)
+    return length * terms + length * sum(count for _, count in groups[RECURRENCE_MAX_SIDES:])
+
+def dice_sum_distribution(num_dice: int, num_sides: int) -> DiceDistribution:
+    """
+    num_dice個のnum_sides面ダイスの合計の分布
+
+    (num_dice, num_sides) ごとにメモ化される
+
+    引数:
+        num_dice: ダイスの数（1以上）
+        num_sides: ダイスの面数（1以上）
+
+    戻り値:
+        合計値の確率分布
+    """
+    probabilities = _dice_shape(((num_sides, num_dice),)) if num_sides > 1 else array('d', [1.0])
+    mean = num_dice * (num_sides + 1) / 2
+    variance = num_dice * (num_sides * num_sides - 1) / 12
+    return DiceDistribution(num_dice, probabilities, mean, variance)
+
+def expression_moments(components: Tuple[DiceComponent, ...]) -> Tuple[float, float]:
+    """
+    ダイス式の期待値と分散を閉じた式で求める
+
+    引数:
+        components: ダイス式の項
+
+    戻り値:
+        (期待値, 分散) のタプル
+    """
+    mean = 0.0
+    variance = 0.0
+    for num_dice, num_sides, modifier in components:
+        if num_sides > 0:
+            mean += num_dice * (num_sides + 1) / 2
+            variance += abs(num_dice) * (num_sides * num_sides - 1) / 12
+        else:
+            mean += modifier
+    return mean, variance
+
+@lru_cache(maxsize=EXPRESSION_DISTRIBUTION_CACHE_SIZE)
+def _components_distribution(components: Tuple[DiceComponent, ...]) -> DiceDistribution:
+    """項のタプルから式全体の分布を計算する（LRUキャッシュ付き）"""
+    mean, variance = expression_moments(components)
+    # 正のダイスは最小値がダイス数、負のダイスは -ダイス数 × 面数
+    offset = 0
+    for num_dice, num_sides, modifier in components:
+        if num_sides == 0:
+            offset += modifier
+        else:
+            offset += num_dice if num_dice > 0 else num_dice * num_sides
+
+    groups = _dice_groups(components)
+    # 一様な分布は左右対称なので、負のダイスも正のダイスと同じ形の分布になる
+    probabilities = _dice_shape(groups) if groups else array('d', [1.0])
+    return DiceDistribution(offset, probabilities, mean, variance)
+
+def expression_distribution(expression: CompiledDiceExpression) -> DiceDistribution:
+    """
+    コンパイル済みのダイス式の結果の分布
+
+    引数:
+        expression: コンパイル済みの式
+
+    戻り値:
+        式の結果の確率分布
+    """
+    return _components_distribution(expression.components)
+
+def get_distribution_cache_info() -> Dict[str, Dict[str, int]]:
+    """
+    分布キャッシュの統計情報を取得する
+
+    戻り値:
+        キャッシュごとのヒット数、ミス数、現在のサイズ、最大サイズの辞書
+    """
+    stats = {}
+    for name, cached in (("dice", _dice_shape), ("expression", _components_distribution)):
+        info = cached.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+    return stats
+
+def calculate_dice_stats(
+    dice_str: Union[str, CompiledDiceExpression],
+    target: Optional[int] = None,
+    settings: Optional[Settings] = None
+) -> Dict[str, Any]:
+    """
+    ダイス式の統計情報を計算する
+
+    引数:
+        dice_str: ダイス表記文字列、またはコンパイル済みの式
+        target: 確率を求めたい結果（省略可能）
+        settings: 設定のスナップショット（ギルド別の制限を適用する場合に指定）
+
+    戻り値:
+        分布と統計量を含む辞書
+    """
+    if isinstance(dice_str, CompiledDiceExpression):
+        expression = dice_str
+        dice_str = expression.normalized
+    else:
+        expression = compile_dice_expression(dice_str)
+    if expression is None:
+        return {"error": "無効なダイス表記です"}
+
+    error = check_expression_limits(expression, settings)
+    if error:
+        return {"error": error}
+    # 種類の多いダイスの組み合わせは計算に時間がかかるため、計算する前に断る
+    if distribution_cost(expression.components) > (settings or get_settings()).stats_max_cost:
+        return {"error": "計算量が大きすぎます。ダイスの種類か数を減らしてください"}
+
+    distribution = expression_distribution(expression)
+    stats = {
+        "input": dice_str,
+        "distribution": distribution,
+        "min": distribution.min_value,
+        "max": distribution.max_value,
+        "mean": distribution.mean,
+        "variance": distribution.variance,
+        "std_dev": distribution.std_dev,
+        "mode": distribution.mode,
+        "percentiles": {p: distribution.value_at_percentile(p) for p in (5, 25, 50, 75, 95)}
+    }
+
+    if target is not None:
+        stats["target"] = {
+            "value": target,
+            "equal": distribution.probability(target),
+            "at_most": distribution.cdf(target),
+            "at_least": distribution.at_least(target),
+            "percentile": distribution.percentile(target)
+        }
+
+    return stats
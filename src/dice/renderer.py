@@ -1,24 +1,147 @@
 """
 ダイス結果の表示ロジックを提供するモジュール
+
+Embedの色・フッター・見出しはモジュール読み込み時に一度だけ作り、ロールごとには作らない。
+出目のフィールドはDiscordのembedの上限（フィールド1024文字、全体6000文字、25フィールド）に
+収まるよう、作成前に各項へ文字数を割り当て、大きなダイスプールは出目ごとの個数や先頭の出目だけにまとめる。
 """
 import discord
 import datetime
-from typing import Dict, Any
-from discord.ext import commands
+from typing import Dict, Any, Optional
 
-import sys
-import os
+from src.utils.logger import get_logger
+from src.dice.result import RollResult, RollRecord, DiceTerm
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
+logger = get_logger()
 
-from dice.src.utils.logger import get_logger
+# Discordのembedの上限（文字数）
+TITLE_LIMIT = 256
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FOOTER_LIMIT = 2048
+EMBED_TOTAL_LIMIT = 6000
+MAX_FIELDS = 25
 
-logger = get_logger()
+# 出目をヒストグラム（出目ごとの個数）にまとめるダイス数の下限と、面数の上限
+HISTOGRAM_MIN_DICE = 20
+HISTOGRAM_MAX_SIDES = 20
+
+class _Style:
+    """結果の種類ごとに共通のEmbedの色とフッター（モジュール読み込み時に一度だけ作る）"""
+    __slots__ = ('color', 'footer')
+
+    def __init__(self, color: discord.Color, footer: Optional[str]):
+        self.color = color
+        self.footer = footer
+
+_STYLE_NORMAL = _Style(discord.Color.blue(), None)
+_STYLE_CRITICAL = _Style(discord.Color.gold(), "🎉 クリティカル！ 大成功です！")
+_STYLE_FUMBLE = _Style(discord.Color.dark_red(), "💥 ファンブル！ 大失敗です！")
+_COLOR_MATCHED = discord.Color.green()
+_COLOR_MISMATCHED = discord.Color.red()
+
+_ROLL_TITLE = "🎲 ダイスロール: "
+_AUDIT_TITLE = "🔍 ロールの検証: "
+_MODIFIER_NAME = "修正値"
+_TOTAL_NAME = "最終結果"
+_OMITTED_NAME = "その他の項"
+_SUM_ONLY_VALUE = "合計"
+
+def _truncate(text: str, limit: int) -> str:
+    """上限を超える文字列を末尾を省略して切り詰める"""
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def _format_histogram(term: DiceTerm) -> str:
+    """出目ごとの個数（例: "1×3 2×5 …"）"""
+    rolls = term.rolls
+    return " ".join(
+        f"{face}×{count}" for face, count in ((face, rolls.count(face)) for face in range(1, term.sides + 1)) if count
+    )
+
+def _format_rolls(term: DiceTerm, budget: int) -> str:
+    """
+    ダイス項のフィールドの値を作る
+    
+    面数の少ないダイスが多い場合は出目ごとの個数にまとめ、それ以外は出目を並べる。
+    上限に収まらない場合は先頭の出目だけを表示する。合計だけを振った項は合計だけを表示する。
+    
+    引数:
+        term: ダイス項
+        budget: 値の最大文字数
+    
+    戻り値:
+        フィールドの値
+    """
+    rolls = term.rolls
+    suffix = f" = **{term.total}**"
+    if len(rolls) != abs(term.count):
+        # 合計だけを振った項は出目を持たない
+        return f"{_SUM_ONLY_VALUE}{suffix}"
+    if len(rolls) >= HISTOGRAM_MIN_DICE and term.sides <= HISTOGRAM_MAX_SIDES:
+        text = f"[{_format_histogram(term)}]{suffix}"
+        if len(text) <= budget:
+            return text
+    
+    # 全ての出目を並べても収まることが桁数から分かる場合は、そのまま連結する
+    if len(rolls) * (len(str(term.sides)) + 2) + len(suffix) + 2 <= budget:
+        return f"[{', '.join(map(str, rolls))}]{suffix}"
+    
+    # 収まる分だけを先頭から並べる（省略表示の分の余白を残す）
+    reserve = len(suffix) + len(f", …他{len(rolls)}個]") + 1
+    parts = []
+    length = 1
+    for value in rolls:
+        text = str(value)
+        if length + len(text) + 2 > budget - reserve:
+            break
+        parts.append(text)
+        length += len(text) + 2
+    if len(parts) == len(rolls):
+        return f"[{', '.join(parts)}]{suffix}"
+    return f"[{', '.join(parts)}, …他{len(rolls) - len(parts)}個]{suffix}"
 
-def create_dice_embed(interaction: discord.Interaction, result: Dict[str, Any]) -> discord.Embed:
+def _add_term_fields(embed: discord.Embed, result: RollResult, used: int, reserved_fields: int = 1):
+    """
+    各項の出目と合計をEmbedのフィールドに追加する
+    
+    フィールド数と全体の文字数の上限に収まるよう、あらかじめ各項に使える文字数を割り当てる
+    
+    引数:
+        embed: 追加先のEmbed
+        result: ダイスロール結果
+        used: タイトル・説明・フッターで使った文字数
+        reserved_fields: 後から追加するフィールドの数
+    """
+    terms = result.terms
+    available = MAX_FIELDS - reserved_fields
+    omitted = ()
+    if len(terms) > available:
+        # 収まらない項は合計だけをまとめて表示する
+        omitted = terms[available - 1:]
+        terms = terms[:available - 1]
+    
+    # 後から追加するフィールドに64文字、各項の名前と修正値に32文字を残し、
+    # 残りをダイス項で分け合う
+    remaining = EMBED_TOTAL_LIMIT - used - 64 * (reserved_fields + (1 if omitted else 0)) - 32 * len(terms)
+    dice_left = sum(1 for term in terms if term.type == "dice")
+    
+    for term in terms:
+        if term.type == "dice":
+            value = _format_rolls(term, max(0, min(FIELD_VALUE_LIMIT, remaining // dice_left)))
+            remaining -= len(value)
+            dice_left -= 1
+            embed.add_field(name=term.notation, value=value, inline=False)
+        else:
+            embed.add_field(name=_MODIFIER_NAME, value=f"{term.value:+}", inline=False)
+    
+    if omitted:
+        embed.add_field(
+            name=_OMITTED_NAME,
+            value=f"{len(omitted)}項の合計 = **{sum(term.total for term in omitted)}**",
+            inline=False
+        )
+
+def create_dice_embed(interaction: discord.Interaction, result: RollResult) -> discord.Embed:
     """
     ダイスロール結果用のEmbedsを作成する
     
@@ -27,60 +150,45 @@ def create_dice_embed(interaction: discord.Interaction, result: Dict[str, Any])
         result: ダイスロール結果
         
     戻り値:
-        Embedオブジェクト
+        Embedオブジェクト（Discordのembedの上限に収まる）
     """
     try:
-        # ロール結果から色を決定
-        is_critical = any(detail.get("is_critical", False) for detail in result["details"] if detail["type"] == "dice")
-        is_fumble = any(detail.get("is_fumble", False) for detail in result["details"] if detail["type"] == "dice")
-        
-        # Embedの色を決定
-        if is_critical:
-            color = discord.Color.gold()
-        elif is_fumble:
-            color = discord.Color.dark_red()
+        # ロール結果から色とフッターを決定
+        if result.is_critical:
+            style = _STYLE_CRITICAL
+        elif result.is_fumble:
+            style = _STYLE_FUMBLE
         else:
-            color = discord.Color.blue()
+            style = _STYLE_NORMAL
         
         # Embedを作成
+        title = _truncate(_ROLL_TITLE + result.input, TITLE_LIMIT)
+        description = f"{interaction.user.display_name}さんのロール結果"
         embed = discord.Embed(
-            title=f"🎲 ダイスロール: {result['input']}",
-            description=f"{interaction.user.display_name}さんのロール結果",
-            color=color,
+            title=title,
+            description=description,
+            color=style.color,
             timestamp=datetime.datetime.now()
         )
         
         # アイコンを設定
         embed.set_thumbnail(url=interaction.user.display_avatar.url)
         
+        # クリティカル/ファンブルの場合のフッター
+        used = len(title) + len(description)
+        if style.footer:
+            embed.set_footer(text=style.footer)
+            used += len(style.footer)
+        
         # 各ダイスの詳細を表示
-        for detail in result["details"]:
-            if detail["type"] == "dice":
-                rolls_str = ", ".join(map(str, detail["rolls"]))
-                embed.add_field(
-                    name=f"{detail['notation']}",
-                    value=f"[{rolls_str}] = **{detail['sum']}**",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="修正値",
-                    value=f"{detail['value']:+}",
-                    inline=False
-                )
+        _add_term_fields(embed, result, used)
         
         # 最終結果
-        embed.add_field(name="最終結果", value=f"**{result['result']}**", inline=False)
-        
-        # クリティカル/ファンブルの場合のフッター
-        if is_critical:
-            embed.set_footer(text="🎉 クリティカル！ 大成功です！")
-        elif is_fumble:
-            embed.set_footer(text="💥 ファンブル！ 大失敗です！")
+        embed.add_field(name=_TOTAL_NAME, value=f"**{result.total}**", inline=False)
         
         return embed
     except Exception as e:
-        logger.error(f"Embed作成中にエラー: {e}")
+        logger.error("Embed作成中にエラー: %s", e)
         
         # エラー時の簡易Embed
         embed = discord.Embed(
@@ -88,4 +196,139 @@ def create_dice_embed(interaction: discord.Interaction, result: Dict[str, Any])
             description="結果の表示中にエラーが発生しました",
             color=discord.Color.red()
         )
-        return embed 
\ No newline at end of file
+        return embed 
+
+def create_audit_embed(display_name: str, record: RollRecord, result: RollResult) -> discord.Embed:
+    """
+    履歴のロールをシードから再生成した結果のEmbedを作成する
+    
+    引数:
+        display_name: ロールしたユーザーの表示名
+        record: 履歴の記録
+        result: replay_roll で再生成した結果
+        
+    戻り値:
+        Embedオブジェクト
+    """
+    matched = result.total == record.total
+    title = _truncate(_AUDIT_TITLE + record.input, TITLE_LIMIT)
+    description = f"{display_name}さんのロールをシードから再生成しました"
+    footer = f"シード: {record.seed:016x}"
+    embed = discord.Embed(
+        title=title,
+        description=description,
+        color=_COLOR_MATCHED if matched else _COLOR_MISMATCHED
+    )
+    embed.set_footer(text=footer)
+    
+    _add_term_fields(embed, result, len(title) + len(description) + len(footer), reserved_fields=2)
+    embed.add_field(name=_TOTAL_NAME, value=f"**{result.total}**", inline=False)
+    
+    if matched:
+        verdict = f"✅ 記録された結果 {record.total} と一致しました"
+    else:
+        verdict = f"⚠️ 記録された結果 {record.total} と一致しません"
+    embed.add_field(name="検証", value=verdict, inline=False)
+    return embed
+
+def _format_distribution_chart(distribution, max_rows: int = 10, bar_width: int = 16) -> str:
+    """
+    分布を簡易的な棒グラフの文字列にする
+    
+    値の種類が多い場合は、両端0.5%を除いた範囲を等幅の区間にまとめる
+    """
+    low = distribution.value_at_percentile(0.5)
+    high = distribution.value_at_percentile(99.5)
+    width = max(1, -(-(high - low + 1) // max_rows))
+    
+    rows = []
+    for start in range(low, high + 1, width):
+        end = min(start + width - 1, high)
+        probability = distribution.cdf(end) - distribution.cdf(start - 1)
+        label = f"{start}" if start == end else f"{start}～{end}"
+        rows.append((label, probability))
+    
+    peak = max(probability for _, probability in rows) or 1.0
+    label_width = max(len(label) for label, _ in rows)
+    lines = [
+        f"{label:>{label_width}} {'█' * max(1, round(bar_width * probability / peak)) if probability > 0 else ''} {probability:.1%}"
+        for label, probability in rows
+    ]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+def create_stats_embed(stats: Dict[str, Any]) -> discord.Embed:
+    """
+    ダイス式の確率分布用のEmbedを作成する
+    
+    引数:
+        stats: calculate_dice_statsの結果
+        
+    戻り値:
+        Embedオブジェクト
+    """
+    distribution = stats["distribution"]
+    embed = discord.Embed(
+        title=_truncate(f"📊 確率分布: {stats['input']}", TITLE_LIMIT),
+        description=f"範囲: **{stats['min']}～{stats['max']}**",
+        color=discord.Color.teal()
+    )
+    
+    embed.add_field(name="期待値", value=f"{stats['mean']:.2f}", inline=True)
+    embed.add_field(name="標準偏差", value=f"{stats['std_dev']:.2f}", inline=True)
+    embed.add_field(name="最頻値", value=f"{stats['mode']}", inline=True)
+    
+    percentiles = " / ".join(f"{p}%: **{value}**" for p, value in stats["percentiles"].items())
+    embed.add_field(name="パーセンタイル", value=percentiles, inline=False)
+    
+    if "target" in stats:
+        target = stats["target"]
+        embed.add_field(
+            name=f"結果 {target['value']} について",
+            value=(
+                f"ちょうど: {target['equal']:.2%}\n"
+                f"以上: {target['at_least']:.2%}\n"
+                f"以下: {target['at_most']:.2%}（{target['percentile']:.1f}パーセンタイル）"
+            ),
+            inline=False
+        )
+    
+    embed.add_field(name="分布", value=_format_distribution_chart(distribution), inline=False)
+    return embed
+
+def create_simulation_embed(dice_str: str, result) -> discord.Embed:
+    """
+    モンテカルロシミュレーションの途中経過・結果用のEmbedを作成する
+    
+    引数:
+        dice_str: ダイス式
+        result: シミュレーションの途中経過・結果（SimulationResult）
+        
+    戻り値:
+        Embedオブジェクト
+    """
+    if result.cancelled:
+        status, color = "⏹️ 中止しました", discord.Color.dark_grey()
+    elif result.done:
+        status, color = "✅ 完了しました", discord.Color.green()
+    else:
+        status, color = "⏳ 実行中…", discord.Color.teal()
+    
+    progress = result.trials / result.requested if result.requested else 0.0
+    embed = discord.Embed(
+        title=_truncate(f"🧪 シミュレーション: {dice_str}", TITLE_LIMIT),
+        description=f"{status}\n試行: **{result.trials:,}** / {result.requested:,}（{progress:.0%}）",
+        color=color
+    )
+    embed.set_footer(text=f"{result.throughput:,.0f} 回/秒・{result.elapsed:.1f}秒")
+    
+    distribution = result.to_distribution()
+    if distribution is None:
+        return embed
+    
+    embed.add_field(name="平均", value=f"{distribution.mean:.3f}", inline=True)
+    embed.add_field(name="標準偏差", value=f"{distribution.std_dev:.3f}", inline=True)
+    embed.add_field(name="範囲（観測）", value=f"{distribution.min_value}～{distribution.max_value}", inline=True)
+    percentiles = " / ".join(f"{p}%: **{distribution.value_at_percentile(p)}**" for p in (5, 25, 50, 75, 95))
+    embed.add_field(name="パーセンタイル", value=percentiles, inline=False)
+    embed.add_field(name="分布", value=_format_distribution_chart(distribution), inline=False)
+    return embed
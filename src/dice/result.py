@@ -0,0 +1,257 @@
+"""
+ダイスロール結果のデータ構造を提供するモジュール
+
+結果は辞書ではなく__slots__を持つ軽量なクラスで表し、出目はarrayで保持する。
+表示用の文字列は必要になった時点で作る。
+履歴には出目を持たない RollRecord（ダイス式・シード・合計）を保存し、出目はシードから再生成する。
+"""
+from array import array
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+def rolls_typecode(num_sides: int) -> str:
+    """
+    出目を保持するarrayの型コードを返す
+
+    引数:
+        num_sides: ダイスの面数
+
+    戻り値:
+        255面以下は'B'（1バイト）、それ以上は'H'（2バイト）
+    """
+    return 'B' if num_sides < 256 else 'H'
+
+class DiceTerm:
+    """ダイス項の結果（例: 2d6 の出目と合計）"""
+    __slots__ = ('count', 'sides', 'rolls', 'total', 'is_critical', 'is_fumble')
+
+    type = "dice"
+
+    def __init__(self, count: int, sides: int, rolls: array, total: int, is_critical: bool, is_fumble: bool):
+        """
+        引数:
+            count: ダイスの数（負の場合は減算するダイス）
+            sides: ダイスの面数
+            rolls: 各ダイスの出目
+            total: 符号を反映した出目の合計
+            is_critical: 全ての出目が最大値かどうか
+            is_fumble: 全ての出目が1かどうか
+        """
+        self.count = count
+        self.sides = sides
+        self.rolls = rolls
+        self.total = total
+        self.is_critical = is_critical
+        self.is_fumble = is_fumble
+
+    @property
+    def negative(self) -> bool:
+        """減算するダイスかどうか"""
+        return self.count < 0
+
+    @property
+    def notation(self) -> str:
+        """ダイス表記（例: "2d6", "-1d4"）"""
+        return f"{'-' if self.count < 0 else ''}{abs(self.count)}d{self.sides}"
+
+    def __repr__(self) -> str:
+        return f"DiceTerm({self.notation}, rolls={list(self.rolls)}, total={self.total})"
+
+class ModifierTerm:
+    """修正値の項"""
+    __slots__ = ('value',)
+
+    type = "modifier"
+
+    def __init__(self, value: int):
+        """
+        引数:
+            value: 修正値
+        """
+        self.value = value
+
+    @property
+    def total(self) -> int:
+        """合計への寄与"""
+        return self.value
+
+    def __repr__(self) -> str:
+        return f"ModifierTerm({self.value:+})"
+
+Term = Union[DiceTerm, ModifierTerm]
+
+class RollResult:
+    """ダイスロール全体の結果"""
+    __slots__ = ('input', 'terms', 'total', 'error', 'seed')
+
+    def __init__(
+        self,
+        input: str,
+        terms: Tuple[Term, ...],
+        total: int,
+        error: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        引数:
+            input: 入力されたダイス表記
+            terms: 各項の結果
+            total: 最終結果
+            error: エラーメッセージ（エラー時のみ）
+            seed: 出目の生成に使ったシード（再生成できる場合のみ）
+        """
+        self.input = input
+        self.terms = terms
+        self.total = total
+        self.error = error
+        self.seed = seed
+
+    @classmethod
+    def failure(cls, message: str) -> "RollResult":
+        """
+        エラーを表す結果を作成する
+
+        引数:
+            message: エラーメッセージ
+
+        戻り値:
+            errorが設定された結果
+        """
+        return cls("", (), 0, message)
+
+    @property
+    def dice_terms(self) -> List[DiceTerm]:
+        """ダイス項の結果のみのリスト"""
+        return [term for term in self.terms if term.type == "dice"]
+
+    @property
+    def is_critical(self) -> bool:
+        """いずれかのダイス項がクリティカルかどうか"""
+        return any(term.is_critical for term in self.terms if term.type == "dice")
+
+    @property
+    def is_fumble(self) -> bool:
+        """いずれかのダイス項がファンブルかどうか"""
+        return any(term.is_fumble for term in self.terms if term.type == "dice")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        保存用の辞書に変換する
+
+        戻り値:
+            JSONに変換可能な辞書
+        """
+        terms = []
+        for term in self.terms:
+            if term.type == "dice":
+                terms.append({"count": term.count, "sides": term.sides, "rolls": list(term.rolls)})
+            else:
+                terms.append({"modifier": term.value})
+        data = {"input": self.input, "result": self.total, "terms": terms}
+        if self.seed is not None:
+            data["seed"] = self.seed
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollResult":
+        """
+        to_dictで変換した辞書から結果を復元する
+
+        引数:
+            data: 保存用の辞書
+
+        戻り値:
+            復元した結果
+        """
+        terms = []
+        for term in data["terms"]:
+            if "modifier" in term:
+                terms.append(ModifierTerm(term["modifier"]))
+                continue
+            count, sides = term["count"], term["sides"]
+            rolls = array(rolls_typecode(sides), term["rolls"])
+            total = sum(rolls)
+            terms.append(DiceTerm(
+                count,
+                sides,
+                rolls,
+                -total if count < 0 else total,
+                len(rolls) > 0 and min(rolls) == sides,
+                len(rolls) > 0 and max(rolls) == 1
+            ))
+        return cls(data["input"], tuple(terms), data["result"], seed=data.get("seed"))
+
+    def __repr__(self) -> str:
+        if self.error:
+            return f"RollResult(error={self.error!r})"
+        return f"RollResult({self.input!r}, terms={list(self.terms)}, total={self.total})"
+
+class RollRecord:
+    """
+    履歴に保存するロール結果
+
+    出目は保持せず、ダイス式とシードから roller.replay_roll で再生成する
+    """
+    __slots__ = ('input', 'seed', 'total', 'is_critical', 'is_fumble')
+
+    def __init__(self, input: str, seed: Optional[int], total: int, is_critical: bool = False, is_fumble: bool = False):
+        """
+        引数:
+            input: 入力されたダイス表記
+            seed: 出目の生成に使ったシード（Noneの場合は再生成できない）
+            total: 最終結果
+            is_critical: いずれかのダイス項がクリティカルだったかどうか
+            is_fumble: いずれかのダイス項がファンブルだったかどうか
+        """
+        self.input = input
+        self.seed = seed
+        self.total = total
+        self.is_critical = is_critical
+        self.is_fumble = is_fumble
+
+    @classmethod
+    def from_result(cls, result: RollResult) -> "RollRecord":
+        """
+        ロール結果から履歴用の記録を作成する
+
+        引数:
+            result: ロール結果
+
+        戻り値:
+            出目を持たない記録
+        """
+        return cls(result.input, result.seed, result.total, result.is_critical, result.is_fumble)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        保存用の辞書に変換する
+
+        戻り値:
+            JSONに変換可能な辞書
+        """
+        data = {"input": self.input, "seed": self.seed, "result": self.total}
+        if self.is_critical:
+            data["critical"] = True
+        if self.is_fumble:
+            data["fumble"] = True
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollRecord":
+        """
+        to_dictで変換した辞書から記録を復元する
+
+        出目を含む以前の形式（RollResult.to_dict）の辞書も受け付ける
+
+        引数:
+            data: 保存用の辞書
+
+        戻り値:
+            復元した記録
+        """
+        if "terms" in data:
+            return cls.from_result(RollResult.from_dict(data))
+        return cls(data["input"], data.get("seed"), data["result"], data.get("critical", False), data.get("fumble", False))
+
+    def __repr__(self) -> str:
+        seed = "None" if self.seed is None else f"{self.seed:016x}"
+        return f"RollRecord({self.input!r}, seed={seed}, total={self.total})"
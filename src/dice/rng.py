@@ -0,0 +1,105 @@
+"""
+ロールごとの乱数生成器を提供するモジュール
+
+各ロールはマスターキーとインタラクションIDから導いた64ビットのシードで初期化した
+専用の乱数生成器で振る。履歴にはダイス式とシードだけを保存し、出目は必要な時に再生成する。
+モジュール共通の random の状態を共有しないため、ワーカースレッドでも並列にロールできる。
+"""
+import hashlib
+import os
+import random
+import secrets
+import struct
+import threading
+from typing import Optional
+
+from config.settings import get_settings
+
+_master_key: Optional[bytes] = None
+_key_lock = threading.Lock()
+
+def _load_or_create_key_file(path: str) -> bytes:
+    """
+    キーファイルを読み込む（存在しない場合は作成する）
+
+    引数:
+        path: キーファイルのパス
+
+    戻り値:
+        マスターキー
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return bytes.fromhex(f.read().strip())
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    key = secrets.token_bytes(32)
+    # 他のユーザーから読めないように作成する
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # 別のプロセスが先に作成した場合はそのキーを使う
+        with open(path, encoding='utf-8') as f:
+            return bytes.fromhex(f.read().strip())
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(key.hex())
+    return key
+
+def get_master_key() -> bytes:
+    """
+    シードの導出に使うマスターキーを取得する
+
+    ROLL_SEED_KEY が設定されていればそれを使い、なければキーファイル（ROLL_SEED_KEY_PATH）から
+    読み込む。キーが変わると過去の履歴の出目を再現できないため、再起動しても同じキーを使う。
+
+    戻り値:
+        マスターキー（32バイト）
+    """
+    global _master_key
+    if _master_key is None:
+        with _key_lock:
+            if _master_key is None:
+                settings = get_settings()
+                if settings.roll_seed_key:
+                    _master_key = hashlib.blake2b(settings.roll_seed_key.encode('utf-8'), digest_size=32).digest()
+                else:
+                    _master_key = _load_or_create_key_file(settings.roll_seed_key_path)
+    return _master_key
+
+def derive_seed(interaction_id: int, sequence: int = 0) -> int:
+    """
+    インタラクションIDから64ビットのシードを導出する
+
+    マスターキーを鍵にしたBLAKE2bで導出するため、キーを知らなければIDから出目を予測できない。
+
+    引数:
+        interaction_id: インタラクションID
+        sequence: 同じインタラクションで複数回振る場合の通し番号
+
+    戻り値:
+        64ビットのシード
+    """
+    digest = hashlib.blake2b(
+        struct.pack('<QQ', interaction_id, sequence),
+        digest_size=8,
+        key=get_master_key()
+    ).digest()
+    return int.from_bytes(digest, 'little')
+
+def create_rng(seed: int) -> random.Random:
+    """
+    シードから乱数生成器を作成する
+
+    引数:
+        seed: 64ビットのシード
+
+    戻り値:
+        シードで初期化した乱数生成器
+    """
+    return random.Random(seed)
+
+def new_seed() -> int:
+    """インタラクションに紐付かないロール用のランダムな64ビットのシード"""
+    return secrets.randbits(64)
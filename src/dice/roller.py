@@ -2,112 +2,215 @@
 ダイスロールの実行ロジックを提供するモジュール
 """
 import random
-import sys
-import os
-from typing import List, Dict, Any, Tuple
+from array import array
+from typing import Union, Optional
 
-# パスを追加して設定モジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
-from dice.config.settings import get_config
-from .parser import parse_complex_dice_notation
+from src.utils.logger import get_logger
+from config.settings import get_settings, Settings
+from .parser import compile_dice_expression, CompiledDiceExpression
+from .result import RollResult, RollRecord, DiceTerm, ModifierTerm, rolls_typecode
+from .rng import create_rng
 
 logger = get_logger()
 
-def roll_dice(num_dice: int, num_sides: int) -> List[int]:
+# 1回の乱数生成でまとめて振るダイス数の下限（これ未満は1個ずつ振る方が速い）
+BULK_ROLL_THRESHOLD = 4
+
+def roll_dice(num_dice: int, num_sides: int, rng: Optional[random.Random] = None) -> array:
     """
     指定された数と面数のダイスを振る
     
+    ダイスが多い場合は、getrandbits でブロック単位の乱数を一度に生成し、
+    偏りが出る範囲の値を棄却（リジェクションサンプリング）して出目に変換する。
+    同じシードの乱数生成器からは常に同じ出目が得られる（履歴の再生成で使う）。
+    
     引数:
         num_dice: ダイスの数
         num_sides: ダイスの面数
+        rng: 乱数生成器（省略時はモジュール共通の random）
+        
+    戻り値:
+        各ダイスの出目の配列（255面以下は'B'、それ以上は'H'のarray）
+    """
+    if rng is None:
+        rng = random
+    count = abs(num_dice)
+    typecode = rolls_typecode(num_sides)
+    rolls = array(typecode)
+    
+    if count < BULK_ROLL_THRESHOLD:
+        for _ in range(count):
+            rolls.append(rng.randrange(num_sides) + 1)
+        return rolls
+    
+    width = 8 if typecode == 'B' else 16
+    span = 1 << width
+    # limit未満の値だけを使えば各出目の確率が等しくなる
+    limit = span - span % num_sides
+    
+    while len(rolls) < count:
+        need = count - len(rolls)
+        # 棄却される分を見込んで多めに生成する
+        block = need + (need * (span - limit)) // limit + 1
+        raw = array(typecode, rng.getrandbits(width * block).to_bytes(block * width // 8, 'little'))
+        rolls.extend([value % num_sides + 1 for value in raw if value < limit][:need])
+    return rolls
+
+def check_expression_limits(expression: CompiledDiceExpression, settings: Optional[Settings] = None) -> Optional[str]:
+    """
+    コンパイル済みの式が設定された制限内にあるかを検証する
+    
+    引数:
+        expression: コンパイル済みの式
+        settings: 設定のスナップショット（省略時は現在の設定）
         
     戻り値:
-        各ダイスの出目のリスト
+        制限を超えている場合はエラーメッセージ、問題なければNone
+    """
+    if settings is None:
+        settings = get_settings()
+    
+    if expression.has_dice:
+        min_dice, max_dice = settings.min_dice_count, settings.max_dice_count
+        min_sides, max_sides = settings.min_dice_sides, settings.max_dice_sides
+        
+        if not (min_dice <= expression.min_dice_count and expression.max_dice_count <= max_dice):
+            return f"ダイスの数は{min_dice}から{max_dice}の間で指定してください"
+        if not (min_sides <= expression.min_sides and expression.max_sides <= max_sides):
+            return f"ダイスの面は{min_sides}から{max_sides}の間で指定してください"
+    
+    min_mod, max_mod = settings.min_modifier, settings.max_modifier
+    if not (min_mod <= expression.min_modifier and expression.max_modifier <= max_mod):
+        return f"修正値は{min_mod}から{max_mod}の間で指定してください"
+    return None
+
+def _roll_expression(
+    expression: CompiledDiceExpression,
+    dice_str: str,
+    rng: Optional[random.Random],
+    seed: Optional[int],
+    sum_only: bool = False
+) -> RollResult:
+    """コンパイル済みの式を振る（制限の検証は行わない）"""
+    if sum_only:
+        return _roll_expression_sum(expression, dice_str, rng)
+    
+    terms = []
+    final_result = 0
+    
+    for num_dice, num_sides, modifier in expression.components:
+        if num_sides > 0:  # ダイスロール
+            rolls = roll_dice(num_dice, num_sides, rng)
+            
+            # 合計・最小・最大はいずれも配列全体に対するC実装の1パスで求める
+            # 負のダイス数の場合は結果を反転
+            roll_sum = sum(rolls)
+            if num_dice < 0:
+                roll_sum = -roll_sum
+            
+            # 出目の最大値と最小値をチェック（全て最大値ならクリティカル、全て1ならファンブル）
+            is_critical = len(rolls) > 0 and min(rolls) == num_sides
+            is_fumble = len(rolls) > 0 and max(rolls) == 1
+            
+            terms.append(DiceTerm(num_dice, num_sides, rolls, roll_sum, is_critical, is_fumble))
+            final_result += roll_sum
+        else:  # 修正値
+            terms.append(ModifierTerm(modifier))
+            final_result += modifier
+    
+    return RollResult(dice_str, tuple(terms), final_result, seed=seed)
+
+def _roll_expression_sum(
+    expression: CompiledDiceExpression,
+    dice_str: str,
+    rng: Optional[random.Random]
+) -> RollResult:
     """
-    return [random.randint(1, num_sides) for _ in range(abs(num_dice))]
+    コンパイル済みの式を合計だけで振る（出目は空の配列になる）
+    
+    出目を振らないため、クリティカル・ファンブルは合計が最大値・最小値かどうかで判定する。
+    出目の再生成とは結果が一致しないため、結果にシードは記録しない。
+    """
+    # sampler は probability を経由してこのモジュールをインポートするため、ここでインポートする
+    from .sampler import roll_dice_sum
+    
+    terms = []
+    final_result = 0
+    
+    for num_dice, num_sides, modifier in expression.components:
+        if num_sides > 0:
+            count = abs(num_dice)
+            roll_sum = roll_dice_sum(num_dice, num_sides, rng)
+            is_critical = count > 0 and abs(roll_sum) == count * num_sides
+            is_fumble = count > 0 and abs(roll_sum) == count
+            rolls = array(rolls_typecode(num_sides))
+            terms.append(DiceTerm(num_dice, num_sides, rolls, roll_sum, is_critical, is_fumble))
+            final_result += roll_sum
+        else:
+            terms.append(ModifierTerm(modifier))
+            final_result += modifier
+    
+    return RollResult(dice_str, tuple(terms), final_result)
 
-def roll_complex_dice(dice_str: str) -> Dict[str, Any]:
+def roll_complex_dice(
+    dice_str: Union[str, CompiledDiceExpression],
+    settings: Optional[Settings] = None,
+    seed: Optional[int] = None,
+    sum_only: bool = False
+) -> RollResult:
     """
     複雑なダイス表記に基づいてダイスを振る
     
     引数:
-        dice_str: ダイス表記文字列
+        dice_str: ダイス表記文字列、またはコンパイル済みの式
+        settings: 設定のスナップショット（ギルド別の制限を適用する場合に指定）
+        seed: 64ビットのシード（指定した場合は専用の乱数生成器で振り、結果にシードを記録する）
+        sum_only: Trueの場合は出目を振らずに合計だけを求める（出目を表示しない場合に使う。
+            出目を再生成できないため、結果にシードは記録されない）
     
     戻り値:
-        ダイスの結果を含む辞書
+        ダイスの結果（エラー時はerrorが設定された結果）
     """
     try:
-        components = parse_complex_dice_notation(dice_str)
-        if not components:
-            return {"error": "無効なダイス表記です"}
+        if isinstance(dice_str, CompiledDiceExpression):
+            expression = dice_str
+            dice_str = expression.normalized
+        else:
+            expression = compile_dice_expression(dice_str)
+        if expression is None:
+            return RollResult.failure("無効なダイス表記です")
         
-        rolls_detail = []
-        final_result = 0
+        # バリデーション（式全体の範囲を事前計算済みのためロール前に一度だけ行う）
+        error = check_expression_limits(expression, settings)
+        if error:
+            return RollResult.failure(error)
         
-        for num_dice, num_sides, modifier in components:
-            if num_sides > 0:  # ダイスロール
-                is_negative = num_dice < 0
-                
-                # バリデーション
-                abs_num_dice = abs(num_dice)
-                min_dice = get_config('MIN_DICE_COUNT', 1)
-                max_dice = get_config('MAX_DICE_COUNT', 100)
-                min_sides = get_config('MIN_DICE_SIDES', 2)
-                max_sides = get_config('MAX_DICE_SIDES', 1000)
-                
-                if not (min_dice <= abs_num_dice <= max_dice):
-                    return {"error": f"ダイスの数は{min_dice}から{max_dice}の間で指定してください"}
-                if not (min_sides <= num_sides <= max_sides):
-                    return {"error": f"ダイスの面は{min_sides}から{max_sides}の間で指定してください"}
-                    
-                rolls = roll_dice(num_dice, num_sides)
-                
-                # 負のダイス数の場合は結果を反転
-                roll_sum = sum(rolls)
-                if is_negative:
-                    roll_sum = -roll_sum
-                
-                # 出目の最大値と最小値をチェック
-                is_critical = all(roll == num_sides for roll in rolls) and len(rolls) > 0
-                is_fumble = all(roll == 1 for roll in rolls) and len(rolls) > 0
-                
-                rolls_detail.append({
-                    "type": "dice",
-                    "notation": f"{'-' if is_negative else ''}{abs_num_dice}d{num_sides}",
-                    "rolls": rolls,
-                    "sum": roll_sum,
-                    "negative": is_negative,
-                    "is_critical": is_critical,
-                    "is_fumble": is_fumble,
-                    "sides": num_sides
-                })
-                
-                final_result += roll_sum
-            else:  # 修正値
-                min_mod = get_config('MIN_MODIFIER', -1000)
-                max_mod = get_config('MAX_MODIFIER', 1000)
-                
-                if not (min_mod <= modifier <= max_mod):
-                    return {"error": f"修正値は{min_mod}から{max_mod}の間で指定してください"}
-                    
-                rolls_detail.append({
-                    "type": "modifier",
-                    "value": modifier
-                })
-                final_result += modifier
+        rng = create_rng(seed) if seed is not None else None
+        result = _roll_expression(expression, dice_str, rng, seed, sum_only)
         
-        result = {
-            "input": dice_str,
-            "details": rolls_detail,
-            "result": final_result
-        }
-        
-        logger.debug(f"ダイスロール結果: {result}")
+        logger.debug("ダイスロール結果: %s", result)
         return result
     except Exception as e:
-        logger.error(f"ダイスロール中にエラー発生: {e}")
-        return {"error": f"ダイスロール処理中にエラーが発生しました: {str(e)}"} 
\ No newline at end of file
+        logger.error("ダイスロール中にエラー発生: %s", e)
+        return RollResult.failure(f"ダイスロール処理中にエラーが発生しました: {str(e)}")
+
+def replay_roll(record: RollRecord) -> RollResult:
+    """
+    履歴の記録からシードを使って出目を再生成する
+    
+    記録後に制限が変わっていても再生成できるよう、制限の検証は行わない
+    
+    引数:
+        record: 履歴の記録
+    
+    戻り値:
+        再生成したダイスの結果（再生成できない場合はerrorが設定された結果）
+    """
+    if record.seed is None:
+        return RollResult.failure(
+            "シードが記録されていないため出目を再生成できません（合計だけのロールは出目を振らないため検証できません）"
+        )
+    expression = compile_dice_expression(record.input)
+    if expression is None:
+        return RollResult.failure("無効なダイス表記です")
+    return _roll_expression(expression, record.input, create_rng(record.seed), record.seed)
@@ -0,0 +1,228 @@
+"""
+合計値だけが必要なロールのための標本抽出モジュール
+
+出目を表示しない場合は、ダイスを1個ずつ振る代わりに (ダイス数, 面数) ごとの合計の累積分布から
+二分探索で合計を直接引く。分布は probability で計算した厳密なものなので、
+出目を振って足した場合と同じ分布になる（floatで表せないほど小さな確率の値は出ない）。
+
+累積分布の表は必要になった時点で作成し、件数を制限したLRUキャッシュに保持する。
+表の作成は O(ダイス数 × 面数) かかるため、1回だけのロールで表がキャッシュにない場合は
+出目を振って足す方が速い。表は作成のコストが振る回数で回収できる場合にだけ作る。
+1回ずつのロールでも、同じ (ダイス数, 面数) を振った回数を数え、積み重なった回数で回収できた時点で作る。
+"""
+import random
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from operator import add
+from typing import Dict, Optional, Tuple
+
+from .parser import CompiledDiceExpression
+from .probability import dice_sum_distribution, distribution_cost
+from .roller import roll_dice
+
+# 累積分布の表のキャッシュの最大エントリ数（ギルドをまたいで共有される）
+SUM_TABLE_CACHE_SIZE = 32
+
+# 表の1要素の作成に対して、出目1個を振るコストが何倍かの見積もり
+SUM_TABLE_PAYBACK = 4
+
+# 表を作成するまで振った回数を数える (ダイス数, 面数) の最大数（古いものから忘れる）
+SUM_TABLE_USES_SIZE = 1024
+
+class SumTable:
+    """
+    ダイスの合計値を引くための累積分布の表（不変）
+
+    cumulative[i] は合計が offset + i 以下になる確率
+    """
+    __slots__ = ('offset', 'cumulative', 'total')
+
+    def __init__(self, offset: int, cumulative: array):
+        self.offset = offset
+        self.cumulative = cumulative
+        # 丸め誤差で最後の値が1からずれていても、その値を上限として引く
+        self.total = cumulative[-1]
+
+    def sample(self, rng: random.Random) -> int:
+        """
+        合計値を1つ引く
+
+        引数:
+            rng: 乱数生成器
+
+        戻り値:
+            合計値
+        """
+        index = bisect_right(self.cumulative, rng.random() * self.total)
+        return self.offset + min(index, len(self.cumulative) - 1)
+
+    def sample_many(self, rng: random.Random, times: int) -> list:
+        """
+        合計値をtimes個引く
+
+        引数:
+            rng: 乱数生成器
+            times: 引く回数
+
+        戻り値:
+            合計値のリスト
+        """
+        cumulative, total, offset = self.cumulative, self.total, self.offset
+        last = len(cumulative) - 1
+        uniform = rng.random
+        return [offset + min(bisect_right(cumulative, uniform() * total), last) for _ in range(times)]
+
+_tables: "OrderedDict[Tuple[int, int], SumTable]" = OrderedDict()
+_tables_lock = threading.Lock()
+# 表のない (ダイス数, 面数) -> 表を使わずに振った回数
+_uses: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def table_build_cost(num_dice: int, num_sides: int) -> int:
+    """
+    累積分布の表の作成コストを見積もる
+
+    分布の計算（probability.distribution_cost）と累積和の計算の要素数で見積もる
+
+    引数:
+        num_dice: ダイスの数（1以上）
+        num_sides: ダイスの面数（1以上）
+
+    戻り値:
+        計算する要素数の見積もり
+    """
+    return distribution_cost(((num_dice, num_sides, 0),)) + num_dice * (num_sides - 1) + 1
+
+def _cached_table(num_dice: int, num_sides: int) -> Optional[SumTable]:
+    """キャッシュにある表を取得する（ない場合はNone）"""
+    key = (num_dice, num_sides)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None:
+            _tables.move_to_end(key)
+            _cache_stats["hits"] += 1
+        return table
+
+def get_sum_table(num_dice: int, num_sides: int) -> SumTable:
+    """
+    (ダイス数, 面数) の累積分布の表を取得する（キャッシュにない場合は作成する）
+
+    引数:
+        num_dice: ダイスの数（1以上）
+        num_sides: ダイスの面数（1以上）
+
+    戻り値:
+        累積分布の表
+    """
+    table = _cached_table(num_dice, num_sides)
+    if table is not None:
+        return table
+
+    # 作成はロックの外で行う（同時に作成された場合は後の方で置き換えるだけ）
+    distribution = dice_sum_distribution(num_dice, num_sides)
+    table = SumTable(distribution.offset, distribution.cumulative)
+    with _tables_lock:
+        _cache_stats["misses"] += 1
+        _tables[(num_dice, num_sides)] = table
+        while len(_tables) > SUM_TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    return table
+
+def _table_for(num_dice: int, num_sides: int, times: int) -> Optional[SumTable]:
+    """
+    表がキャッシュにあるか、これまでに振った回数と今回振る回数で作成のコストを回収できる場合は表を返す
+    """
+    table = _cached_table(num_dice, num_sides)
+    if table is not None:
+        return table
+
+    key = (num_dice, num_sides)
+    with _tables_lock:
+        uses = _uses.pop(key, 0) + times
+        if uses * num_dice * SUM_TABLE_PAYBACK < table_build_cost(num_dice, num_sides):
+            _uses[key] = uses
+            while len(_uses) > SUM_TABLE_USES_SIZE:
+                _uses.popitem(last=False)
+            return None
+    return get_sum_table(num_dice, num_sides)
+
+def roll_dice_sum(num_dice: int, num_sides: int, rng: Optional[random.Random] = None) -> int:
+    """
+    指定された数と面数のダイスの合計だけを求める
+
+    引数:
+        num_dice: ダイスの数（負の場合は合計を反転する）
+        num_sides: ダイスの面数
+        rng: 乱数生成器（省略時はモジュール共通の random）
+
+    戻り値:
+        ダイスの合計
+    """
+    if rng is None:
+        rng = random
+    count = abs(num_dice)
+    if count == 0:
+        return 0
+    table = _table_for(count, num_sides, 1)
+    total = table.sample(rng) if table is not None else sum(roll_dice(count, num_sides, rng))
+    return -total if num_dice < 0 else total
+
+def roll_totals(expression: CompiledDiceExpression, times: int, rng: Optional[random.Random] = None) -> array:
+    """
+    ダイス式をtimes回振った結果の合計だけを求める（制限の検証は行わない）
+
+    項ごとに表を使うかどうかを振る回数から判断するため、回数が多いほど大きなダイスプールでも
+    1回あたり O(log 分布の長さ) で振れる
+
+    引数:
+        expression: コンパイル済みの式
+        times: 振る回数
+        rng: 乱数生成器（省略時はモジュール共通の random）
+
+    戻り値:
+        各回の結果の配列（'q'のarray）
+    """
+    if rng is None:
+        rng = random
+    modifier = sum(modifier for _, num_sides, modifier in expression.components if num_sides == 0)
+    totals = [modifier] * times
+
+    for num_dice, num_sides, _ in expression.components:
+        count = abs(num_dice)
+        if num_sides == 0 or count == 0:
+            continue
+        table = _table_for(count, num_sides, times)
+        if table is not None:
+            samples = table.sample_many(rng, times)
+        else:
+            samples = [sum(roll_dice(count, num_sides, rng)) for _ in range(times)]
+        if num_dice < 0:
+            samples = [-value for value in samples]
+        totals = list(map(add, totals, samples))
+
+    return array('q', totals)
+
+def get_sum_table_cache_info() -> Dict[str, int]:
+    """
+    累積分布の表のキャッシュの統計情報を取得する
+
+    戻り値:
+        ヒット数、ミス数、現在のサイズ、最大サイズの辞書
+    """
+    with _tables_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "size": len(_tables),
+            "max_size": SUM_TABLE_CACHE_SIZE
+        }
+
+def clear_sum_tables():
+    """累積分布の表のキャッシュを空にする（主にテスト用）"""
+    with _tables_lock:
+        _tables.clear()
+        _uses.clear()
+        _cache_stats["hits"] = 0
+        _cache_stats["misses"] = 0
@@ -0,0 +1,175 @@
+"""
+ダイス式のモンテカルロシミュレーションを提供するモジュール
+
+試行を一定数ごとのチャンクに分け、プロセスプールで並列に振る。チャンクごとに基準のシードと
+チャンクの番号から独立したシードを導くため、同じシードからはワーカー数や実行順によらず同じ結果になる。
+各チャンクは合計値ごとの回数だけを返し、結果は回数を足し合わせて集計する。
+"""
+import asyncio
+import hashlib
+import math
+import struct
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Dict, Optional
+
+from .parser import CompiledDiceExpression
+from .probability import DiceDistribution
+from .rng import create_rng
+from .sampler import roll_totals
+
+# 1つのチャンクで振る試行の数（ワーカーに渡す単位）
+SIMULATION_CHUNK_TRIALS = 250000
+
+def chunk_seed(seed: int, index: int) -> int:
+    """
+    基準のシードとチャンクの番号からチャンクのシードを導出する
+
+    引数:
+        seed: 基準の64ビットのシード
+        index: チャンクの番号
+
+    戻り値:
+        64ビットのシード
+    """
+    digest = hashlib.blake2b(struct.pack('<QQ', seed, index), digest_size=8, person=b'dice-simulate').digest()
+    return int.from_bytes(digest, 'little')
+
+def simulate_chunk(expression: CompiledDiceExpression, trials: int, seed: int) -> Dict[int, int]:
+    """
+    ダイス式をtrials回振り、合計値ごとの回数を数える（ワーカープロセスで実行する）
+
+    引数:
+        expression: コンパイル済みの式
+        trials: 試行の数
+        seed: チャンクのシード
+
+    戻り値:
+        合計値と回数の辞書
+    """
+    return dict(Counter(roll_totals(expression, trials, create_rng(seed))))
+
+class SimulationResult:
+    """シミュレーションの途中経過と結果"""
+
+    def __init__(self, requested: int):
+        """
+        引数:
+            requested: 要求された試行の数
+        """
+        self.requested = requested
+        self.trials = 0
+        self.counts: Counter = Counter()
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    def merge(self, counts: Dict[int, int]):
+        """
+        チャンクの結果を加える
+
+        引数:
+            counts: 合計値と回数の辞書
+        """
+        self.counts.update(counts)
+        self.trials += sum(counts.values())
+
+    @property
+    def done(self) -> bool:
+        """全ての試行が終わったかどうか"""
+        return self.trials >= self.requested
+
+    @property
+    def throughput(self) -> float:
+        """1秒あたりの試行の数"""
+        return self.trials / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_distribution(self) -> Optional[DiceDistribution]:
+        """
+        観測した頻度を分布に変換する
+
+        戻り値:
+            観測した最小値から最大値までの経験分布（試行がない場合はNone）
+        """
+        if not self.trials:
+            return None
+        low, high = min(self.counts), max(self.counts)
+        trials = self.trials
+        counts = self.counts
+        probabilities = array('d', (counts.get(value, 0) / trials for value in range(low, high + 1)))
+        mean = math.fsum(value * count for value, count in counts.items()) / trials
+        variance = math.fsum(count * (value - mean) ** 2 for value, count in counts.items()) / trials
+        return DiceDistribution(low, probabilities, mean, variance)
+
+async def run_simulation(
+    expression: CompiledDiceExpression,
+    trials: int,
+    seed: int,
+    executor: Executor,
+    workers: int,
+    on_progress: Optional[Callable[[SimulationResult], Awaitable[None]]] = None,
+    interval: float = 3.0,
+    stop: Optional[asyncio.Event] = None,
+    chunk_trials: int = SIMULATION_CHUNK_TRIALS
+) -> SimulationResult:
+    """
+    ダイス式をtrials回振るシミュレーションを実行する
+
+    ワーカー数の2倍までのチャンクを同時に投入し、終わったものから集計する。
+    stop がセットされると、まだ始まっていないチャンクを取り消し、それまでの結果を返す
+    （cancelled がTrueになる）。タスクをキャンセルした場合は CancelledError を送出する。
+
+    引数:
+        expression: コンパイル済みの式（制限の検証は呼び出し側で行う）
+        trials: 試行の数
+        seed: 基準の64ビットのシード
+        executor: チャンクを実行するエグゼキューター
+        workers: エグゼキューターのワーカー数
+        on_progress: interval秒ごとに途中経過を渡して呼ぶコルーチン関数
+        interval: 途中経過を通知する間隔（秒）
+        stop: 中止を指示するイベント
+        chunk_trials: 1つのチャンクの試行の数
+
+    戻り値:
+        シミュレーションの結果
+    """
+    loop = asyncio.get_running_loop()
+    result = SimulationResult(trials)
+    start = time.perf_counter()
+    next_progress = loop.time() + interval
+    pending = set()
+    submitted = 0
+    index = 0
+
+    try:
+        while submitted < trials or pending:
+            if stop is not None and stop.is_set():
+                result.cancelled = True
+                break
+            while submitted < trials and len(pending) < workers * 2:
+                size = min(chunk_trials, trials - submitted)
+                pending.add(loop.run_in_executor(
+                    executor, simulate_chunk, expression, size, chunk_seed(seed, index)
+                ))
+                submitted += size
+                index += 1
+
+            timeout = None if on_progress is None else max(0.0, next_progress - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                result.merge(future.result())
+            result.elapsed = time.perf_counter() - start
+
+            if on_progress is not None and loop.time() >= next_progress and not result.done:
+                await on_progress(result)
+                next_progress = loop.time() + interval
+    except asyncio.CancelledError:
+        for future in pending:
+            future.cancel()
+        raise
+
+    for future in pending:
+        future.cancel()
+    result.elapsed = time.perf_counter() - start
+    return result
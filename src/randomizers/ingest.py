@@ -0,0 +1,237 @@
+"""
+添付ファイルから参加者リストを読み込むモジュール
+
+テキストまたはCSVの添付ファイルをチャンク単位でストリーミングしながら1行ずつ解析し、
+重複を除いた参加者を呼び出し側のコールバックに渡す。ファイル全体をメモリに読み込まない。
+
+形式:
+    1行に1人。CSVの場合は1列目が名前、2列目（省略可能）が重み（口数）
+    空行と # で始まる行は無視する。1行目の2列目が数値でない場合は見出し行とみなす
+"""
+import asyncio
+import codecs
+import csv
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import discord
+
+# 1回に読み込むバイト数
+CHUNK_SIZE = 64 * 1024
+
+# 受け付けるファイルの拡張子
+ACCEPTED_EXTENSIONS = ('.txt', '.csv')
+
+class IngestError(Exception):
+    """添付ファイルを読み込めない場合の例外（メッセージはそのままユーザーに表示する）"""
+
+class IngestResult:
+    """読み込み結果の集計"""
+    __slots__ = ('entries', 'duplicates', 'invalid', 'weighted')
+
+    def __init__(self):
+        # 重複を除いた参加者数
+        self.entries = 0
+        self.duplicates = 0
+        # 重みが数値でないなどで無視した行数
+        self.invalid = 0
+        # 重みの列があったかどうか
+        self.weighted = False
+
+    def summary(self) -> str:
+        """表示用の概要"""
+        text = f"{self.entries:,}件を読み込みました"
+        skipped = []
+        if self.duplicates:
+            skipped.append(f"重複 {self.duplicates:,}件")
+        if self.invalid:
+            skipped.append(f"不正な行 {self.invalid:,}件")
+        if skipped:
+            text += f"（{'、'.join(skipped)}を除外）"
+        return text
+
+def parse_entry(line: str) -> Optional[Tuple[str, Optional[float]]]:
+    """
+    1行を解析する
+
+    引数:
+        line: 行
+
+    戻り値:
+        (名前, 重み) の組。重みがない場合はNone。空行やコメント行の場合はNone
+
+    例外:
+        ValueError: 重みが数値でない場合
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    # 引用符を含む行だけCSVとして解析する（大半の行は単純な分割で足りる）
+    if '"' in line:
+        row = next(csv.reader((line,)))
+        name = row[0] if row else ''
+        weight = row[1] if len(row) > 1 else ''
+    else:
+        name, _, rest = line.partition(',')
+        weight = rest.partition(',')[0]
+
+    name = name.strip()
+    if not name:
+        return None
+    weight = weight.strip()
+    return name, float(weight) if weight else None
+
+class EntryParser:
+    """行を順に解析し、重複を除いた参加者を返す"""
+
+    def __init__(self):
+        self.result = IngestResult()
+        self._seen = set()
+        self._first = True
+
+    def feed(self, line: str) -> Optional[Tuple[str, float]]:
+        """
+        1行を解析する
+
+        引数:
+            line: 行
+
+        戻り値:
+            新しい参加者の (名前, 重み) の組。重みが省略された場合は1。
+            参加者でない行や重複した参加者の場合はNone
+        """
+        first = self._first
+        try:
+            entry = parse_entry(line)
+        except ValueError:
+            # 1行目の2列目が数値でなければ見出し行として読み飛ばす
+            if not first:
+                self.result.invalid += 1
+            self._first = False
+            return None
+        if entry is None:
+            return None
+        self._first = False
+
+        name, weight = entry
+        if name in self._seen:
+            self.result.duplicates += 1
+            return None
+        self._seen.add(name)
+        self.result.entries += 1
+
+        if weight is None:
+            return name, 1.0
+        self.result.weighted = True
+        return name, weight
+
+def iter_entries(lines: Iterable[str], parser: Optional[EntryParser] = None) -> Iterator[Tuple[str, float]]:
+    """
+    行のイテラブルから重複を除いた参加者を順に返す
+
+    引数:
+        lines: 行のイテラブル
+        parser: 集計を受け取る場合に指定するパーサー
+
+    戻り値:
+        (名前, 重み) の組のイテレーター
+    """
+    parser = parser or EntryParser()
+    for line in lines:
+        entry = parser.feed(line)
+        if entry is not None:
+            yield entry
+
+async def iter_url_lines(url: str, max_bytes: int) -> AsyncIterator[List[str]]:
+    """
+    URLの内容をチャンク単位で読み込み、行のリストを順に返す
+
+    引数:
+        url: 読み込むURL
+        max_bytes: 読み込む最大バイト数
+
+    戻り値:
+        チャンクごとの行のリストの非同期イテレーター
+
+    例外:
+        IngestError: 取得に失敗した場合、または最大バイト数を超えた場合
+    """
+    # aiohttp の読み込みは重いため、実際に取得する時まで遅らせる
+    import aiohttp
+
+    # 先頭のBOMを除き、チャンクの境界で分かれたマルチバイト文字も正しく復元する
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    received = 0
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    raise IngestError(f"添付ファイルを取得できませんでした（HTTP {response.status}）")
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise IngestError(f"添付ファイルが大きすぎます（最大 {max_bytes:,} バイト）")
+                    lines = (pending + decoder.decode(chunk)).split('\n')
+                    pending = lines.pop()
+                    yield lines
+                    # 大きなファイルでもイベントループを占有しない
+                    await asyncio.sleep(0)
+    except aiohttp.ClientError as e:
+        raise IngestError(f"添付ファイルを取得できませんでした: {e}") from e
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield [pending]
+
+def check_attachment(attachment: 'discord.Attachment', max_bytes: int):
+    """
+    添付ファイルの種類とサイズを確認する
+
+    引数:
+        attachment: 添付ファイル
+        max_bytes: 最大バイト数
+
+    例外:
+        IngestError: テキスト・CSV以外のファイル、または大きすぎる場合
+    """
+    content_type = (attachment.content_type or '').split(';')[0].strip()
+    if not (content_type.startswith('text/') or attachment.filename.lower().endswith(ACCEPTED_EXTENSIONS)):
+        raise IngestError("添付ファイルはテキスト（.txt）またはCSV（.csv）を指定してください")
+    if attachment.size > max_bytes:
+        raise IngestError(f"添付ファイルが大きすぎます（最大 {max_bytes:,} バイト）")
+
+async def ingest_attachment(
+    attachment: 'discord.Attachment',
+    consume: Callable[[str, float], None],
+    max_bytes: int,
+    max_entries: Optional[int] = None
+) -> IngestResult:
+    """
+    添付ファイルをストリーミングで読み込み、重複を除いた参加者をコールバックに渡す
+
+    引数:
+        attachment: 添付ファイル
+        consume: 参加者ごとに (名前, 重み) で呼び出す関数
+        max_bytes: 読み込む最大バイト数
+        max_entries: 参加者数の上限（全員をメモリに保持する場合に指定）
+
+    戻り値:
+        読み込み結果の集計
+
+    例外:
+        IngestError: 読み込めない場合
+    """
+    check_attachment(attachment, max_bytes)
+    parser = EntryParser()
+    result = parser.result
+    feed = parser.feed
+    async for lines in iter_url_lines(attachment.url, max_bytes):
+        for line in lines:
+            entry = feed(line)
+            if entry is not None:
+                if max_entries is not None and result.entries > max_entries:
+                    raise IngestError(f"参加者が多すぎます（最大 {max_entries:,} 件）")
+                consume(*entry)
+    return result
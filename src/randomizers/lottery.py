@@ -1,33 +1,35 @@
 """
 抽選モジュール - 各種抽選機能を提供します
 """
+import heapq
+import math
 import random
-from typing import List, Dict, Any, Union, Optional, Tuple
-import os
-import sys
+from collections.abc import Sequence
+from typing import Iterable, List, Dict, Any, Union, Optional, Tuple
 from collections import defaultdict
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
-from dice.src.randomizers.selector import shuffle_list
+from src.utils.logger import get_logger
+from src.randomizers.selector import shuffle_list, reservoir_sample, Reservoir, positive_random
 
 logger = get_logger()
 
-def draw_lottery(participants: List[str], winners_count: int) -> List[str]:
+def draw_lottery(participants: Iterable[str], winners_count: int) -> List[str]:
     """
     参加者リストから指定数の当選者をランダムに抽選します
     
     引数:
-        participants: 参加者リスト
+        participants: 参加者リスト（任意のイテラブルも指定でき、リザーバーサンプリングで抽選します）
         winners_count: 当選者数
         
     戻り値:
         当選者リスト
     """
+    if not isinstance(participants, Sequence):
+        winners = reservoir_sample(participants, winners_count)
+        if not winners:
+            logger.warning("空の参加者リストから抽選しようとしました")
+        return winners
+    
     if not participants:
         logger.warning("空の参加者リストから抽選しようとしました")
         return []
@@ -38,66 +40,120 @@ def draw_lottery(participants: List[str], winners_count: int) -> List[str]:
     # 重複なしでランダムに選択
     winners = random.sample(participants, actual_count)
     
-    logger.info(f"{len(participants)}人の参加者から{actual_count}人を抽選しました")
+    logger.info("%d人の参加者から%d人を抽選しました", len(participants), actual_count)
     return winners
 
-def draw_tiered_lottery(participants: List[str], prize_tiers: Dict[str, int]) -> Dict[str, List[str]]:
+def draw_tiered_lottery(participants: Iterable[str], prize_tiers: Dict[str, int]) -> Dict[str, List[str]]:
     """
     参加者リストから複数の賞品に対して当選者を抽選します
     
     引数:
-        participants: 参加者リスト
+        participants: 参加者リスト（任意のイテラブルも指定できます）
         prize_tiers: 賞品名と当選者数の辞書（例: {"一等賞": 1, "二等賞": 3, "三等賞": 5}）
         
     戻り値:
         賞品ごとの当選者リストの辞書
     """
-    if not participants:
-        logger.warning("空の参加者リストから抽選しようとしました")
-        return {prize: [] for prize in prize_tiers}
-        
     if not prize_tiers:
         logger.warning("賞品リストが指定されていません")
         return {}
         
-    # 参加者リストをシャッフル
-    remaining = participants.copy()
-    random.shuffle(remaining)
+    # 全賞品の当選者をまとめてランダムな順で選ぶ（参加者全体はシャッフルしない）
+    total = sum(max(0, count) for count in prize_tiers.values())
+    remaining = draw_lottery(participants, total)
+    return assign_prize_tiers(remaining, prize_tiers)
+
+def assign_prize_tiers(winners: List[str], prize_tiers: Dict[str, int]) -> Dict[str, List[str]]:
+    """
+    選ばれた順の当選者を賞品に割り当てます
     
-    # 賞品ごとに当選者を抽選
+    引数:
+        winners: 当選者リスト（選ばれた順）
+        prize_tiers: 賞品名と当選者数の辞書
+        
+    戻り値:
+        賞品ごとの当選者リストの辞書
+    """
     result = {}
     
     # 賞品を優先度順にソート（辞書順）
     sorted_prizes = sorted(prize_tiers.keys())
     
+    position = 0
     for prize in sorted_prizes:
-        count = prize_tiers[prize]
-        # 残りの参加者から抽選
-        winners_count = min(count, len(remaining))
-        
-        if winners_count > 0:
-            # 当選者を選択
-            winners = remaining[:winners_count]
-            result[prize] = winners
-            
-            # 当選者を残りのリストから削除
-            remaining = remaining[winners_count:]
-        else:
-            result[prize] = []
+        count = max(0, prize_tiers[prize])
+        result[prize] = winners[position:position + count]
+        position += len(result[prize])
     
     return result
 
+class WeightedReservoir:
+    """
+    ストリームから重み付きで重複なしにk個を選ぶリザーバー（Efraimidis–Spirakis法）
+
+    キー log(u) / 重み の上位k個だけを最小ヒープに保持するため、メモリはO(k)。
+    重みが0以下の要素は、重みが正の要素が足りない場合に等確率で選ぶ。
+    """
+    __slots__ = ('k', 'count', '_heap', '_zero')
+
+    def __init__(self, k: int):
+        """
+        引数:
+            k: 選ぶ個数
+        """
+        self.k = max(0, k)
+        self.count = 0
+        # (キー, 番号, 要素) の最小ヒープ。番号は要素同士を比較しないためのもの
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._zero = Reservoir(self.k)
+
+    def add(self, item: Any, weight: float):
+        """
+        要素を1つ渡す
+
+        引数:
+            item: 要素
+            weight: 重み（口数などの整数も可）
+        """
+        self.count += 1
+        if not weight > 0:
+            self._zero.add(item)
+            return
+        if self.k == 0:
+            return
+        key = math.log(positive_random()) / weight
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (key, self.count, item))
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (key, self.count, item))
+
+    def sample(self) -> List[Any]:
+        """
+        選ばれた要素を取得する
+
+        戻り値:
+            選ばれた要素のリスト（当選した順）
+        """
+        result = [item for _, _, item in sorted(self._heap, reverse=True)]
+        if len(result) < self.k:
+            result.extend(self._zero.sample()[:self.k - len(result)])
+        return result
+
 def draw_weighted_lottery(participants: List[str], weights: List[float], winners_count: int) -> List[str]:
     """
     重み付けされた参加者リストから当選者を抽選します
     
+    1人ずつ重みに比例した確率で選び、選ばれた人を除いて繰り返すのと同じ分布になるように、
+    各参加者に log(u) / 重み（uは0～1の一様乱数）のキーを付けて上位から当選者とします
+    （Efraimidis–Spirakis法）。n人からk人を選ぶ計算量は O(n log k) です。
+    
     引数:
         participants: 参加者リスト
-        weights: 各参加者の当選確率の重み
+        weights: 各参加者の当選確率の重み（口数などの整数もそのまま指定できます）
         winners_count: 当選者数
         
     戻り値:
-        当選者リスト
+        当選者リスト（当選した順）
     """
     if not participants:
         logger.warning("空の参加者リストから抽選しようとしました")
@@ -108,33 +164,23 @@ def draw_weighted_lottery(participants: List[str], weights: List[float], winners
         # 等確率で抽選
         weights = [1] * len(participants)
     
-    # 負の重みを0に変換
-    weights = [max(0, w) for w in weights]
-    
     # 当選者数が参加者数を超えないようにする
-    actual_count = min(winners_count, len(participants))
+    actual_count = max(0, min(winners_count, len(participants)))
+    if actual_count == 0:
+        return []
     
-    winners = []
-    remaining_participants = participants.copy()
-    remaining_weights = weights.copy()
-    
-    for _ in range(actual_count):
-        if not remaining_participants:
-            break
-            
-        # 重みに基づいて1人選択
-        if sum(remaining_weights) == 0:  # すべての重みが0の場合
-            idx = random.randrange(len(remaining_participants))
-        else:
-            idx = random.choices(range(len(remaining_participants)), 
-                                weights=remaining_weights, k=1)[0]
-        
-        # 当選者を追加
-        winners.append(remaining_participants[idx])
-        
-        # 当選者を削除
-        remaining_participants.pop(idx)
-        remaining_weights.pop(idx)
+    # 重みが正の参加者にキーを付ける（1 - random() は0を含まないので log が定義される）
+    rand = random.random
+    log = math.log
+    positive = [i for i, w in enumerate(weights) if w > 0]
+    keys = [log(1.0 - rand()) / weights[i] for i in positive]
+    order = heapq.nlargest(actual_count, range(len(positive)), key=keys.__getitem__)
+    winners = [participants[positive[j]] for j in order]
+    
+    # 重みが正の参加者が足りない場合は、重みが0以下の参加者から等確率で選ぶ
+    if len(winners) < actual_count:
+        rest = [participants[i] for i, w in enumerate(weights) if not w > 0]
+        winners.extend(random.sample(rest, actual_count - len(winners)))
     
     return winners
 
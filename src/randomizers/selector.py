@@ -1,20 +1,110 @@
 """
 ランダム選択モジュール - ランダムな選択機能を提供します
 """
+import math
 import random
-from typing import List, Dict, Any, Union, Optional, Tuple
-import os
-import sys
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Iterable, List, Dict, Any, Union, Optional, Tuple
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
-
-from dice.src.utils.logger import get_logger
+from src.utils.logger import get_logger
 
 logger = get_logger()
 
+# コンパイル済みの重み付き選択のキャッシュの最大エントリ数
+WEIGHTED_SAMPLER_CACHE_SIZE = 128
+
+def positive_random() -> float:
+    """0より大きく1未満の一様乱数"""
+    u = random.random()
+    while u == 0.0:
+        u = random.random()
+    return u
+
+class Reservoir:
+    """
+    ストリームから重複なしでk個を等確率に選ぶリザーバーサンプリング
+
+    要素を1つずつ add で渡すと、全体の件数によらずk個分のメモリで抽出できる。
+    置き換える位置をまとめて読み飛ばすAlgorithm Lを使うため、乱数の呼び出しは O(k log(n/k)) 回。
+    """
+    __slots__ = ('k', 'items', 'count', '_w', '_next')
+
+    def __init__(self, k: int):
+        """
+        引数:
+            k: 選ぶ個数
+        """
+        self.k = max(0, k)
+        self.items: List[Any] = []
+        # これまでに渡された要素の数
+        self.count = 0
+        self._w = 0.0
+        # 次にリザーバーに入れる要素の番号（1始まり）
+        self._next = 0
+
+    def _advance(self):
+        """次に置き換える要素の番号を決める"""
+        self._w *= math.exp(math.log(positive_random()) / self.k)
+        if self._w >= 1.0:
+            self._next = self.count + 1
+        else:
+            self._next = self.count + int(math.log(positive_random()) / math.log1p(-self._w)) + 1
+
+    def add(self, item: Any):
+        """
+        要素を1つ渡す
+
+        引数:
+            item: 要素
+        """
+        self.count += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+            if len(self.items) == self.k:
+                self._w = 1.0
+                self._advance()
+        elif self.count == self._next:
+            self.items[random.randrange(self.k)] = item
+            self._advance()
+
+    def extend(self, items: Iterable[Any]):
+        """
+        複数の要素を順に渡す
+
+        引数:
+            items: 要素のイテラブル
+        """
+        for item in items:
+            self.add(item)
+
+    def sample(self) -> List[Any]:
+        """
+        選ばれた要素を取得する
+
+        戻り値:
+            選ばれた要素のリスト（ランダムな順）
+        """
+        result = self.items.copy()
+        random.shuffle(result)
+        return result
+
+def reservoir_sample(items: Iterable[Any], k: int) -> List[Any]:
+    """
+    イテラブルから重複なしでk個を等確率に選ぶ（要素をリストに展開しない）
+
+    引数:
+        items: 選択対象のイテラブル
+        k: 選ぶ個数
+
+    戻り値:
+        選ばれた要素のリスト（ランダムな順）
+    """
+    reservoir = Reservoir(k)
+    reservoir.extend(items)
+    return reservoir.sample()
+
 def select_random_item(items: List[Any]) -> Tuple[Any, int]:
     """
     リストからランダムに1つの項目を選択します
@@ -32,18 +122,27 @@ def select_random_item(items: List[Any]) -> Tuple[Any, int]:
     index = random.randint(0, len(items) - 1)
     return items[index], index
 
-def select_random_multiple(items: List[Any], count: int, unique: bool = True) -> List[Any]:
+def select_random_multiple(items: Iterable[Any], count: int, unique: bool = True) -> List[Any]:
     """
     リストからランダムに複数の項目を選択します
     
     引数:
-        items: 選択対象のリスト
+        items: 選択対象のリスト（重複なしの場合は任意のイテラブルも指定でき、リザーバーサンプリングで選択します）
         count: 選択する項目数
         unique: True=重複なしで選択, False=重複ありで選択
         
     戻り値:
         選択された項目のリスト
     """
+    if unique and not isinstance(items, Sequence):
+        selected = reservoir_sample(items, count)
+        if not selected:
+            logger.warning("空のリストから選択しようとしました")
+        return selected
+    
+    if not isinstance(items, Sequence):
+        items = list(items)
+    
     if not items:
         logger.warning("空のリストから選択しようとしました")
         return []
@@ -54,12 +153,202 @@ def select_random_multiple(items: List[Any], count: int, unique: bool = True) ->
         return random.sample(items, count)
     else:
         # 重複ありの選択
-        return [random.choice(items) for _ in range(count)]
+        return random.choices(items, k=count)
+
+class WeightedSampler:
+    """
+    重み付きの選択をO(1)で行うエイリアス表（Vose's alias method）
+
+    作成時にO(n)で表を作り、以降は1回の選択ごとに一様な番号と一様な実数を1つずつ引くだけで選ぶ。
+    同じ項目と重みから何度も選ぶ場合（ドロップ表や抽選の口数など）は get_weighted_sampler で
+    キャッシュしたものを使う。
+    """
+    __slots__ = ('items', 'weights', 'total', '_probability', '_alias')
+
+    def __init__(self, items: Sequence, weights: Sequence[float]):
+        """
+        引数:
+            items: 選択対象の項目
+            weights: 各項目の重み（負の値とNaNは0として扱い、全て0の場合は等確率で選ぶ）
+
+        例外:
+            ValueError: 項目が空の場合、または項目と重みの数が一致しない場合
+        """
+        if not items:
+            raise ValueError("選択対象の項目がありません")
+        if len(items) != len(weights):
+            raise ValueError("項目リストと重みリストの長さが一致しません")
+
+        weights = [float(w) if w > 0 else 0.0 for w in weights]
+        total = math.fsum(weights)
+        if not math.isfinite(total):
+            raise ValueError("重みには有限の数値を指定してください")
+        if total == 0:
+            logger.warning("すべての重みが0です。等確率で選択します。")
+            weights = [1.0] * len(items)
+            total = float(len(items))
+
+        self.items = items
+        self.weights = weights
+        self.total = total
+
+        n = len(weights)
+        # 平均が1になるように拡大した重み
+        scaled = [w * n / total for w in weights]
+        probability = array('d', bytes(8 * n))
+        alias = array('l', bytes(array('l').itemsize * n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probability[less] = scaled[less]
+            alias[less] = more
+            # 余った分を大きい方から小さい方の枠に移す
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # 残りは丸め誤差の範囲で1に等しい
+        for i in large + small:
+            probability[i] = 1.0
+            alias[i] = i
+        self._probability = probability
+        self._alias = alias
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def probability(self, index: int) -> float:
+        """
+        指定した番号の項目が選ばれる確率
+
+        引数:
+            index: 項目の番号
+
+        戻り値:
+            確率
+        """
+        return self.weights[index] / self.total
+
+    def sample_index(self, rng: random.Random = random) -> int:
+        """
+        項目の番号を1つ選ぶ
+
+        引数:
+            rng: 乱数生成器（省略時はモジュール共通の random）
+
+        戻り値:
+            選ばれた項目の番号
+        """
+        index = rng.randrange(len(self._probability))
+        return index if rng.random() < self._probability[index] else self._alias[index]
+
+    def sample(self, rng: random.Random = random) -> Any:
+        """
+        項目を1つ選ぶ
+
+        引数:
+            rng: 乱数生成器（省略時はモジュール共通の random）
+
+        戻り値:
+            選ばれた項目
+        """
+        return self.items[self.sample_index(rng)]
+
+    def sample_many(self, count: int, rng: random.Random = random) -> List[Any]:
+        """
+        重複ありで項目を複数選ぶ
+
+        引数:
+            count: 選ぶ個数
+            rng: 乱数生成器（省略時はモジュール共通の random）
+
+        戻り値:
+            選ばれた項目のリスト
+        """
+        items, probability, alias = self.items, self._probability, self._alias
+        n = len(probability)
+        randrange, uniform = rng.randrange, rng.random
+        selected = []
+        for _ in range(count):
+            index = randrange(n)
+            selected.append(items[index] if uniform() < probability[index] else items[alias[index]])
+        return selected
+
+@lru_cache(maxsize=WEIGHTED_SAMPLER_CACHE_SIZE)
+def _compile_sampler(items: Tuple[Any, ...], weights: Tuple[float, ...]) -> WeightedSampler:
+    """項目と重みのタプルからエイリアス表を作成する（LRUキャッシュ付き）"""
+    return WeightedSampler(items, weights)
+
+def get_weighted_sampler(items: Iterable[Any], weights: Iterable[float]) -> WeightedSampler:
+    """
+    項目と重みのエイリアス表を取得する
+
+    項目と重みのハッシュでキャッシュし、同じ組み合わせからは作成済みの表を返す
+    （項目がハッシュできない場合はキャッシュせずに作成する）
+
+    引数:
+        items: 選択対象の項目
+        weights: 各項目の重み
+
+    戻り値:
+        エイリアス表
+
+    例外:
+        ValueError: 項目が空の場合、または項目と重みの数が一致しない場合
+    """
+    items, weights = tuple(items), tuple(weights)
+    try:
+        return _compile_sampler(items, weights)
+    except TypeError:
+        # 項目にハッシュできない値が含まれる場合
+        return WeightedSampler(items, weights)
+
+def get_weighted_sampler_cache_info() -> Dict[str, int]:
+    """
+    エイリアス表のキャッシュの統計情報を取得する
+
+    戻り値:
+        ヒット数、ミス数、現在のサイズ、最大サイズの辞書
+    """
+    info = _compile_sampler.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+def parse_weighted_items(text: Optional[str]) -> Tuple[List[str], List[float]]:
+    """
+    「項目:重み」のカンマ区切りの文字列を項目と重みに分割する
+
+    重みを省略した項目や、最後の「:」の後ろが数値でない項目（「Re:ゼロ」など）は
+    全体を項目名として重み1で扱う
+
+    引数:
+        text: カンマ区切りの文字列（例: "剣:5, 盾:3, 薬"）
+
+    戻り値:
+        (項目のリスト, 重みのリスト) のタプル
+    """
+    items, weights = [], []
+    for entry in (text or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, separator, weight = entry.rpartition(':')
+        name = name.strip()
+        if separator and name:
+            try:
+                weights.append(float(weight))
+                items.append(name)
+                continue
+            except ValueError:
+                pass
+        items.append(entry)
+        weights.append(1.0)
+    return items, weights
 
 def weighted_select(items: List[Any], weights: List[float]) -> Any:
     """
     重み付けされたリストからランダムに1つの項目を選択します
     
+    同じ項目と重みのエイリアス表はキャッシュされ、2回目以降はO(1)で選択します
+    
     引数:
         items: 選択対象のリスト
         weights: 各項目の重み（確率）のリスト
@@ -74,16 +363,30 @@ def weighted_select(items: List[Any], weights: List[float]) -> Any:
     if not items:
         logger.warning("空のリストから選択しようとしました")
         return None
-        
-    # 負の重みを0に変換
-    weights = [max(0, w) for w in weights]
     
-    # 全ての重みが0の場合、等確率で選択
-    if sum(weights) == 0:
-        logger.warning("すべての重みが0です。等確率で選択します。")
-        return random.choice(items)
+    return get_weighted_sampler(items, weights).sample()
+
+def weighted_select_multiple(items: List[Any], weights: List[float], count: int) -> List[Any]:
+    """
+    重み付けされたリストから重複ありで複数の項目を選択します
+    
+    引数:
+        items: 選択対象のリスト
+        weights: 各項目の重みのリスト
+        count: 選択する項目数
         
-    return random.choices(items, weights=weights, k=1)[0]
+    戻り値:
+        選択された項目のリスト（項目と重みの数が一致しない場合や空の場合は空のリスト）
+    """
+    if len(items) != len(weights):
+        logger.error("項目リストと重みリストの長さが一致しません")
+        return []
+        
+    if not items:
+        logger.warning("空のリストから選択しようとしました")
+        return []
+    
+    return get_weighted_sampler(items, weights).sample_many(count)
 
 def shuffle_list(items: List[Any]) -> List[Any]:
     """
@@ -0,0 +1,3 @@
+"""
+データ保存パッケージ
+"""
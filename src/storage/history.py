@@ -0,0 +1,671 @@
+"""
+ロール履歴の保存を提供するモジュール
+
+履歴は追記専用のバックエンド（デフォルトはWALモードのSQLite）に保存し、
+最近アクセスしたユーザーの直近の履歴だけをメモリ上のdequeに保持する。
+保存するのは出目を持たない RollRecord（ダイス式・シード・合計）で、出目は必要な時にシードから再生成する。
+バックエンドへの書き込みは専用スレッドでまとめて行い、イベントループを止めない。
+キャッシュにないユーザーの直近の履歴も書き込みスレッドで読み込み、読み込むまでに追加されたロールの前に足す。
+
+SQLiteでは正規化したダイス式・合計・クリティカル/ファンブルのフラグ・チャンネルを列として持ち、
+/history の検索は (ユーザーID, [ダイス式/チャンネル,] 記録時刻) のインデックス（フラグの絞り込みは
+クリティカル/ファンブルの行だけの部分インデックス）の範囲を1回走査するだけで1ページ分を取得する。
+条件に合うロールが少なくても、そのユーザーの履歴全体を走査しない。
+ページ送りはOFFSETではなく直前のページの端の (記録時刻, ID) を基準にするため、履歴の量によらない。
+"""
+import asyncio
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.dice.parser import normalize_dice_notation
+from src.dice.result import RollResult, RollRecord
+
+logger = get_logger()
+
+# (ユーザーID, 記録時刻, ロールの記録, ギルドID, チャンネルID) の組
+HistoryEntry = Tuple[int, float, RollRecord, Optional[int], Optional[int]]
+
+class _HistoryLoad(NamedTuple):
+    """書き込みスレッドに依頼するユーザーの直近の履歴の読み込み"""
+    user_id: int
+    loop: asyncio.AbstractEventLoop
+    future: "asyncio.Future[None]"
+
+# ページの端の (記録時刻, ID)
+HistoryCursor = Tuple[float, int]
+
+# 既存のデータベースに列を追加した後、既存の行の列を埋める単位
+_BACKFILL_BATCH = 1000
+
+class HistoryRow(NamedTuple):
+    """検索で取得した履歴の1件"""
+    id: int
+    created_at: float
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    record: RollRecord
+
+    @property
+    def cursor(self) -> HistoryCursor:
+        """この行をページの端とする場合の基準"""
+        return (self.created_at, self.id)
+
+class HistoryFilter(NamedTuple):
+    """履歴の検索条件（Noneの条件は絞り込まない）"""
+    expression: Optional[str] = None  # 正規化したダイス式
+    flag: Optional[str] = None  # 'critical' / 'fumble'
+    since: Optional[float] = None  # この時刻以降（UNIX時刻）
+    until: Optional[float] = None  # この時刻より前（UNIX時刻）
+    channel_id: Optional[int] = None
+
+    def matches(self, row: HistoryRow) -> bool:
+        """
+        履歴の1件が条件に合うかどうか
+
+        引数:
+            row: 履歴の1件
+
+        戻り値:
+            条件に合う場合はTrue
+        """
+        record = row.record
+        if self.expression is not None and normalize_dice_notation(record.input) != self.expression:
+            return False
+        if self.flag == 'critical' and not record.is_critical:
+            return False
+        if self.flag == 'fumble' and not record.is_fumble:
+            return False
+        if self.since is not None and row.created_at < self.since:
+            return False
+        if self.until is not None and row.created_at >= self.until:
+            return False
+        return self.channel_id is None or row.channel_id == self.channel_id
+
+def _encode_record(record: RollRecord) -> str:
+    """ロールの記録をJSON文字列に変換する"""
+    return json.dumps(record.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+def _decode_record(data: str) -> RollRecord:
+    """JSON文字列からロールの記録を復元する"""
+    return RollRecord.from_dict(json.loads(data))
+
+class HistoryBackend:
+    """履歴バックエンドの基底クラス"""
+
+    def append_many(self, entries: List[HistoryEntry]):
+        """
+        履歴をまとめて追記する
+
+        引数:
+            entries: 追記する履歴のリスト
+        """
+        raise NotImplementedError
+
+    def load_recent(self, user_id: int, limit: int) -> List[RollRecord]:
+        """
+        ユーザーの直近の履歴を古い順に取得する
+
+        引数:
+            user_id: ユーザーID
+            limit: 取得する最大件数
+
+        戻り値:
+            ロールの記録のリスト
+        """
+        raise NotImplementedError
+
+    def query(
+        self,
+        user_id: int,
+        history_filter: HistoryFilter,
+        limit: int,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None
+    ) -> List[HistoryRow]:
+        """
+        ユーザーの履歴を条件で絞り込み、新しい順に1ページ分取得する
+
+        引数:
+            user_id: ユーザーID
+            history_filter: 検索条件
+            limit: 取得する最大件数
+            before: 指定した場合はこれより古い履歴（次のページ）を取得する
+            after: 指定した場合はこれより新しい履歴（前のページ）のうち、最も古いlimit件を取得する
+
+        戻り値:
+            履歴のリスト（新しい順）
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """バックエンドを閉じる"""
+
+class MemoryHistoryBackend(HistoryBackend):
+    """メモリ上に履歴を保持するバックエンド（テスト用）"""
+
+    def __init__(self):
+        self._entries: Dict[int, List[HistoryRow]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def append_many(self, entries: List[HistoryEntry]):
+        with self._lock:
+            for user_id, created_at, record, guild_id, channel_id in entries:
+                row = HistoryRow(self._next_id, created_at, guild_id, channel_id, record)
+                self._entries.setdefault(user_id, []).append(row)
+                self._next_id += 1
+
+    def load_recent(self, user_id: int, limit: int) -> List[RollRecord]:
+        with self._lock:
+            return [row.record for row in self._entries.get(user_id, [])[-limit:]]
+
+    def query(
+        self,
+        user_id: int,
+        history_filter: HistoryFilter,
+        limit: int,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None
+    ) -> List[HistoryRow]:
+        with self._lock:
+            rows = sorted(self._entries.get(user_id, []), key=lambda row: row.cursor, reverse=True)
+        rows = [
+            row for row in rows
+            if history_filter.matches(row)
+            and (before is None or row.cursor < before)
+            and (after is None or row.cursor > after)
+        ]
+        return rows[-limit:] if after is not None else rows[:limit]
+
+class SQLiteHistoryBackend(HistoryBackend):
+    """SQLite（WALモード）に履歴を保存するバックエンド"""
+
+    # 検索用の列（以前のバージョンで作成したデータベースには起動時に追加する）
+    _COLUMNS = (
+        ("guild_id", "INTEGER"),
+        ("channel_id", "INTEGER"),
+        ("expression", "TEXT"),
+        ("total", "INTEGER"),
+        ("is_critical", "INTEGER NOT NULL DEFAULT 0"),
+        ("is_fumble", "INTEGER NOT NULL DEFAULT 0")
+    )
+
+    # 絞り込み用のインデックス（フラグは該当する少数の行だけを持つ部分インデックス）
+    _FILTER_INDEXES = (
+        ("idx_roll_history_user_expression", "(user_id, expression, created_at, id)"),
+        ("idx_roll_history_user_channel", "(user_id, channel_id, created_at, id)"),
+        ("idx_roll_history_user_critical", "(user_id, created_at, id) WHERE is_critical = 1"),
+        ("idx_roll_history_user_fumble", "(user_id, created_at, id) WHERE is_fumble = 1")
+    )
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 書き込みスレッドと読み込み側で共有するため、ロックで直列化する
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS roll_history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+            self._migrate()
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_roll_history_user ON roll_history (user_id, id)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_roll_history_user_time ON roll_history (user_id, created_at, id)"
+            )
+            # 絞り込みごとに、条件に合う行だけを記録時刻の順に読めるインデックスを持つ
+            for name, definition in self._FILTER_INDEXES:
+                self._connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON roll_history {definition}")
+            self._connection.commit()
+
+    def _migrate(self):
+        """検索用の列がなければ追加し、既存の行の列を記録から埋める"""
+        existing = {row[1] for row in self._connection.execute("PRAGMA table_info(roll_history)")}
+        added = False
+        for name, definition in self._COLUMNS:
+            if name not in existing:
+                self._connection.execute(f"ALTER TABLE roll_history ADD COLUMN {name} {definition}")
+                added = True
+        if not added:
+            return
+
+        filled = 0
+        while True:
+            rows = self._connection.execute(
+                "SELECT id, data FROM roll_history WHERE expression IS NULL LIMIT ?", (_BACKFILL_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row_id, data in rows:
+                record = _decode_record(data)
+                updates.append((
+                    normalize_dice_notation(record.input), record.total,
+                    int(record.is_critical), int(record.is_fumble), row_id
+                ))
+            self._connection.executemany(
+                "UPDATE roll_history SET expression = ?, total = ?, is_critical = ?, is_fumble = ? WHERE id = ?",
+                updates
+            )
+            filled += len(updates)
+        self._connection.commit()
+        logger.info("履歴のデータベースに検索用の列を追加しました（既存の履歴 %d 件）", filled)
+
+    def append_many(self, entries: List[HistoryEntry]):
+        rows = [
+            (
+                user_id, created_at, _encode_record(record), guild_id, channel_id,
+                normalize_dice_notation(record.input), record.total, int(record.is_critical), int(record.is_fumble)
+            )
+            for user_id, created_at, record, guild_id, channel_id in entries
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO roll_history "
+                "(user_id, created_at, data, guild_id, channel_id, expression, total, is_critical, is_fumble) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._connection.commit()
+
+    def load_recent(self, user_id: int, limit: int) -> List[RollRecord]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM roll_history WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+        return [_decode_record(data) for (data,) in reversed(rows)]
+
+    def query(
+        self,
+        user_id: int,
+        history_filter: HistoryFilter,
+        limit: int,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None
+    ) -> List[HistoryRow]:
+        conditions = ["user_id = ?"]
+        params: list = [user_id]
+        # 時刻の条件は (user_id, created_at, id) のインデックスの範囲になる
+        if history_filter.since is not None:
+            conditions.append("created_at >= ?")
+            params.append(history_filter.since)
+        if history_filter.until is not None:
+            conditions.append("created_at < ?")
+            params.append(history_filter.until)
+        if before is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(before)
+        if after is not None:
+            conditions.append("(created_at, id) > (?, ?)")
+            params.extend(after)
+        if history_filter.expression is not None:
+            conditions.append("expression = ?")
+            params.append(history_filter.expression)
+        if history_filter.flag == 'critical':
+            conditions.append("is_critical = 1")
+        elif history_filter.flag == 'fumble':
+            conditions.append("is_fumble = 1")
+        if history_filter.channel_id is not None:
+            conditions.append("channel_id = ?")
+            params.append(history_filter.channel_id)
+
+        # 前のページは古い方から数えて取り、新しい順に並べ直す
+        order = "ASC" if after is not None else "DESC"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, created_at, guild_id, channel_id, data FROM roll_history "
+                f"WHERE {' AND '.join(conditions)} "
+                f"ORDER BY created_at {order}, id {order} LIMIT ?",
+                params
+            ).fetchall()
+        if after is not None:
+            rows.reverse()
+        return [
+            HistoryRow(row_id, created_at, guild_id, channel_id, _decode_record(data))
+            for row_id, created_at, guild_id, channel_id, data in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class HistoryStore:
+    """
+    ロール履歴ストア
+
+    ユーザーごとの直近の履歴を deque(maxlen=max_size) でキャッシュし、
+    一定時間アクセスのないユーザーはキャッシュから追い出す。
+    書き込みはキューに積み、書き込みスレッドがまとめてバックエンドに保存する。
+    """
+
+    def __init__(
+        self,
+        backend: HistoryBackend,
+        max_size: int = 10,
+        idle_seconds: float = 600,
+        max_cached_users: int = 10000,
+        flush_interval: float = 1.0,
+        batch_size: int = 200
+    ):
+        self.backend = backend
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.max_cached_users = max_cached_users
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        # ユーザーID -> (最終アクセス時刻, 直近の履歴)。アクセス順に並ぶ
+        self._cache: "OrderedDict[int, Tuple[float, deque]]" = OrderedDict()
+        # 未保存の書き込みがあるユーザーは追い出さない
+        self._pending: Dict[int, int] = {}
+        self._pending_lock = threading.Lock()
+        # 書き込みスレッドが保存するたびに通知する（検索の前にユーザーの書き込みの保存を待つ）
+        self._written = threading.Condition(self._pending_lock)
+        # 書き込みスレッドで直近の履歴を読み込んでいるユーザー -> 読み込みの完了
+        self._loading: Dict[int, "asyncio.Future[None]"] = {}
+
+        # 追加された記録を受け取る関数（クラスターの他のプロセスへの通知に使う）
+        self._listeners: List[Callable[[int, RollRecord], None]] = []
+
+        self._queue: "queue.Queue[Union[HistoryEntry, _HistoryLoad, None]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        self._closed = False
+
+    def append(
+        self,
+        user_id: int,
+        result: Union[RollResult, RollRecord],
+        guild_id: Optional[int] = None,
+        channel_id: Optional[int] = None
+    ):
+        """
+        ユーザーの履歴にロール結果を追加する
+
+        出目は保存せず、ダイス式・シード・合計だけを記録する
+
+        引数:
+            user_id: ユーザーID
+            result: ロール結果（または記録）
+            guild_id: ロールしたギルドのID（検索に使う）
+            channel_id: ロールしたチャンネルのID（検索に使う）
+        """
+        record = RollRecord.from_result(result) if isinstance(result, RollResult) else result
+        now = time.monotonic()
+        history = self._get_cached(user_id, now)
+        history.append(record)
+
+        with self._pending_lock:
+            self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        self._queue.put((user_id, time.time(), record, guild_id, channel_id))
+
+        self._evict(now)
+        for listener in self._listeners:
+            listener(user_id, record)
+
+    def add_listener(self, listener: Callable[[int, RollRecord], None]):
+        """
+        履歴が追加された時に呼ぶ関数を登録する
+
+        引数:
+            listener: ユーザーIDと追加された記録を受け取る関数
+        """
+        self._listeners.append(listener)
+
+    def merge_remote(self, user_id: int, record: RollRecord):
+        """
+        別のプロセスで追加された記録をキャッシュに反映する（バックエンドには書き込まない）
+
+        キャッシュにないユーザーや読み込み中のユーザーは、バックエンドから読み込む分に任せる
+
+        引数:
+            user_id: ユーザーID
+            record: 別のプロセスで追加された記録
+        """
+        entry = self._cache.get(user_id)
+        if entry is not None and user_id not in self._loading:
+            entry[1].append(record)
+
+    async def preload(self, user_id: int):
+        """
+        ユーザーの直近の履歴をイベントループの外で読み込む（読み込み中の場合は完了を待つ）
+
+        引数:
+            user_id: ユーザーID
+        """
+        self._get_cached(user_id, time.monotonic())
+        future = self._loading.get(user_id)
+        if future is not None:
+            await asyncio.shield(future)
+
+    def get(self, user_id: int) -> List[RollRecord]:
+        """
+        ユーザーの直近の履歴を古い順に取得する
+
+        イベントループでは、先に preload で読み込んでおかないと読み込み中の分が含まれない
+
+        引数:
+            user_id: ユーザーID
+
+        戻り値:
+            ロールの記録のリスト
+        """
+        now = time.monotonic()
+        history = list(self._get_cached(user_id, now))
+        self._evict(now)
+        return history
+
+    def query(
+        self,
+        user_id: int,
+        history_filter: HistoryFilter,
+        limit: int,
+        before: Optional[HistoryCursor] = None,
+        after: Optional[HistoryCursor] = None
+    ) -> List[HistoryRow]:
+        """
+        ユーザーの履歴を条件で絞り込み、新しい順に1ページ分取得する
+
+        ユーザーの未保存の書き込みがあればその保存を待ってから検索するため、イベントループの外で呼ぶこと
+        （他のユーザーの書き込みは待たない）
+
+        引数:
+            user_id: ユーザーID
+            history_filter: 検索条件
+            limit: 取得する最大件数
+            before: 指定した場合はこれより古い履歴（次のページ）を取得する
+            after: 指定した場合はこれより新しい履歴（前のページ）を取得する
+
+        戻り値:
+            履歴のリスト（新しい順）
+        """
+        with self._written:
+            self._written.wait_for(lambda: not self._pending.get(user_id))
+        return self.backend.query(user_id, history_filter, limit, before, after)
+
+    def cached_user_count(self) -> int:
+        """キャッシュされているユーザー数"""
+        return len(self._cache)
+
+    def _get_cached(self, user_id: int, now: float) -> deque:
+        """
+        キャッシュから履歴を取得する（なければバックエンドから読み込む）
+
+        イベントループでは空の履歴を返し、読み込みは書き込みスレッドに依頼する。
+        キャッシュにないユーザーには未保存の書き込みがないため、依頼より後に積まれた書き込みの前に
+        読み込めば、バックエンドにあるのはキャッシュに追加される前の履歴だけになる
+        """
+        entry = self._cache.get(user_id)
+        if entry is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is None:
+                history = deque(self.backend.load_recent(user_id, self.max_size), maxlen=self.max_size)
+            else:
+                history = deque(maxlen=self.max_size)
+                future = loop.create_future()
+                self._loading[user_id] = future
+                self._queue.put(_HistoryLoad(user_id, loop, future))
+        else:
+            history = entry[1]
+            self._cache.move_to_end(user_id)
+        self._cache[user_id] = (now, history)
+        return history
+
+    def _evict(self, now: float):
+        """アイドル状態のユーザーと上限を超えた分のユーザーをキャッシュから追い出す"""
+        cache = self._cache
+        excess = len(cache) - self.max_cached_users
+        evicted = []
+        for user_id, (last_access, _) in cache.items():
+            if excess <= 0 and now - last_access < self.idle_seconds:
+                break
+            with self._pending_lock:
+                if self._pending.get(user_id):
+                    # 保存が終わるまでは残し（次回以降の追い出しで対象になる）、次に古いユーザーを調べる
+                    continue
+            evicted.append(user_id)
+            excess -= 1
+        for user_id in evicted:
+            del cache[user_id]
+            self._loading.pop(user_id, None)
+
+    def _load_recent(self, load: _HistoryLoad):
+        """書き込みスレッドでユーザーの直近の履歴を読み込み、イベントループでキャッシュに反映する"""
+        try:
+            records = self.backend.load_recent(load.user_id, self.max_size)
+        except Exception as e:
+            logger.error("履歴の読み込み中にエラーが発生しました: %s", e)
+            records = []
+        try:
+            load.loop.call_soon_threadsafe(self._merge_loaded, load, records)
+        except RuntimeError:
+            # イベントループが既に閉じている
+            pass
+
+    def _merge_loaded(self, load: _HistoryLoad, records: List[RollRecord]):
+        """読み込んだ履歴を、読み込み中に追加されたロールの前に足す"""
+        if self._loading.get(load.user_id) is load.future:
+            del self._loading[load.user_id]
+            entry = self._cache.get(load.user_id)
+            if entry is not None:
+                history = entry[1]
+                appended = list(history)
+                history.clear()
+                history.extend(records)
+                history.extend(appended)
+        if not load.future.done():
+            load.future.set_result(None)
+
+    def _write_loop(self):
+        """キューに積まれた履歴をまとめてバックエンドに書き込む"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            items = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            # 履歴の読み込みは待たせないよう、まとめるのをやめてすぐに処理する
+            while len(items) < self.batch_size and not isinstance(items[-1], _HistoryLoad):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+
+            # 読み込みはこのまとまりの書き込みより前に行う（読み込みより後に追加されたロールを含めない）
+            batch = []
+            for item in items:
+                if isinstance(item, _HistoryLoad):
+                    self._load_recent(item)
+                else:
+                    batch.append(item)
+
+            try:
+                if batch:
+                    self.backend.append_many(batch)
+            except Exception as e:
+                logger.error("履歴の保存中にエラーが発生しました: %s", e)
+            finally:
+                with self._written:
+                    for user_id, *_ in batch:
+                        remaining = self._pending.get(user_id, 0) - 1
+                        if remaining > 0:
+                            self._pending[user_id] = remaining
+                        else:
+                            self._pending.pop(user_id, None)
+                    self._written.notify_all()
+                for _ in range(len(items) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def flush(self):
+        """キューに積まれた書き込みが全て保存されるまで待つ"""
+        self._queue.join()
+
+    def close(self):
+        """未保存の履歴を書き込んでからストアを閉じる"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self.backend.close()
+
+_history_store: Optional[HistoryStore] = None
+
+def create_history_backend() -> HistoryBackend:
+    """設定に従って履歴バックエンドを作成する"""
+    settings = get_settings()
+    if settings.history_backend == 'memory':
+        return MemoryHistoryBackend()
+    return SQLiteHistoryBackend(settings.history_db_path)
+
+def get_history_store() -> HistoryStore:
+    """履歴ストアを取得する（初回呼び出し時に作成）"""
+    global _history_store
+    if _history_store is None:
+        settings = get_settings()
+        _history_store = HistoryStore(
+            create_history_backend(),
+            max_size=settings.max_history_size,
+            idle_seconds=settings.history_idle_seconds,
+            max_cached_users=settings.history_cache_max_users,
+            flush_interval=settings.history_flush_interval,
+            batch_size=settings.history_batch_size
+        )
+        atexit.register(_history_store.close)
+    return _history_store
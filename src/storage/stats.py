@@ -0,0 +1,542 @@
+"""
+ギルドごとの運の統計（ロールの集計値）を提供するモジュール
+
+ロールのたびに (ギルドID, ユーザーID) ごとの集計値（回数・合計・二乗和・クリティカル/ファンブルの回数・
+ダイスの面数ごとの出目の頻度）を更新し、/stats と /leaderboard は履歴を読まずに集計値だけで答える。
+更新はメモリ上で行い、前回の保存からの差分を一定間隔でバックエンドの集計値に加える。
+集計値は全て和で表せるため、複数のプロセス（クラスター）が同じ行を更新しても互いの分を上書きしない
+（DMの集計値は全てのクラスターが更新する）。
+
+運の良さは、ロールの合計がダイス式の期待値から標準偏差いくつ分ずれたか（zスコア）の平均で表す。
+ダイス式ごとの合計の大きさによらず比べられる。
+"""
+import asyncio
+import atexit
+import heapq
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.dice.result import RollResult
+
+logger = get_logger()
+
+# ギルド全体の集計値を保持するユーザーID
+GUILD_TOTAL_USER = 0
+
+# DMでのロールを集計するギルドID
+DIRECT_MESSAGE_GUILD = 0
+
+# 出目の頻度を数えるダイスの最大の面数（それより大きいダイスは合計だけを集計する）
+STATS_MAX_FACE_SIDES = 100
+
+class LuckStats:
+    """1人（またはギルド全体）のロールの集計値"""
+    __slots__ = ('count', 'total', 'total_squares', 'critical', 'fumble', 'luck_count', 'luck_sum', 'faces')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.critical = 0
+        self.fumble = 0
+        # 合計にばらつきのあるロールの数と、そのzスコアの和
+        self.luck_count = 0
+        self.luck_sum = 0.0
+        # 面数 -> 出目ごとの回数（添字は出目-1）
+        self.faces: Dict[int, List[int]] = {}
+
+    def add(self, result: RollResult):
+        """
+        ロール結果を集計値に加える
+
+        計算量はダイスの数に比例し、これまでのロールの数によらない
+
+        引数:
+            result: ロール結果
+        """
+        total = result.total
+        self.count += 1
+        self.total += total
+        self.total_squares += total * total
+
+        # 修正値は期待値をずらすだけで、ばらつきには寄与しない
+        mean = float(sum(term.value for term in result.terms if term.type == "modifier"))
+        variance = 0.0
+        critical = fumble = False
+        for term in result.dice_terms:
+            count = abs(term.count)
+            sides = term.sides
+            mean += (sides + 1) / 2 * (count if term.count > 0 else -count)
+            variance += count * (sides * sides - 1) / 12
+            critical = critical or term.is_critical
+            fumble = fumble or term.is_fumble
+            # 合計だけのロールは出目を持たない
+            if sides <= STATS_MAX_FACE_SIDES and len(term.rolls) == count:
+                histogram = self.faces.get(sides)
+                if histogram is None:
+                    histogram = self.faces[sides] = [0] * sides
+                for face in term.rolls:
+                    histogram[face - 1] += 1
+        if critical:
+            self.critical += 1
+        if fumble:
+            self.fumble += 1
+        if variance > 0:
+            self.luck_count += 1
+            self.luck_sum += (total - mean) / math.sqrt(variance)
+
+    @property
+    def mean(self) -> float:
+        """合計の平均"""
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """合計の標準偏差"""
+        if not self.count:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(max(self.total_squares / self.count - mean * mean, 0.0))
+
+    @property
+    def critical_rate(self) -> float:
+        """クリティカルの割合"""
+        return self.critical / self.count if self.count else 0.0
+
+    @property
+    def fumble_rate(self) -> float:
+        """ファンブルの割合"""
+        return self.fumble / self.count if self.count else 0.0
+
+    @property
+    def luck(self) -> float:
+        """運の良さ（合計のzスコアの平均。0が期待値どおり）"""
+        return self.luck_sum / self.luck_count if self.luck_count else 0.0
+
+    def face_mean(self, sides: int) -> Optional[float]:
+        """
+        指定した面数のダイスの出目の平均
+
+        引数:
+            sides: ダイスの面数
+
+        戻り値:
+            出目の平均（そのダイスを振っていない場合はNone）
+        """
+        histogram = self.faces.get(sides)
+        if not histogram:
+            return None
+        dice = sum(histogram)
+        if not dice:
+            return None
+        return sum(face * times for face, times in enumerate(histogram, 1)) / dice
+
+    def merge(self, other: "LuckStats"):
+        """
+        他の集計値を加える
+
+        引数:
+            other: 加える集計値
+        """
+        for name in ('count', 'total', 'total_squares', 'critical', 'fumble', 'luck_count', 'luck_sum'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for sides, histogram in other.faces.items():
+            mine = self.faces.get(sides)
+            if mine is None:
+                self.faces[sides] = list(histogram)
+            else:
+                for index, times in enumerate(histogram):
+                    mine[index] += times
+
+    def copy(self) -> "LuckStats":
+        """集計値の複製"""
+        stats = LuckStats()
+        for name in ('count', 'total', 'total_squares', 'critical', 'fumble', 'luck_count', 'luck_sum'):
+            setattr(stats, name, getattr(self, name))
+        stats.faces = {sides: list(histogram) for sides, histogram in self.faces.items()}
+        return stats
+
+    def to_dict(self) -> dict:
+        """
+        保存用の辞書に変換する
+
+        戻り値:
+            JSONに変換可能な辞書
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "total_squares": self.total_squares,
+            "critical": self.critical,
+            "fumble": self.fumble,
+            "luck_count": self.luck_count,
+            "luck_sum": self.luck_sum,
+            "faces": {str(sides): histogram for sides, histogram in self.faces.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LuckStats":
+        """
+        保存用の辞書から集計値を復元する
+
+        引数:
+            data: to_dict で作成した辞書
+
+        戻り値:
+            集計値
+        """
+        stats = cls()
+        for name in ('count', 'total', 'total_squares', 'critical', 'fumble', 'luck_count'):
+            setattr(stats, name, int(data.get(name, 0)))
+        stats.luck_sum = float(data.get("luck_sum", 0.0))
+        stats.faces = {int(sides): list(histogram) for sides, histogram in data.get("faces", {}).items()}
+        return stats
+
+# リーダーボードの指標 -> (集計値から値を取り出す関数, 最低回数を適用するか)
+LEADERBOARD_METRICS: Dict[str, Tuple[Callable[[LuckStats], float], bool]] = {
+    'luck': (lambda stats: stats.luck, True),
+    'critical': (lambda stats: stats.critical_rate, True),
+    'fumble': (lambda stats: stats.fumble_rate, True),
+    'rolls': (lambda stats: stats.count, False)
+}
+
+# (ギルドID, ユーザーID, 集計値の辞書) の組
+StatsEntry = Tuple[int, int, dict]
+
+class StatsBackend:
+    """集計値のバックエンドの基底クラス"""
+
+    def load_guild(self, guild_id: int) -> Dict[int, LuckStats]:
+        """
+        ギルドの全員の集計値を読み込む
+
+        引数:
+            guild_id: ギルドID
+
+        戻り値:
+            ユーザーID -> 集計値 の辞書
+        """
+        raise NotImplementedError
+
+    def merge_many(self, entries: List[StatsEntry]):
+        """
+        集計値の差分をまとめて保存済みの集計値に加える（保存済みの集計値がなければそのまま保存する）
+
+        引数:
+            entries: 加える差分のリスト
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """バックエンドを閉じる"""
+
+class MemoryStatsBackend(StatsBackend):
+    """メモリ上に集計値を保持するバックエンド（テスト用）"""
+
+    def __init__(self):
+        self._entries: Dict[int, Dict[int, dict]] = {}
+        self._lock = threading.Lock()
+
+    def load_guild(self, guild_id: int) -> Dict[int, LuckStats]:
+        with self._lock:
+            entries = dict(self._entries.get(guild_id, {}))
+        return {user_id: LuckStats.from_dict(data) for user_id, data in entries.items()}
+
+    def merge_many(self, entries: List[StatsEntry]):
+        with self._lock:
+            for guild_id, user_id, data in entries:
+                guild = self._entries.setdefault(guild_id, {})
+                stats = LuckStats.from_dict(data)
+                if user_id in guild:
+                    stored = LuckStats.from_dict(guild[user_id])
+                    stored.merge(stats)
+                    stats = stored
+                guild[user_id] = stats.to_dict()
+
+class SQLiteStatsBackend(StatsBackend):
+    """SQLite（WALモード）に集計値を保存するバックエンド"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 保存スレッドと読み込み側で共有するため、ロックで直列化する
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS roll_stats ("
+                "guild_id INTEGER NOT NULL, "
+                "user_id INTEGER NOT NULL, "
+                "data TEXT NOT NULL, "
+                "PRIMARY KEY (guild_id, user_id))"
+            )
+            self._connection.commit()
+
+    def load_guild(self, guild_id: int) -> Dict[int, LuckStats]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT user_id, data FROM roll_stats WHERE guild_id = ?", (guild_id,)
+            ).fetchall()
+        return {user_id: LuckStats.from_dict(json.loads(data)) for user_id, data in rows}
+
+    def merge_many(self, entries: List[StatsEntry]):
+        with self._lock:
+            # 他のプロセスが同じ行を読んでから書くまでの間に更新しないよう、書き込みのロックを先に取る
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                for guild_id, user_id, data in entries:
+                    stats = LuckStats.from_dict(data)
+                    stored = self._connection.execute(
+                        "SELECT data FROM roll_stats WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+                    ).fetchone()
+                    if stored is not None:
+                        merged = LuckStats.from_dict(json.loads(stored[0]))
+                        merged.merge(stats)
+                        stats = merged
+                    rows.append((guild_id, user_id, json.dumps(stats.to_dict(), separators=(',', ':'))))
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO roll_stats (guild_id, user_id, data) VALUES (?, ?, ?)", rows
+                )
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class LuckStatsStore:
+    """
+    運の統計のストア
+
+    ギルドの集計値は最初にアクセスした時にバックエンドからまとめて読み込み、以降はメモリ上で更新する。
+    ユーザーごとの集計値と同時にギルド全体の集計値（ユーザーID 0）も更新する。
+    ロールの記録はバックエンドを読まず、前回の保存からの差分に加えるだけで、保存スレッドが
+    flush_interval 秒ごとに差分をバックエンドの集計値に加える。読み込み前のギルドの差分は、
+    読み込んだ時に保存済みの集計値に加える。
+    idle_seconds 秒参照されず、保存していない差分もないギルドは、保存の後にメモリから外す（次の参照で読み込み直す）。
+
+    イベントループからは preload でギルドを読み込んでから get・leaderboard を呼ぶ。
+    他のクラスターが更新したDMの集計値は、そのクラスターが保存した後に読み込んだ分だけが反映される。
+    """
+
+    def __init__(self, backend: StatsBackend, flush_interval: float = 30.0, idle_seconds: float = 600.0):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+
+        # ギルドID -> ユーザーID -> 集計値
+        self._guilds: Dict[int, Dict[int, LuckStats]] = {}
+        # ギルドID -> 最後に参照した時刻
+        self._last_access: Dict[int, float] = {}
+        # (ギルドID, ユーザーID) -> 保存していない差分
+        self._pending: Dict[Tuple[int, int], LuckStats] = {}
+        self._lock = threading.Lock()
+        # 読み込みと保存を直列化し、保存中の差分が読み込み結果に二重に加わらない（または欠けない）ようにする
+        self._io_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._flush_loop, name="stats-writer", daemon=True)
+        self._writer.start()
+        self._closed = False
+
+    def record(self, guild_id: Optional[int], user_id: int, result: RollResult):
+        """
+        ロール結果をユーザーとギルド全体の集計値に加える
+
+        引数:
+            guild_id: ロールしたギルドのID（DMの場合はNone）
+            user_id: ユーザーID
+            result: ロール結果
+        """
+        guild_key = guild_id or DIRECT_MESSAGE_GUILD
+        with self._lock:
+            # 読み込み前のギルドは差分だけを記録する（イベントループ上でバックエンドを読まない）
+            guild = self._guilds.get(guild_key)
+            for key in (user_id, GUILD_TOTAL_USER):
+                delta = self._pending.get((guild_key, key))
+                if delta is None:
+                    delta = self._pending[(guild_key, key)] = LuckStats()
+                delta.add(result)
+                if guild is not None:
+                    stats = guild.get(key)
+                    if stats is None:
+                        stats = guild[key] = LuckStats()
+                    stats.add(result)
+
+    async def preload(self, guild_id: Optional[int]):
+        """
+        ギルドの集計値をイベントループの外で読み込む
+
+        引数:
+            guild_id: ギルドID（DMの場合はNone）
+        """
+        guild_key = guild_id or DIRECT_MESSAGE_GUILD
+        if guild_key not in self._guilds:
+            await asyncio.get_running_loop().run_in_executor(None, self._load, guild_key)
+
+    def get(self, guild_id: Optional[int], user_id: int = GUILD_TOTAL_USER) -> Optional[LuckStats]:
+        """
+        集計値の複製を取得する
+
+        引数:
+            guild_id: ギルドID（DMの場合はNone）
+            user_id: ユーザーID（省略時はギルド全体）
+
+        戻り値:
+            集計値（まだロールしていない場合はNone）
+        """
+        guild = self._load(guild_id or DIRECT_MESSAGE_GUILD)
+        with self._lock:
+            stats = guild.get(user_id)
+            return stats.copy() if stats is not None else None
+
+    def leaderboard(
+        self,
+        guild_id: Optional[int],
+        metric: str,
+        min_rolls: int = 1,
+        limit: int = 10
+    ) -> List[Tuple[int, float, LuckStats]]:
+        """
+        ギルドのリーダーボードを作成する
+
+        引数:
+            guild_id: ギルドID（DMの場合はNone）
+            metric: 指標（LEADERBOARD_METRICS のキー）
+            min_rolls: 順位に含めるのに必要なロールの回数（回数の指標には適用しない）
+            limit: 取得する人数
+
+        戻り値:
+            (ユーザーID, 指標の値, 集計値) のリスト（値の大きい順）
+
+        例外:
+            ValueError: 指標が不明な場合
+        """
+        if metric not in LEADERBOARD_METRICS:
+            raise ValueError(f"不明な指標です: {metric}")
+        value, use_min_rolls = LEADERBOARD_METRICS[metric]
+        threshold = min_rolls if use_min_rolls else 1
+        guild = self._load(guild_id or DIRECT_MESSAGE_GUILD)
+        with self._lock:
+            top = heapq.nlargest(
+                limit,
+                (
+                    (value(stats), user_id) for user_id, stats in guild.items()
+                    if user_id != GUILD_TOTAL_USER and stats.count >= threshold
+                ),
+                key=lambda candidate: candidate[0]
+            )
+            return [(user_id, score, guild[user_id].copy()) for score, user_id in top]
+
+    def loaded_guild_count(self) -> int:
+        """メモリ上にあるギルドの数"""
+        return len(self._guilds)
+
+    def _load(self, guild_key: int) -> Dict[int, LuckStats]:
+        """ギルドの集計値を取得する（なければバックエンドから読み込む）"""
+        self._last_access[guild_key] = time.monotonic()
+        guild = self._guilds.get(guild_key)
+        if guild is not None:
+            return guild
+        with self._io_lock:
+            # 待っている間に別のスレッドが読み込んでいた場合はそちらを使う
+            guild = self._guilds.get(guild_key)
+            if guild is not None:
+                return guild
+            loaded = self.backend.load_guild(guild_key)
+            with self._lock:
+                # まだ保存していない差分を加える
+                for (pending_guild, user_id), delta in self._pending.items():
+                    if pending_guild == guild_key:
+                        stats = loaded.get(user_id)
+                        if stats is None:
+                            stats = loaded[user_id] = LuckStats()
+                        stats.merge(delta)
+                self._guilds[guild_key] = loaded
+                return loaded
+
+    def flush(self):
+        """前回の保存からの差分をバックエンドの集計値に加え、アイドル状態のギルドをメモリから外す"""
+        with self._io_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+            if pending:
+                self._merge_pending(pending)
+            self._evict(time.monotonic())
+
+    def _merge_pending(self, pending: Dict[Tuple[int, int], LuckStats]):
+        """差分をバックエンドの集計値に加える（失敗した場合は次回の保存に回す）"""
+        entries = [(guild_key, user_id, delta.to_dict()) for (guild_key, user_id), delta in pending.items()]
+        try:
+            self.backend.merge_many(entries)
+        except Exception as e:
+            logger.error("運の統計の保存中にエラーが発生しました: %s", e)
+            # 次回の保存で再試行する（その間に記録した差分と合わせる）
+            with self._lock:
+                for key, delta in pending.items():
+                    newer = self._pending.get(key)
+                    if newer is not None:
+                        delta.merge(newer)
+                    self._pending[key] = delta
+
+    def _evict(self, now: float):
+        """一定時間参照されず、保存していない差分のないギルドをメモリから外す（_io_lock を持って呼ぶ）"""
+        with self._lock:
+            pending_guilds = {guild_key for guild_key, _ in self._pending}
+            for guild_key in list(self._guilds):
+                if guild_key in pending_guilds:
+                    continue
+                if now - self._last_access.get(guild_key, now) >= self.idle_seconds:
+                    del self._guilds[guild_key]
+                    self._last_access.pop(guild_key, None)
+
+    def _flush_loop(self):
+        """一定間隔で変更のあった集計値を保存する"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """変更のあった集計値を保存してからストアを閉じる"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._writer.join()
+        self.flush()
+        self.backend.close()
+
+_stats_store: Optional[LuckStatsStore] = None
+
+def create_stats_backend() -> StatsBackend:
+    """設定に従って集計値のバックエンドを作成する（履歴と同じデータベースに保存する）"""
+    settings = get_settings()
+    if settings.history_backend == 'memory':
+        return MemoryStatsBackend()
+    return SQLiteStatsBackend(settings.history_db_path)
+
+def get_luck_stats_store() -> LuckStatsStore:
+    """運の統計のストアを取得する（初回呼び出し時に作成）"""
+    global _stats_store
+    if _stats_store is None:
+        settings = get_settings()
+        _stats_store = LuckStatsStore(
+            create_stats_backend(),
+            flush_interval=settings.stats_flush_interval,
+            idle_seconds=settings.stats_idle_seconds
+        )
+        atexit.register(_stats_store.close)
+    return _stats_store
@@ -0,0 +1,3 @@
+"""
+タイマーパッケージ - 予定したイベントを指定時刻に実行する
+"""
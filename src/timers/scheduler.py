@@ -0,0 +1,377 @@
+"""
+予定したイベントを指定時刻に実行するスケジューラー
+
+予定はすべて1つの最小ヒープ（実行時刻, ID）に積み、1つのタスクが先頭の実行時刻まで眠って
+順に取り出す。待機中の予定がいくつあってもタスクは1つで、起きるのは先頭の予定が来た時と
+より早い予定が追加された時だけ。取り消しはヒープから削除せず、取り出した時に読み飛ばす。
+
+予定はバックエンド（デフォルトはWALモードのSQLite）に保存し、再起動時に読み込み直す。
+再起動中に実行時刻を過ぎた予定は、起動直後に実行する。
+"""
+import asyncio
+import atexit
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger()
+
+# 1回の待機の上限（秒）。時計が変更された場合でもこの間隔で実行時刻を確認し直す
+MAX_SLEEP = 60.0
+
+class ScheduledEvent:
+    """予定したイベント"""
+    __slots__ = ('id', 'kind', 'due_at', 'payload', 'owner')
+
+    def __init__(self, id: Optional[int], kind: str, due_at: float, payload: Dict[str, Any], owner: int = 0):
+        """
+        引数:
+            id: 予定のID（保存前はNone）
+            kind: イベントの種類（登録した処理を選ぶのに使う）
+            due_at: 実行時刻（UNIX時間）
+            payload: 処理に渡すデータ（JSONに変換可能な辞書）
+            owner: 予定を実行するプロセス（クラスターID）
+        """
+        self.id = id
+        self.kind = kind
+        self.due_at = due_at
+        self.payload = payload
+        self.owner = owner
+
+    def __repr__(self) -> str:
+        return f"ScheduledEvent(id={self.id}, kind={self.kind!r}, due_at={self.due_at})"
+
+EventHandler = Callable[[ScheduledEvent], Awaitable[None]]
+
+class SchedulerBackend:
+    """予定の保存先の基底クラス"""
+
+    def add(self, event: ScheduledEvent) -> int:
+        """
+        予定を保存する
+
+        引数:
+            event: 保存する予定
+
+        戻り値:
+            予定のID
+        """
+        raise NotImplementedError
+
+    def remove(self, event_id: int):
+        """
+        予定を削除する
+
+        引数:
+            event_id: 予定のID
+        """
+        raise NotImplementedError
+
+    def load_pending(self, owner: int) -> List[ScheduledEvent]:
+        """
+        保存されている予定を読み込む
+
+        引数:
+            owner: 予定を実行するプロセス
+
+        戻り値:
+            予定のリスト
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """保存先を閉じる"""
+
+class MemorySchedulerBackend(SchedulerBackend):
+    """メモリ上に予定を保持するバックエンド（テスト用）"""
+
+    def __init__(self):
+        self._events: Dict[int, ScheduledEvent] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def add(self, event: ScheduledEvent) -> int:
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events[event_id] = ScheduledEvent(event_id, event.kind, event.due_at, event.payload, event.owner)
+        return event_id
+
+    def remove(self, event_id: int):
+        with self._lock:
+            self._events.pop(event_id, None)
+
+    def load_pending(self, owner: int) -> List[ScheduledEvent]:
+        with self._lock:
+            return [
+                ScheduledEvent(e.id, e.kind, e.due_at, e.payload, e.owner)
+                for e in self._events.values() if e.owner == owner
+            ]
+
+class SQLiteSchedulerBackend(SchedulerBackend):
+    """SQLite（WALモード）に予定を保存するバックエンド"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # エグゼキューターのスレッドから使うため、ロックで直列化する
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS scheduled_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "owner INTEGER NOT NULL, "
+                "kind TEXT NOT NULL, "
+                "due_at REAL NOT NULL, "
+                "payload TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_scheduled_events_owner ON scheduled_events (owner, due_at)"
+            )
+            self._connection.commit()
+
+    def add(self, event: ScheduledEvent) -> int:
+        payload = json.dumps(event.payload, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO scheduled_events (owner, kind, due_at, payload) VALUES (?, ?, ?, ?)",
+                (event.owner, event.kind, event.due_at, payload)
+            )
+            self._connection.commit()
+        return cursor.lastrowid
+
+    def remove(self, event_id: int):
+        with self._lock:
+            self._connection.execute("DELETE FROM scheduled_events WHERE id = ?", (event_id,))
+            self._connection.commit()
+
+    def load_pending(self, owner: int) -> List[ScheduledEvent]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, kind, due_at, payload FROM scheduled_events WHERE owner = ?", (owner,)
+            ).fetchall()
+        return [
+            ScheduledEvent(event_id, kind, due_at, json.loads(payload), owner)
+            for event_id, kind, due_at, payload in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class Scheduler:
+    """
+    予定したイベントを指定時刻に実行するスケジューラー
+
+    イベントの種類ごとに register で処理（コルーチン関数）を登録し、schedule で予定を追加する。
+    予定の保存と削除はエグゼキューターで行い、イベントループを止めない。
+    """
+
+    def __init__(self, backend: SchedulerBackend, clock: Callable[[], float] = time.time):
+        """
+        引数:
+            backend: 予定の保存先
+            clock: 現在時刻（UNIX時間）を返す関数
+        """
+        self.backend = backend
+        self.owner = 0
+        self._clock = clock
+        # (実行時刻, ID) の最小ヒープ。取り消した予定は _events から消し、取り出した時に読み飛ばす
+        self._heap: List[Tuple[float, int]] = []
+        self._events: Dict[int, ScheduledEvent] = {}
+        self._handlers: Dict[str, EventHandler] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def register(self, kind: str, handler: EventHandler):
+        """
+        イベントの種類に対応する処理を登録する
+
+        引数:
+            kind: イベントの種類
+            handler: 予定を受け取るコルーチン関数
+        """
+        self._handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, owner: int = 0):
+        """
+        保存されている予定を読み込み、実行を開始する
+
+        引数:
+            owner: このプロセスが実行する予定（クラスターID）
+        """
+        if self.running:
+            return
+        self.owner = owner
+        loop = asyncio.get_running_loop()
+        pending = await loop.run_in_executor(None, self.backend.load_pending, owner)
+        for event in pending:
+            if event.id in self._events:
+                continue
+            self._events[event.id] = event
+            self._heap.append((event.due_at, event.id))
+        heapq.heapify(self._heap)
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        overdue = sum(1 for event in pending if event.due_at <= self._clock())
+        logger.info("スケジューラーを開始しました（予定 %d件、実行時刻を過ぎた予定 %d件）", len(pending), overdue)
+
+    async def close(self):
+        """実行を停止する（保存されている予定は次回の起動時に実行する）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def schedule(self, kind: str, delay: float, payload: Dict[str, Any]) -> ScheduledEvent:
+        """
+        予定を追加する
+
+        引数:
+            kind: イベントの種類
+            delay: 実行までの秒数
+            payload: 処理に渡すデータ（JSONに変換可能な辞書）
+
+        戻り値:
+            追加した予定
+        """
+        event = ScheduledEvent(None, kind, self._clock() + max(0.0, delay), payload, self.owner)
+        event.id = await asyncio.get_running_loop().run_in_executor(None, self.backend.add, event)
+        self._events[event.id] = event
+        heapq.heappush(self._heap, (event.due_at, event.id))
+        # 先頭が入れ替わった場合だけ待機中のタスクを起こす
+        if self._wakeup is not None and self._heap[0][1] == event.id:
+            self._wakeup.set()
+        return event
+
+    async def cancel(self, event_id: int) -> bool:
+        """
+        予定を取り消す
+
+        引数:
+            event_id: 予定のID
+
+        戻り値:
+            取り消した場合はTrue（既に実行した場合や存在しない場合はFalse）
+        """
+        if self._events.pop(event_id, None) is None:
+            return False
+        await asyncio.get_running_loop().run_in_executor(None, self.backend.remove, event_id)
+        return True
+
+    def get(self, event_id: int) -> Optional[ScheduledEvent]:
+        """実行を待っている予定を取得する"""
+        return self._events.get(event_id)
+
+    def pending(self, kind: Optional[str] = None) -> List[ScheduledEvent]:
+        """
+        実行を待っている予定を実行時刻の順に取得する
+
+        引数:
+            kind: 指定した場合はこの種類の予定だけを返す
+
+        戻り値:
+            予定のリスト
+        """
+        events = [event for event in self._events.values() if kind is None or event.kind == kind]
+        events.sort(key=lambda event: (event.due_at, event.id))
+        return events
+
+    def pending_count(self) -> int:
+        """実行を待っている予定の数"""
+        return len(self._events)
+
+    async def _run(self):
+        """先頭の予定の実行時刻まで待ち、実行時刻を過ぎた予定を順に実行する"""
+        heap = self._heap
+        while True:
+            # 取り消した予定を読み飛ばす
+            while heap and heap[0][1] not in self._events:
+                heapq.heappop(heap)
+
+            self._wakeup.clear()
+            if not heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = heap[0][0] - self._clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, event_id = heapq.heappop(heap)
+            event = self._events.pop(event_id)
+            task = asyncio.ensure_future(self._dispatch(event))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, event: ScheduledEvent):
+        """予定の処理を実行し、保存先から削除する"""
+        handler = self._handlers.get(event.kind)
+        try:
+            if handler is None:
+                logger.warning("処理が登録されていない予定を破棄しました: %s", event.kind)
+            else:
+                await handler(event)
+        except Exception as e:
+            logger.error("予定 %s (%d) の実行中にエラーが発生しました: %s", event.kind, event.id, e)
+        finally:
+            # 失敗した予定も再実行しない（同じエラーを繰り返さないよう破棄する）
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.backend.remove, event.id)
+            except Exception as e:
+                logger.error("予定 %d の削除中にエラーが発生しました: %s", event.id, e)
+
+_scheduler: Optional[Scheduler] = None
+
+# イベントの種類 -> 処理（スケジューラーの作成時にまとめて登録する）
+_event_handlers: Dict[str, EventHandler] = {}
+
+def register_event_handler(kind: str, handler: EventHandler):
+    """
+    イベントの種類に対応する処理を登録する
+
+    スケジューラーがまだなければ作成せず（保存先のデータベースも開かず）、作成時に登録する。
+    コマンドの登録時に呼んでよい
+
+    引数:
+        kind: イベントの種類
+        handler: 予定を受け取るコルーチン関数
+    """
+    _event_handlers[kind] = handler
+    if _scheduler is not None:
+        _scheduler.register(kind, handler)
+
+def get_scheduler() -> Scheduler:
+    """スケジューラーを取得する（初回呼び出し時に作成）"""
+    global _scheduler
+    if _scheduler is None:
+        backend = SQLiteSchedulerBackend(get_settings().scheduler_db_path)
+        _scheduler = Scheduler(backend)
+        for kind, handler in _event_handlers.items():
+            _scheduler.register(kind, handler)
+        atexit.register(backend.close)
+    return _scheduler
@@ -0,0 +1,134 @@
+"""
+スラッシュコマンドの同期を管理するモジュール
+
+登録されたコマンドツリー（名前・引数・説明など、Discordに送る内容）のハッシュを計算し、
+前回同期したハッシュと異なる場合だけ同期する。ハッシュはアプリケーションIDと同期先
+（グローバルまたはギルド）ごとにファイルへ保存するため、再接続や再起動のたびに同期しない。
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+import discord
+from discord import app_commands
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+def command_tree_fingerprint(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """
+    同期先に送るコマンドツリーのハッシュを計算する
+
+    引数:
+        tree: コマンドツリー
+        guild: 同期先のギルド（Noneの場合はグローバル）
+
+    戻り値:
+        コマンドの定義のSHA-256（16進数）
+    """
+    payload = sorted(
+        (command.to_dict() for command in tree.get_commands(guild=guild)),
+        key=lambda data: (data.get("type", 1), data["name"])
+    )
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class CommandSyncManager:
+    """コマンドツリーが変わった場合だけ同期する"""
+
+    def __init__(self, tree: app_commands.CommandTree, state_path: str):
+        """
+        引数:
+            tree: コマンドツリー
+            state_path: 前回同期したハッシュを保存するファイル
+        """
+        self.tree = tree
+        self.state_path = state_path
+
+    def _load_state(self) -> Dict[str, str]:
+        """保存したハッシュを読み込む（読めない場合は空）"""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("コマンドの同期状態を読み込めませんでした（同期し直します）: %s", e)
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _save_state(self, state: Dict[str, str]):
+        """ハッシュを保存する（途中で中断しても壊れないよう一時ファイルから置き換える）"""
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.state_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _state_key(self, guild: Optional[discord.abc.Snowflake]) -> str:
+        """同期先を表すキー（別のアプリケーションのトークンで起動した場合は別扱い）"""
+        target = "global" if guild is None else f"guild:{guild.id}"
+        return f"{self.tree.client.application_id}:{target}"
+
+    def needs_sync(self, guild: Optional[discord.abc.Snowflake] = None) -> bool:
+        """
+        前回の同期からコマンドツリーが変わったかどうか
+
+        引数:
+            guild: 同期先のギルド（Noneの場合はグローバル）
+        """
+        return self._load_state().get(self._state_key(guild)) != command_tree_fingerprint(self.tree, guild)
+
+    async def sync(self, guild: Optional[discord.abc.Snowflake] = None, force: bool = False) -> Optional[int]:
+        """
+        コマンドツリーが変わっていれば同期する
+
+        引数:
+            guild: 同期先のギルド（Noneの場合はグローバル）
+            force: Trueの場合は変わっていなくても同期する
+
+        戻り値:
+            同期したコマンド数。同期を省略した場合はNone
+
+        例外:
+            discord.HTTPException: 同期に失敗した場合
+        """
+        key = self._state_key(guild)
+        fingerprint = command_tree_fingerprint(self.tree, guild)
+        state = self._load_state()
+        if not force and state.get(key) == fingerprint:
+            logger.info("コマンドに変更がないため同期を省略しました（%s）", key)
+            return None
+
+        synced = await self.tree.sync(guild=guild)
+        state[key] = fingerprint
+        try:
+            self._save_state(state)
+        except OSError as e:
+            logger.warning("コマンドの同期状態を保存できませんでした: %s", e)
+        return len(synced)
+
+    async def sync_guild(self, guild_id: int, force: bool = False) -> Optional[int]:
+        """
+        開発用のギルドにグローバルコマンドをコピーして同期する
+
+        ギルドへの同期はすぐに反映されるため、コマンドを変更しながら試す場合に使う
+
+        引数:
+            guild_id: ギルドID
+            force: Trueの場合は変わっていなくても同期する
+
+        戻り値:
+            同期したコマンド数。同期を省略した場合はNone
+        """
+        guild = discord.Object(id=guild_id)
+        self.tree.copy_global_to(guild=guild)
+        return await self.sync(guild=guild, force=force)
@@ -0,0 +1,247 @@
+"""
+重い計算をイベントループの外で実行するためのユーティリティモジュール
+
+コストの見積もりが閾値以上の計算はエグゼキューター（スレッドまたはプロセス）に回し、
+小さな計算はそのままイベントループ上で実行する。
+コマンドごとにループを止めた時間を記録し、オフロードの効果を確認できるようにする。
+"""
+import asyncio
+import atexit
+import functools
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.utils.logger import get_logger
+from config.settings import get_settings
+from src.utils.metrics import record_phase
+from src.dice.probability import distribution_cost
+
+logger = get_logger()
+
+_executor: Optional[Executor] = None
+_simulation_executor: Optional[Executor] = None
+_simulation_workers = 0
+
+class CommandExecutionStats:
+    """コマンドごとの計算時間の統計"""
+    __slots__ = ('inline_count', 'offloaded_count', 'max_blocking', 'max_offloaded', 'total_seconds')
+
+    def __init__(self):
+        self.inline_count = 0
+        self.offloaded_count = 0
+        # イベントループ上で実行した計算の最大時間（ループを止めた時間）
+        self.max_blocking = 0.0
+        # エグゼキューターで実行した計算の最大時間（オフロードしなければループを止めていた時間）
+        self.max_offloaded = 0.0
+        self.total_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """統計を辞書に変換する"""
+        return {
+            "inline_count": self.inline_count,
+            "offloaded_count": self.offloaded_count,
+            "max_blocking_ms": self.max_blocking * 1000,
+            "max_offloaded_ms": self.max_offloaded * 1000,
+            "total_ms": self.total_seconds * 1000
+        }
+
+_command_stats: Dict[str, CommandExecutionStats] = {}
+
+def get_executor() -> Executor:
+    """設定に従ってエグゼキューターを取得する（初回呼び出し時に作成）"""
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        kind = settings.executor_kind
+        max_workers = settings.executor_max_workers
+        if kind == 'process':
+            _executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dice-compute")
+        atexit.register(_executor.shutdown, wait=False)
+        logger.info("計算用エグゼキューターを作成しました: %s", kind)
+    return _executor
+
+def get_simulation_executor() -> Tuple[Executor, int]:
+    """
+    シミュレーション用のプロセスプールを取得する（初回呼び出し時に作成）
+
+    シミュレーションは長時間CPUを使うため、通常の計算用のエグゼキューターとは分けて
+    GILの影響を受けないプロセスで実行する
+
+    戻り値:
+        (エグゼキューター, ワーカー数) のタプル
+    """
+    global _simulation_executor, _simulation_workers
+    if _simulation_executor is None:
+        settings = get_settings()
+        _simulation_workers = settings.simulate_workers or os.cpu_count() or 1
+        _simulation_executor = ProcessPoolExecutor(max_workers=_simulation_workers)
+        atexit.register(_simulation_executor.shutdown, wait=False, cancel_futures=True)
+        logger.info("シミュレーション用のプロセスプールを作成しました: %d プロセス", _simulation_workers)
+    return _simulation_executor, _simulation_workers
+
+def should_offload(cost: int) -> bool:
+    """
+    計算をエグゼキューターに回すかどうか
+
+    引数:
+        cost: 計算コストの見積もり
+
+    戻り値:
+        コストが閾値以上ならTrue
+    """
+    return cost >= get_settings().offload_cost_threshold
+
+async def run_computation(command: str, cost: int, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    計算を実行する（コストが閾値以上ならエグゼキューターで実行する）
+
+    引数:
+        command: 統計を記録するコマンド名
+        cost: 計算コストの見積もり
+        func: 実行する関数（プロセスプールを使う場合はpickle可能である必要がある）
+        *args, **kwargs: 関数に渡す引数
+
+    戻り値:
+        関数の戻り値
+    """
+    stats = _command_stats.get(command)
+    if stats is None:
+        stats = _command_stats[command] = CommandExecutionStats()
+
+    if not should_offload(cost):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.inline_count += 1
+            stats.total_seconds += elapsed
+            stats.max_blocking = max(stats.max_blocking, elapsed)
+            record_phase('compute', elapsed)
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.offloaded_count += 1
+        stats.total_seconds += elapsed
+        stats.max_offloaded = max(stats.max_offloaded, elapsed)
+        record_phase('compute', elapsed)
+
+async def run_interaction_computation(interaction, command: str, cost: int, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    インタラクションに応答するための計算を実行する
+
+    エグゼキューターで実行する場合は、応答の期限（3秒）を過ぎないように先に応答を保留する。
+    保留した後の応答は interaction.followup で送る必要がある
+
+    引数:
+        interaction: 応答するインタラクション
+        command: 統計を記録するコマンド名
+        cost: 計算コストの見積もり
+        func: 実行する関数
+        *args, **kwargs: 関数に渡す引数
+
+    戻り値:
+        関数の戻り値
+    """
+    if should_offload(cost) and not interaction.response.is_done():
+        await interaction.response.defer(thinking=True)
+    return await run_computation(command, cost, func, *args, **kwargs)
+
+def estimate_roll_cost(expression) -> int:
+    """
+    ダイス式のロールのコストを見積もる
+
+    出目はブロック単位で生成するため、面数によらずダイス数に比例する
+
+    引数:
+        expression: コンパイル済みの式
+
+    戻り値:
+        ダイス数の合計
+    """
+    return sum(abs(num_dice) for num_dice, num_sides, _ in expression.components if num_sides > 0)
+
+def estimate_selection_cost(num_items: int, count: int, unique: bool) -> int:
+    """
+    複数選択のコストを見積もる
+
+    重複なしは選ぶ数が候補の数までに制限され、重複ありは選ぶ数だけ乱数を引くため、
+    候補の数と選ぶ数の和で見積もる
+
+    引数:
+        num_items: 候補の数
+        count: 選ぶ数
+        unique: 重複なしで選ぶかどうか
+
+    戻り値:
+        処理する要素数の見積もり
+    """
+    return num_items + (min(count, num_items) if unique else count)
+
+def estimate_distribution_cost(expression) -> int:
+    """
+    ダイス式の確率分布計算のコストを見積もる
+
+    分布は漸化式で計算するため、分布の長さ（ダイス数 × 面数）× 漸化式の項の数 で見積もる
+
+    引数:
+        expression: コンパイル済みの式
+
+    戻り値:
+        計算する要素数の見積もり
+    """
+    return distribution_cost(expression.components)
+
+def get_execution_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    コマンドごとの計算時間の統計を取得する
+
+    戻り値:
+        コマンド名と統計の辞書
+    """
+    return {command: stats.to_dict() for command, stats in _command_stats.items()}
+
+class LoopLagMonitor:
+    """
+    イベントループの遅延を計測する
+
+    一定間隔でスリープし、予定より遅れて起きた時間をループが止まっていた時間とみなす
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """計測を開始する（実行中のイベントループが必要）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """計測を停止する"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            if self.last_lag > self.max_lag:
+                self.max_lag = self.last_lag
+                if self.last_lag > 0.25:
+                    logger.warning("イベントループが%.0fms停止しました", self.last_lag * 1000)
+
+loop_lag_monitor = LoopLagMonitor()
@@ -1,39 +1,139 @@
 """
 ロギングユーティリティモジュール
+
+ロガーはレコードをキューに積むだけにし、フォーマットとコンソール・ファイルへの書き込みは
+QueueListenerのスレッドで行う。イベントループのスレッドではディスクI/Oを行わない。
 """
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 from typing import Optional
 
+# ログの出力先
+LOGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'logs'))
+LOG_FILE_NAME = 'dice_bot.log'
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# ボット用のロガーの名前
+LOGGER_NAME = 'dice_bot'
+
+# ルートロガーに付けるQueueHandlerの名前
+QUEUE_HANDLER_NAME = 'dice_bot_queue'
+
 _logger: Optional[logging.Logger] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """ログレコードを1行のJSONに変換するフォーマッター"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False)
+
+def _create_formatter(log_format: str) -> logging.Formatter:
+    """ログ形式（text / json）に対応するフォーマッターを作成する"""
+    if log_format == 'json':
+        return JsonFormatter()
+    if log_format == 'text':
+        return logging.Formatter(TEXT_FORMAT)
+    raise ValueError(f"不明なログ形式です: {log_format}")
+
+def setup_logger(
+    level: int = logging.INFO,
+    log_format: str = 'text',
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    logs_dir: Optional[str] = None,
+    file_name: str = LOG_FILE_NAME
+) -> logging.Logger:
+    """
+    ロギングの設定
+
+    ルートロガーにはQueueHandlerだけを付け、コンソールとローテートするログファイルへの
+    出力はQueueListenerのスレッドで行う。既に設定済みの場合は設定し直す。
+
+    引数:
+        level: ログレベル
+        log_format: ログ形式（text / json）
+        max_bytes: ログファイルをローテートするサイズ（バイト）
+        backup_count: 残す古いログファイルの数
+        logs_dir: ログファイルの出力先（省略時はプロジェクトのlogsディレクトリ）
+        file_name: ログファイル名（複数のプロセスが同じファイルをローテートしないよう、プロセスごとに分ける）
+
+    戻り値:
+        ボット用のロガー
+    """
+    global _logger, _queue_handler, _listener
+
+    formatter = _create_formatter(log_format)
+    shutdown_logger()
 
-def setup_logger(level: int = logging.INFO) -> logging.Logger:
-    """ロギングの設定"""
-    global _logger
-    
-    if _logger is not None:
-        return _logger
-        
     # ログディレクトリの確認と作成
-    logs_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
+    logs_dir = logs_dir or LOGS_DIR
     os.makedirs(logs_dir, exist_ok=True)
-    
-    # ロギング設定
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(os.path.join(logs_dir, 'dice_bot.log'), 
-                               encoding='utf-8')
-        ]
+
+    console_handler = logging.StreamHandler()
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(logs_dir, file_name),
+        maxBytes=max_bytes,
+        backupCount=backup_count,
+        encoding='utf-8'
     )
-    _logger = logging.getLogger('dice_bot')
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.set_name(QUEUE_HANDLER_NAME)
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    # 別経路でインポートされたこのモジュールが付けたハンドラがあれば外し、二重に出力しない
+    for handler in list(root.handlers):
+        if handler.get_name() == QUEUE_HANDLER_NAME:
+            root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _logger = logging.getLogger(LOGGER_NAME)
     return _logger
 
+def shutdown_logger():
+    """キューに残ったログを書き出してから出力スレッドを止める"""
+    global _logger, _queue_handler, _listener
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    _logger = None
+
+atexit.register(shutdown_logger)
+
 def get_logger() -> logging.Logger:
-    """ロガーオブジェクトを取得"""
-    global _logger
-    if _logger is None:
-        _logger = setup_logger()
-    return _logger 
\ No newline at end of file
+    """
+    ボット用のロガーを取得する
+
+    モジュールの読み込み時に呼ばれるため、ハンドラの設定やログディレクトリの作成は行わない。
+    出力先は起動時に setup_logger で設定する（設定前のWARNING以上はstderrに出力される）
+    """
+    return logging.getLogger(LOGGER_NAME)
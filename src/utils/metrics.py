@@ -0,0 +1,342 @@
+"""
+コマンドのレイテンシとスループットを計測するモジュール
+
+各コマンドのコールバックを track_command で包み、呼び出し回数・エラー数と
+処理全体の時間を記録する。コマンド内では measure_phase でフェーズ
+（parse / compute / render / respond）ごとの時間を記録する。
+集計結果は /botstats コマンドか、Prometheusのテキスト形式のエンドポイントで確認する。
+"""
+import asyncio
+import bisect
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# ヒストグラムのバケットの上限（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# フェーズ名（total はコマンド全体）
+PHASES = ('total', 'parse', 'compute', 'render', 'respond')
+
+class Histogram:
+    """固定バケットのレイテンシヒストグラム"""
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # 最後の要素は最大のバケットを超えた分
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        """
+        計測値を追加する
+
+        引数:
+            seconds: 計測した時間（秒）
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        パーセンタイルを推定する（バケット内は線形補間）
+
+        引数:
+            q: 0～1の割合
+
+        戻り値:
+            推定値（秒）。計測値がない場合は0
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and cumulative + count >= rank:
+                fraction = (rank - cumulative) / count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += count
+            lower = upper
+        return self.max
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """バケットの上限と累積数の組のリスト（最後は +Inf）"""
+        result = []
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            result.append((self.buckets[i] if i < len(self.buckets) else float('inf'), cumulative))
+        return result
+
+class CommandMetrics:
+    """コマンドごとの計測値"""
+    __slots__ = ('name', 'calls', 'errors', 'phases')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.phases: Dict[str, Histogram] = {}
+
+    def observe(self, phase: str, seconds: float):
+        """
+        フェーズの計測値を追加する
+
+        引数:
+            phase: フェーズ名
+            seconds: 計測した時間（秒）
+        """
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = Histogram()
+        histogram.observe(seconds)
+
+    @property
+    def error_rate(self) -> float:
+        """エラー率（0～1）"""
+        return self.errors / self.calls if self.calls else 0.0
+
+_commands: Dict[str, CommandMetrics] = {}
+# コマンドに属さない出来事の回数（再ロールの編集の間引きなど）
+_counters: Dict[str, int] = {}
+_started_at = time.time()
+
+# 実行中のコマンドの計測先（タスクごとに独立）
+_current: ContextVar[Optional[CommandMetrics]] = ContextVar('current_command_metrics', default=None)
+
+def get_command_metrics(name: str) -> CommandMetrics:
+    """
+    コマンドの計測値を取得する（なければ作成）
+
+    引数:
+        name: コマンド名（例: "roll", "choose one"）
+
+    戻り値:
+        コマンドの計測値
+    """
+    metrics = _commands.get(name)
+    if metrics is None:
+        metrics = _commands[name] = CommandMetrics(name)
+    return metrics
+
+def track_command(name: str) -> Callable:
+    """
+    コマンドのコールバックを包み、呼び出し回数・エラー数・全体の時間を記録するデコレーター
+
+    app_commands の describe などより内側（関数の直上）に付ける
+
+    引数:
+        name: 記録するコマンド名
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            metrics = get_command_metrics(name)
+            metrics.calls += 1
+            token = _current.set(metrics)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                metrics.errors += 1
+                raise
+            finally:
+                metrics.observe('total', time.perf_counter() - start)
+                _current.reset(token)
+        return wrapper
+    return decorator
+
+def record_phase(phase: str, seconds: float):
+    """
+    実行中のコマンドにフェーズの時間を記録する（コマンドの外では何もしない）
+
+    引数:
+        phase: フェーズ名
+        seconds: 計測した時間（秒）
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.observe(phase, seconds)
+
+@contextmanager
+def measure_phase(phase: str) -> Iterator[None]:
+    """
+    ブロックの実行時間を実行中のコマンドのフェーズとして記録する
+
+    引数:
+        phase: フェーズ名（parse / compute / render / respond）
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+def record_error():
+    """コマンド内で捕捉したエラーを実行中のコマンドのエラーとして数える"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.errors += 1
+
+def increment_counter(name: str, amount: int = 1):
+    """
+    出来事の回数を数える
+
+    引数:
+        name: カウンター名（例: "reroll_coalesced"）
+        amount: 加える数
+    """
+    _counters[name] = _counters.get(name, 0) + amount
+
+def get_counters() -> Dict[str, int]:
+    """カウンター名と回数の辞書"""
+    return dict(sorted(_counters.items()))
+
+def get_metrics_summary() -> Dict[str, Dict[str, Any]]:
+    """
+    コマンドごとの計測値の概要を取得する
+
+    戻り値:
+        コマンド名と、呼び出し回数・エラー率・フェーズごとのp50/p95（ミリ秒）の辞書
+    """
+    summary = {}
+    for name, metrics in sorted(_commands.items()):
+        phases = {}
+        for phase in PHASES:
+            histogram = metrics.phases.get(phase)
+            if histogram is not None:
+                phases[phase] = {
+                    "count": histogram.count,
+                    "p50_ms": histogram.percentile(0.5) * 1000,
+                    "p95_ms": histogram.percentile(0.95) * 1000,
+                    "max_ms": histogram.max * 1000
+                }
+        summary[name] = {
+            "calls": metrics.calls,
+            "errors": metrics.errors,
+            "error_rate": metrics.error_rate,
+            "phases": phases
+        }
+    return summary
+
+def _label_value(value: str) -> str:
+    """Prometheusのラベル値をエスケープする"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+def render_prometheus() -> str:
+    """
+    計測値をPrometheusのテキスト形式に変換する
+
+    コマンドの計測値に加えて、エグゼキューターの統計とイベントループの遅延も出力する
+
+    戻り値:
+        テキスト形式の計測値
+    """
+    from .executor import get_execution_stats, loop_lag_monitor
+
+    lines = [
+        "# HELP dice_bot_command_calls_total Number of command invocations.",
+        "# TYPE dice_bot_command_calls_total counter"
+    ]
+    for name, metrics in sorted(_commands.items()):
+        lines.append(f'dice_bot_command_calls_total{{command="{_label_value(name)}"}} {metrics.calls}')
+
+    lines.append("# HELP dice_bot_command_errors_total Number of command invocations that failed.")
+    lines.append("# TYPE dice_bot_command_errors_total counter")
+    for name, metrics in sorted(_commands.items()):
+        lines.append(f'dice_bot_command_errors_total{{command="{_label_value(name)}"}} {metrics.errors}')
+
+    lines.append("# HELP dice_bot_command_duration_seconds Command latency by phase.")
+    lines.append("# TYPE dice_bot_command_duration_seconds histogram")
+    for name, metrics in sorted(_commands.items()):
+        for phase, histogram in sorted(metrics.phases.items()):
+            labels = f'command="{_label_value(name)}",phase="{phase}"'
+            for bound, cumulative in histogram.cumulative_counts():
+                lines.append(f'dice_bot_command_duration_seconds_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'dice_bot_command_duration_seconds_sum{{{labels}}} {histogram.sum!r}')
+            lines.append(f'dice_bot_command_duration_seconds_count{{{labels}}} {histogram.count}')
+
+    lines.append("# HELP dice_bot_events_total Number of events outside commands (e.g. coalesced edits).")
+    lines.append("# TYPE dice_bot_events_total counter")
+    for name, count in sorted(_counters.items()):
+        lines.append(f'dice_bot_events_total{{event="{_label_value(name)}"}} {count}')
+
+    execution_stats = get_execution_stats()
+    lines.append("# HELP dice_bot_computations_total Computations by where they ran.")
+    lines.append("# TYPE dice_bot_computations_total counter")
+    for command, stats in sorted(execution_stats.items()):
+        label = _label_value(command)
+        lines.append(f'dice_bot_computations_total{{command="{label}",mode="inline"}} {stats["inline_count"]}')
+        lines.append(f'dice_bot_computations_total{{command="{label}",mode="offloaded"}} {stats["offloaded_count"]}')
+    lines.append("# HELP dice_bot_computation_max_blocking_seconds Longest computation run on the event loop.")
+    lines.append("# TYPE dice_bot_computation_max_blocking_seconds gauge")
+    for command, stats in sorted(execution_stats.items()):
+        lines.append(
+            f'dice_bot_computation_max_blocking_seconds{{command="{_label_value(command)}"}} '
+            f'{stats["max_blocking_ms"] / 1000!r}'
+        )
+
+    lines.append("# HELP dice_bot_event_loop_lag_seconds Event loop lag.")
+    lines.append("# TYPE dice_bot_event_loop_lag_seconds gauge")
+    lines.append(f'dice_bot_event_loop_lag_seconds{{kind="last"}} {loop_lag_monitor.last_lag!r}')
+    lines.append(f'dice_bot_event_loop_lag_seconds{{kind="max"}} {loop_lag_monitor.max_lag!r}')
+
+    lines.append("# HELP dice_bot_uptime_seconds Seconds since the metrics module was loaded.")
+    lines.append("# TYPE dice_bot_uptime_seconds gauge")
+    lines.append(f"dice_bot_uptime_seconds {time.time() - _started_at!r}")
+    return "\n".join(lines) + "\n"
+
+def reset_metrics():
+    """計測値を全て消去する"""
+    _commands.clear()
+    _counters.clear()
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """/metrics へのHTTPリクエストに応答する"""
+    try:
+        request_line = await reader.readline()
+        # ヘッダーは読み捨てる
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/', '/metrics'):
+            status, body = '200 OK', render_prometheus().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'not found\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Prometheusのテキスト形式で計測値を返すHTTPサーバーを起動する
+
+    引数:
+        host: 待ち受けるアドレス
+        port: 待ち受けるポート
+
+    戻り値:
+        起動したサーバー
+    """
+    return await asyncio.start_server(_handle_metrics_request, host, port)
@@ -0,0 +1,120 @@
+"""
+トークンバケットによるレート制限モジュール
+
+キー（ユーザーとメッセージなど）ごとにトークンバケットを持ち、操作のたびにトークンを1つ消費する。
+トークンは一定の速度で上限まで補充される。満杯に戻ったバケットは保持する必要がないため、
+キーが増えすぎた場合に削除する。
+"""
+import time
+from typing import Callable, Dict, Hashable
+
+class TokenBucket:
+    """1つのキーのトークンバケット"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """
+        引数:
+            rate: 1秒あたりに補充するトークン数
+            capacity: トークンの上限（連続して許可する回数）
+            now: 現在時刻
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_acquire(self, now: float) -> bool:
+        """
+        トークンを1つ消費する
+
+        引数:
+            now: 現在時刻
+
+        戻り値:
+            消費できた場合はTrue
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self, now: float) -> float:
+        """次のトークンが補充されるまでの秒数（既にある場合は0）"""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self, now: float) -> bool:
+        """トークンが上限まで補充されているかどうか"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class KeyedRateLimiter:
+    """キーごとのトークンバケット"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 10000
+    ):
+        """
+        引数:
+            rate: 1秒あたりに補充するトークン数
+            capacity: トークンの上限
+            clock: 現在時刻を返す関数
+            max_keys: この数を超えたら満杯のバケットを削除する
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("補充速度は0より大きく、上限は1以上を指定してください")
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def try_acquire(self, key: Hashable) -> bool:
+        """
+        キーのトークンを1つ消費する
+
+        引数:
+            key: キー
+
+        戻り値:
+            消費できた場合はTrue
+        """
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity, now)
+        return bucket.try_acquire(now)
+
+    def delay(self, key: Hashable) -> float:
+        """
+        キーの次のトークンが補充されるまでの秒数
+
+        引数:
+            key: キー
+
+        戻り値:
+            秒数（すぐに消費できる場合は0）
+        """
+        bucket = self._buckets.get(key)
+        return 0.0 if bucket is None else bucket.delay(self._clock())
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _prune(self, now: float):
+        """満杯に戻ったバケットを削除する（新しく作る場合と同じ状態のため）"""
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
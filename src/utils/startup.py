@@ -0,0 +1,98 @@
+"""
+起動時間の計測モジュール
+
+新しいPythonプロセスを -X importtime 付きで起動してボットとコマンドのモジュールを読み込み、
+標準エラーに出力されるモジュールごとの読み込み時間を集計する。
+計測対象のプロセスはボットを起動せず、Discordにも接続しない。
+"""
+import os
+import re
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+# 計測するプロセスで実行するコード（起動時と同じ順にモジュールを読み込む）
+STARTUP_CODE = "import src.bot; src.bot.load_command_setups()"
+
+# -X importtime の出力行（import time: self [us] | cumulative | imported package）
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+class ModuleImportTime(NamedTuple):
+    """モジュールごとの読み込み時間"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+class StartupReport(NamedTuple):
+    """起動時間の計測結果"""
+    modules: List[ModuleImportTime]
+    # 最上位で読み込んだモジュールの累積時間の合計（マイクロ秒）
+    total_us: int
+
+def parse_importtime(output: str) -> StartupReport:
+    """
+    -X importtime の出力を解析する
+
+    引数:
+        output: 標準エラーへの出力
+
+    戻り値:
+        計測結果
+    """
+    modules = []
+    total_us = 0
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        # インデントは最上位で1文字、1段深くなるごとに2文字増える
+        depth = (len(indent) - 1) // 2
+        modules.append(ModuleImportTime(module.strip(), int(self_us), int(cumulative_us), depth))
+        if depth == 0:
+            total_us += int(cumulative_us)
+    return StartupReport(modules, total_us)
+
+def measure_startup(code: str = STARTUP_CODE) -> StartupReport:
+    """
+    新しいプロセスでモジュールを読み込み、読み込み時間を計測する
+
+    引数:
+        code: 計測するプロセスで実行するコード
+
+    戻り値:
+        計測結果
+
+    例外:
+        RuntimeError: 読み込みに失敗した場合
+    """
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"モジュールを読み込めませんでした:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+def format_startup_report(report: StartupReport, top: int = 20) -> str:
+    """
+    計測結果を表示用の文字列にする
+
+    引数:
+        report: 計測結果
+        top: 表示するモジュール数（累積時間の長い順）
+
+    戻り値:
+        表示用の文字列
+    """
+    lines = [f"{'累積(ms)':>10} {'自身(ms)':>10}  モジュール"]
+    for item in sorted(report.modules, key=lambda m: m.cumulative_us, reverse=True)[:top]:
+        lines.append(
+            f"{item.cumulative_us / 1000:>10.1f} {item.self_us / 1000:>10.1f}  {'  ' * item.depth}{item.module}"
+        )
+    lines.append(f"合計: {report.total_us / 1000:.1f}ms（{len(report.modules)}モジュール）")
+    return "\n".join(lines)
@@ -1,68 +1,277 @@
 """
 ダイスロール用のDiscord UI要素
+
+再ロールボタンは状態を持たない。ボタンの custom_id にロールした人のIDとダイス式を埋め込み
+（dice:reroll:<ユーザーID>:<正規化したダイス式>。合計だけを表示するロールはダイス式の前に「=」を付ける）、
+ボタンが押されると on_interaction に登録した1つのハンドラーが custom_id から振り直す。ロールごとのビューやタイムアウトのタスクを保持しないため、
+ロールの回数によらずメモリ使用量は一定で、ボットを再起動しても過去のボタンが使える。
+
+ボタンが連打された場合は RerollCoalescer がメッセージの編集を間引き、最後に押された分だけを送る。
 """
+import asyncio
 import discord
 from discord.ext import commands
-from typing import Dict, Any, Optional
+from typing import Dict, Optional, Set, Tuple
+
+from src.utils.logger import get_logger
+from config.settings import Settings, get_settings
+from src.dice.parser import CompiledDiceExpression, compile_dice_expression
+from src.dice.roller import roll_complex_dice
+from src.dice.result import RollResult
+from src.dice.renderer import create_dice_embed
+from src.dice.rng import derive_seed
+from src.storage.history import get_history_store
+from src.storage.stats import get_luck_stats_store
+from src.utils.executor import run_computation, should_offload, estimate_roll_cost
+from src.utils.metrics import track_command, measure_phase, record_error, increment_counter
+from src.utils.ratelimit import KeyedRateLimiter
 
-import sys
-import os
+logger = get_logger()
 
-# パスを追加して必要なモジュールをインポートできるようにする
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, '..', '..', '..'))
-sys.path.append(project_root)
+# 再ロールボタンの custom_id の接頭辞
+REROLL_PREFIX = "dice:reroll:"
 
-from dice.src.utils.logger import get_logger
-from dice.config.settings import get_config
-from dice.src.dice.roller import roll_complex_dice
-from dice.src.dice.renderer import create_dice_embed
+# 合計だけを表示するロールの再ロールボタンで、ダイス式の前に付ける印
+SUM_ONLY_MARK = "="
 
-logger = get_logger()
+# Discordが受け付ける custom_id の最大文字数
+CUSTOM_ID_MAX_LENGTH = 100
+
+def reroll_custom_id(owner_id: int, expression: CompiledDiceExpression, sum_only: bool = False) -> Optional[str]:
+    """
+    再ロールボタンの custom_id を作成する
+
+    引数:
+        owner_id: ロールした人のユーザーID
+        expression: コンパイル済みのダイス式
+        sum_only: 合計だけを表示するロールの場合はTrue
+
+    戻り値:
+        custom_id。ダイス式が長すぎて収まらない場合はNone
+    """
+    mark = SUM_ONLY_MARK if sum_only else ""
+    custom_id = f"{REROLL_PREFIX}{owner_id}:{mark}{expression.normalized}"
+    return custom_id if len(custom_id) <= CUSTOM_ID_MAX_LENGTH else None
+
+def parse_reroll_custom_id(custom_id: str) -> Optional[Tuple[int, str]]:
+    """
+    再ロールボタンの custom_id を解析する
+
+    引数:
+        custom_id: ボタンの custom_id
+
+    戻り値:
+        (ロールした人のユーザーID, ダイス式)。再ロールボタンでない場合はNone
+        （合計だけを表示するロールのダイス式には SUM_ONLY_MARK が付いたまま）
+    """
+    if not custom_id.startswith(REROLL_PREFIX):
+        return None
+    owner, _, dice_str = custom_id[len(REROLL_PREFIX):].partition(':')
+    if not owner.isdigit() or not dice_str:
+        return None
+    return int(owner), dice_str
+
+def create_reroll_view(
+    owner_id: int,
+    expression: Optional[CompiledDiceExpression],
+    sum_only: bool = False
+) -> Optional[discord.ui.View]:
+    """
+    再ロールボタンだけを持つビューを作成する
 
-class DiceRollView(discord.ui.View):
-    """ダイスロール結果に付けるボタン付きビュー"""
-    def __init__(self, dice_str: str, interaction: discord.Interaction):
-        timeout = get_config('BUTTON_TIMEOUT', 60)
-        super().__init__(timeout=timeout)  # 設定された秒数後にボタンを無効化
-        self.dice_str = dice_str
-        self.interaction = interaction
-        self.roll_history_callback = None
+    ビューは送信するボタンの定義としてだけ使い、送信前に停止してビューの保存先に登録させない
+    （ボタンは on_interaction のハンドラーが処理する）。イベントループ上で呼ぶこと。
 
-    def set_history_callback(self, callback):
+    引数:
+        owner_id: ロールした人のユーザーID
+        expression: コンパイル済みのダイス式
+        sum_only: 合計だけを表示するロールの場合はTrue
+
+    戻り値:
+        ビュー。ボタンを付けられない場合（式が無効、または custom_id に収まらない場合）はNone
+    """
+    custom_id = reroll_custom_id(owner_id, expression, sum_only) if expression else None
+    if custom_id is None:
+        return None
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(
+        label="再ロール", style=discord.ButtonStyle.primary, emoji="🎲", custom_id=custom_id
+    ))
+    view.stop()
+    return view
+
+class RerollCoalescer:
+    """
+    再ロールによるメッセージの編集を間引く
+
+    ユーザーとメッセージの組ごとのトークンバケットで編集の回数を制限する。トークンがない間に
+    押されたボタンは応答だけを返して保留し、トークンが補充された時に最後に押された分だけを振って
+    編集する（それまでに押された分は振らずに捨てる）。
+    """
+
+    def __init__(self, rate: float, burst: int):
         """
-        ロール履歴更新用のコールバック関数を設定
-        
         引数:
-            callback: 呼び出す関数（ユーザーID、結果を引数に取る）
+            rate: 1秒あたりに許可する編集の回数
+            burst: 連続して許可する編集の回数
+        """
+        self.limiter = KeyedRateLimiter(rate, burst)
+        # (ユーザーID, メッセージID) -> (保留中のインタラクション, ダイス式)
+        self._pending: Dict[Tuple[int, int], Tuple[discord.Interaction, str]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def try_acquire(self, key: Tuple[int, int]) -> bool:
         """
-        self.roll_history_callback = callback
+        すぐに編集してよいかどうか
 
-    @discord.ui.button(label="再ロール", style=discord.ButtonStyle.primary, emoji="🎲")
-    async def reroll_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """再ロールボタンが押された時の処理"""
-        if interaction.user.id != self.interaction.user.id:
-            await interaction.response.send_message("他の人のロールは再ロールできません", ephemeral=True)
+        保留中の編集がある場合は、順序が入れ替わらないよう常にFalseを返す
+        """
+        return key not in self._pending and self.limiter.try_acquire(key)
+
+    def defer(self, key: Tuple[int, int], interaction: discord.Interaction, dice_str: str):
+        """
+        編集を保留する（既に保留中の編集があれば置き換える）
+
+        引数:
+            key: (ユーザーID, メッセージID)
+            interaction: 応答済み（defer済み）のインタラクション
+            dice_str: ダイス式
+        """
+        if key in self._pending:
+            increment_counter('reroll_dropped')
+            self._pending[key] = (interaction, dice_str)
             return
+        self._pending[key] = (interaction, dice_str)
+        task = asyncio.ensure_future(self._flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
+    async def _flush(self, key: Tuple[int, int]):
+        """トークンが補充されるまで待ち、最後に保留した編集を送る"""
+        while not self.limiter.try_acquire(key):
+            await asyncio.sleep(self.limiter.delay(key))
+        interaction, dice_str = self._pending.pop(key)
+        increment_counter('reroll_coalesced')
         try:
-            # 複雑なダイス表記の処理
-            result = roll_complex_dice(self.dice_str)
-            
-            if "error" in result:
-                await interaction.response.send_message(f"エラー: {result['error']}", ephemeral=True)
+            result = await _reroll(interaction, dice_str, get_settings(interaction.guild_id))
+            if result.error:
+                await interaction.followup.send(f"エラー: {result.error}", ephemeral=True)
                 return
-                
-            # Embedの作成
-            embed = create_dice_embed(interaction, result)
-            
-            # 結果を更新
-            await interaction.response.edit_message(embed=embed, view=self)
-            
-            # ロール履歴に追加
-            if self.roll_history_callback:
-                self.roll_history_callback(interaction.user.id, result)
-                
+            await interaction.edit_original_response(embed=create_dice_embed(interaction, result))
+            get_history_store().append(interaction.user.id, result, interaction.guild_id, interaction.channel_id)
+            get_luck_stats_store().record(interaction.guild_id, interaction.user.id, result)
         except Exception as e:
-            logger.error(f"再ロール中にエラーが発生: {e}")
-            await interaction.response.send_message("ダイスの振り直し中にエラーが発生しました。", ephemeral=True) 
\ No newline at end of file
+            logger.error("保留した再ロールの送信中にエラーが発生: %s", e)
+
+    def pending_count(self) -> int:
+        """保留中の編集の数"""
+        return len(self._pending)
+
+_coalescer: Optional[RerollCoalescer] = None
+
+def get_reroll_coalescer() -> RerollCoalescer:
+    """再ロールの編集の間引きを取得する（初回呼び出し時に作成）"""
+    global _coalescer
+    if _coalescer is None:
+        settings = get_settings()
+        _coalescer = RerollCoalescer(settings.reroll_edit_rate, settings.reroll_edit_burst)
+    return _coalescer
+
+async def _reroll(interaction: discord.Interaction, dice_str: str, settings: Settings) -> RollResult:
+    """
+    ボタンのインタラクションのシードでダイスを振る
+
+    エグゼキューターで実行する場合、応答していないインタラクションは先に保留する。
+    ダイス式に SUM_ONLY_MARK が付いている場合は合計だけを振る
+    """
+    sum_only = dice_str.startswith(SUM_ONLY_MARK)
+    if sum_only:
+        dice_str = dice_str[len(SUM_ONLY_MARK):]
+    with measure_phase('parse'):
+        expression = compile_dice_expression(dice_str)
+    cost = estimate_roll_cost(expression) if expression else 0
+    if should_offload(cost) and not interaction.response.is_done():
+        # 時間のかかる計算は応答を保留してから実行し、結果は後でメッセージを編集して表示する
+        await interaction.response.defer()
+    # ボタンのインタラクションごとに新しいシードで振る
+    return await run_computation(
+        'roll', cost, roll_complex_dice, expression or dice_str, settings, derive_seed(interaction.id), sum_only
+    )
+
+@track_command('roll reroll')
+async def handle_reroll(interaction: discord.Interaction, owner_id: int, dice_str: str):
+    """
+    再ロールボタンが押された時の処理
+
+    引数:
+        interaction: ボタンのインタラクション
+        owner_id: custom_id に埋め込んだロールした人のユーザーID
+        dice_str: custom_id に埋め込んだダイス式
+    """
+    if interaction.user.id != owner_id:
+        await interaction.response.send_message("他の人のロールは再ロールできません", ephemeral=True)
+        return
+
+    settings = get_settings(interaction.guild_id)
+    if settings.button_timeout > 0 and interaction.message is not None:
+        # 最後にロールした（メッセージを編集した）時刻から数える
+        last_roll = interaction.message.edited_at or interaction.message.created_at
+        if (discord.utils.utcnow() - last_roll).total_seconds() > settings.button_timeout:
+            await interaction.response.edit_message(view=None)
+            await interaction.followup.send("再ロールの期限が切れています。`/roll`で振り直してください。", ephemeral=True)
+            return
+
+    # 連打された場合は応答だけを返し、最後に押された分だけを後でまとめて編集する
+    coalescer = get_reroll_coalescer()
+    key = (owner_id, interaction.message.id if interaction.message is not None else 0)
+    if not coalescer.try_acquire(key):
+        with measure_phase('respond'):
+            await interaction.response.defer()
+        coalescer.defer(key, interaction, dice_str)
+        return
+
+    try:
+        result = await _reroll(interaction, dice_str, settings)
+        deferred = interaction.response.is_done()
+
+        if result.error:
+            send = interaction.followup.send if deferred else interaction.response.send_message
+            await send(f"エラー: {result.error}", ephemeral=True)
+            return
+
+        with measure_phase('render'):
+            embed = create_dice_embed(interaction, result)
+
+        # ボタンはそのまま残し、結果だけを更新する
+        with measure_phase('respond'):
+            if deferred:
+                await interaction.edit_original_response(embed=embed)
+            else:
+                await interaction.response.edit_message(embed=embed)
+
+        get_history_store().append(interaction.user.id, result, interaction.guild_id, interaction.channel_id)
+        get_luck_stats_store().record(interaction.guild_id, interaction.user.id, result)
+
+    except Exception as e:
+        logger.error("再ロール中にエラーが発生: %s", e)
+        record_error()
+        if not interaction.response.is_done():
+            await interaction.response.send_message("ダイスの振り直し中にエラーが発生しました。", ephemeral=True)
+        else:
+            await interaction.followup.send("ダイスの振り直し中にエラーが発生しました。", ephemeral=True)
+
+def setup_reroll_handler(bot: commands.Bot):
+    """
+    再ロールボタンのハンドラーをボットに登録する
+
+    引数:
+        bot: ハンドラーを登録するBot
+    """
+    async def on_interaction(interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component or not interaction.data:
+            return
+        parsed = parse_reroll_custom_id(interaction.data.get("custom_id", ""))
+        if parsed is not None:
+            await handle_reroll(interaction, *parsed)
+
+    bot.add_listener(on_interaction)
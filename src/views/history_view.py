@@ -0,0 +1,74 @@
+"""
+ロール履歴のページ送り用のDiscord UI要素
+"""
+import discord
+from typing import Awaitable, Callable, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+# ページ送りのボタンを受け付ける秒数
+HISTORY_VIEW_TIMEOUT = 300
+
+class HistoryView(discord.ui.View):
+    """
+    /history の結果のページを送るボタンを持つビュー
+
+    ページの取得と表示は呼び出し側の関数に任せ、ビューはボタンの状態だけを管理する
+    """
+
+    def __init__(
+        self,
+        owner_id: int,
+        turn_page: Callable[[discord.Interaction, int], Awaitable[None]],
+        has_newer: bool,
+        has_older: bool
+    ):
+        """
+        引数:
+            owner_id: 履歴を表示した人のユーザーID
+            turn_page: ボタンが押された時にインタラクションと方向（-1: 新しい方、1: 古い方）で呼ぶ関数
+            has_newer: 新しい方のページがあるかどうか
+            has_older: 古い方のページがあるかどうか
+        """
+        super().__init__(timeout=HISTORY_VIEW_TIMEOUT)
+        self.owner_id = owner_id
+        self.turn_page = turn_page
+        self.message: Optional[discord.Message] = None
+        self.update_buttons(has_newer, has_older)
+
+    def update_buttons(self, has_newer: bool, has_older: bool):
+        """
+        ページの有無に合わせてボタンを有効・無効にする
+
+        引数:
+            has_newer: 新しい方のページがあるかどうか
+            has_older: 古い方のページがあるかどうか
+        """
+        self.newer_button.disabled = not has_newer
+        self.older_button.disabled = not has_older
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("他の人の履歴のページは送れません", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="新しい", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def newer_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """新しい方のページを表示する"""
+        await self.turn_page(interaction, -1)
+
+    @discord.ui.button(label="古い", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def older_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """古い方のページを表示する"""
+        await self.turn_page(interaction, 1)
+
+    async def on_timeout(self):
+        """期限が切れたらボタンを外す"""
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException as e:
+                logger.debug("履歴のボタンを外せませんでした: %s", e)
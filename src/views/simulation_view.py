@@ -0,0 +1,36 @@
+"""
+シミュレーション用のDiscord UI要素
+"""
+import asyncio
+import discord
+
+class SimulationView(discord.ui.View):
+    """
+    実行中のシミュレーションを中止するボタンを持つビュー
+
+    ボタンは実行した人だけが押せる。押すと中止のイベントをセットし、シミュレーションは
+    それまでの試行の結果で終わる。シミュレーションが終わったら stop で停止する。
+    """
+
+    def __init__(self, owner_id: int, stop_event: asyncio.Event):
+        """
+        引数:
+            owner_id: シミュレーションを実行した人のユーザーID
+            stop_event: 中止を指示するイベント
+        """
+        super().__init__(timeout=None)
+        self.owner_id = owner_id
+        self.stop_event = stop_event
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("他の人のシミュレーションは中止できません", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="中止", style=discord.ButtonStyle.danger, emoji="⏹️")
+    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """中止ボタン（結果の表示はシミュレーションの終了時に行う）"""
+        self.stop_event.set()
+        button.disabled = True
+        await interaction.response.edit_message(view=self)
@@ -0,0 +1,125 @@
+"""
+クラスター（複数プロセスでのシャーディング）のテスト
+"""
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.cluster.ipc import ClusterIPCServer, ClusterIPCClient
+from src.cluster.launcher import shard_ranges
+from src.commands.botstats import create_botstats_embed
+from src.dice.result import RollRecord
+from src.storage.history import HistoryStore, MemoryHistoryBackend
+
+class TestCluster(unittest.TestCase):
+    """クラスターのテストクラス"""
+
+    def test_shard_ranges(self):
+        """シャードが連続した範囲に偏りなく分けられるテスト"""
+        self.assertEqual(shard_ranges(10, 3), [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.assertEqual(shard_ranges(4, 4), [[0], [1], [2], [3]])
+        self.assertEqual(sum(shard_ranges(1000, 7), []), list(range(1000)))
+        with self.assertRaises(ValueError):
+            shard_ranges(2, 3)
+
+    def test_ipc(self):
+        """統計の集計、イベントの中継、認証のテスト"""
+        async def scenario():
+            server = ClusterIPCServer("secret")
+            port = await server.start()
+            first = ClusterIPCClient(0, port, "secret")
+            second = ClusterIPCClient(1, port, "secret")
+            received = asyncio.Queue()
+            second.on("history_append", received.put_nowait)
+            second.on("shutdown", lambda data: received.put_nowait("shutdown"))
+            await first.connect()
+            await second.connect()
+
+            first.send_stats({"guilds": 3})
+            first.send_ready()
+            self.assertTrue(await server.wait_ready(0, 5))
+            self.assertFalse(await server.wait_ready(1, 0.05))
+            self.assertEqual(await second.get_stats(), {0: {"guilds": 3}})
+
+            # 送信元には届かず、他のクラスターにだけ届く
+            first.publish("history_append", {"user_id": 1})
+            self.assertEqual(await asyncio.wait_for(received.get(), 5), {"user_id": 1})
+            server.send_event("shutdown")
+            self.assertEqual(await asyncio.wait_for(received.get(), 5), "shutdown")
+
+            # 秘密が一致しない接続は切断される
+            disconnected = asyncio.Event()
+            intruder = ClusterIPCClient(2, port, "wrong")
+
+            async def on_disconnect():
+                disconnected.set()
+            intruder.on_disconnect(on_disconnect)
+            await intruder.connect()
+            await asyncio.wait_for(disconnected.wait(), 5)
+
+            for client in (first, second, intruder):
+                await client.close()
+            await server.close()
+
+        asyncio.run(scenario())
+
+    def test_history_merge_remote(self):
+        """他のクラスターで追加された履歴がキャッシュ済みのユーザーにだけ反映されるテスト"""
+        published = []
+        store = HistoryStore(MemoryHistoryBackend())
+        store.add_listener(lambda user_id, record: published.append((user_id, record.total)))
+        store.append(1, RollRecord("1d6", 1, 4))
+        self.assertEqual(published, [(1, 4)])
+
+        store.merge_remote(1, RollRecord("1d6", 2, 5))
+        store.merge_remote(2, RollRecord("1d6", 3, 6))
+        self.assertEqual([record.total for record in store.get(1)], [4, 5])
+        self.assertEqual(store.get(2), [])
+        store.close()
+
+    def test_botstats_cluster_field(self):
+        """/botstats に全クラスターの統計が表示されるテスト"""
+        stats = {
+            0: {"shard_ids": [0, 1], "guilds": 5, "latency_ms": {"0": 40.0, "1": None},
+                "commands": {"roll": {"calls": 3, "errors": 1}}},
+            1: {"shard_ids": [2, 3], "guilds": 7, "latency_ms": {"2": None, "3": None}, "commands": {}}
+        }
+        field = create_botstats_embed(stats).fields[0]
+        self.assertEqual(field.name, "クラスター（2プロセス / ギルド 12）")
+        self.assertEqual(field.value.splitlines(), [
+            "#0 シャード 0-1 / ギルド 5 / 遅延 最大40ms / 実行 3回 / エラー 1回",
+            "#1 シャード 2-3 / ギルド 7 / 遅延 最大- / 実行 0回 / エラー 0回"
+        ])
+
+    def test_botstats_embed_limit(self):
+        """コマンドやフェーズが多くても /botstats のEmbedが全体の上限に収まるテスト"""
+        phases = {
+            phase: {"p50_ms": 12.3, "p95_ms": 456.7, "max_ms": 8901.2}
+            for phase in ("parse", "compute", "render", "respond", "defer", "history")
+        }
+        summary = {
+            f"command-with-a-long-name-{i}": {"calls": 123456, "errors": 789, "error_rate": 0.0064, "phases": phases}
+            for i in range(40)
+        }
+        counters = {f"event_{i}": 1000000 for i in range(100)}
+        stats = {
+            i: {"shard_ids": [i * 10, i * 10 + 9], "guilds": 25000, "latency_ms": {"0": 40.0}, "commands": {}}
+            for i in range(40)
+        }
+        with patch('src.commands.botstats.get_metrics_summary', return_value=summary), \
+                patch('src.commands.botstats.get_counters', return_value=counters):
+            embed = create_botstats_embed(stats)
+        self.assertLessEqual(len(embed), 6000)
+        self.assertEqual(len(embed.fields), 25)
+        self.assertTrue(all(len(field.value) <= 1024 for field in embed.fields))
+        self.assertTrue(embed.fields[-1].value.startswith("実行 123456回"))
+
+if __name__ == "__main__":
+    unittest.main()
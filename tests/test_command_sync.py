@@ -0,0 +1,66 @@
+"""
+スラッシュコマンドの同期管理のテスト
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+import discord
+from discord import app_commands
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.utils.command_sync import CommandSyncManager, command_tree_fingerprint
+
+def make_tree(description: str = "ダイスを振ります") -> app_commands.CommandTree:
+    """ログインせずにコマンドを登録したツリーを作成する"""
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    @tree.command(name="roll", description=description)
+    async def roll(interaction: discord.Interaction, dice_str: str):
+        pass
+
+    tree.sync = AsyncMock(return_value=[object()])
+    return tree
+
+class TestCommandSync(unittest.TestCase):
+    """スラッシュコマンドの同期管理のテストクラス"""
+
+    def test_fingerprint(self):
+        """コマンドの定義が変わった場合だけハッシュが変わるテスト"""
+        self.assertEqual(command_tree_fingerprint(make_tree()), command_tree_fingerprint(make_tree()))
+        self.assertNotEqual(command_tree_fingerprint(make_tree()), command_tree_fingerprint(make_tree("説明を変更")))
+
+    def test_skip_unchanged(self):
+        """変更がなければ同期を省略し、変更があれば同期するテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "command_sync.json")
+            tree = make_tree()
+            manager = CommandSyncManager(tree, path)
+            self.assertTrue(manager.needs_sync())
+            self.assertEqual(asyncio.run(manager.sync()), 1)
+            self.assertFalse(manager.needs_sync())
+
+            # 再起動後も保存したハッシュから変更がないと判断する
+            tree = make_tree()
+            manager = CommandSyncManager(tree, path)
+            self.assertIsNone(asyncio.run(manager.sync()))
+            tree.sync.assert_not_called()
+            self.assertEqual(asyncio.run(manager.sync(force=True)), 1)
+
+            tree = make_tree("説明を変更")
+            manager = CommandSyncManager(tree, path)
+            self.assertEqual(asyncio.run(manager.sync()), 1)
+
+            # ギルドへの同期はグローバルとは別に記録する
+            self.assertEqual(asyncio.run(manager.sync_guild(1234)), 1)
+            self.assertIsNone(asyncio.run(manager.sync_guild(1234)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+再ロールボタンのテスト
+"""
+import asyncio
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice import rng
+from src.dice.parser import compile_dice_expression
+from src.utils.metrics import get_counters, reset_metrics
+from src.views.dice_view import (
+    reroll_custom_id,
+    parse_reroll_custom_id,
+    create_reroll_view,
+    RerollCoalescer,
+    CUSTOM_ID_MAX_LENGTH
+)
+
+OWNER_ID = 123456789012345678
+
+class TestRerollButton(unittest.TestCase):
+    """再ロールボタンのテストクラス"""
+
+    def test_custom_id_round_trip(self):
+        """custom_id にロールした人と正規化したダイス式が埋め込まれるテスト"""
+        custom_id = reroll_custom_id(OWNER_ID, compile_dice_expression("2D6 + 1d4 - 3"))
+        self.assertEqual(custom_id, f"dice:reroll:{OWNER_ID}:2d6+1d4-3")
+        self.assertEqual(parse_reroll_custom_id(custom_id), (OWNER_ID, "2d6+1d4-3"))
+
+        # 合計だけを表示するロールはダイス式の前に印を付ける
+        custom_id = reroll_custom_id(OWNER_ID, compile_dice_expression("100d1000"), sum_only=True)
+        self.assertEqual(parse_reroll_custom_id(custom_id), (OWNER_ID, "=100d1000"))
+
+    def test_parse_other_custom_id(self):
+        """再ロールボタン以外の custom_id は無視されるテスト"""
+        for custom_id in ("", "0123abcd", "dice:reroll:", "dice:reroll:abc:1d6", f"dice:reroll:{OWNER_ID}:"):
+            self.assertIsNone(parse_reroll_custom_id(custom_id))
+
+    def test_long_expression(self):
+        """custom_id に収まらないダイス式にはボタンを付けないテスト"""
+        expression = compile_dice_expression("+".join(["1d20"] * 30))
+        self.assertIsNone(reroll_custom_id(OWNER_ID, expression))
+
+        async def build():
+            return create_reroll_view(OWNER_ID, expression)
+
+        self.assertIsNone(asyncio.run(build()))
+
+    def test_view_is_not_stored(self):
+        """ビューはボタンの定義だけを持ち、停止した状態で作られるテスト"""
+        async def build():
+            return create_reroll_view(OWNER_ID, compile_dice_expression("1d20"))
+
+        view = asyncio.run(build())
+        self.assertTrue(view.is_finished())
+        self.assertIsNone(view.timeout)
+        button = view.to_components()[0]["components"][0]
+        self.assertEqual(button["custom_id"], f"dice:reroll:{OWNER_ID}:1d20")
+        self.assertLessEqual(len(button["custom_id"]), CUSTOM_ID_MAX_LENGTH)
+
+class FakeInteraction:
+    """保留した再ロールの送信に必要な属性だけを持つインタラクション"""
+
+    def __init__(self, interaction_id: int):
+        self.id = interaction_id
+        self.guild_id = None
+        self.channel_id = None
+        avatar = SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+        self.user = SimpleNamespace(id=OWNER_ID, display_name="テスト", display_avatar=avatar)
+        self.edits = []
+
+    async def edit_original_response(self, embed):
+        self.edits.append(embed)
+
+class TestRerollCoalescer(unittest.TestCase):
+    """再ロールの編集の間引きのテストクラス"""
+
+    def setUp(self):
+        reset_metrics()
+
+    @patch.object(rng, '_master_key', bytes(32))
+    @patch('src.views.dice_view.get_luck_stats_store')
+    @patch('src.views.dice_view.get_history_store')
+    def test_only_latest_click_is_sent(self, get_history_store, get_luck_stats_store):
+        """トークンがない間の連打は保留され、最後に押された分だけが編集されるテスト"""
+        history = MagicMock()
+        get_history_store.return_value = history
+        interactions = [FakeInteraction(i) for i in range(1, 5)]
+        key = (OWNER_ID, 1)
+
+        async def mash():
+            coalescer = RerollCoalescer(rate=20.0, burst=1)
+            # 最初の1回はすぐに編集してよい
+            self.assertTrue(coalescer.try_acquire(key))
+            for interaction in interactions:
+                self.assertFalse(coalescer.try_acquire(key))
+                coalescer.defer(key, interaction, "1d20")
+            self.assertEqual(coalescer.pending_count(), 1)
+            await asyncio.sleep(0.2)
+            self.assertEqual(coalescer.pending_count(), 0)
+
+        asyncio.run(mash())
+        self.assertEqual([len(interaction.edits) for interaction in interactions], [0, 0, 0, 1])
+        history.append.assert_called_once()
+        get_luck_stats_store.return_value.record.assert_called_once()
+        self.assertEqual(get_counters(), {"reroll_coalesced": 1, "reroll_dropped": 3})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+計算オフロードのテスト
+"""
+import asyncio
+import threading
+import unittest
+import sys
+import os
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.parser import compile_dice_expression
+from src.utils.executor import (
+    run_computation,
+    run_interaction_computation,
+    get_execution_stats,
+    estimate_roll_cost,
+    estimate_selection_cost,
+    estimate_distribution_cost
+)
+
+def current_thread_name() -> str:
+    """実行中のスレッド名を返す"""
+    return threading.current_thread().name
+
+class FakeResponse:
+    """応答の保留だけを記録するインタラクションの応答"""
+    def __init__(self):
+        self.deferred = False
+    def is_done(self):
+        return self.deferred
+    async def defer(self, thinking=False):
+        self.deferred = True
+
+class FakeInteraction:
+    """テスト用のインタラクション"""
+    def __init__(self):
+        self.response = FakeResponse()
+
+class TestExecutor(unittest.TestCase):
+    """計算オフロードのテストクラス"""
+    
+    def test_small_job_runs_inline(self):
+        """小さな計算はイベントループ上で実行されるテスト"""
+        name = asyncio.run(run_computation('test inline', 1, current_thread_name))
+        self.assertEqual(name, threading.current_thread().name)
+        self.assertEqual(get_execution_stats()['test inline']['inline_count'], 1)
+    
+    def test_large_job_is_offloaded(self):
+        """大きな計算はエグゼキューターで実行されるテスト"""
+        name = asyncio.run(run_computation('test offload', 10 ** 9, current_thread_name))
+        self.assertNotEqual(name, threading.current_thread().name)
+        self.assertEqual(get_execution_stats()['test offload']['offloaded_count'], 1)
+    
+    def test_interaction_deferred_before_offload(self):
+        """エグゼキューターで実行する場合だけ応答を保留するテスト"""
+        interaction = FakeInteraction()
+        asyncio.run(run_interaction_computation(interaction, 'test interaction', 1, current_thread_name))
+        self.assertFalse(interaction.response.is_done())
+        asyncio.run(run_interaction_computation(interaction, 'test interaction', 10 ** 9, current_thread_name))
+        self.assertTrue(interaction.response.is_done())
+    
+    def test_cost_estimates(self):
+        """コスト見積もりのテスト"""
+        expression = compile_dice_expression("2d6+3d10+4")
+        self.assertEqual(estimate_roll_cost(expression), 5)
+        # 分布の長さ (2×5 + 3×9 + 1) × 漸化式の項の数 2^(面数の種類+1)
+        self.assertEqual(estimate_distribution_cost(expression), 38 * 8)
+        # 重複ありは選ぶ数だけ、重複なしは候補の数までのコスト
+        self.assertEqual(estimate_selection_cost(10, 100000, False), 100010)
+        self.assertEqual(estimate_selection_cost(10, 100000, True), 20)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,301 @@
+"""
+ロール履歴ストアのテスト
+"""
+import asyncio
+import unittest
+import sqlite3
+import sys
+import os
+import tempfile
+import threading
+import unittest.mock
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from array import array
+
+from src.dice.result import RollResult, RollRecord, DiceTerm, ModifierTerm
+from src.dice.roller import roll_complex_dice, replay_roll
+from src.storage.history import (
+    HistoryStore,
+    HistoryFilter,
+    MemoryHistoryBackend,
+    SQLiteHistoryBackend,
+    _encode_record
+)
+from src.commands.history import build_history_filter, create_history_embed, fetch_history_page
+
+def make_result(value: int) -> RollResult:
+    """テスト用のロール結果を作成する"""
+    term = DiceTerm(1, 20, array('B', [value]), value, value == 20, value == 1)
+    return RollResult("1d20+1", (term, ModifierTerm(1)), value + 1)
+
+class TestHistoryStore(unittest.TestCase):
+    """ロール履歴ストアのテストクラス"""
+    
+    def test_max_size(self):
+        """履歴が最大件数に制限されるテスト"""
+        store = HistoryStore(MemoryHistoryBackend(), max_size=3)
+        for value in range(1, 6):
+            store.append(1, make_result(value))
+        
+        history = store.get(1)
+        self.assertEqual([roll.total - 1 for roll in history], [3, 4, 5])
+        self.assertEqual(store.get(2), [])
+        store.close()
+    
+    def test_idle_eviction(self):
+        """アイドル状態のユーザーがキャッシュから外れ、バックエンドから復元されるテスト"""
+        store = HistoryStore(MemoryHistoryBackend(), max_size=3, max_cached_users=2, flush_interval=0.01)
+        for user_id in range(5):
+            store.append(user_id, make_result(user_id + 1))
+            store.flush()
+        
+        self.assertLessEqual(store.cached_user_count(), 2)
+        self.assertEqual([roll.total - 1 for roll in store.get(0)], [1])
+        store.close()
+    
+    def test_eviction_skips_pending_users(self):
+        """未保存の書き込みがあるユーザーは残し、その次に古いユーザーを追い出すテスト"""
+        backend = MemoryHistoryBackend()
+        store = HistoryStore(backend, max_cached_users=1, flush_interval=0.01)
+        release = threading.Event()
+        append_many = backend.append_many
+
+        def slow_append_many(entries):
+            release.wait(5)
+            append_many(entries)
+
+        with unittest.mock.patch.object(backend, 'append_many', slow_append_many):
+            store.append(1, make_result(1))
+            store.get(2)
+            self.assertEqual(store.cached_user_count(), 1)
+            self.assertEqual(store.get(1)[-1].total, 2)
+            release.set()
+            store.flush()
+        store.close()
+    
+    def test_sqlite_persistence(self):
+        """SQLiteバックエンドで再起動後も履歴が残るテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            store = HistoryStore(SQLiteHistoryBackend(path), max_size=2)
+            for value in (7, 8, 9):
+                store.append(42, make_result(value))
+            seeded = roll_complex_dice("3d6+2", seed=2 ** 64 - 1)
+            store.append(43, seeded)
+            store.close()
+            
+            store = HistoryStore(SQLiteHistoryBackend(path), max_size=2)
+            history = store.get(42)
+            self.assertEqual([roll.total - 1 for roll in history], [8, 9])
+            
+            # 出目は保存されず、シードから再生成される
+            record = store.get(43)[0]
+            self.assertEqual(record.seed, 2 ** 64 - 1)
+            replayed = replay_roll(record)
+            self.assertEqual(replayed.total, seeded.total)
+            self.assertEqual(list(replayed.terms[0].rolls), list(seeded.terms[0].rolls))
+            store.close()
+    
+    def test_load_off_event_loop(self):
+        """イベントループではキャッシュにないユーザーの履歴を書き込みスレッドで読み込むテスト"""
+        backend = MemoryHistoryBackend()
+        backend.append_many([(1, float(value), RollRecord.from_result(make_result(value)), None, None) for value in (1, 2)])
+        store = HistoryStore(backend, max_size=3)
+        loading_threads = []
+        load_recent = backend.load_recent
+        
+        def recording_load_recent(user_id, limit):
+            loading_threads.append(threading.get_ident())
+            return load_recent(user_id, limit)
+        
+        async def roll_and_audit():
+            with unittest.mock.patch.object(backend, 'load_recent', recording_load_recent):
+                store.append(1, make_result(3))
+                store.append(1, make_result(4))
+                await store.preload(1)
+                return store.get(1)
+        
+        history = asyncio.run(roll_and_audit())
+        # 読み込み中に追加したロールは、読み込んだ履歴の後ろに1回だけ並ぶ
+        self.assertEqual([roll.total - 1 for roll in history], [2, 3, 4])
+        self.assertEqual(len(loading_threads), 1)
+        self.assertNotEqual(loading_threads[0], threading.get_ident())
+        store.close()
+    
+    def test_legacy_record(self):
+        """出目を含む以前の形式の履歴を読み込めるテスト"""
+        record = RollRecord.from_dict(make_result(20).to_dict())
+        self.assertEqual(record.input, "1d20+1")
+        self.assertEqual(record.total, 21)
+        self.assertIsNone(record.seed)
+        self.assertTrue(record.is_critical)
+
+class TestHistoryQuery(unittest.TestCase):
+    """履歴の検索とページ送りのテストクラス"""
+
+    def fill(self, backend):
+        """1d20の出目1～20と2d6を交互に、2つのチャンネルに記録する"""
+        entries = []
+        for i in range(40):
+            if i % 2 == 0:
+                value = i // 2 + 1
+                record = RollRecord("1D20 + 1", None, value + 1, value == 20, value == 1)
+            else:
+                record = RollRecord("2d6", None, 7)
+            entries.append((1, 1000.0 + i, record, 10, 100 + i % 3))
+        entries.append((2, 1000.0, RollRecord("1d20+1", None, 21, True), 10, 100))
+        backend.append_many(entries)
+
+    def check_backend(self, backend):
+        self.fill(backend)
+
+        rows = backend.query(1, HistoryFilter(expression="1d20+1"), 100)
+        self.assertEqual(len(rows), 20)
+        self.assertEqual([row.created_at for row in rows[:2]], [1038.0, 1036.0])
+
+        critical = backend.query(1, HistoryFilter(flag='critical'), 100)
+        self.assertEqual([row.record.total for row in critical], [21])
+        self.assertEqual(len(backend.query(1, HistoryFilter(flag='fumble'), 100)), 1)
+
+        in_range = backend.query(1, HistoryFilter(since=1010.0, until=1020.0, channel_id=100), 100)
+        self.assertEqual([row.created_at for row in in_range], [1018.0, 1015.0, 1012.0])
+
+        # 古い方へ進み、新しい方へ戻る
+        first = backend.query(1, HistoryFilter(), 15)
+        second = backend.query(1, HistoryFilter(), 15, before=first[-1].cursor)
+        self.assertEqual(second[0].created_at, 1024.0)
+        back = backend.query(1, HistoryFilter(), 15, after=second[0].cursor)
+        self.assertEqual([row.id for row in back], [row.id for row in first])
+        backend.close()
+
+    def test_memory_backend(self):
+        """メモリ上のバックエンドの検索のテスト"""
+        self.check_backend(MemoryHistoryBackend())
+
+    def test_sqlite_backend(self):
+        """SQLiteバックエンドの検索がインデックスの範囲で行われるテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SQLiteHistoryBackend(os.path.join(directory, "history.db"))
+            plan = backend._connection.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM roll_history WHERE user_id = ? AND created_at >= ? "
+                "ORDER BY created_at DESC, id DESC LIMIT 10", (1, 0.0)
+            ).fetchall()
+            self.assertIn("idx_roll_history_user_time", " ".join(str(row) for row in plan))
+            self.assertNotIn("TEMP B-TREE", " ".join(str(row) for row in plan))
+
+            # 絞り込みもそれぞれのインデックスの範囲で行う（ユーザーの履歴全体を走査しない）
+            for condition, params, index in (
+                ("expression = ?", ("1d20",), "idx_roll_history_user_expression"),
+                ("channel_id = ?", (10,), "idx_roll_history_user_channel"),
+                ("is_critical = 1", (), "idx_roll_history_user_critical"),
+                ("is_fumble = 1", (), "idx_roll_history_user_fumble")
+            ):
+                plan = " ".join(str(row) for row in backend._connection.execute(
+                    f"EXPLAIN QUERY PLAN SELECT id FROM roll_history WHERE user_id = ? AND {condition} "
+                    "ORDER BY created_at DESC, id DESC LIMIT 10", (1, *params)
+                ).fetchall())
+                self.assertIn(index, plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+            self.check_backend(backend)
+
+    def test_migrate_old_database(self):
+        """以前の形式のデータベースに検索用の列が追加されるテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            connection = sqlite3.connect(path)
+            connection.execute(
+                "CREATE TABLE roll_history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id INTEGER NOT NULL, created_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            connection.execute(
+                "INSERT INTO roll_history (user_id, created_at, data) VALUES (?, ?, ?)",
+                (5, 1.0, json_dumps_legacy())
+            )
+            connection.commit()
+            connection.close()
+
+            backend = SQLiteHistoryBackend(path)
+            rows = backend.query(5, HistoryFilter(expression="1d20+1", flag='critical'), 10)
+            self.assertEqual([row.record.total for row in rows], [21])
+            self.assertIsNone(rows[0].channel_id)
+            backend.close()
+
+    def test_store_pages(self):
+        """ストアの未保存の履歴も含めてページ送りできるテスト"""
+        store = HistoryStore(MemoryHistoryBackend(), max_size=3, flush_interval=0.01)
+        for value in range(1, 26):
+            store.append(7, make_result(value), guild_id=1, channel_id=2)
+        history_filter = build_history_filter()
+
+        with unittest.mock.patch('src.commands.history.get_history_store', return_value=store):
+            rows, has_newer, has_older = fetch_history_page(7, history_filter, 10)
+            self.assertEqual([row.record.total for row in rows], list(range(26, 16, -1)))
+            self.assertEqual((has_newer, has_older), (False, True))
+
+            rows, has_newer, has_older = fetch_history_page(7, history_filter, 10, before=rows[-1].cursor)
+            rows, has_newer, has_older = fetch_history_page(7, history_filter, 10, before=rows[-1].cursor)
+            self.assertEqual([row.record.total for row in rows], [6, 5, 4, 3, 2])
+            self.assertEqual((has_newer, has_older), (True, False))
+
+            rows, has_newer, has_older = fetch_history_page(7, history_filter, 10, after=rows[0].cursor)
+            self.assertEqual(rows[0].record.total, 16)
+            self.assertEqual((has_newer, has_older), (True, True))
+
+        # 記録時刻が同じロールもIDで順序が決まる
+        self.assertEqual(len(store.query(7, build_history_filter(flag='fumble'), 10)), 1)
+        store.close()
+
+    def test_query_waits_for_own_writes(self):
+        """検索は自分の書き込みの保存だけを待ち、後から積まれた他のユーザーの書き込みを待たないテスト"""
+        backend = MemoryHistoryBackend()
+        store = HistoryStore(backend, flush_interval=0.01, batch_size=1)
+        release = threading.Event()
+        append_many = backend.append_many
+        
+        def slow_append_many(entries):
+            if any(user_id == 2 for user_id, *_ in entries):
+                release.wait(5)
+            append_many(entries)
+        
+        rows = []
+        with unittest.mock.patch.object(backend, 'append_many', slow_append_many):
+            store.append(1, make_result(5))
+            store.append(2, make_result(6))
+            searcher = threading.Thread(target=lambda: rows.extend(store.query(1, build_history_filter(), 10)))
+            searcher.start()
+            searcher.join(2)
+            self.assertFalse(searcher.is_alive())
+            release.set()
+            store.flush()
+        self.assertEqual([row.record.total for row in rows], [6])
+        store.close()
+
+    def test_embed_long_expression(self):
+        """長いダイス式の履歴もフィールド名の上限に収めて表示するテスト"""
+        store = HistoryStore(MemoryHistoryBackend())
+        store.append(7, RollRecord("+".join(["1d6"] * 200), None, 700))
+        rows = store.query(7, build_history_filter(), 10)
+        embed = create_history_embed("テスト", rows, 1, "")
+        self.assertEqual(len(embed.fields[0].name), 256)
+        self.assertTrue(embed.fields[0].name.endswith("…"))
+        store.close()
+
+    def test_build_filter(self):
+        """コマンドの引数から検索条件を作成するテスト"""
+        history_filter = build_history_filter("1D20 + 5", "critical", "2024-01-01", "2024-01-31")
+        self.assertEqual(history_filter.expression, "1d20+5")
+        self.assertEqual(history_filter.until - history_filter.since, 31 * 86400)
+        with self.assertRaises(ValueError):
+            build_history_filter(since="2024/01/01")
+
+def json_dumps_legacy() -> str:
+    """出目を含む以前の形式の記録"""
+    return _encode_record(RollRecord.from_dict(make_result(20).to_dict()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+参加者リストの読み込みとリザーバーサンプリングのテスト
+"""
+import asyncio
+import random
+import unittest
+import sys
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+import discord
+from aiohttp import web
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.randomizers.ingest import (
+    parse_entry,
+    EntryParser,
+    iter_entries,
+    ingest_attachment,
+    IngestError,
+    CHUNK_SIZE
+)
+from src.randomizers.selector import reservoir_sample, select_random_multiple
+from src.randomizers.lottery import draw_lottery, draw_tiered_lottery, WeightedReservoir
+from src.commands.attachments import format_lines, field_budget
+
+class TestParseEntries(unittest.TestCase):
+    """参加者リストの解析のテストクラス"""
+    
+    def test_parse_entry(self):
+        """1行の解析のテスト"""
+        self.assertEqual(parse_entry("山田\r\n"), ("山田", None))
+        self.assertEqual(parse_entry("佐藤, 3"), ("佐藤", 3.0))
+        self.assertEqual(parse_entry('"Smith, John",2'), ("Smith, John", 2.0))
+        self.assertIsNone(parse_entry("   "))
+        self.assertIsNone(parse_entry("# コメント"))
+        with self.assertRaises(ValueError):
+            parse_entry("鈴木,たくさん")
+    
+    def test_deduplicate_and_header(self):
+        """見出し行を読み飛ばし、重複を除くテスト"""
+        parser = EntryParser()
+        lines = ["名前,口数", "山田,2", "佐藤", "山田,5", "鈴木,x", ""]
+        entries = list(iter_entries(lines, parser))
+        
+        self.assertEqual(entries, [("山田", 2.0), ("佐藤", 1.0)])
+        self.assertEqual(parser.result.entries, 2)
+        self.assertEqual(parser.result.duplicates, 1)
+        self.assertEqual(parser.result.invalid, 1)
+        self.assertTrue(parser.result.weighted)
+
+class TestReservoir(unittest.TestCase):
+    """リザーバーサンプリングのテストクラス"""
+    
+    def test_sample_size(self):
+        """選ばれる数と重複のテスト"""
+        sample = reservoir_sample(iter(range(100000)), 50)
+        self.assertEqual(len(sample), 50)
+        self.assertEqual(len(set(sample)), 50)
+        self.assertEqual(sorted(reservoir_sample(iter(range(3)), 10)), [0, 1, 2])
+        self.assertEqual(reservoir_sample(iter([]), 3), [])
+    
+    def test_uniform(self):
+        """全ての要素が等確率で選ばれるテスト"""
+        random.seed(2024)
+        counts = Counter()
+        for _ in range(4000):
+            counts.update(reservoir_sample(iter(range(20)), 5))
+        # 各要素の期待値は 4000 × 5 / 20 = 1000
+        for value in range(20):
+            self.assertAlmostEqual(counts[value], 1000, delta=120)
+    
+    def test_streaming_draw(self):
+        """イテラブルを渡した抽選・選択がリザーバーサンプリングで行われるテスト"""
+        participants = (f"p{i}" for i in range(1000))
+        winners = draw_lottery(participants, 10)
+        self.assertEqual(len(set(winners)), 10)
+        self.assertEqual(len(select_random_multiple(iter("abcdef"), 4)), 4)
+        
+        tiers = draw_tiered_lottery(iter(["a", "b", "c"]), {"一等賞": 1, "二等賞": 5})
+        self.assertEqual(len(tiers["一等賞"]), 1)
+        self.assertEqual(len(tiers["二等賞"]), 2)
+    
+    def test_weighted_reservoir(self):
+        """重み付きリザーバーが口数に比例して選ぶテスト"""
+        random.seed(7)
+        counts = Counter()
+        for _ in range(20000):
+            reservoir = WeightedReservoir(1)
+            for name, weight in (("a", 1), ("b", 3), ("c", 0)):
+                reservoir.add(name, weight)
+            counts.update(reservoir.sample())
+        self.assertEqual(counts["c"], 0)
+        self.assertAlmostEqual(counts["b"] / 20000, 0.75, delta=0.015)
+        
+        # 重みが正の要素が足りない場合は重み0の要素で埋める
+        reservoir = WeightedReservoir(3)
+        for name, weight in (("a", 1), ("b", 0), ("c", 0)):
+            reservoir.add(name, weight)
+        sample = reservoir.sample()
+        self.assertEqual(sample[0], "a")
+        self.assertEqual(sorted(sample), ["a", "b", "c"])
+
+class TestIngestAttachment(unittest.TestCase):
+    """添付ファイルのストリーミング読み込みのテストクラス"""
+    
+    def run_ingest(self, body: bytes, filename: str = "entries.txt", max_bytes: int = 10 * 1024 * 1024):
+        """ローカルのHTTPサーバーから body を読み込む"""
+        async def handler(request):
+            return web.Response(body=body, content_type="text/plain")
+        
+        async def run():
+            app = web.Application()
+            app.router.add_get("/entries", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            attachment = SimpleNamespace(
+                url=f"http://127.0.0.1:{port}/entries",
+                filename=filename,
+                content_type="text/plain; charset=utf-8",
+                size=len(body)
+            )
+            entries = []
+            try:
+                result = await ingest_attachment(attachment, lambda name, weight: entries.append((name, weight)), max_bytes)
+            finally:
+                await runner.cleanup()
+            return result, entries
+        
+        return asyncio.run(run())
+    
+    def test_stream_large_file(self):
+        """チャンクの境界をまたぐマルチバイト文字とBOMを正しく読み込むテスト"""
+        names = [f"参加者{i}" for i in range(20000)]
+        body = ("\ufeff" + "\n".join(names + names[:10]) + "\n").encode("utf-8")
+        self.assertGreater(len(body), CHUNK_SIZE * 3)
+        
+        result, entries = self.run_ingest(body)
+        self.assertEqual([name for name, _ in entries], names)
+        self.assertEqual(result.entries, 20000)
+        self.assertEqual(result.duplicates, 10)
+    
+    def test_too_large(self):
+        """最大バイト数を超えるファイルが拒否されるテスト"""
+        with self.assertRaises(IngestError):
+            self.run_ingest(b"a\n" * 1000, max_bytes=100)
+    
+    def test_rejects_binary_file(self):
+        """テキスト以外のファイルが拒否されるテスト"""
+        attachment = SimpleNamespace(url="", filename="image.png", content_type="image/png", size=10)
+        with self.assertRaises(IngestError):
+            asyncio.run(ingest_attachment(attachment, lambda name, weight: None, 1000))
+
+class TestFormatLines(unittest.TestCase):
+    """参加者リストの表示のテストクラス"""
+
+    def test_lines_fit_field(self):
+        """フィールドに収まらない行が人数にまとめられるテスト"""
+        names = [f"参加者{i:05d}" for i in range(50000)]
+        text = format_lines((f"• {name}" for name in names), len(names), unit="人")
+        self.assertLessEqual(len(text), 1024)
+        shown = text.count("\n")
+        self.assertTrue(text.endswith(f"…他{len(names) - shown:,}人"))
+        self.assertEqual(format_lines(["a", "b"], 2), "a\nb")
+
+        # 1行で上限を超える場合は行の末尾を省略する
+        self.assertLessEqual(len(format_lines(["x" * 5000], 1)), 1024)
+
+    def test_many_fields_fit_embed(self):
+        """フィールドの値を分け合い、Embed全体が上限に収まるテスト"""
+        embed = discord.Embed(title="👥 チーム分け結果", description="**50,000人**を**25チーム**に分けました")
+        budget = field_budget(embed, 25)
+        for i in range(25):
+            embed.add_field(name=f"チーム {i+1}", value=format_lines(("• " + "x" * 20 for _ in range(2000)), 2000, budget, "人"))
+        self.assertLessEqual(len(embed), 6000)
+        self.assertEqual(field_budget(discord.Embed(), 1), 1024)
+
+if __name__ == "__main__":
+    unittest.main()
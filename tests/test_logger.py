@@ -0,0 +1,62 @@
+"""
+ロギングのテスト
+"""
+import unittest
+import json
+import logging
+import sys
+import os
+import tempfile
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.utils.logger import setup_logger, shutdown_logger, LOG_FILE_NAME
+
+class TestLogger(unittest.TestCase):
+    """ロギングのテストクラス"""
+    
+    def setUp(self):
+        self.logs_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutdown_logger()
+    
+    def read_log(self):
+        shutdown_logger()
+        with open(os.path.join(self.logs_dir, LOG_FILE_NAME), encoding='utf-8') as f:
+            return f.read().splitlines()
+    
+    def test_json_format(self):
+        """JSON形式で遅延評価の引数が展開されるテスト"""
+        logger = setup_logger(logging.INFO, log_format='json', logs_dir=self.logs_dir)
+        logger.info("ロール結果: %s (%d)", "2d6", 7)
+        
+        record = json.loads(self.read_log()[-1])
+        self.assertEqual(record["message"], "ロール結果: 2d6 (7)")
+        self.assertEqual(record["level"], "INFO")
+        self.assertEqual(record["logger"], "dice_bot")
+    
+    def test_disabled_level_is_not_formatted(self):
+        """無効なレベルのログは引数が文字列化されないテスト"""
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError("文字列化されました")
+        
+        logger = setup_logger(logging.INFO, logs_dir=self.logs_dir)
+        logger.debug("ダイスロール結果: %s", Unformattable())
+        logger.info("完了")
+        
+        lines = self.read_log()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("完了"))
+    
+    def test_invalid_format(self):
+        """不明なログ形式が拒否されるテスト"""
+        with self.assertRaises(ValueError):
+            setup_logger(log_format="xml", logs_dir=self.logs_dir)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+抽選機能のテスト
+"""
+import unittest
+import random
+import sys
+import os
+from collections import Counter
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.randomizers.lottery import draw_weighted_lottery
+
+class TestWeightedLottery(unittest.TestCase):
+    """重み付き抽選のテストクラス"""
+    
+    def test_winners_are_unique(self):
+        """当選者が重複せず、指定した人数になるテスト"""
+        participants = [f"p{i}" for i in range(100)]
+        winners = draw_weighted_lottery(participants, [1 + i % 7 for i in range(100)], 30)
+        self.assertEqual(len(winners), 30)
+        self.assertEqual(len(set(winners)), 30)
+        self.assertTrue(set(winners) <= set(participants))
+    
+    def test_count_is_capped(self):
+        """当選者数が参加者数を超えないテスト"""
+        self.assertEqual(sorted(draw_weighted_lottery(["a", "b"], [1, 2], 5)), ["a", "b"])
+        self.assertEqual(draw_weighted_lottery(["a", "b"], [1, 2], 0), [])
+        self.assertEqual(draw_weighted_lottery([], [], 3), [])
+    
+    def test_zero_weights_only_fill_remaining(self):
+        """重みが0の参加者は、重みが正の参加者が足りない場合だけ選ばれるテスト"""
+        for _ in range(20):
+            self.assertEqual(sorted(draw_weighted_lottery(["a", "b", "c"], [0, 3, 1], 2)), ["b", "c"])
+        winners = draw_weighted_lottery(["a", "b", "c"], [0, 0, 1], 2)
+        self.assertEqual(winners[0], "c")
+        self.assertIn(winners[1], ("a", "b"))
+    
+    def test_first_winner_follows_ticket_counts(self):
+        """最初の当選者が口数に比例した確率で選ばれるテスト"""
+        random.seed(12345)
+        counts = Counter(draw_weighted_lottery(["a", "b", "c"], [1, 2, 7], 1)[0] for _ in range(20000))
+        self.assertAlmostEqual(counts["a"] / 20000, 0.1, delta=0.015)
+        self.assertAlmostEqual(counts["b"] / 20000, 0.2, delta=0.015)
+        self.assertAlmostEqual(counts["c"] / 20000, 0.7, delta=0.015)
+    
+    def test_mismatched_weights_fall_back_to_uniform(self):
+        """重みの数が合わない場合は等確率で抽選するテスト"""
+        winners = draw_weighted_lottery(["a", "b", "c"], [1], 3)
+        self.assertEqual(sorted(winners), ["a", "b", "c"])
+
+if __name__ == "__main__":
+    unittest.main()
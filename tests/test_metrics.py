@@ -0,0 +1,109 @@
+"""
+コマンド計測のテスト
+"""
+import asyncio
+import unittest
+import sys
+import os
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.utils.metrics import (
+    Histogram,
+    track_command,
+    measure_phase,
+    record_error,
+    get_metrics_summary,
+    render_prometheus,
+    reset_metrics,
+    start_metrics_server
+)
+
+class TestMetrics(unittest.TestCase):
+    """コマンド計測のテストクラス"""
+    
+    def setUp(self):
+        reset_metrics()
+    
+    def test_histogram_percentile(self):
+        """ヒストグラムのパーセンタイルがバケットの範囲に収まるテスト"""
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.observe(0.002)
+        for _ in range(10):
+            histogram.observe(0.3)
+        
+        self.assertEqual(histogram.count, 100)
+        self.assertTrue(0.001 <= histogram.percentile(0.5) <= 0.0025)
+        self.assertTrue(0.25 <= histogram.percentile(0.95) <= 0.3)
+        self.assertEqual(histogram.cumulative_counts()[-1], (float('inf'), 100))
+    
+    def test_track_command(self):
+        """呼び出し回数・エラー数・フェーズが記録されるテスト"""
+        @track_command('roll')
+        async def command(fail: bool):
+            with measure_phase('parse'):
+                pass
+            if fail:
+                record_error()
+        
+        async def run():
+            await command(False)
+            await command(True)
+        asyncio.run(run())
+        
+        summary = get_metrics_summary()["roll"]
+        self.assertEqual(summary["calls"], 2)
+        self.assertEqual(summary["errors"], 1)
+        self.assertAlmostEqual(summary["error_rate"], 0.5)
+        self.assertEqual(summary["phases"]["total"]["count"], 2)
+        self.assertEqual(summary["phases"]["parse"]["count"], 2)
+    
+    def test_unhandled_exception_counts_as_error(self):
+        """捕捉されなかった例外がエラーとして数えられるテスト"""
+        @track_command('choose one')
+        async def command():
+            raise RuntimeError("失敗")
+        
+        with self.assertRaises(RuntimeError):
+            asyncio.run(command())
+        self.assertEqual(get_metrics_summary()["choose one"]["errors"], 1)
+    
+    def test_phase_outside_command_is_ignored(self):
+        """コマンドの外で計測しても記録されないテスト"""
+        with measure_phase('render'):
+            pass
+        self.assertEqual(get_metrics_summary(), {})
+    
+    def test_prometheus_endpoint(self):
+        """エンドポイントがPrometheusのテキスト形式で応答するテスト"""
+        @track_command('roll')
+        async def command():
+            pass
+        
+        async def run():
+            await command()
+            server = await start_metrics_server('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return response.decode('utf-8')
+            finally:
+                server.close()
+                await server.wait_closed()
+        
+        response = asyncio.run(run())
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn('dice_bot_command_calls_total{command="roll"} 1', response)
+        self.assertIn('dice_bot_command_duration_seconds_count{command="roll",phase="total"} 1', response)
+        self.assertIn(render_prometheus().splitlines()[0], response)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,7 +10,13 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
-from src.dice.parser import parse_complex_dice_notation, validate_dice_notation
+from src.dice.parser import (
+    parse_complex_dice_notation,
+    validate_dice_notation,
+    compile_dice_expression,
+    get_parse_cache_info,
+    clear_parse_cache
+)
 
 class TestDiceParser(unittest.TestCase):
     """ダイス表記パーサーのテストクラス"""
@@ -74,5 +80,35 @@ class TestDiceParser(unittest.TestCase):
         self.assertFalse(is_valid)
         self.assertEqual(error, "無効なダイス表記です")
 
+    def test_compile_dice_expression(self):
+        """コンパイル済みダイス式のテスト"""
+        expression = compile_dice_expression("2d6-1d4+3")
+        self.assertEqual(expression.normalized, "2d6-1d4+3")
+        self.assertEqual(expression.components, ((2, 6, 0), (-1, 4, 0), (0, 0, 3)))
+        # 最小値: 2 - 4 + 3, 最大値: 12 - 1 + 3
+        self.assertEqual(expression.min_total, 1)
+        self.assertEqual(expression.max_total, 14)
+        self.assertEqual(expression.min_dice_count, 1)
+        self.assertEqual(expression.max_dice_count, 2)
+        self.assertEqual(expression.min_sides, 4)
+        self.assertEqual(expression.max_sides, 6)
+        self.assertEqual(expression.max_modifier, 3)
+        
+        # 無効な表記
+        self.assertIsNone(compile_dice_expression("invalid"))
+    
+    def test_parse_cache(self):
+        """パースキャッシュのテスト"""
+        clear_parse_cache()
+        first = compile_dice_expression("1D20 + 5")
+        second = compile_dice_expression("1d20+5")
+        
+        # 正規化された表記は同じキャッシュエントリを共有する
+        self.assertIs(first, second)
+        info = get_parse_cache_info()
+        self.assertEqual(info["misses"], 1)
+        self.assertEqual(info["hits"], 1)
+        self.assertEqual(info["size"], 1)
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
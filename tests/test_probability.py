@@ -0,0 +1,118 @@
+"""
+確率分布計算のテスト
+"""
+import unittest
+import sys
+import os
+from dataclasses import replace
+from itertools import product
+from unittest.mock import patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.parser import compile_dice_expression
+from src.dice.probability import dice_sum_distribution, calculate_dice_stats, expression_distribution
+from config.settings import get_settings
+
+def exact_counts(terms):
+    """(ダイス数, 面数) のダイスの合計の場合の数を整数で厳密に求める"""
+    counts = [1]
+    for num_dice, num_sides in terms:
+        for _ in range(num_dice):
+            prefix = [0]
+            for count in counts:
+                prefix.append(prefix[-1] + count)
+            length = len(counts)
+            counts = [
+                prefix[min(k + 1, length)] - prefix[max(0, k + 1 - num_sides)]
+                for k in range(length + num_sides - 1)
+            ]
+    return counts
+
+class TestDiceProbability(unittest.TestCase):
+    """確率分布計算のテストクラス"""
+    
+    def test_dice_sum_distribution(self):
+        """ダイス合計の分布を総当たりの結果と比較するテスト"""
+        distribution = dice_sum_distribution(3, 6)
+        self.assertEqual(distribution.min_value, 3)
+        self.assertEqual(distribution.max_value, 18)
+        
+        counts = {}
+        for faces in product(range(1, 7), repeat=3):
+            counts[sum(faces)] = counts.get(sum(faces), 0) + 1
+        for total, count in counts.items():
+            self.assertAlmostEqual(distribution.probability(total), count / 216)
+        
+        self.assertAlmostEqual(distribution.mean, 10.5)
+        self.assertAlmostEqual(distribution.variance, 8.75)
+    
+    def test_expression_stats(self):
+        """複数項のダイス式の統計量のテスト"""
+        stats = calculate_dice_stats("2d6-1d4+3", target=10)
+        self.assertEqual(stats["min"], 1)
+        self.assertEqual(stats["max"], 14)
+        self.assertAlmostEqual(stats["mean"], 7.5)
+        
+        # 総当たりで P(X >= 10) を求める
+        hits = sum(1 for a, b, c in product(range(1, 7), range(1, 7), range(1, 5)) if a + b - c + 3 >= 10)
+        self.assertAlmostEqual(stats["target"]["at_least"], hits / 144)
+        self.assertAlmostEqual(sum(stats["distribution"].probabilities), 1.0)
+    
+    def test_maximum_pool(self):
+        """最大サイズのダイスプールでも正規化された分布になるテスト"""
+        stats = calculate_dice_stats("100d1000")
+        distribution = stats["distribution"]
+        self.assertEqual(len(distribution.probabilities), 100 * 1000 - 100 + 1)
+        self.assertAlmostEqual(sum(distribution.probabilities), 1.0, places=9)
+        self.assertEqual(stats["percentiles"][50], 50050)
+    
+    def test_tail_precision(self):
+        """裾の小さな確率まで相対誤差が小さいテスト（左右とも）"""
+        cases = [
+            ("30d100", [(30, 100)]),
+            ("20d50-10d7+5", [(20, 50), (10, 7)]),
+            ("40d200+40d199", [(40, 200), (40, 199)]),
+            # 面数の種類が多い場合は一部をダイス1個ずつ畳み込む
+            ("3d6+1d2+2d3+1d20+5d4", [(3, 6), (1, 2), (2, 3), (1, 20), (5, 4)])
+        ]
+        for notation, terms in cases:
+            distribution = expression_distribution(compile_dice_expression(notation))
+            counts = exact_counts(terms)
+            total = sum(counts)
+            self.assertEqual(len(distribution.probabilities), len(counts))
+            for probability, count in zip(distribution.probabilities, counts):
+                expected = count / total
+                if expected > 1e-290:
+                    self.assertAlmostEqual(probability / expected, 1.0, places=7, msg=notation)
+    
+    def test_shared_shape(self):
+        """負のダイスや修正値は分布の形を共有し、最小値だけがずれるテスト"""
+        positive = expression_distribution(compile_dice_expression("2d6+1d8"))
+        negative = expression_distribution(compile_dice_expression("1d8-2d6+3"))
+        self.assertIs(positive.probabilities, negative.probabilities)
+        self.assertEqual((negative.min_value, negative.max_value), (1 - 12 + 3, 8 - 2 + 3))
+        self.assertAlmostEqual(negative.mean, 4.5 - 7 + 3)
+    
+    def test_stats_validation(self):
+        """確率分布計算の検証テスト"""
+        self.assertIn("error", calculate_dice_stats("invalid"))
+        self.assertIn("error", calculate_dice_stats("1000d6"))
+    
+    def test_stats_cost_limit(self):
+        """計算量が上限を超える式は分布を計算せずにエラーにするテスト"""
+        expression = "+".join(f"100d{sides}" for sides in range(1000, 990, -1))
+        with patch('src.dice.probability.expression_distribution') as distribution:
+            stats = calculate_dice_stats(expression)
+        self.assertIn("error", stats)
+        distribution.assert_not_called()
+        
+        settings = replace(get_settings(), stats_max_cost=100)
+        self.assertIn("error", calculate_dice_stats("3d6+2d8", settings=settings))
+        self.assertNotIn("error", calculate_dice_stats("3d6+2d8"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+トークンバケットのテスト
+"""
+import unittest
+import sys
+import os
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.utils.ratelimit import KeyedRateLimiter
+
+class FakeClock:
+    """テスト用の時計"""
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+class TestKeyedRateLimiter(unittest.TestCase):
+    """キーごとのトークンバケットのテストクラス"""
+    
+    def test_burst_and_refill(self):
+        """上限まで連続して許可され、補充速度に従って再び許可されるテスト"""
+        clock = FakeClock()
+        limiter = KeyedRateLimiter(2.0, 3, clock=clock)
+        self.assertEqual([limiter.try_acquire("a") for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(limiter.delay("a"), 0.5)
+        # 別のキーは独立している
+        self.assertTrue(limiter.try_acquire("b"))
+        
+        clock.now = 0.5
+        self.assertTrue(limiter.try_acquire("a"))
+        self.assertFalse(limiter.try_acquire("a"))
+        
+        # 上限を超えては補充されない
+        clock.now = 100.0
+        self.assertEqual([limiter.try_acquire("a") for _ in range(4)], [True, True, True, False])
+    
+    def test_prune_full_buckets(self):
+        """キーが増えすぎた場合に満杯のバケットが削除されるテスト"""
+        clock = FakeClock()
+        limiter = KeyedRateLimiter(1.0, 1, clock=clock, max_keys=3)
+        for key in range(3):
+            limiter.try_acquire(key)
+        clock.now = 0.5
+        limiter.try_acquire(3)
+        self.assertEqual(len(limiter), 4)
+        
+        clock.now = 10.0
+        limiter.try_acquire(4)
+        self.assertEqual(len(limiter), 1)
+    
+    def test_invalid_rate(self):
+        """不正な補充速度を拒否するテスト"""
+        with self.assertRaises(ValueError):
+            KeyedRateLimiter(0, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+ダイス結果の表示のテスト
+"""
+import unittest
+import sys
+import os
+from array import array
+from types import SimpleNamespace
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.result import RollResult, DiceTerm, ModifierTerm
+from src.dice.roller import roll_complex_dice
+from src.dice.probability import calculate_dice_stats
+from src.dice.renderer import (
+    create_dice_embed,
+    create_stats_embed,
+    EMBED_TOTAL_LIMIT,
+    FIELD_VALUE_LIMIT,
+    MAX_FIELDS,
+    TITLE_LIMIT
+)
+
+def make_interaction() -> SimpleNamespace:
+    """create_dice_embed が参照する属性だけを持つインタラクション"""
+    avatar = SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png")
+    return SimpleNamespace(user=SimpleNamespace(display_name="テスト", display_avatar=avatar))
+
+def make_term(count: int, sides: int, face: int = None) -> DiceTerm:
+    """出目が決まったダイス項を作成する（faceを省略すると1から順に割り当てる）"""
+    rolls = array('H', [face if face is not None else i % sides + 1 for i in range(count)])
+    return DiceTerm(count, sides, rolls, sum(rolls), False, False)
+
+class TestRenderer(unittest.TestCase):
+    """ダイス結果の表示のテストクラス"""
+    
+    def assertWithinLimits(self, embed):
+        self.assertLessEqual(len(embed), EMBED_TOTAL_LIMIT)
+        self.assertLessEqual(len(embed.fields), MAX_FIELDS)
+        self.assertLessEqual(len(embed.title), TITLE_LIMIT)
+        for field in embed.fields:
+            self.assertLessEqual(len(field.value), FIELD_VALUE_LIMIT)
+    
+    def test_small_roll(self):
+        """少ないダイスは全ての出目を表示するテスト"""
+        term = make_term(3, 6)
+        embed = create_dice_embed(make_interaction(), RollResult("3d6+2", (term, ModifierTerm(2)), term.total + 2))
+        self.assertEqual(embed.fields[0].value, "[1, 2, 3] = **6**")
+        self.assertEqual(embed.fields[1].value, "+2")
+        self.assertEqual(embed.fields[-1].value, "**8**")
+    
+    def test_histogram(self):
+        """面数の少ないダイスが多い場合は出目ごとの個数にまとめるテスト"""
+        term = make_term(100, 6)
+        embed = create_dice_embed(make_interaction(), RollResult("100d6", (term,), term.total))
+        self.assertTrue(embed.fields[0].value.startswith("[1×17 2×17 3×17 4×17 5×16 6×16]"))
+    
+    def test_sum_only(self):
+        """合計だけを振った項は出目を表示せず合計だけを表示するテスト"""
+        result = roll_complex_dice("100d1000+5", seed=12345, sum_only=True)
+        embed = create_dice_embed(make_interaction(), result)
+        self.assertEqual(embed.fields[0].value, f"合計 = **{result.terms[0].total}**")
+        self.assertEqual(embed.fields[-1].value, f"**{result.total}**")
+    
+    def test_large_pool_truncated(self):
+        """上限を超える出目は先頭だけを表示するテスト"""
+        terms = tuple(make_term(500, 1000, 1000) for _ in range(3))
+        result = RollResult("500d1000+500d1000+500d1000", terms, sum(term.total for term in terms))
+        embed = create_dice_embed(make_interaction(), result)
+        self.assertWithinLimits(embed)
+        self.assertIn("個]", embed.fields[0].value)
+        self.assertTrue(embed.fields[0].value.endswith(f"= **{terms[0].total}**"))
+    
+    def test_many_terms(self):
+        """フィールド数の上限を超える項は合計にまとめるテスト"""
+        terms = tuple(make_term(1, 6, 4) for _ in range(40))
+        result = RollResult("+".join(["1d6"] * 40), terms, 160)
+        embed = create_dice_embed(make_interaction(), result)
+        self.assertWithinLimits(embed)
+        self.assertEqual(embed.fields[-2].value, "17項の合計 = **68**")
+        self.assertEqual(embed.fields[-1].value, "**160**")
+
+    def test_stats_long_expression(self):
+        """長いダイス式の確率分布のタイトルが上限に収まるテスト"""
+        stats = calculate_dice_stats("+".join(["1d6"] * 80))
+        self.assertNotIn("error", stats)
+        embed = create_stats_embed(stats)
+        self.assertWithinLimits(embed)
+        self.assertTrue(embed.title.endswith("…"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,7 +11,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
-from src.dice.roller import roll_dice, roll_complex_dice
+from src.dice.roller import roll_dice, roll_complex_dice, replay_roll
+from src.dice.result import RollRecord
+from src.dice import rng
 
 class TestDiceRoller(unittest.TestCase):
     """ダイスローラーのテストクラス"""
@@ -35,6 +37,37 @@ class TestDiceRoller(unittest.TestCase):
         for value in result:
             self.assertTrue(1 <= value <= 4)
     
+    def test_roll_dice_bulk(self):
+        """大量ダイスの一括ロールのテスト"""
+        for num_sides in (2, 6, 256, 257, 1000):
+            result = roll_dice(100, num_sides)
+            self.assertEqual(len(result), 100)
+            self.assertTrue(1 <= min(result) and max(result) <= num_sides)
+        
+        # 十分な回数振れば全ての出目が現れる
+        faces = set()
+        for _ in range(20):
+            faces.update(roll_dice(100, 6))
+        self.assertEqual(faces, {1, 2, 3, 4, 5, 6})
+
+    def test_roll_dice_max_face(self):
+        """最大の目が配列の型に収まるテスト（256面ダイスの256は1バイトに収まらない）"""
+        class MaxRandom:
+            """常に最大の目を出す乱数生成器"""
+            def __init__(self, num_sides):
+                self.num_sides = num_sides
+            def randrange(self, stop):
+                return stop - 1
+            def getrandbits(self, bits):
+                # 各ブロック（1または2バイト）を「面数-1」にする（棄却されない値）
+                width = 8 if self.num_sides < 256 else 16
+                return sum((self.num_sides - 1) << shift for shift in range(0, bits, width))
+
+        for num_dice in (1, 100):
+            for num_sides in (255, 256, 1000):
+                result = roll_dice(num_dice, num_sides, MaxRandom(num_sides))
+                self.assertEqual(list(result), [num_sides] * num_dice)
+    
     @patch('src.dice.roller.roll_dice')
     def test_roll_complex_dice_basic(self, mock_roll_dice):
         """基本的な複合ダイスロールのテスト（モック使用）"""
@@ -43,14 +76,14 @@ class TestDiceRoller(unittest.TestCase):
         
         # 基本的なダイスロール
         result = roll_complex_dice("1d6")
-        self.assertEqual(result["input"], "1d6")
-        self.assertEqual(result["result"], 3)
-        self.assertEqual(len(result["details"]), 1)
-        self.assertEqual(result["details"][0]["type"], "dice")
-        self.assertEqual(result["details"][0]["rolls"], [3])
+        self.assertEqual(result.input, "1d6")
+        self.assertEqual(result.total, 3)
+        self.assertEqual(len(result.terms), 1)
+        self.assertEqual(result.terms[0].type, "dice")
+        self.assertEqual(list(result.terms[0].rolls), [3])
         
         # モックの呼び出し確認
-        mock_roll_dice.assert_called_with(1, 6)
+        mock_roll_dice.assert_called_with(1, 6, None)
     
     @patch('src.dice.roller.roll_dice')
     def test_roll_complex_dice_with_modifier(self, mock_roll_dice):
@@ -60,40 +93,40 @@ class TestDiceRoller(unittest.TestCase):
         
         # 修正値付きダイスロール
         result = roll_complex_dice("1d20+5")
-        self.assertEqual(result["input"], "1d20+5")
-        self.assertEqual(result["result"], 20)  # 15 + 5
-        self.assertEqual(len(result["details"]), 2)
+        self.assertEqual(result.input, "1d20+5")
+        self.assertEqual(result.total, 20)  # 15 + 5
+        self.assertEqual(len(result.terms), 2)
         
         # ダイス部分の確認
-        self.assertEqual(result["details"][0]["type"], "dice")
-        self.assertEqual(result["details"][0]["rolls"], [15])
+        self.assertEqual(result.terms[0].type, "dice")
+        self.assertEqual(list(result.terms[0].rolls), [15])
         
         # 修正値部分の確認
-        self.assertEqual(result["details"][1]["type"], "modifier")
-        self.assertEqual(result["details"][1]["value"], 5)
+        self.assertEqual(result.terms[1].type, "modifier")
+        self.assertEqual(result.terms[1].value, 5)
         
         # モックの呼び出し確認
-        mock_roll_dice.assert_called_with(1, 20)
+        mock_roll_dice.assert_called_with(1, 20, None)
     
     def test_roll_complex_dice_validation(self):
         """複合ダイスロールの検証テスト"""
         # 無効なダイス表記
         result = roll_complex_dice("invalid")
-        self.assertIn("error", result)
+        self.assertIsNotNone(result.error)
         
         # ダイス数の制限チェック
         result = roll_complex_dice("1000d6")  # 最大100個
-        self.assertIn("error", result)
+        self.assertIsNotNone(result.error)
         
         # ダイス面の制限チェック
         result = roll_complex_dice("1d1")  # 最小2面
-        self.assertIn("error", result)
+        self.assertIsNotNone(result.error)
         result = roll_complex_dice("1d2000")  # 最大1000面
-        self.assertIn("error", result)
+        self.assertIsNotNone(result.error)
         
         # 修正値の制限チェック
         result = roll_complex_dice("1d6+2000")  # 最大1000
-        self.assertIn("error", result)
+        self.assertIsNotNone(result.error)
     
     @patch('src.dice.roller.roll_dice')
     def test_critical_fumble_detection(self, mock_roll_dice):
@@ -101,30 +134,54 @@ class TestDiceRoller(unittest.TestCase):
         # クリティカル（最大値）
         mock_roll_dice.return_value = [20]
         result = roll_complex_dice("1d20")
-        self.assertTrue(result["details"][0]["is_critical"])
-        self.assertFalse(result["details"][0]["is_fumble"])
+        self.assertTrue(result.terms[0].is_critical)
+        self.assertFalse(result.terms[0].is_fumble)
         
         # ファンブル（最小値）
         mock_roll_dice.return_value = [1]
         result = roll_complex_dice("1d20")
-        self.assertFalse(result["details"][0]["is_critical"])
-        self.assertTrue(result["details"][0]["is_fumble"])
+        self.assertFalse(result.terms[0].is_critical)
+        self.assertTrue(result.terms[0].is_fumble)
         
         # 複数ダイスのクリティカル
         mock_roll_dice.return_value = [6, 6]
         result = roll_complex_dice("2d6")
-        self.assertTrue(result["details"][0]["is_critical"])
+        self.assertTrue(result.terms[0].is_critical)
         
         # 複数ダイスのファンブル
         mock_roll_dice.return_value = [1, 1]
         result = roll_complex_dice("2d6")
-        self.assertTrue(result["details"][0]["is_fumble"])
+        self.assertTrue(result.terms[0].is_fumble)
         
         # クリティカルでもファンブルでもない
         mock_roll_dice.return_value = [2, 5]
         result = roll_complex_dice("2d6")
-        self.assertFalse(result["details"][0]["is_critical"])
-        self.assertFalse(result["details"][0]["is_fumble"])
+        self.assertFalse(result.terms[0].is_critical)
+        self.assertFalse(result.terms[0].is_fumble)
+    
+    def test_seeded_roll_replay(self):
+        """同じシードからは同じ出目が得られ、記録から再生成できるテスト"""
+        first = roll_complex_dice("10d6+1d20+3", seed=12345)
+        second = roll_complex_dice("10d6+1d20+3", seed=12345)
+        self.assertEqual(first.seed, 12345)
+        self.assertEqual([list(term.rolls) for term in first.terms[:2]], [list(term.rolls) for term in second.terms[:2]])
+        
+        record = RollRecord.from_result(first)
+        replayed = replay_roll(record)
+        self.assertEqual(replayed.total, record.total)
+        self.assertEqual(list(replayed.terms[0].rolls), list(first.terms[0].rolls))
+        
+        # シードのない記録は再生成できない
+        self.assertIsNotNone(replay_roll(RollRecord("1d6", None, 3)).error)
+    
+    @patch.object(rng, '_master_key', bytes(32))
+    def test_derive_seed(self):
+        """シードがインタラクションIDと通し番号から決定的に導出されるテスト"""
+        seed = rng.derive_seed(1234567890123456789)
+        self.assertEqual(seed, rng.derive_seed(1234567890123456789))
+        self.assertTrue(0 <= seed < 2 ** 64)
+        self.assertNotEqual(seed, rng.derive_seed(1234567890123456789, 1))
+        self.assertNotEqual(seed, rng.derive_seed(1234567890123456790))
 
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
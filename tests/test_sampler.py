@@ -0,0 +1,123 @@
+"""
+合計値の標本抽出のテスト
+"""
+import random
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice import sampler
+from src.dice.parser import compile_dice_expression
+from src.dice.probability import dice_sum_distribution
+from src.dice.roller import roll_complex_dice
+from src.dice.sampler import (
+    get_sum_table,
+    roll_dice_sum,
+    roll_totals,
+    table_build_cost,
+    get_sum_table_cache_info,
+    clear_sum_tables
+)
+
+class TestSumSampler(unittest.TestCase):
+    """合計値の標本抽出のテストクラス"""
+
+    def setUp(self):
+        clear_sum_tables()
+
+    def test_table_matches_distribution(self):
+        """表から引いた合計の頻度が厳密な分布と一致するテスト"""
+        table = get_sum_table(3, 6)
+        samples = table.sample_many(random.Random(1), 60000)
+        self.assertEqual(min(samples), 3)
+        self.assertEqual(max(samples), 18)
+
+        distribution = dice_sum_distribution(3, 6)
+        for total in range(3, 19):
+            expected = distribution.probability(total)
+            # 標準誤差の5倍以内
+            tolerance = 5 * (expected * (1 - expected) / len(samples)) ** 0.5
+            self.assertAlmostEqual(samples.count(total) / len(samples), expected, delta=tolerance)
+
+    def test_seeded_sampling(self):
+        """同じシードからは同じ合計が引かれるテスト"""
+        table = get_sum_table(100, 100)
+        first = [table.sample(random.Random(42)) for _ in range(3)]
+        self.assertEqual(len(set(first)), 1)
+        self.assertTrue(100 <= first[0] <= 10000)
+
+    def test_single_roll_does_not_build_table(self):
+        """1回だけのロールでは表を作らず、キャッシュにある表は使うテスト"""
+        total = roll_dice_sum(100, 1000, random.Random(1))
+        self.assertTrue(100 <= total <= 100000)
+        self.assertEqual(get_sum_table_cache_info()["size"], 0)
+
+        get_sum_table(3, 6)
+        self.assertTrue(-18 <= roll_dice_sum(-3, 6, random.Random(1)) <= -3)
+        self.assertEqual(get_sum_table_cache_info()["hits"], 1)
+
+    def test_repeated_single_rolls_build_table(self):
+        """1回ずつのロールでも、振った回数で作成のコストを回収できた時点で表を作るテスト"""
+        rng = random.Random(3)
+        payback = -(-table_build_cost(20, 6) // (20 * sampler.SUM_TABLE_PAYBACK))
+        for _ in range(payback - 1):
+            roll_dice_sum(20, 6, rng)
+        self.assertEqual(get_sum_table_cache_info()["size"], 0)
+        roll_dice_sum(20, 6, rng)
+        self.assertEqual(get_sum_table_cache_info()["size"], 1)
+
+    def test_roll_totals(self):
+        """繰り返しのロールでは表を作って合計を引くテスト"""
+        expression = compile_dice_expression("10d10-1d4+3")
+        totals = roll_totals(expression, 5000, random.Random(7))
+        self.assertEqual(len(totals), 5000)
+        self.assertTrue(all(9 <= value <= 102 for value in totals))
+        self.assertAlmostEqual(sum(totals) / len(totals), 55 - 2.5 + 3, delta=1.0)
+        self.assertEqual(get_sum_table_cache_info()["size"], 2)
+
+        self.assertEqual(list(totals), list(roll_totals(expression, 5000, random.Random(7))))
+
+    def test_cache_is_bounded(self):
+        """表のキャッシュが最大件数を超えないテスト"""
+        with patch.object(sampler, 'SUM_TABLE_CACHE_SIZE', 2):
+            for num_dice in (1, 2, 3):
+                get_sum_table(num_dice, 6)
+            info = get_sum_table_cache_info()
+        self.assertEqual(info["size"], 2)
+        self.assertEqual(info["misses"], 3)
+
+class TestSumOnlyRoll(unittest.TestCase):
+    """合計だけのロールのテストクラス"""
+
+    def test_sum_only_result(self):
+        """合計だけのロールは出目を持たず、シードを記録しないテスト"""
+        result = roll_complex_dice("100d1000+5", seed=12345, sum_only=True)
+        self.assertIsNone(result.error)
+        self.assertIsNone(result.seed)
+        term = result.terms[0]
+        self.assertEqual(len(term.rolls), 0)
+        self.assertTrue(100 <= term.total <= 100000)
+        self.assertEqual(result.total, term.total + 5)
+
+        # シードを指定すれば同じ合計になる
+        self.assertEqual(roll_complex_dice("100d1000+5", seed=12345, sum_only=True).total, result.total)
+
+    def test_sum_only_critical(self):
+        """合計だけのロールでも最大値・最小値でクリティカル・ファンブルになるテスト"""
+        for seed in range(20):
+            term = roll_complex_dice("1d2", seed=seed, sum_only=True).terms[0]
+            self.assertEqual(term.is_critical, term.total == 2)
+            self.assertEqual(term.is_fumble, term.total == 1)
+
+    def test_sum_only_limits(self):
+        """合計だけのロールでも制限を検証するテスト"""
+        self.assertIsNotNone(roll_complex_dice("1000d6", sum_only=True).error)
+
+if __name__ == "__main__":
+    unittest.main()
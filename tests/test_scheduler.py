@@ -0,0 +1,151 @@
+"""
+スケジューラーとタイマーのテスト
+"""
+import asyncio
+import unittest
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.timers import scheduler as scheduler_module
+from src.timers.scheduler import Scheduler, MemorySchedulerBackend, SQLiteSchedulerBackend
+from src.commands import lottery
+from src.commands.timer import parse_duration, format_duration, _owner_mentions
+
+class TestScheduler(unittest.TestCase):
+    """スケジューラーのテストクラス"""
+
+    def run_scheduler(self, scheduler: Scheduler, steps):
+        """スケジューラーを開始して steps を実行し、実行された予定の payload を順に返す"""
+        fired = []
+
+        async def handler(event):
+            fired.append(event.payload["n"])
+
+        async def main():
+            scheduler.register("test", handler)
+            await scheduler.start()
+            try:
+                await steps(scheduler)
+            finally:
+                await scheduler.close()
+
+        asyncio.run(main())
+        return fired
+
+    def test_due_order_and_cancel(self):
+        """実行時刻の順に実行され、取り消した予定は実行されないテスト"""
+        async def steps(scheduler):
+            for n, delay in ((1, 0.06), (2, 0.02), (3, 0.04)):
+                await scheduler.schedule("test", delay, {"n": n})
+            cancelled = await scheduler.schedule("test", 0.03, {"n": 4})
+            self.assertTrue(await scheduler.cancel(cancelled.id))
+            self.assertFalse(await scheduler.cancel(cancelled.id))
+            await asyncio.sleep(0.15)
+            self.assertEqual(scheduler.pending_count(), 0)
+
+        fired = self.run_scheduler(Scheduler(MemorySchedulerBackend()), steps)
+        self.assertEqual(fired, [2, 3, 1])
+
+    def test_earlier_event_wakes_scheduler(self):
+        """待機中に先頭より早い予定を追加すると、その時刻に実行されるテスト"""
+        async def steps(scheduler):
+            await scheduler.schedule("test", 60, {"n": 1})
+            await asyncio.sleep(0.01)
+            await scheduler.schedule("test", 0.01, {"n": 2})
+            await asyncio.sleep(0.1)
+            self.assertEqual([event.payload["n"] for event in scheduler.pending()], [1])
+
+        fired = self.run_scheduler(Scheduler(MemorySchedulerBackend()), steps)
+        self.assertEqual(fired, [2])
+
+    def test_persistence(self):
+        """保存した予定が再起動後に読み込まれ、実行時刻を過ぎた予定がすぐに実行されるテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "scheduler.db")
+
+            async def schedule_only(scheduler):
+                # 開始せずに予定だけを保存する（実行される前に停止した状態）
+                await scheduler.schedule("test", 0, {"n": 1})
+                await scheduler.schedule("test", 3600, {"n": 2})
+
+            backend = SQLiteSchedulerBackend(path)
+            asyncio.run(schedule_only(Scheduler(backend)))
+            backend.close()
+
+            async def wait(scheduler):
+                await asyncio.sleep(0.05)
+                self.assertEqual([event.payload["n"] for event in scheduler.pending()], [2])
+
+            backend = SQLiteSchedulerBackend(path)
+            fired = self.run_scheduler(Scheduler(backend), wait)
+            self.assertEqual(fired, [1])
+            # 実行した予定は保存先から削除される
+            self.assertEqual([event.payload["n"] for event in backend.load_pending(0)], [2])
+            self.assertEqual(backend.load_pending(1), [])
+            backend.close()
+
+class TestLotteryReveal(unittest.TestCase):
+    """抽選結果の遅延表示のテストクラス"""
+
+    @patch.object(scheduler_module, '_event_handlers', {})
+    @patch.object(scheduler_module, '_scheduler', None)
+    @patch.object(scheduler_module, 'SQLiteSchedulerBackend', lambda path: MemorySchedulerBackend())
+    def test_token_is_not_stored(self):
+        """コマンドの登録でスケジューラーを作成せず、予定にトークンを保存しないテスト"""
+        bot = MagicMock()
+        lottery.setup_lottery_command(bot)
+        self.assertIsNone(scheduler_module._scheduler)
+
+        async def announce():
+            interaction = SimpleNamespace(
+                application_id=1, token="secret", channel_id=2,
+                response=SimpleNamespace(is_done=lambda: False, send_message=AsyncMock()),
+                original_response=AsyncMock(return_value=SimpleNamespace(id=3))
+            )
+            await lottery._announce_result(interaction, discord.Embed(title="🎉 抽選結果"), 5)
+            return scheduler_module.get_scheduler()
+
+        scheduler = asyncio.run(announce())
+        event = scheduler.backend.load_pending(0)[0]
+        self.assertNotIn("secret", str(event.payload))
+        self.assertIn(lottery.LOTTERY_REVEAL_EVENT, scheduler._handlers)
+        self.assertEqual(lottery._reveal_tokens.pop(3), "secret")
+
+class TestTimerDuration(unittest.TestCase):
+    """タイマーの時間の表記のテストクラス"""
+
+    def test_parse_duration(self):
+        """時間の表記の変換テスト"""
+        self.assertEqual(parse_duration("90"), 90)
+        self.assertEqual(parse_duration("5m"), 300)
+        self.assertEqual(parse_duration("1h30m"), 5400)
+        self.assertEqual(parse_duration("1d 2h"), 93600)
+        self.assertEqual(parse_duration("1:30"), 90)
+        self.assertEqual(parse_duration("1:00:05"), 3605)
+        for text in ("", "abc", "5x", "1:75", "m"):
+            with self.assertRaises(ValueError):
+                parse_duration(text)
+
+    def test_format_duration(self):
+        """時間の表示のテスト"""
+        self.assertEqual(format_duration(5400), "1時間30分")
+        self.assertEqual(format_duration(0), "0秒")
+
+    def test_owner_mentions(self):
+        """通知のメンションがタイマーを開始したユーザーだけに限られるテスト"""
+        mentions = _owner_mentions({"user_id": 1234, "label": "@everyone"}).to_dict()
+        self.assertEqual(mentions["parse"], [])
+        self.assertEqual(mentions["users"], [1234])
+
+if __name__ == "__main__":
+    unittest.main()
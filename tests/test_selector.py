@@ -0,0 +1,80 @@
+"""
+重み付きランダム選択のテスト
+"""
+import random
+import unittest
+import sys
+import os
+from collections import Counter
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.randomizers.selector import (
+    WeightedSampler,
+    get_weighted_sampler,
+    get_weighted_sampler_cache_info,
+    parse_weighted_items,
+    weighted_select
+)
+from src.commands.choose import draw_weighted
+
+class TestWeightedSampler(unittest.TestCase):
+    """エイリアス表による重み付き選択のテストクラス"""
+
+    def test_frequencies(self):
+        """選ばれる頻度が重みに比例するテスト"""
+        sampler = WeightedSampler(["a", "b", "c", "d"], [1, 2, 7, 0])
+        counts = Counter(sampler.sample_many(50000, random.Random(3)))
+        self.assertNotIn("d", counts)
+        for item, weight in (("a", 1), ("b", 2), ("c", 7)):
+            self.assertAlmostEqual(counts[item] / 50000, weight / 10, delta=0.01)
+        self.assertAlmostEqual(sampler.probability(2), 0.7)
+
+    def test_seeded_sampling(self):
+        """同じシードからは同じ項目が選ばれるテスト"""
+        sampler = WeightedSampler(list(range(100)), [i % 7 + 0.5 for i in range(100)])
+        self.assertEqual(sampler.sample_many(20, random.Random(9)), sampler.sample_many(20, random.Random(9)))
+        self.assertEqual(sampler.sample(random.Random(9)), sampler.sample_many(1, random.Random(9))[0])
+
+    def test_zero_and_invalid_weights(self):
+        """重みが全て0なら等確率、不正な入力は例外になるテスト"""
+        sampler = WeightedSampler(["a", "b"], [0, -1])
+        self.assertEqual(set(sampler.sample_many(200, random.Random(1))), {"a", "b"})
+        self.assertEqual(sampler.probability(0), 0.5)
+        with self.assertRaises(ValueError):
+            WeightedSampler([], [])
+        with self.assertRaises(ValueError):
+            WeightedSampler(["a"], [1, 2])
+        with self.assertRaises(ValueError):
+            WeightedSampler(["a", "b"], [1, float("inf")])
+
+    def test_sampler_cache(self):
+        """同じ項目と重みからは作成済みのエイリアス表が返されるテスト"""
+        items = [f"item{i}" for i in range(10)]
+        first = get_weighted_sampler(items, range(1, 11))
+        hits = get_weighted_sampler_cache_info()["hits"]
+        self.assertIs(get_weighted_sampler(list(items), [float(w) for w in range(1, 11)]), first)
+        self.assertEqual(get_weighted_sampler_cache_info()["hits"], hits + 1)
+        self.assertIsNot(get_weighted_sampler(items, range(2, 12)), first)
+
+        # ハッシュできない項目はキャッシュせずに選ぶ
+        self.assertEqual(weighted_select([["x"], ["y"]], [0, 1]), ["y"])
+        self.assertIsNone(weighted_select(["a"], [1, 2]))
+
+    def test_parse_weighted_items(self):
+        """「項目:重み」の文字列の分割のテスト"""
+        items, weights = parse_weighted_items("剣:5, 盾 : 2.5, 薬, Re:ゼロ, ,:3")
+        self.assertEqual(items, ["剣", "盾", "薬", "Re:ゼロ", ":3"])
+        self.assertEqual(weights, [5.0, 2.5, 1.0, 1.0, 1.0])
+        self.assertEqual(parse_weighted_items(None), ([], []))
+
+    def test_draw_weighted(self):
+        """/choose weighted の抽選結果が回数の多い順にまとめられるテスト"""
+        selected = draw_weighted(["剣", "盾"], [1, 0], 5)
+        self.assertEqual(selected, [("剣", 5, 1.0)])
+
+if __name__ == "__main__":
+    unittest.main()
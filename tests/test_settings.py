@@ -0,0 +1,100 @@
+"""
+設定スナップショットのテスト
+"""
+import unittest
+import sys
+import os
+import tempfile
+from dataclasses import FrozenInstanceError
+from unittest.mock import patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+import config.settings
+from config.settings import Settings, get_settings, reload_settings, set_guild_overrides
+from src.dice.roller import roll_complex_dice
+
+class TestSettings(unittest.TestCase):
+    """設定スナップショットのテストクラス"""
+    
+    def test_snapshot_is_frozen(self):
+        """スナップショットが変更できないテスト"""
+        settings = get_settings()
+        with self.assertRaises(FrozenInstanceError):
+            settings.max_dice_count = 5
+    
+    def test_validation(self):
+        """不正な設定が拒否されるテスト"""
+        with self.assertRaises(ValueError):
+            Settings(min_dice_count=10, max_dice_count=5)
+        with self.assertRaises(ValueError):
+            Settings(min_dice_sides=1)
+        with self.assertRaises(ValueError):
+            Settings(history_backend="redis")
+    
+    def test_reload_swaps_snapshot(self):
+        """再読み込みで新しいスナップショットに差し替わるテスト"""
+        before = get_settings()
+        with patch.dict(os.environ, {"MAX_DICE_COUNT": "250"}):
+            self.assertTrue(reload_settings())
+            self.assertEqual(get_settings().max_dice_count, 250)
+            # 取得済みのスナップショットは変わらない
+            self.assertEqual(before.max_dice_count, 100)
+        
+        # 不正な値では現在の設定が維持される
+        with patch.dict(os.environ, {"MAX_DICE_COUNT": "0"}):
+            self.assertFalse(reload_settings())
+            self.assertEqual(get_settings().max_dice_count, 250)
+        
+        reload_settings()
+        self.assertEqual(get_settings().max_dice_count, 100)
+    
+    def test_guild_overrides(self):
+        """ギルド別設定がダイスロールに適用されるテスト"""
+        guild_settings = set_guild_overrides(1234, max_dice_count=500)
+        self.assertEqual(get_settings(1234).max_dice_count, 500)
+        self.assertEqual(get_settings(5678).max_dice_count, 100)
+        
+        self.assertIsNone(roll_complex_dice("300d6", guild_settings).error)
+        self.assertIsNotNone(roll_complex_dice("300d6").error)
+        
+        with self.assertRaises(ValueError):
+            set_guild_overrides(1234, bot_token="x")
+
+    def test_overrides_survive_reload(self):
+        """上書きしたギルド別設定が再読み込みの後も維持されるテスト"""
+        set_guild_overrides(4321, min_dice_count=50)
+        self.assertTrue(reload_settings())
+        self.assertEqual(get_settings(4321).min_dice_count, 50)
+        
+        # 新しい設定では不正になる上書きは破棄される
+        with patch.dict(os.environ, {"MAX_DICE_COUNT": "40"}):
+            self.assertTrue(reload_settings())
+            self.assertEqual(get_settings(4321).min_dice_count, 1)
+        reload_settings()
+        self.assertEqual(get_settings(4321).min_dice_count, 1)
+    
+    def test_removed_dotenv_key(self):
+        """.envから消したキーが再読み込みで元の値に戻るテスト"""
+        with tempfile.TemporaryDirectory() as directory, patch.dict(os.environ):
+            os.environ.pop("MAX_DICE_COUNT", None)
+            os.environ["MAX_MODIFIER"] = "500"
+            path = os.path.join(directory, ".env")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("MAX_DICE_COUNT=250\nMAX_MODIFIER=800\n")
+            with patch.object(config.settings, "ENV_PATH", path):
+                self.assertTrue(reload_settings())
+                self.assertEqual((get_settings().max_dice_count, get_settings().max_modifier), (250, 800))
+                
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("# 空\n")
+                self.assertTrue(reload_settings())
+                self.assertEqual((get_settings().max_dice_count, get_settings().max_modifier), (100, 500))
+                self.assertNotIn("MAX_DICE_COUNT", os.environ)
+        reload_settings()
+
+if __name__ == "__main__":
+    unittest.main()
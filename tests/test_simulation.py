@@ -0,0 +1,98 @@
+"""
+モンテカルロシミュレーションのテスト
+"""
+import asyncio
+import unittest
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.parser import compile_dice_expression
+from src.dice.probability import dice_sum_distribution
+from src.dice.renderer import create_simulation_embed
+from src.dice.simulation import SimulationResult, chunk_seed, run_simulation, simulate_chunk
+
+class TestSimulation(unittest.TestCase):
+    """シミュレーションのテストクラス"""
+
+    def test_chunk(self):
+        """チャンクの結果が式の範囲に収まり、シードで再現できるテスト"""
+        expression = compile_dice_expression("2d6+1")
+        counts = simulate_chunk(expression, 10000, 42)
+        self.assertEqual(sum(counts.values()), 10000)
+        self.assertTrue(set(counts) <= set(range(3, 14)))
+        self.assertEqual(counts, simulate_chunk(expression, 10000, 42))
+        self.assertNotEqual(chunk_seed(42, 0), chunk_seed(42, 1))
+
+    def test_result_independent_of_workers(self):
+        """ワーカー数によらず同じシードからは同じ結果になり、分布が厳密な値に近いテスト"""
+        expression = compile_dice_expression("3d6")
+
+        async def simulate(workers):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return await run_simulation(expression, 50000, 7, executor, workers, chunk_trials=4000)
+
+        first = asyncio.run(simulate(1))
+        second = asyncio.run(simulate(4))
+        self.assertTrue(first.done)
+        self.assertEqual(first.trials, 50000)
+        self.assertEqual(first.counts, second.counts)
+
+        distribution = first.to_distribution()
+        self.assertAlmostEqual(distribution.mean, 10.5, delta=0.05)
+        self.assertAlmostEqual(distribution.probability(10), dice_sum_distribution(3, 6).probability(10), delta=0.01)
+
+    def test_process_pool(self):
+        """プロセスプールでチャンクを実行できるテスト"""
+        expression = compile_dice_expression("100d1000")
+
+        async def simulate():
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                return await run_simulation(expression, 2000, 1, executor, 2, chunk_trials=500)
+
+        result = asyncio.run(simulate())
+        self.assertEqual(result.trials, 2000)
+        self.assertTrue(min(result.counts) >= 100 and max(result.counts) <= 100000)
+
+    def test_progress_and_stop(self):
+        """途中経過が通知され、中止するとそれまでの結果で終わるテスト"""
+        expression = compile_dice_expression("1d20")
+        progress = []
+
+        async def simulate():
+            stop = asyncio.Event()
+
+            async def on_progress(result):
+                progress.append(result.trials)
+                stop.set()
+
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return await run_simulation(
+                    expression, 10 ** 7, 3, executor, 1,
+                    on_progress=on_progress, interval=0.05, stop=stop, chunk_trials=20000
+                )
+
+        result = asyncio.run(simulate())
+        self.assertTrue(result.cancelled)
+        self.assertFalse(result.done)
+        self.assertEqual(len(progress), 1)
+        self.assertLess(result.trials, 10 ** 7)
+        self.assertGreater(result.throughput, 0)
+
+        embed = create_simulation_embed("1d20", result)
+        self.assertIn("中止", embed.description)
+        self.assertEqual([field.name for field in embed.fields][-1], "分布")
+
+    def test_empty_result_embed(self):
+        """試行前の結果でもEmbedを作成できるテスト"""
+        embed = create_simulation_embed("3d6", SimulationResult(100))
+        self.assertIn("0", embed.description)
+        self.assertEqual(len(embed.fields), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+起動時のモジュール読み込みのテスト
+"""
+import unittest
+import json
+import subprocess
+import sys
+import os
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.utils.startup import parse_importtime
+
+# 読み込み後の状態を調べるコード（テスト自体のプロセスは discord を読み込み済みのため別プロセスで実行）
+CHECK_CODE = """
+import json, logging, sys
+import src.dice.roller, src.dice.parser, src.dice.probability
+import src.randomizers.selector, src.randomizers.lottery, src.randomizers.ingest
+print(json.dumps({
+    "discord": "discord" in sys.modules,
+    "aiohttp": "aiohttp" in sys.modules,
+    "handlers": len(logging.getLogger().handlers) + len(logging.getLogger("dice_bot").handlers)
+}))
+"""
+
+class TestStartup(unittest.TestCase):
+    """起動時のモジュール読み込みのテストクラス"""
+
+    def test_engine_imports_without_discord(self):
+        """ダイスエンジンとランダマイザーが discord を読み込まず、ロギングも設定しないテスト"""
+        completed = subprocess.run(
+            [sys.executable, '-c', CHECK_CODE], cwd=project_root, capture_output=True, text=True, check=True
+        )
+        state = json.loads(completed.stdout)
+        self.assertFalse(state["discord"])
+        self.assertFalse(state["aiohttp"])
+        self.assertEqual(state["handlers"], 0)
+
+    def test_parse_importtime(self):
+        """-X importtime の出力の解析テスト"""
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   src.dice.parser",
+            "import time:       300 |        420 | src.dice.roller",
+            "import time:        50 |         50 | json",
+        ])
+        report = parse_importtime(output)
+
+        self.assertEqual([m.module for m in report.modules], ["src.dice.parser", "src.dice.roller", "json"])
+        self.assertEqual([m.depth for m in report.modules], [1, 0, 0])
+        self.assertEqual(report.total_us, 470)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""
+運の統計のテスト
+"""
+import asyncio
+import sqlite3
+import unittest
+import sys
+import os
+import tempfile
+import time
+from array import array
+from unittest.mock import patch
+
+# パスを追加して必要なモジュールをインポートできるようにする
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from src.dice.result import DiceTerm, ModifierTerm, RollResult
+from src.dice.roller import roll_complex_dice
+from src.storage.stats import (
+    GUILD_TOTAL_USER,
+    LuckStats,
+    LuckStatsStore,
+    MemoryStatsBackend,
+    SQLiteStatsBackend
+)
+from src.commands.stats import create_leaderboard_embed, create_luck_embed
+
+def make_result(*faces: int) -> RollResult:
+    """テスト用の d20 のロール結果を作成する（修正値+1）"""
+    term = DiceTerm(
+        len(faces), 20, array('B', faces), sum(faces),
+        all(face == 20 for face in faces), all(face == 1 for face in faces)
+    )
+    return RollResult(f"{len(faces)}d20+1", (term, ModifierTerm(1)), sum(faces) + 1)
+
+def make_stats(count: int) -> LuckStats:
+    """テスト用の count 回分の集計値を作成する"""
+    stats = LuckStats()
+    for _ in range(count):
+        stats.add(make_result(10))
+    return stats
+
+class TestLuckStats(unittest.TestCase):
+    """集計値のテストクラス"""
+
+    def test_add(self):
+        """ロール結果から回数・合計・クリティカル・出目の頻度が集計されるテスト"""
+        stats = LuckStats()
+        for faces in ((20,), (1,), (10, 12)):
+            stats.add(make_result(*faces))
+
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.total, 21 + 2 + 23)
+        self.assertEqual(stats.total_squares, 21 ** 2 + 2 ** 2 + 23 ** 2)
+        self.assertEqual((stats.critical, stats.fumble), (1, 1))
+        self.assertEqual(sum(stats.faces[20]), 4)
+        self.assertEqual(stats.faces[20][19], 1)
+        self.assertAlmostEqual(stats.face_mean(20), 43 / 4)
+        self.assertIsNone(stats.face_mean(6))
+
+        # 1d20+1 の期待値は11.5、標準偏差は約5.77
+        self.assertAlmostEqual(LuckStats.from_dict(stats.to_dict()).luck, stats.luck)
+        self.assertGreater(stats.luck, 0)
+
+    def test_modifier_shifts_mean(self):
+        """修正値の分だけ期待値がずれ、運の良さに偏りが出ないテスト"""
+        # 2d20+10 の期待値は31（出目10と11で期待値どおり）
+        term = DiceTerm(2, 20, array('B', (10, 11)), 21, False, False)
+        stats = LuckStats()
+        stats.add(RollResult("2d20+10", (term, ModifierTerm(10)), 31))
+        self.assertEqual(stats.luck_count, 1)
+        self.assertAlmostEqual(stats.luck, 0.0)
+
+        stats = LuckStats()
+        for _ in range(4000):
+            stats.add(roll_complex_dice("1d20+10-5"))
+        self.assertAlmostEqual(stats.luck, 0.0, delta=0.1)
+
+    def test_sum_only_and_large_dice(self):
+        """出目を持たないロールと大きなダイスは合計だけが集計されるテスト"""
+        stats = LuckStats()
+        stats.add(roll_complex_dice("100d6", sum_only=True))
+        stats.add(roll_complex_dice("2d1000"))
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.faces, {})
+        self.assertEqual(stats.luck_count, 2)
+
+    def test_mean_of_many_rolls(self):
+        """多数のロールの運の良さが0に近いテスト"""
+        stats = LuckStats()
+        for _ in range(4000):
+            stats.add(roll_complex_dice("3d6-1d4"))
+        self.assertAlmostEqual(stats.luck, 0.0, delta=0.1)
+        self.assertAlmostEqual(stats.face_mean(6), 3.5, delta=0.1)
+        self.assertAlmostEqual(stats.mean, 10.5 - 2.5, delta=0.2)
+
+class TestLuckStatsStore(unittest.TestCase):
+    """運の統計のストアのテストクラス"""
+
+    def test_guild_totals_and_leaderboard(self):
+        """ユーザーとギルド全体の集計値が更新され、リーダーボードが作成されるテスト"""
+        store = LuckStatsStore(MemoryStatsBackend(), flush_interval=60)
+        for _ in range(3):
+            store.record(1, 10, make_result(20))
+            store.record(1, 11, make_result(2))
+        store.record(1, 12, make_result(20))
+        store.record(2, 10, make_result(1))
+        store.record(None, 10, make_result(5))
+
+        self.assertEqual(store.get(1, GUILD_TOTAL_USER).count, 7)
+        self.assertEqual(store.get(2, 10).fumble, 1)
+        self.assertEqual(store.get(None, 10).count, 1)
+        self.assertIsNone(store.get(3, 10))
+
+        ranking = store.leaderboard(1, 'luck', min_rolls=2)
+        self.assertEqual([user_id for user_id, _, _ in ranking], [10, 11])
+        ranking = store.leaderboard(1, 'rolls', min_rolls=2)
+        self.assertEqual([user_id for user_id, _, _ in ranking][-1], 12)
+        with self.assertRaises(ValueError):
+            store.leaderboard(1, 'unknown')
+
+        # 取得した集計値を変更してもストアには影響しない
+        store.get(1, 10).count = 0
+        self.assertEqual(store.get(1, 10).count, 3)
+        store.close()
+
+    def test_sqlite_persist(self):
+        """集計値が保存され、再起動後に読み込まれるテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            store = LuckStatsStore(SQLiteStatsBackend(path), flush_interval=0.01)
+            store.record(1, 10, make_result(20, 20))
+            store.close()
+
+            store = LuckStatsStore(SQLiteStatsBackend(path), flush_interval=60)
+            stats = store.get(1, 10)
+            self.assertEqual((stats.count, stats.critical, stats.faces[20][19]), (1, 1, 2))
+            store.record(1, 10, make_result(3))
+            self.assertEqual(store.get(1, GUILD_TOTAL_USER).count, 2)
+            store.close()
+
+    def test_clusters_merge_direct_messages(self):
+        """複数のクラスターが同じDMの集計値を更新しても、互いの分を上書きしないテスト"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.db")
+            first = LuckStatsStore(SQLiteStatsBackend(path), flush_interval=60)
+            second = LuckStatsStore(SQLiteStatsBackend(path), flush_interval=60)
+            self.assertEqual(first.get(None), None)
+            self.assertEqual(second.get(None), None)
+            first.record(None, 10, make_result(20))
+            second.record(None, 10, make_result(1))
+            second.record(None, 11, make_result(5))
+            first.close()
+            second.close()
+
+            store = LuckStatsStore(SQLiteStatsBackend(path), flush_interval=60)
+            self.assertEqual(store.get(None, GUILD_TOTAL_USER).count, 3)
+            stats = store.get(None, 10)
+            self.assertEqual((stats.count, stats.critical, stats.fumble), (2, 1, 1))
+            store.close()
+
+    def test_preload_with_pending_rolls(self):
+        """読み込み前に記録したロールが、保存の前後どちらで読み込んでも一度だけ数えられるテスト"""
+        backend = MemoryStatsBackend()
+        backend.merge_many([(1, 10, make_stats(2).to_dict())])
+        store = LuckStatsStore(backend, flush_interval=60)
+        store.record(1, 10, make_result(20))
+        asyncio.run(store.preload(1))
+        self.assertEqual(store.get(1, 10).count, 3)
+
+        store.record(2, 10, make_result(20))
+        store.flush()
+        asyncio.run(store.preload(2))
+        self.assertEqual(store.get(2, 10).count, 1)
+        store.record(2, 10, make_result(1))
+        store.flush()
+        self.assertEqual(LuckStats.from_dict(backend._entries[2][10]).count, 2)
+        store.close()
+
+    def test_idle_guild_eviction(self):
+        """参照されないギルドは保存の後にメモリから外れ、差分のあるギルドは残るテスト"""
+        backend = MemoryStatsBackend()
+        store = LuckStatsStore(backend, flush_interval=60, idle_seconds=0.01)
+        for guild_id in (1, 2):
+            store.record(guild_id, 10, make_result(20))
+            asyncio.run(store.preload(guild_id))
+        self.assertEqual(store.loaded_guild_count(), 2)
+
+        time.sleep(0.02)
+        store.flush()
+        self.assertEqual(store.loaded_guild_count(), 0)
+
+        # 差分のあるギルドは残し、外れたギルドは読み込み直す
+        store.get(1, 10)
+        store.record(1, 10, make_result(1))
+        time.sleep(0.02)
+        with patch.object(backend, 'merge_many', side_effect=sqlite3.OperationalError("locked")):
+            store.flush()
+        self.assertEqual(store.loaded_guild_count(), 1)
+        self.assertEqual(store.get(1, 10).count, 2)
+        self.assertEqual(store.get(2, 10).count, 1)
+        store.close()
+
+    def test_embeds(self):
+        """統計とリーダーボードのEmbedを作成できるテスト"""
+        store = LuckStatsStore(MemoryStatsBackend(), flush_interval=60)
+        store.record(1, 10, make_result(20))
+        embed = create_luck_embed("テスト", store.get(1, 10), store.get(1))
+        self.assertIn("d20", embed.fields[-1].value)
+        embed = create_leaderboard_embed('critical', store.leaderboard(1, 'critical'), 1)
+        self.assertIn("<@10> 100.0%", embed.description)
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()